@@ -0,0 +1,6 @@
+"""Benchmarks for Smelt's orchestration overhead.
+
+These drive the real pipeline against synthetic repositories with scripted
+LLM and coding agent stand-ins, so the numbers measure Smelt itself (context
+build, git, QA subprocesses, the task store) rather than provider latency.
+"""
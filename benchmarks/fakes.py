@@ -0,0 +1,125 @@
+"""Scripted LLM client and coding agent with configurable latency.
+
+Both satisfy the protocols in smelt.agents.protocols. They sleep for a fixed
+latency to stand in for provider time, and record how long they slept so the
+benchmark can report orchestration overhead separately.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+from smelt.db.models import AgentResult, LLMResponse, LLMUsage
+
+_PLAN: str = "## Plan\n1. Add the feature module.\n2. Add a test for it.\n"
+
+
+class _LatencyRecorder:
+    """Thread-safe accumulator of simulated latency."""
+
+    def __init__(self, latency_seconds: float) -> None:
+        self._latency_seconds = latency_seconds
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.slept_seconds = 0.0
+
+    def sleep(self) -> None:
+        """Sleep for the configured latency and record it."""
+        start = time.monotonic()
+        if self._latency_seconds > 0:
+            time.sleep(self._latency_seconds)
+        with self._lock:
+            self.calls += 1
+            self.slept_seconds += time.monotonic() - start
+
+
+class ScriptedLLMClient(_LatencyRecorder):
+    """LLMClient stand-in that returns a canned plan after a fixed delay."""
+
+    def complete(
+        self,
+        *,
+        model: str,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int = 4096,
+        temperature: float = 0.0,
+    ) -> LLMResponse:
+        """Return the canned plan after the configured latency."""
+        self.sleep()
+        return LLMResponse(
+            content=_PLAN,
+            usage=LLMUsage(model=model, prompt_tokens=100, completion_tokens=20),
+        )
+
+
+class ScriptedCodingAgent(_LatencyRecorder):
+    """CodingAgent stand-in that writes a feature module and its test.
+
+    The first `qa_failures` sessions for each task write a failing test, so
+    the Coder/QA retry loop is exercised; later sessions write a passing one.
+    Read-only sessions are reviews and always approve.
+    """
+
+    def __init__(self, latency_seconds: float, *, qa_failures: int = 0) -> None:
+        """Initialize the agent.
+
+        Args:
+            latency_seconds: Simulated duration of each session.
+            qa_failures: Number of failing attempts per task before success.
+        """
+        super().__init__(latency_seconds)
+        self._qa_failures = qa_failures
+        self._attempts: defaultdict[str, int] = defaultdict(int)
+
+    def run_session(
+        self,
+        *,
+        prompt: str,
+        working_dir: str,
+        timeout_seconds: int,
+        read_only: bool = False,
+    ) -> AgentResult:
+        """Write the feature files after the configured latency.
+
+        A read-only (review) session writes nothing and approves the change.
+        """
+        self.sleep()
+        if read_only:
+            return AgentResult(
+                success=True,
+                session_id=str(uuid.uuid4())[:8],
+                output="Looks good.\nVERDICT: PASS",
+                duration_seconds=self._latency_seconds,
+            )
+        task_key = _task_key(prompt)
+        with self._lock:
+            attempt = self._attempts[task_key]
+            self._attempts[task_key] += 1
+
+        passing = attempt >= self._qa_failures
+        root = Path(working_dir)
+        (root / "src" / "synth" / f"feature_{task_key}.py").write_text(
+            f'def feature_{task_key}() -> str:\n    return "{task_key}"\n'
+        )
+        (root / "tests" / f"test_feature_{task_key}.py").write_text(
+            f"def test_feature_{task_key}() -> None:\n    assert {passing}\n"
+        )
+        return AgentResult(
+            success=True,
+            session_id=str(uuid.uuid4())[:8],
+            output="done",
+            duration_seconds=self._latency_seconds,
+        )
+
+
+def _task_key(prompt: str) -> str:
+    """Derive a stable identifier for the task a prompt belongs to."""
+    for line in prompt.splitlines():
+        if line.startswith("bench task "):
+            return line.removeprefix("bench task ").strip()
+    return "unknown"
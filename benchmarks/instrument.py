@@ -0,0 +1,171 @@
+"""Runtime instrumentation: per-stage wall time, subprocess counts, peak RSS.
+
+Timing is done by temporarily wrapping methods on the pipeline classes, and
+subprocesses are counted by wrapping `subprocess.Popen.__init__` (which
+`subprocess.run` also goes through). Everything is restored on exit.
+"""
+
+from __future__ import annotations
+
+import functools
+import math
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any  # wrappers forward the wrapped methods' signatures
+
+from smelt.db.store import TaskStore
+from smelt.git import GitOps
+from smelt.pipeline.architect import ArchitectStage
+from smelt.pipeline.coder import CoderStage
+from smelt.pipeline.context import RepoContextBuilder
+from smelt.pipeline.qa import QAStage
+from smelt.pipeline.reviewer import ReviewerStage
+from smelt.pipeline.sanity import SanityChecker
+
+# (owner class, method name, reported stage)
+_TIMED_METHODS: tuple[tuple[type, str, str], ...] = (
+    (TaskStore, "claim_next_task", "store"),
+    (TaskStore, "update_status", "store"),
+    (GitOps, "checkout_branch", "git"),
+    (GitOps, "pull", "git"),
+    (GitOps, "create_branch", "git"),
+    (SanityChecker, "check", "sanity"),
+    (RepoContextBuilder, "build", "context"),
+    (ArchitectStage, "execute", "architect"),
+    (CoderStage, "execute", "coder"),
+    (QAStage, "execute", "qa"),
+    (ReviewerStage, "execute", "reviewer"),
+)
+
+
+@dataclass(frozen=True)
+class StageTiming:
+    """Aggregated wall time of one stage.
+
+    Attributes:
+        calls: Number of timed calls.
+        total_seconds: Sum of all call durations.
+        p50_seconds: Median call duration.
+        p95_seconds: 95th percentile call duration.
+    """
+
+    calls: int
+    total_seconds: float
+    p50_seconds: float
+    p95_seconds: float
+
+
+class Instrumentation:
+    """Collects stage timings and subprocess counts while installed.
+
+    Recording can be paused (e.g. while the harness resets the repository)
+    so that only pipeline work is counted.
+    """
+
+    def __init__(self) -> None:
+        """Initialize empty measurements."""
+        self._durations: defaultdict[str, list[float]] = defaultdict(list)
+        self._subprocesses: Counter[str] = Counter()
+        self._lock = threading.Lock()
+        self._recording = True
+
+    @contextmanager
+    def installed(self) -> Iterator[Instrumentation]:
+        """Wrap the pipeline methods and Popen for the duration of the block."""
+        originals: list[tuple[type, str, Any]] = []
+        for owner, method, stage in _TIMED_METHODS:
+            original = owner.__dict__[method]
+            originals.append((owner, method, original))
+            setattr(owner, method, self._timed(original, stage))
+        popen_init = subprocess.Popen.__init__
+        originals.append((subprocess.Popen, "__init__", popen_init))
+        subprocess.Popen.__init__ = self._counted(popen_init)  # type: ignore[method-assign]
+        try:
+            yield self
+        finally:
+            for owner, method, original in reversed(originals):
+                setattr(owner, method, original)
+
+    @contextmanager
+    def paused(self) -> Iterator[None]:
+        """Stop recording for the duration of the block."""
+        self._recording = False
+        try:
+            yield
+        finally:
+            self._recording = True
+
+    def stage_timings(self) -> dict[str, StageTiming]:
+        """Return the aggregated timing of every stage that ran."""
+        with self._lock:
+            return {
+                stage: _aggregate(durations)
+                for stage, durations in self._durations.items()
+            }
+
+    def subprocess_counts(self) -> dict[str, int]:
+        """Return the number of subprocesses started, by executable name."""
+        with self._lock:
+            return dict(self._subprocesses.most_common())
+
+    def _timed(self, func: Callable[..., Any], stage: str) -> Callable[..., Any]:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                if self._recording:
+                    elapsed = time.perf_counter() - start
+                    with self._lock:
+                        self._durations[stage].append(elapsed)
+
+        return wrapper
+
+    def _counted(self, init: Callable[..., None]) -> Callable[..., None]:
+        @functools.wraps(init)
+        def wrapper(popen: subprocess.Popen[Any], args: Any, *a: Any, **k: Any) -> None:
+            if self._recording:
+                argv0 = args if isinstance(args, str | bytes) else next(iter(args))
+                name = os.path.basename(os.fsdecode(argv0)).split()[0]
+                with self._lock:
+                    self._subprocesses[name] += 1
+            init(popen, args, *a, **k)
+
+        return wrapper
+
+
+def peak_rss_kib() -> tuple[int, int]:
+    """Return the peak resident set size of this process and its children.
+
+    Returns:
+        (self, largest child) peak RSS in KiB.
+    """
+    scale = 1024 if sys.platform == "darwin" else 1  # macOS reports bytes
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale
+    return own, children
+
+
+def _aggregate(durations: list[float]) -> StageTiming:
+    ordered = sorted(durations)
+    return StageTiming(
+        calls=len(ordered),
+        total_seconds=sum(ordered),
+        p50_seconds=_percentile(ordered, 0.50),
+        p95_seconds=_percentile(ordered, 0.95),
+    )
+
+
+def _percentile(ordered: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
@@ -0,0 +1,252 @@
+"""End-to-end pipeline benchmark.
+
+Drives PipelineRunner over a queue of tasks in a synthetic repository, with
+scripted LLM and agent stand-ins, and reports per-stage wall time,
+subprocess counts, peak RSS and throughput. Usage:
+
+    python -m benchmarks.pipeline_bench --tasks 20 --modules 200
+    python -m benchmarks.pipeline_bench --json results.json
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import tempfile
+import time
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+from typing import Any
+
+import click
+
+from benchmarks.fakes import ScriptedCodingAgent, ScriptedLLMClient
+from benchmarks.instrument import Instrumentation, StageTiming, peak_rss_kib
+from benchmarks.synthetic_repo import make_repo, reset_repo
+from smelt.config import QAConfig, SmeltConfig
+from smelt.db.schema import init_db
+from smelt.db.store import TaskStore
+from smelt.git import GitOps
+from smelt.pipeline.context import RepoContextBuilder
+from smelt.pipeline.runner import PipelineRunner
+
+_SECONDS_PER_HOUR: float = 3600.0
+
+
+@dataclass(frozen=True)
+class BenchmarkParams:
+    """Knobs for one benchmark run.
+
+    Attributes:
+        tasks: Number of tasks queued and run.
+        modules: Number of generated modules in the synthetic repository.
+        functions_per_module: Functions per generated module.
+        llm_latency_seconds: Simulated latency of each LLM call.
+        agent_latency_seconds: Simulated duration of each agent session.
+        qa_failures: Failing Coder attempts per task before QA passes.
+        run_linter: Whether QA runs ruff.
+        run_type_checker: Whether QA runs mypy.
+    """
+
+    tasks: int = 10
+    modules: int = 100
+    functions_per_module: int = 20
+    llm_latency_seconds: float = 0.0
+    agent_latency_seconds: float = 0.0
+    qa_failures: int = 0
+    run_linter: bool = False
+    run_type_checker: bool = False
+
+
+@dataclass(frozen=True)
+class BenchmarkReport:
+    """Measurements from one benchmark run.
+
+    Attributes:
+        params: The parameters the run used.
+        succeeded: Number of tasks that passed QA.
+        wall_seconds: Total wall time spent in the pipeline.
+        simulated_latency_seconds: Time spent sleeping in the fakes.
+        stages: Aggregated wall time per stage.
+        subprocesses: Subprocesses started, by executable name.
+        peak_rss_kib: Peak RSS of the benchmark process.
+        peak_child_rss_kib: Peak RSS of the largest subprocess.
+    """
+
+    params: BenchmarkParams
+    succeeded: int
+    wall_seconds: float
+    simulated_latency_seconds: float
+    stages: dict[str, StageTiming]
+    subprocesses: dict[str, int]
+    peak_rss_kib: int
+    peak_child_rss_kib: int
+
+    @property
+    def overhead_seconds(self) -> float:
+        """Wall time not explained by simulated provider latency."""
+        return self.wall_seconds - self.simulated_latency_seconds
+
+    @property
+    def tasks_per_hour(self) -> float:
+        """Throughput over the whole run."""
+        if self.wall_seconds <= 0:
+            return 0.0
+        return self.params.tasks * _SECONDS_PER_HOUR / self.wall_seconds
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return a JSON-serializable form, including derived metrics."""
+        data = asdict(self)
+        data["overhead_seconds"] = self.overhead_seconds
+        data["tasks_per_hour"] = self.tasks_per_hour
+        return data
+
+    def render(self) -> str:
+        """Return a human-readable summary table."""
+        lines = [
+            f"tasks: {self.succeeded}/{self.params.tasks} passed "
+            f"({self.params.modules} modules x "
+            f"{self.params.functions_per_module} functions)",
+            f"wall: {self.wall_seconds:.2f}s  "
+            f"overhead: {self.overhead_seconds:.2f}s  "
+            f"throughput: {self.tasks_per_hour:.0f} tasks/hour",
+            f"peak RSS: {self.peak_rss_kib / 1024:.1f} MiB "
+            f"(largest subprocess {self.peak_child_rss_kib / 1024:.1f} MiB)",
+            "",
+            f"{'stage':<10} {'calls':>6} {'total s':>9} {'p50 ms':>9} {'p95 ms':>9}",
+        ]
+        for stage, t in sorted(
+            self.stages.items(), key=lambda item: -item[1].total_seconds
+        ):
+            lines.append(
+                f"{stage:<10} {t.calls:>6} {t.total_seconds:>9.3f} "
+                f"{t.p50_seconds * 1000:>9.1f} {t.p95_seconds * 1000:>9.1f}"
+            )
+        lines.append("")
+        counts = ", ".join(f"{k}={v}" for k, v in self.subprocesses.items())
+        lines.append(f"subprocesses: {sum(self.subprocesses.values())} ({counts})")
+        return "\n".join(lines)
+
+
+def run_benchmark(params: BenchmarkParams, workdir: Path) -> BenchmarkReport:
+    """Run the pipeline over `params.tasks` tasks and collect measurements.
+
+    Args:
+        params: Benchmark parameters.
+        workdir: Empty scratch directory for the repository and database.
+
+    Returns:
+        The collected measurements.
+    """
+    config = SmeltConfig()
+    config = replace(
+        config,
+        coding=replace(config.coding, max_retries=params.qa_failures),
+        qa=QAConfig(
+            run_linter=params.run_linter,
+            run_type_checker=params.run_type_checker,
+        ),
+    )
+    base_branch = config.git.base_branch
+    repo = make_repo(
+        workdir,
+        modules=params.modules,
+        functions_per_module=params.functions_per_module,
+        base_branch=base_branch,
+    )
+
+    conn = sqlite3.connect(str(workdir / "bench.db"), check_same_thread=False)
+    init_db(conn)
+    store = TaskStore(conn)
+    for n in range(params.tasks):
+        store.add_task(f"bench task {n}")
+
+    llm = ScriptedLLMClient(params.llm_latency_seconds)
+    agent = ScriptedCodingAgent(
+        params.agent_latency_seconds, qa_failures=params.qa_failures
+    )
+    runner = PipelineRunner(
+        config=config,
+        store=store,
+        git=GitOps(repo, config.git),
+        llm=llm,
+        agent=agent,
+        repo_path=repo,
+        context_builder=RepoContextBuilder(config=config.context),
+    )
+
+    succeeded = 0
+    wall_seconds = 0.0
+    instrumentation = Instrumentation()
+    with instrumentation.installed():
+        for _ in range(params.tasks):
+            start = time.perf_counter()
+            result = runner.run()
+            wall_seconds += time.perf_counter() - start
+            succeeded += result.success
+            with instrumentation.paused():
+                reset_repo(repo, base_branch)
+
+    own_rss, child_rss = peak_rss_kib()
+    return BenchmarkReport(
+        params=params,
+        succeeded=succeeded,
+        wall_seconds=wall_seconds,
+        simulated_latency_seconds=llm.slept_seconds + agent.slept_seconds,
+        stages=instrumentation.stage_timings(),
+        subprocesses=instrumentation.subprocess_counts(),
+        peak_rss_kib=own_rss,
+        peak_child_rss_kib=child_rss,
+    )
+
+
+@click.command()
+@click.option("--tasks", default=10, show_default=True, help="Tasks to run.")
+@click.option("--modules", default=100, show_default=True, help="Repo modules.")
+@click.option("--functions", default=20, show_default=True, help="Functions/module.")
+@click.option("--llm-latency", default=0.0, show_default=True, help="Seconds/call.")
+@click.option("--agent-latency", default=0.0, show_default=True, help="Seconds/call.")
+@click.option(
+    "--qa-failures", default=0, show_default=True, help="Failing attempts per task."
+)
+@click.option("--linter/--no-linter", default=False, help="Run ruff in QA.")
+@click.option("--type-checker/--no-type-checker", default=False, help="Run mypy.")
+@click.option(
+    "--json",
+    "json_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Also write the report as JSON, for tracking over time.",
+)
+def main(
+    tasks: int,
+    modules: int,
+    functions: int,
+    llm_latency: float,
+    agent_latency: float,
+    qa_failures: int,
+    linter: bool,
+    type_checker: bool,
+    json_path: Path | None,
+) -> None:
+    """Benchmark the pipeline end to end against a synthetic repository."""
+    params = BenchmarkParams(
+        tasks=tasks,
+        modules=modules,
+        functions_per_module=functions,
+        llm_latency_seconds=llm_latency,
+        agent_latency_seconds=agent_latency,
+        qa_failures=qa_failures,
+        run_linter=linter,
+        run_type_checker=type_checker,
+    )
+    with tempfile.TemporaryDirectory(prefix="smelt-bench-") as tmp:
+        report = run_benchmark(params, Path(tmp))
+
+    click.echo(report.render())
+    if json_path is not None:
+        json_path.write_text(json.dumps(report.to_dict(), indent=2) + "\n")
+        click.echo(f"\nreport written to {json_path}")
+
+
+if __name__ == "__main__":
+    main()
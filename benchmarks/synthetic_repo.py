@@ -0,0 +1,98 @@
+"""Synthetic git repositories of configurable size.
+
+The repository has a bare `origin` remote so the pipeline's fetch and push
+steps run for real, a package of generated modules for the context builder
+to parse, and a trivial test suite so the sanity check and QA pass.
+"""
+
+from __future__ import annotations
+
+import subprocess
+from pathlib import Path
+
+_PYPROJECT: str = """\
+[project]
+name = "synth"
+version = "0.0.0"
+
+[tool.pytest.ini_options]
+testpaths = ["tests"]
+"""
+
+
+def make_repo(
+    root: Path, *, modules: int, functions_per_module: int, base_branch: str
+) -> Path:
+    """Create a synthetic repository with an origin remote.
+
+    Args:
+        root: Empty directory to create the repository (and its remote) in.
+        modules: Number of generated Python modules.
+        functions_per_module: Number of functions in each module.
+        base_branch: Name of the branch tasks are based on.
+
+    Returns:
+        Path to the working tree.
+    """
+    origin = root / "origin.git"
+    repo = root / "repo"
+    _git(root, "init", "-q", "--bare", f"--initial-branch={base_branch}", str(origin))
+    _git(root, "init", "-q", f"--initial-branch={base_branch}", str(repo))
+
+    package = repo / "src" / "synth"
+    package.mkdir(parents=True)
+    (package / "__init__.py").write_text('"""Synthetic package."""\n')
+    for m in range(modules):
+        (package / f"module_{m}.py").write_text(_module_source(m, functions_per_module))
+
+    tests = repo / "tests"
+    tests.mkdir()
+    (tests / "test_smoke.py").write_text("def test_smoke() -> None:\n    assert True\n")
+    (repo / "pyproject.toml").write_text(_PYPROJECT)
+    (repo / ".gitignore").write_text("__pycache__/\n.pytest_cache/\n")
+
+    # The pipeline commits task branches, so the identity must persist
+    _git(repo, "config", "user.name", "bench")
+    _git(repo, "config", "user.email", "bench@example.com")
+    _git(repo, "add", ".")
+    _git(repo, "commit", "-q", "-m", "Synthetic baseline")
+    _git(repo, "remote", "add", "origin", str(origin))
+    _git(repo, "push", "-q", "-u", "origin", base_branch)
+    return repo
+
+
+def reset_repo(repo: Path, base_branch: str) -> None:
+    """Discard a task's changes and return to the base branch.
+
+    Args:
+        repo: The working tree to reset.
+        base_branch: Branch to check out.
+    """
+    _git(repo, "checkout", "-q", "-f", base_branch)
+    _git(repo, "clean", "-q", "-fdx")
+
+
+def _module_source(index: int, functions: int) -> str:
+    """Generate the source of one synthetic module."""
+    lines = [f'"""Synthetic module {index}."""', ""]
+    lines.append(f"class Model{index}:")
+    lines.append(f'    """Model {index}."""')
+    lines.append("")
+    lines.append("    def value(self) -> int:")
+    lines.append(f"        return {index}")
+    for f in range(functions):
+        lines.extend(
+            [
+                "",
+                "",
+                f"def function_{index}_{f}(x: int, y: int = {f}) -> int:",
+                f'    """Return a derived value ({f})."""',
+                f"    return x * {f} + y",
+            ]
+        )
+    return "\n".join(lines) + "\n"
+
+
+def _git(cwd: Path, *args: str) -> None:
+    """Run a git command, failing loudly."""
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True)
@@ -7,14 +7,38 @@ write a new adapter and change one line in cli.py.
 
 from __future__ import annotations
 
+import contextlib
+import logging
+import os
+import queue
 import subprocess
+import tempfile
+import threading
 import time
 import uuid
+from collections import deque
+from collections.abc import Callable, Sequence
+from pathlib import Path
+from typing import IO, TextIO
 
-from smelt.db.models import AgentResult
-from smelt.exceptions import AgentError, AgentTimeoutError
+from smelt.agents.protocols import OutputMonitor
+from smelt.db.models import AgentResult, OutputLine
+from smelt.exceptions import AgentAbortedError, AgentError, AgentTimeoutError
+
+logger = logging.getLogger(__name__)
 
 _GOOSE_DEFAULT_EXECUTABLE: str = "goose"
+# Only the tail of each stream is kept in memory; the full output goes to the log
+_STDOUT_TAIL_LINES: int = 200
+_STDERR_TAIL_LINES: int = 50
+# Prompts up to this size are written to stdin; larger ones go through a temp
+# instruction file.
+_STDIN_PROMPT_MAX_BYTES: int = 64 * 1024
+
+OutputCallback = Callable[[OutputLine], None]
+MonitorFactory = Callable[[], Sequence[OutputMonitor]]
+# (stream name, line) — a None line marks the end of that stream
+_StreamItem = tuple[str, str | None]
 
 
 class GooseAdapter:
@@ -22,15 +46,53 @@ class GooseAdapter:
 
     Satisfies the CodingAgent protocol. The pipeline stages receive a
     CodingAgent and never import this class directly.
+
+    Output is streamed line by line while the session runs: every line is
+    forwarded to the optional callback, appended to a per-session log file
+    (in the run's directory, see for_run()),
+    and checked by a fresh set of output monitors that can abort the session
+    early. Only a bounded tail of the output is held in memory.
     """
 
-    def __init__(self, executable: str = _GOOSE_DEFAULT_EXECUTABLE) -> None:
+    def __init__(
+        self,
+        executable: str = _GOOSE_DEFAULT_EXECUTABLE,
+        *,
+        log_dir: Path | None = None,
+        on_output: OutputCallback | None = None,
+        monitor_factory: MonitorFactory | None = None,
+    ) -> None:
         """Initialize the Goose adapter.
 
         Args:
             executable: Path or name of the goose CLI executable.
+            log_dir: Directory for per-session log files (no log if None).
+            on_output: Called with every output line as it is produced.
+            monitor_factory: Creates the output monitors for each session.
         """
         self._executable = executable
+        self._log_dir = log_dir
+        self._on_output = on_output
+        self._monitor_factory = monitor_factory
+
+    def for_run(self, run_id: str) -> GooseAdapter:
+        """Return an adapter writing its session logs under log_dir/run_id/.
+
+        Args:
+            run_id: Id of the run (its log directory name).
+
+        Returns:
+            An adapter for the sessions of that run; this one if it keeps no
+            logs.
+        """
+        if self._log_dir is None:
+            return self
+        return GooseAdapter(
+            self._executable,
+            log_dir=self._log_dir / run_id,
+            on_output=self._on_output,
+            monitor_factory=self._monitor_factory,
+        )
 
     def run_session(
         self,
@@ -42,9 +104,9 @@ class GooseAdapter:
     ) -> AgentResult:
         """Run a headless Goose session.
 
-        Goose is invoked as a subprocess. The prompt is passed via stdin
-        so it does not appear in the process argument list (avoids shell quoting
-        issues and keeps sensitive context off the process table).
+        Goose is invoked as a subprocess and its stdout/stderr are read line
+        by line as they are produced, so progress is visible immediately and
+        a stuck session can be stopped before the timeout.
 
         Args:
             prompt: The full prompt/instructions for the agent.
@@ -57,37 +119,271 @@ class GooseAdapter:
 
         Raises:
             AgentTimeoutError: If the session exceeds timeout_seconds.
-            AgentError: If Goose exits with a non-zero return code.
+            AgentAbortedError: If an output monitor requests an abort.
+            AgentError: If Goose fails to start or exits with a non-zero code.
         """
         session_id = str(uuid.uuid4())[:8]
-        start = time.monotonic()
-
-        cmd = [self._executable, "run", "--text", prompt]
+        cmd = [self._executable, "run", "--name", _session_name(session_id)]
         if read_only:
             cmd.append("--no-write")
+        return self._execute(cmd, prompt, session_id, working_dir, timeout_seconds)
+
+    def resume_session(
+        self,
+        *,
+        session_id: str,
+        prompt: str,
+        working_dir: str,
+        timeout_seconds: int,
+    ) -> AgentResult:
+        """Continue a previous Goose session with a follow-up prompt.
+
+        Goose reloads the named session's conversation, so the agent keeps
+        everything it already learned about the repository and only the new
+        instructions are sent.
+
+        Args:
+            session_id: The session_id of a previous AgentResult.
+            prompt: The incremental instructions for the agent.
+            working_dir: The directory the agent should operate in.
+            timeout_seconds: Maximum seconds before the session is killed.
+
+        Returns:
+            AgentResult with the same session_id.
+
+        Raises:
+            AgentTimeoutError: If the session exceeds timeout_seconds.
+            AgentAbortedError: If an output monitor requests an abort.
+            AgentError: If Goose fails to start or exits with a non-zero code.
+        """
+        cmd = [
+            self._executable,
+            "run",
+            "--name",
+            _session_name(session_id),
+            "--resume",
+        ]
+        return self._execute(cmd, prompt, session_id, working_dir, timeout_seconds)
+
+    def _execute(
+        self,
+        cmd: list[str],
+        prompt: str,
+        session_id: str,
+        working_dir: str,
+        timeout_seconds: int,
+    ) -> AgentResult:
+        """Run a Goose command with the prompt delivered off the command line.
+
+        The prompt never appears in argv (no ARG_MAX limit, not visible in
+        `ps`). Prompts up to 64 KiB are written to stdin; larger ones are
+        written to a private temp file passed via --instructions, which is
+        removed when the session ends.
+
+        Args:
+            cmd: The goose command line, without the prompt.
+            prompt: The instructions for the agent.
+            session_id: The session this invocation belongs to.
+            working_dir: The directory the agent should operate in.
+            timeout_seconds: Maximum seconds before the process is killed.
+
+        Returns:
+            AgentResult describing the outcome.
+        """
+        if len(prompt.encode("utf-8")) <= _STDIN_PROMPT_MAX_BYTES:
+            return self._stream(
+                [*cmd, "--instructions", "-"],
+                prompt,
+                session_id,
+                working_dir,
+                timeout_seconds,
+            )
 
+        fd, instructions_path = tempfile.mkstemp(prefix="smelt-prompt-", suffix=".md")
         try:
-            result = subprocess.run(
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(prompt)
+            return self._stream(
+                [*cmd, "--instructions", instructions_path],
+                None,
+                session_id,
+                working_dir,
+                timeout_seconds,
+            )
+        finally:
+            os.unlink(instructions_path)
+
+    def _stream(
+        self,
+        cmd: list[str],
+        stdin_prompt: str | None,
+        session_id: str,
+        working_dir: str,
+        timeout_seconds: int,
+    ) -> AgentResult:
+        """Run a Goose command, streaming and monitoring its output.
+
+        Args:
+            cmd: The full goose command line.
+            stdin_prompt: Prompt to write to stdin, or None to give no stdin.
+            session_id: The session this invocation belongs to.
+            working_dir: The directory the agent should operate in.
+            timeout_seconds: Maximum seconds before the process is killed.
+
+        Returns:
+            AgentResult describing the outcome.
+        """
+        start = time.monotonic()
+        deadline = start + timeout_seconds
+
+        monitors = list(self._monitor_factory()) if self._monitor_factory else []
+        log_path = self._log_path(session_id)
+        stdout_tail: deque[str] = deque(maxlen=_STDOUT_TAIL_LINES)
+        stderr_tail: deque[str] = deque(maxlen=_STDERR_TAIL_LINES)
+
+        try:
+            proc = subprocess.Popen(
                 cmd,
                 cwd=working_dir,
-                capture_output=True,
+                stdin=subprocess.DEVNULL if stdin_prompt is None else subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
                 text=True,
-                timeout=timeout_seconds,
-                check=True,
+                encoding="utf-8",
+                errors="replace",
             )
-            duration = time.monotonic() - start
-            return AgentResult(
-                success=True,
-                session_id=session_id,
-                output=result.stdout.strip(),
-                duration_seconds=duration,
+        except OSError as e:
+            raise AgentError(f"Failed to start Goose: {e}") from e
+
+        items: queue.Queue[_StreamItem] = queue.Queue()
+        for name, stream in (("stdout", proc.stdout), ("stderr", proc.stderr)):
+            threading.Thread(
+                target=_pump, args=(stream, name, items), daemon=True
+            ).start()
+        # Written from its own thread while the output is drained, so a prompt
+        # larger than the pipe buffer cannot deadlock against Goose's output
+        feeder = None
+        if stdin_prompt is not None and proc.stdin is not None:
+            feeder = threading.Thread(
+                target=_feed, args=(proc.stdin, stdin_prompt), daemon=True
             )
+            feeder.start()
+
+        try:
+            with _open_log(log_path) as log:
+                open_streams = 2
+                while open_streams:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        if remaining <= 0:
+                            raise queue.Empty
+                        stream_name, text = items.get(timeout=remaining)
+                    except queue.Empty:
+                        raise AgentTimeoutError(
+                            f"Goose session timed out after {timeout_seconds}s"
+                        ) from None
+
+                    if text is None:
+                        open_streams -= 1
+                        continue
+
+                    line = OutputLine(
+                        session_id=session_id,
+                        stream=stream_name,
+                        text=text,
+                        elapsed_seconds=time.monotonic() - start,
+                    )
+                    tail = stdout_tail if stream_name == "stdout" else stderr_tail
+                    tail.append(text)
+                    if log is not None:
+                        log.write(f"[{stream_name}] {text}\n")
+                    logger.debug("goose[%s] %s", session_id, text)
+                    if self._on_output is not None:
+                        self._on_output(line)
+
+                    for monitor in monitors:
+                        reason = monitor.observe(line)
+                        if reason is not None:
+                            raise AgentAbortedError(f"Goose session aborted: {reason}")
+        except BaseException:
+            # Never leave Goose running: timeout, abort or a failing callback
+            _kill(proc)
+            raise
+
+        try:
+            returncode = proc.wait(timeout=max(deadline - time.monotonic(), 0))
         except subprocess.TimeoutExpired as e:
+            _kill(proc)
             raise AgentTimeoutError(
                 f"Goose session timed out after {timeout_seconds}s"
             ) from e
-        except subprocess.CalledProcessError as e:
-            error_output = e.stderr.strip() if e.stderr else e.stdout.strip()
+        if feeder is not None:
+            # Goose has exited, so the write is done or ends in a broken pipe
+            feeder.join()
+
+        stdout = "\n".join(stdout_tail).strip()
+        if returncode != 0:
+            error_output = "\n".join(stderr_tail).strip() or stdout
             raise AgentError(
-                f"Goose session failed (exit {e.returncode}): {error_output}"
-            ) from e
+                f"Goose session failed (exit {returncode}): {error_output}"
+            )
+
+        return AgentResult(
+            success=True,
+            session_id=session_id,
+            output=stdout,
+            duration_seconds=time.monotonic() - start,
+            log_path=str(log_path) if log_path else None,
+        )
+
+    def _log_path(self, session_id: str) -> Path | None:
+        """Return the log file path for a session, creating the log dir."""
+        if self._log_dir is None:
+            return None
+        self._log_dir.mkdir(parents=True, exist_ok=True)
+        return self._log_dir / f"goose-{session_id}.log"
+
+
+def _session_name(session_id: str) -> str:
+    """Return the Goose session name used for a Smelt session id."""
+    return f"smelt-{session_id}"
+
+
+def _pump(stream: IO[str] | None, name: str, sink: queue.Queue[_StreamItem]) -> None:
+    """Forward every line of a subprocess stream into a queue.
+
+    Args:
+        stream: The subprocess pipe to read.
+        name: Stream name attached to each item ('stdout' or 'stderr').
+        sink: Queue receiving (name, line) items, then (name, None) at EOF.
+    """
+    try:
+        if stream is not None:  # pragma: no branch
+            for raw in stream:
+                sink.put((name, raw.rstrip("\n")))
+    finally:
+        sink.put((name, None))
+
+
+def _feed(stream: IO[str], text: str) -> None:
+    """Write a prompt to a subprocess's stdin and close it.
+
+    A broken pipe means the process exited early; its exit code reports why.
+    """
+    with contextlib.suppress(BrokenPipeError):
+        stream.write(text)
+    with contextlib.suppress(BrokenPipeError):
+        stream.close()
+
+
+def _kill(proc: subprocess.Popen[str]) -> None:
+    """Kill a subprocess and reap it."""
+    proc.kill()
+    proc.wait()
+
+
+def _open_log(path: Path | None) -> contextlib.AbstractContextManager[TextIO | None]:
+    """Open a line-buffered session log for appending, or a no-op context."""
+    if path is None:
+        return contextlib.nullcontext()
+    return path.open("a", encoding="utf-8", buffering=1)
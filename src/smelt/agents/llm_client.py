@@ -6,11 +6,17 @@ and other providers is a model string change, not a code change.
 
 from __future__ import annotations
 
+import logging
+import time
+
 import litellm
 import litellm.exceptions
 
+from smelt.db.models import LLMResponse, LLMUsage
 from smelt.exceptions import InfraError, LLMError
 
+logger = logging.getLogger(__name__)
+
 
 class LiteLLMClient:
     """LLM client that uses litellm for chat completions.
@@ -27,7 +33,7 @@ class LiteLLMClient:
         user_prompt: str,
         max_tokens: int = 4096,
         temperature: float = 0.0,
-    ) -> str:
+    ) -> LLMResponse:
         """Send a chat completion request via litellm.
 
         Args:
@@ -38,12 +44,14 @@ class LiteLLMClient:
             temperature: Sampling temperature (0.0 = most deterministic).
 
         Returns:
-            The model's response as a plain string.
+            LLMResponse with the response text and the call's token usage,
+            latency and estimated cost (None for models litellm cannot price).
 
         Raises:
             InfraError: For transient failures (rate limit, API unavailable).
             LLMError: For all other API failures or empty responses.
         """
+        start = time.monotonic()
         try:
             response = litellm.completion(
                 model=model,
@@ -67,4 +75,43 @@ class LiteLLMClient:
         content: str = raw if isinstance(raw, str) else ""
         if not content:
             raise LLMError("LLM returned an empty response")
-        return content
+        return LLMResponse(
+            content=content,
+            usage=_extract_usage(response, model, time.monotonic() - start),
+        )
+
+
+def _extract_usage(
+    response: litellm.ModelResponse, model: str, latency_seconds: float
+) -> LLMUsage:
+    """Read token counts and estimate the cost of a completion response.
+
+    Args:
+        response: The litellm completion response.
+        model: The requested model (used if the response does not name one).
+        latency_seconds: Measured wall-clock time of the call.
+
+    Returns:
+        LLMUsage for the call. Missing counts are reported as zero.
+    """
+    usage = getattr(response, "usage", None)
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) or getattr(
+        usage, "cache_read_input_tokens", None
+    )
+    try:
+        cost: float | None = float(
+            litellm.completion_cost(completion_response=response)
+        )
+    except Exception as e:
+        # Unknown or custom models have no pricing; record tokens only
+        logger.debug("No cost estimate for model %s: %s", model, e)
+        cost = None
+    return LLMUsage(
+        model=getattr(response, "model", None) or model,
+        prompt_tokens=int(getattr(usage, "prompt_tokens", 0) or 0),
+        completion_tokens=int(getattr(usage, "completion_tokens", 0) or 0),
+        cached_tokens=int(cached or 0),
+        latency_seconds=latency_seconds,
+        cost_usd=cost,
+    )
@@ -0,0 +1,104 @@
+"""Output monitors that stop stuck coding agent sessions early.
+
+Monitors watch the streamed output of a single agent session and return an
+abort reason when the session looks stuck (the same line keeps coming back,
+or an error pattern recurs too often). This stops a looping agent long before
+its session timeout.
+"""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Sequence
+
+from smelt.agents.protocols import OutputMonitor
+from smelt.config import CodingConfig
+from smelt.db.models import OutputLine
+
+# Lines shorter than this are too generic to indicate a loop ("ok", "---")
+_MIN_REPEAT_LINE_LENGTH: int = 8
+# Cap on distinct lines tracked per session, to keep memory bounded
+_MAX_TRACKED_LINES: int = 10_000
+
+
+class RepeatedLineMonitor:
+    """Aborts a session when one output line repeats too many times.
+
+    Blank, very short, and purely decorative lines are ignored. Once the
+    number of distinct tracked lines reaches a cap, the counts are reset so
+    memory stays bounded for chatty sessions.
+    """
+
+    def __init__(self, *, max_repeats: int) -> None:
+        """Initialize the monitor.
+
+        Args:
+            max_repeats: Number of occurrences of the same line that triggers
+                an abort.
+        """
+        self._max_repeats = max_repeats
+        self._counts: dict[str, int] = {}
+
+    def observe(self, line: OutputLine) -> str | None:
+        """Count the line and request an abort once it repeats too often."""
+        text = line.text.strip()
+        if len(text) < _MIN_REPEAT_LINE_LENGTH or not any(c.isalnum() for c in text):
+            return None
+
+        if text not in self._counts and len(self._counts) >= _MAX_TRACKED_LINES:
+            self._counts.clear()
+        count = self._counts.get(text, 0) + 1
+        self._counts[text] = count
+
+        if count >= self._max_repeats:
+            return f"output line repeated {count} times: {text[:80]!r}"
+        return None
+
+
+class PatternMonitor:
+    """Aborts a session when error patterns match too many output lines."""
+
+    def __init__(self, *, patterns: Sequence[str], max_matches: int) -> None:
+        """Initialize the monitor.
+
+        Args:
+            patterns: Regular expressions searched in every output line.
+            max_matches: Number of matching lines that triggers an abort.
+        """
+        self._patterns = [re.compile(p) for p in patterns]
+        self._max_matches = max_matches
+        self._matches = 0
+
+    def observe(self, line: OutputLine) -> str | None:
+        """Count matching lines and request an abort past the threshold."""
+        if not any(p.search(line.text) for p in self._patterns):
+            return None
+        self._matches += 1
+        if self._matches >= self._max_matches:
+            return (
+                f"error pattern matched {self._matches} times "
+                f"(last: {line.text.strip()[:80]!r})"
+            )
+        return None
+
+
+def build_monitors(config: CodingConfig) -> list[OutputMonitor]:
+    """Create a fresh set of output monitors for one agent session.
+
+    Args:
+        config: Coding configuration holding the abort thresholds.
+
+    Returns:
+        The monitors enabled by the configuration (possibly empty).
+    """
+    monitors: list[OutputMonitor] = []
+    if config.max_repeated_lines > 0:
+        monitors.append(RepeatedLineMonitor(max_repeats=config.max_repeated_lines))
+    if config.abort_patterns:
+        monitors.append(
+            PatternMonitor(
+                patterns=config.abort_patterns,
+                max_matches=config.max_pattern_matches,
+            )
+        )
+    return monitors
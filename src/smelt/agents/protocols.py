@@ -9,7 +9,7 @@ from __future__ import annotations
 
 from typing import Protocol, runtime_checkable
 
-from smelt.db.models import AgentResult
+from smelt.db.models import AgentResult, LLMResponse, OutputLine
 
 
 @runtime_checkable
@@ -46,6 +46,61 @@ class CodingAgent(Protocol):
         ...  # pragma: no cover
 
 
+@runtime_checkable
+class RunScopedCodingAgent(CodingAgent, Protocol):
+    """A coding agent that can keep its session logs with a pipeline run.
+
+    The run's directory holds its events; an agent that writes logs of its
+    own puts them there too, so they are pruned with the run.
+    """
+
+    def for_run(self, run_id: str) -> CodingAgent:
+        """Return this agent with its session logs in a run's directory.
+
+        Args:
+            run_id: Id of the run (its log directory name).
+
+        Returns:
+            An agent to use for the sessions of that run.
+        """
+        ...  # pragma: no cover
+
+
+@runtime_checkable
+class ResumableCodingAgent(CodingAgent, Protocol):
+    """A coding agent whose sessions can be continued with a follow-up prompt.
+
+    Resuming keeps the agent's conversation (and everything it has already
+    read from the repository), so a retry only needs to send what changed.
+    Agents that do not support this simply implement CodingAgent.
+    """
+
+    def resume_session(
+        self,
+        *,
+        session_id: str,
+        prompt: str,
+        working_dir: str,
+        timeout_seconds: int,
+    ) -> AgentResult:
+        """Send a follow-up prompt into an existing session.
+
+        Args:
+            session_id: The session_id of a previous AgentResult.
+            prompt: The incremental instructions for the agent.
+            working_dir: The directory the agent should operate in.
+            timeout_seconds: Maximum seconds before the session is killed.
+
+        Returns:
+            AgentResult with the same session_id.
+
+        Raises:
+            AgentError: If the session cannot be resumed or the agent fails.
+            AgentTimeoutError: If the session exceeds timeout_seconds.
+        """
+        ...  # pragma: no cover
+
+
 @runtime_checkable
 class LLMClient(Protocol):
     """Protocol for direct LLM calls (chat completion, no coding agent).
@@ -62,8 +117,8 @@ class LLMClient(Protocol):
         user_prompt: str,
         max_tokens: int = 4096,
         temperature: float = 0.0,
-    ) -> str:
-        """Send a chat completion request and return the response text.
+    ) -> LLMResponse:
+        """Send a chat completion request and return the response.
 
         Args:
             model: The model identifier (e.g. 'claude-opus-4-20250514').
@@ -73,10 +128,33 @@ class LLMClient(Protocol):
             temperature: Sampling temperature (0.0 = deterministic).
 
         Returns:
-            The model's response as a plain string.
+            LLMResponse with the response text and the call's token usage,
+            latency and estimated cost.
 
         Raises:
             LLMError: If the API call fails.
             InfraError: If the failure is transient (rate limit, API down).
         """
         ...  # pragma: no cover
+
+
+@runtime_checkable
+class OutputMonitor(Protocol):
+    """Protocol for watchers of streamed coding agent output.
+
+    A monitor sees every output line of one session and may request that the
+    session be aborted early (e.g. the agent is stuck in a loop). Monitors are
+    stateful, so a fresh set is created for every session.
+    """
+
+    def observe(self, line: OutputLine) -> str | None:
+        """Inspect one line of agent output.
+
+        Args:
+            line: The streamed output line.
+
+        Returns:
+            A human-readable abort reason to stop the session, or None to
+            let it continue.
+        """
+        ...  # pragma: no cover
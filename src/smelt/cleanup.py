@@ -0,0 +1,111 @@
+"""Pruning of stale task branches and pooled worktrees (`smelt cleanup`).
+
+Every task leaves a `smelt/<task-id>` branch behind, and failed or merged
+tasks never need theirs again. Each extra ref slows down ref lookups and
+every command that walks refs, so RepoCleaner cross-references the task
+store with `git for-each-ref` and deletes the stale branches in a single
+`update-ref --stdin` transaction instead of one `git branch -D` per branch.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+
+from smelt.db.store import TaskStore
+from smelt.git import GitOps
+
+# Task statuses whose branch is still in use (being worked on or reviewed)
+LIVE_STATUSES: frozenset[str] = frozenset({"in-progress", "in-review", "speculative"})
+
+
+@dataclass(frozen=True)
+class CleanupPlan:
+    """What a cleanup would delete.
+
+    Attributes:
+        branches: Stale task branches, with the commit each points at.
+        worktrees: Stale pooled worktrees.
+    """
+
+    branches: dict[str, str]
+    worktrees: tuple[Path, ...]
+
+    @property
+    def empty(self) -> bool:
+        """True if there is nothing to delete."""
+        return not self.branches and not self.worktrees
+
+
+class RepoCleaner:
+    """Finds and deletes task branches and worktrees no task needs.
+
+    A task branch is stale unless its task is in-progress, in-review or
+    speculative; branches of tasks no longer in the store are stale too. A
+    pooled worktree is stale if it is idle (detached), on a stale branch, or
+    already gone.
+    Branches checked out in the main working tree or in worktrees outside
+    the pool are never deleted.
+    """
+
+    def __init__(self, *, store: TaskStore, git: GitOps, worktree_root: Path) -> None:
+        """Initialize the cleaner.
+
+        Args:
+            store: Task store holding the task statuses.
+            git: GitOps for the main repository.
+            worktree_root: Directory holding the pooled worktrees.
+        """
+        self._store = store
+        self._git = git
+        self._worktree_root = worktree_root
+
+    def plan(self) -> CleanupPlan:
+        """Work out what is stale, without changing anything.
+
+        Returns:
+            The branches and worktrees a cleanup would delete.
+        """
+        prefix = self._git.config.branch_prefix
+        statuses = self._store.task_statuses()
+        root = self._worktree_root.resolve()
+        pooled = []
+        protected = set()
+        for worktree in self._git.worktrees():
+            if worktree.path.parent == root:
+                pooled.append(worktree)
+            elif worktree.branch is not None:
+                protected.add(worktree.branch)
+
+        branches = {
+            name: sha
+            for name, sha in self._git.list_branches(prefix).items()
+            if name not in protected
+            and statuses.get(name.removeprefix(prefix)) not in LIVE_STATUSES
+        }
+        worktrees = tuple(
+            worktree.path
+            for worktree in pooled
+            if worktree.prunable
+            or worktree.branch is None
+            or worktree.branch in branches
+        )
+        return CleanupPlan(branches=branches, worktrees=worktrees)
+
+    def apply(self, plan: CleanupPlan) -> None:
+        """Delete what a plan lists, then let git repack if worthwhile.
+
+        Worktrees are removed first so their branches are no longer checked
+        out, then all branches are deleted in one ref transaction.
+
+        Args:
+            plan: A plan returned by plan().
+
+        Raises:
+            GitError: If the branches could not be deleted (e.g. one moved
+                since the plan was made); no branch is deleted then.
+        """
+        for path in plan.worktrees:
+            self._git.remove_worktree(path)
+        self._git.delete_branches(plan.branches)
+        self._git.gc_auto()
@@ -2,21 +2,33 @@
 
 from __future__ import annotations
 
+import contextlib
+import functools
 import os
 import sqlite3
 import subprocess
+from collections.abc import Iterator
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import click
 from rich.console import Console
 from rich.table import Table
+from rich.text import Text
 
 from smelt import __version__
 from smelt.config import SmeltConfig
+from smelt.db.models import OutputLine
 from smelt.db.schema import init_db
 from smelt.db.store import TaskStore
 from smelt.exceptions import SmeltError
-from smelt.git import GitOps
+from smelt.git import BaseBranchSync, GitOps, PushBatcher, WorktreePool
+
+if TYPE_CHECKING:
+    from smelt.agents.goose_adapter import GooseAdapter, OutputCallback
+    from smelt.events import EventLog
+    from smelt.metrics import PipelineMetrics
+    from smelt.profiling import RunProfiler
 
 console = Console()
 
@@ -52,13 +64,152 @@ def _get_config() -> SmeltConfig:
     return SmeltConfig.default()
 
 
+def _make_agent(
+    config: SmeltConfig, on_output: OutputCallback | None = None
+) -> GooseAdapter:
+    """Build the Goose adapter with session logs and stuck-session monitors."""
+    from smelt.agents.goose_adapter import GooseAdapter
+    from smelt.agents.monitors import build_monitors
+
+    return GooseAdapter(
+        log_dir=Path(config.observability.log_dir),
+        on_output=on_output,
+        monitor_factory=functools.partial(build_monitors, config.coding),
+    )
+
+
+def _make_event_log(config: SmeltConfig) -> EventLog:
+    """Build the per-run structured event log from observability config."""
+    from smelt.events import EventLog
+
+    return EventLog(
+        log_dir=Path(config.observability.log_dir),
+        max_runs_retained=config.observability.max_runs_retained,
+    )
+
+
+def _make_worktree_pool(
+    config: SmeltConfig, git: GitOps, repo_path: Path
+) -> WorktreePool | None:
+    """Build the task worktree pool, or None if worktrees are disabled."""
+    if not config.git.use_worktrees:
+        return None
+    return WorktreePool(
+        git,
+        root=repo_path / config.git.worktree_dir,
+        max_idle=config.git.max_idle_worktrees,
+        idle_seconds=config.git.worktree_idle_seconds,
+    )
+
+
+def _queue_depth() -> dict[str, int]:
+    """Count tasks by status on a fresh connection (called from exporters)."""
+    return _get_db().count_by_status()
+
+
+@contextlib.contextmanager
+def _serve_metrics(config: SmeltConfig, *, workers: int) -> Iterator[PipelineMetrics]:
+    """Expose pipeline metrics for the duration of the block.
+
+    Starts the HTTP endpoint and/or the textfile exporter enabled in
+    [observability]; with neither, metrics are still collected but unexported.
+    """
+    from smelt.metrics import MetricsServer, PipelineMetrics, TextfileExporter
+
+    observability = config.observability
+    metrics = PipelineMetrics()
+    metrics.workers.set(workers)
+    metrics.watch_queue(_queue_depth)
+    with contextlib.ExitStack() as stack:
+        if observability.metrics_port:
+            server = MetricsServer(
+                metrics.registry,
+                host=observability.metrics_host,
+                port=observability.metrics_port,
+            )
+            server.start()
+            stack.callback(server.stop)
+            console.print(
+                f"[bold cyan]smelt[/] → metrics at http://"
+                f"{observability.metrics_host}:{server.port}/metrics"
+            )
+        if observability.metrics_textfile:
+            exporter = TextfileExporter(
+                metrics.registry,
+                Path(observability.metrics_textfile),
+                interval_seconds=observability.metrics_interval_seconds,
+            )
+            exporter.start()
+            stack.callback(exporter.stop)
+        yield metrics
+
+
+def _print_profile(profiler: RunProfiler, run_dir: Path | None) -> None:
+    """Print the profile summary tables and write the profile files."""
+    for title, stats in (
+        (f"Hot paths ({profiler.wall_seconds:.2f}s wall)", profiler.hot_paths()),
+        ("Top functions by cumulative time", profiler.top_functions(limit=15)),
+    ):
+        table = Table(title=title)
+        table.add_column("Function", style="yellow")
+        table.add_column("Calls", justify="right")
+        table.add_column("Own (s)", justify="right")
+        table.add_column("Cumulative (s)", justify="right")
+        for stat in stats:
+            table.add_row(
+                stat.name,
+                str(stat.calls),
+                f"{stat.own_seconds:.3f}",
+                f"{stat.cumulative_seconds:.3f}",
+            )
+        console.print(table)
+
+    calls = profiler.subprocesses
+    if calls:
+        table = Table(title=f"Subprocesses ({len(calls)})")
+        table.add_column("Caller", style="yellow")
+        table.add_column("Command")
+        table.add_column("Exit", justify="right")
+        table.add_column("Seconds", justify="right")
+        for call in calls:
+            table.add_row(
+                call.caller,
+                call.command,
+                str(call.return_code),
+                f"{call.duration_seconds:.3f}",
+            )
+        console.print(table)
+
+    console.print(
+        "[dim]Stack samples and subprocesses cover the run's thread and its "
+        "stage helper threads (QA, Reviewer).[/]"
+    )
+    if run_dir is not None:
+        files = profiler.write(run_dir)
+        console.print(
+            f"[bold cyan]smelt[/] → profile written to [yellow]{run_dir}[/] "
+            f"({files.pstats.name}, {files.folded.name}, {files.summary.name})"
+        )
+
+
+def _print_agent_line(line: OutputLine) -> None:
+    """Echo one streamed agent output line to the console."""
+    console.print(Text(f"  goose │ {line.text}", style="dim"))
+
+
 @cli.command()
 @click.option("--task", default=None, help="Execute a specific task by ID.")
-def run(task: str | None) -> None:
+@click.option("--verbose", "-v", is_flag=True, help="Stream coding agent output live.")
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Profile the run and write flame graph data to its run directory.",
+)
+def run(task: str | None, *, verbose: bool, profile: bool) -> None:
     """Pick the next task and execute the full pipeline."""
-    from smelt.agents.goose_adapter import GooseAdapter
     from smelt.agents.llm_client import LiteLLMClient
     from smelt.pipeline.runner import PipelineRunner
+    from smelt.profiling import RunProfiler
 
     config = _get_config()
     store = _get_db()
@@ -75,16 +226,32 @@ def run(task: str | None) -> None:
     else:
         console.print("[bold cyan]smelt[/] → picking next ready task …")
 
-    runner = PipelineRunner(
-        config=config,
-        store=store,
-        git=git,
-        llm=LiteLLMClient(),
-        agent=GooseAdapter(),
-        repo_path=repo_path,
-    )
-
-    result = runner.run(specific_task)
+    event_log = _make_event_log(config)
+    profiler = RunProfiler() if profile else None
+    try:
+        with _serve_metrics(config, workers=1) as metrics:
+            runner = PipelineRunner(
+                config=config,
+                store=store,
+                git=git,
+                llm=LiteLLMClient(),
+                agent=_make_agent(
+                    config, on_output=_print_agent_line if verbose else None
+                ),
+                repo_path=repo_path,
+                event_log=event_log,
+                metrics=metrics,
+                worktrees=_make_worktree_pool(config, git, repo_path),
+            )
+            with profiler or contextlib.nullcontext():
+                result = runner.run(specific_task)
+    finally:
+        git.close()
+        event_log.close()
+
+    if profiler is not None:
+        run_dir = Path(config.observability.log_dir) / result.run_id
+        _print_profile(profiler, run_dir if result.run_id else None)
 
     if result.success:
         console.print(f"[bold green]Pipeline passed![/] {result.message}")
@@ -95,6 +262,116 @@ def run(task: str | None) -> None:
         )
 
 
+@cli.command()
+@click.option(
+    "--concurrency",
+    type=int,
+    default=None,
+    help="Number of parallel workers (overrides [daemon] concurrency).",
+)
+@click.option(
+    "--poll-interval",
+    type=float,
+    default=None,
+    help="Seconds between polls when the queue is empty.",
+)
+def daemon(concurrency: int | None, poll_interval: float | None) -> None:
+    """Run a long-lived worker loop that drains the task queue."""
+    from dataclasses import replace
+
+    from smelt.agents.llm_client import LiteLLMClient
+    from smelt.daemon import Daemon
+    from smelt.pipeline.context import RepoContextBuilder
+    from smelt.pipeline.runner import PipelineResult, PipelineRunner, TaskClaims
+
+    config = _get_config()
+    daemon_config = config.daemon
+    if concurrency is not None:
+        daemon_config = replace(daemon_config, concurrency=concurrency)
+    if poll_interval is not None:
+        daemon_config = replace(daemon_config, poll_interval_seconds=poll_interval)
+    if daemon_config.concurrency < 1 or daemon_config.poll_interval_seconds <= 0:
+        console.print(
+            "[bold red]Error:[/] concurrency must be >= 1 and poll interval > 0."
+        )
+        raise click.Abort()
+
+    repo_path = Path.cwd()
+    # Shared across workers and kept warm for the lifetime of the daemon
+    llm = LiteLLMClient()
+    agent = _make_agent(config)
+    context_builder = RepoContextBuilder(config=config.context)
+    git = GitOps(repo_path, config.git)
+    worktrees = _make_worktree_pool(config, git, repo_path)
+    # One rate-limited fetch of the base branch shared by all workers
+    base_sync = BaseBranchSync(
+        git,
+        branch=config.git.base_branch,
+        interval_seconds=config.git.fetch_interval_seconds,
+    )
+    # Branches finished while a push is in flight go out in one push
+    pusher = PushBatcher(git)
+    # Which worker runs which task, so a crashed run's task is requeued
+    claims = TaskClaims()
+    # Closed in reverse order once the workers have stopped
+    resources = contextlib.ExitStack()
+    resources.callback(git.close)
+    event_log = _make_event_log(config)
+    resources.callback(event_log.close)
+    metrics = resources.enter_context(
+        _serve_metrics(config, workers=daemon_config.concurrency)
+    )
+
+    @contextlib.contextmanager
+    def runner_factory() -> Iterator[PipelineRunner]:
+        # Each worker has its own database connection and git processes
+        store = _get_db()
+        worker_git = GitOps(repo_path, config.git)
+        try:
+            yield PipelineRunner(
+                config=config,
+                store=store,
+                git=worker_git,
+                llm=llm,
+                agent=agent,
+                repo_path=repo_path,
+                context_builder=context_builder,
+                event_log=event_log,
+                metrics=metrics,
+                worktrees=worktrees,
+                base_sync=base_sync,
+                pusher=pusher,
+                claims=claims,
+            )
+        finally:
+            worker_git.close()
+            store.close()
+
+    def on_result(result: PipelineResult) -> None:
+        outcome = "[green]passed[/]" if result.success else "[red]failed[/]"
+        console.print(
+            f"[bold cyan]smelt[/] → task [yellow]{result.task_id}[/] {outcome} "
+            f"at [yellow]{result.stage_reached}[/]: {result.message}"
+        )
+
+    worker = Daemon(
+        config=daemon_config, runner_factory=runner_factory, on_result=on_result
+    )
+    worker.install_signal_handlers()
+    console.print(
+        f"[bold cyan]smelt[/] → daemon started with "
+        f"{daemon_config.concurrency} worker(s); Ctrl+C or SIGTERM to stop"
+    )
+    if daemon_config.concurrency > 1 and worktrees is None:
+        console.print(
+            "[dim]Note: workers share the repository working tree; "
+            "concurrent tasks may interfere with each other.[/]"
+        )
+    with resources:
+        processed = worker.run()
+    console.print(f"[bold cyan]smelt[/] → daemon stopped after {processed} task(s)")
+
+
 @cli.command()
 @click.argument("description")
 @click.option("--context", default=None, help="External context to attach.")
@@ -175,10 +452,64 @@ def lint(*, check: bool) -> None:
 
 
 @cli.command()
-def history() -> None:
+@click.option("--task", "task_id", default=None, help="Only runs of this task.")
+@click.option(
+    "--passed/--failed", "passed", default=None, help="Only passed or failed runs."
+)
+@click.option(
+    "--since", default=None, help="Only runs finished on or after this UTC date."
+)
+@click.option("--limit", type=click.IntRange(min=1), default=20, help="Runs per page.")
+@click.option("--page", type=click.IntRange(min=1), default=1, help="Page number.")
+def history(
+    task_id: str | None, passed: bool | None, since: str | None, limit: int, page: int
+) -> None:
     """Browse past pipeline runs."""
-    console.print("[bold cyan]smelt[/] → run history")
-    console.print("[dim]Observability not yet implemented.[/]")
+    store = _get_db()
+    stats = store.run_stats(task_id=task_id, passed=passed, since=since)
+    if not stats.runs:
+        console.print("[bold cyan]smelt[/] → no runs recorded")
+        return
+
+    runs = store.list_runs(
+        task_id=task_id,
+        passed=passed,
+        since=since,
+        limit=limit,
+        offset=(page - 1) * limit,
+    )
+    pages = -(-stats.runs // limit)
+    table = Table(title=f"Run History (page {page}/{pages})")
+    table.add_column("Finished (UTC)")
+    table.add_column("Run", style="dim")
+    table.add_column("Task", style="yellow")
+    table.add_column("Outcome")
+    table.add_column("Stage", style="magenta")
+    table.add_column("Base", style="dim", no_wrap=True)
+    table.add_column("Attempts", justify="right")
+    table.add_column("Duration", justify="right")
+    table.add_column("Tokens", justify="right")
+    table.add_column("Cost", justify="right")
+    for run in runs:
+        table.add_row(
+            run.finished_at,
+            run.run_id,
+            run.task_id,
+            "[green]passed[/]" if run.passed else "[red]failed[/]",
+            run.stage_reached,
+            run.base_sha[:8],
+            str(run.attempts),
+            f"{run.duration_seconds:.1f}s",
+            f"{run.prompt_tokens + run.completion_tokens:,}",
+            f"${run.cost_usd:.4f}",
+        )
+    console.print(table)
+    console.print(
+        f"{stats.runs} run(s), {stats.passed} passed "
+        f"({stats.passed / stats.runs:.0%}) · "
+        f"p50 {stats.p50_seconds:.1f}s · p95 {stats.p95_seconds:.1f}s · "
+        f"{stats.tasks_per_day:.1f} tasks/day · ${stats.cost_usd:.2f}"
+    )
 
 
 @cli.command()
@@ -190,15 +521,99 @@ def replay(run_id: str) -> None:
 
 
 @cli.command()
-def cleanup() -> None:
-    """Delete stale failed branches."""
+@click.option(
+    "--dry-run", is_flag=True, help="List what would be deleted, delete nothing."
+)
+def cleanup(*, dry_run: bool) -> None:
+    """Delete stale task branches and pooled worktrees."""
+    from smelt.cleanup import RepoCleaner
+
+    config = _get_config()
+    repo_path = Path.cwd()
+    git = GitOps(repo_path, config.git)
+    cleaner = RepoCleaner(
+        store=_get_db(), git=git, worktree_root=repo_path / config.git.worktree_dir
+    )
     console.print("[bold cyan]smelt[/] → cleaning up stale branches …")
-    console.print("[dim]Cleanup not yet implemented.[/]")
+    try:
+        plan = cleaner.plan()
+        if plan.empty:
+            console.print("[dim]Nothing to clean up.[/]")
+            return
+        for branch in sorted(plan.branches):
+            console.print(f"  branch   [yellow]{branch}[/]")
+        for path in plan.worktrees:
+            console.print(f"  worktree [dim]{path}[/]")
+        if dry_run:
+            console.print("[dim]Dry run: nothing deleted.[/]")
+            return
+        cleaner.apply(plan)
+    except SmeltError as e:
+        console.print(f"[bold red]Error:[/] {e}")
+        raise click.Abort() from e
+    finally:
+        git.close()
+    console.print(
+        f"[bold green]Deleted {len(plan.branches)} branch(es) and "
+        f"{len(plan.worktrees)} worktree(s).[/]"
+    )
 
 
 @cli.command()
 @click.argument("task_id")
 def decompose(task_id: str) -> None:
     """Run the decomposer on an existing task."""
-    console.print(f"[bold cyan]smelt[/] → decomposing task [yellow]{task_id}[/]")
-    console.print("[dim]Decomposer not yet implemented.[/]")
+    from smelt.agents.llm_client import LiteLLMClient
+    from smelt.events import new_run_id
+    from smelt.pipeline.context import RepoContextBuilder
+    from smelt.pipeline.decomposer import DecomposerStage
+    from smelt.pipeline.stages import StageInput
+
+    config = _get_config()
+    store = _get_db()
+    task = store.get_task(task_id)
+    if task is None:
+        console.print(f"[bold red]Error:[/] Task '{task_id}' not found.")
+        raise click.Abort()
+
+    console.print(f"[bold cyan]smelt[/] → decomposing task [yellow]{task_id}[/] …")
+    repo_context = RepoContextBuilder(config=config.context).build(Path.cwd())
+    stage = DecomposerStage(llm=LiteLLMClient(), models=config.models)
+    try:
+        result = stage.decompose(
+            StageInput(
+                task_description=task.description,
+                task_context=task.context,
+                repo_context=repo_context.render(config.context.max_tokens),
+                plan=None,
+                last_failure=None,
+            )
+        )
+        store.record_usage(
+            run_id=new_run_id(task.id),
+            task_id=task.id,
+            entries=[(stage.name, result.usage)],
+        )
+        if result.atomic:
+            console.print("[dim]Task is small enough; left unchanged.[/]")
+            return
+        created = store.split_task(task.id, result.subtasks)
+    except SmeltError as e:
+        console.print(f"[bold red]Error:[/] {e}")
+        raise click.Abort() from e
+
+    ids = {sub.key: t.id for sub, t in zip(result.subtasks, created, strict=True)}
+    table = Table(title=f"Sub-tasks of {task_id}")
+    table.add_column("ID", style="yellow")
+    table.add_column("Complexity", justify="right")
+    table.add_column("Depends on", style="dim")
+    table.add_column("Description")
+    for sub, new_task in zip(result.subtasks, created, strict=True):
+        table.add_row(
+            new_task.id,
+            str(sub.complexity),
+            ", ".join(ids[dep] for dep in sub.depends_on),
+            sub.description,
+        )
+    console.print(table)
+    console.print(f"[bold green]Split {task_id} into {len(created)} sub-task(s).[/]")
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import re
 import tomllib
 import warnings
 from dataclasses import dataclass, field
@@ -29,11 +30,23 @@ class ContextConfig:
 class CodingConfig:
     max_retries: int = 3
     timeout_seconds: int = 600
+    # Retries continue the previous agent session with only the QA failure
+    resume_sessions: bool = True
+    # Abort the agent session early when it looks stuck (0 / empty = disabled)
+    max_repeated_lines: int = 50
+    abort_patterns: tuple[str, ...] = ()
+    max_pattern_matches: int = 10
+    # Scale each task's timeout and retries by its complexity and by how long
+    # similar tasks took (timeout_seconds/max_retries fit complexity 5)
+    adaptive_budgets: bool = True
+    min_timeout_seconds: int = 120
+    max_timeout_seconds: int = 1800
 
 
 @dataclass(frozen=True)
 class ReviewerConfig:
-    max_retries: int = 2
+    enabled: bool = True  # review each candidate while QA runs
+    max_retries: int = 2  # rejections fed back to the Coder before QA decides alone
     timeout_seconds: int = 300
 
 
@@ -50,6 +63,7 @@ class QAConfig:
 class QCConfig:
     escalation_mode: str = "last_attempt"
     timeout_seconds: int = 300
+    max_diff_tokens: int = 2000  # compacted diff budget in the QC prompt
 
 
 @dataclass(frozen=True)
@@ -57,6 +71,12 @@ class GitConfig:
     base_branch: str = "develop"
     branch_prefix: str = "smelt/"
     lint_before_commit: bool = True
+    fetch_interval_seconds: float = 60.0  # at most one base-branch fetch per interval
+    use_worktrees: bool = True  # run tasks in pooled worktrees, not the main tree
+    worktree_dir: str = ".smelt/worktrees"
+    max_idle_worktrees: int = 2
+    worktree_idle_seconds: float = 3600.0
+    speculative: bool = False  # start tasks on top of dependencies in review
 
 
 @dataclass(frozen=True)
@@ -69,6 +89,10 @@ class InfraConfig:
 class ObservabilityConfig:
     log_dir: str = ".smelt/runs"
     max_runs_retained: int = 50
+    metrics_port: int = 0  # 0 disables the HTTP endpoint
+    metrics_host: str = "127.0.0.1"
+    metrics_textfile: str = ""  # empty disables the textfile exporter
+    metrics_interval_seconds: float = 15.0
 
 
 @dataclass(frozen=True)
@@ -77,6 +101,12 @@ class SanityConfig:
     bug_ticket_priority: int = 1
 
 
+@dataclass(frozen=True)
+class DaemonConfig:
+    concurrency: int = 1
+    poll_interval_seconds: float = 5.0
+
+
 @dataclass(frozen=True)
 class SmeltConfig:
     """Root configuration object representing smelt.toml."""
@@ -91,6 +121,7 @@ class SmeltConfig:
     infra: InfraConfig = field(default_factory=InfraConfig)
     observability: ObservabilityConfig = field(default_factory=ObservabilityConfig)
     sanity: SanityConfig = field(default_factory=SanityConfig)
+    daemon: DaemonConfig = field(default_factory=DaemonConfig)
 
     @classmethod
     def default(cls) -> SmeltConfig:
@@ -135,6 +166,7 @@ class SmeltConfig:
             "infra",
             "observability",
             "sanity",
+            "daemon",
         }
 
         # Warn on unknown root sections
@@ -147,7 +179,10 @@ class SmeltConfig:
 
         models = ModelsConfig(**data.get("models", {}))
         context = ContextConfig(**data.get("context", {}))
-        coding = CodingConfig(**data.get("coding", {}))
+        coding_data = dict(data.get("coding", {}))
+        if "abort_patterns" in coding_data:
+            coding_data["abort_patterns"] = tuple(coding_data["abort_patterns"])
+        coding = CodingConfig(**coding_data)
         reviewer = ReviewerConfig(**data.get("reviewer", {}))
         qa = QAConfig(**data.get("qa", {}))
         qc_data = data.get("qc", {})
@@ -156,17 +191,58 @@ class SmeltConfig:
         infra = InfraConfig(**data.get("infra", {}))
         observability = ObservabilityConfig(**data.get("observability", {}))
         sanity = SanityConfig(**data.get("sanity", {}))
+        daemon = DaemonConfig(**data.get("daemon", {}))
 
         # Basic validation
         if context.max_tokens <= 0:
             raise ConfigError("context.max_tokens must be positive")
+        if qc.max_diff_tokens <= 0:
+            raise ConfigError("qc.max_diff_tokens must be positive")
         if coding.max_retries < 0 or reviewer.max_retries < 0:
             raise ConfigError("max_retries cannot be negative")
+        if coding.max_repeated_lines < 0 or coding.max_pattern_matches < 1:
+            raise ConfigError(
+                "coding.max_repeated_lines cannot be negative and "
+                "coding.max_pattern_matches must be at least 1"
+            )
+        if not 0 < coding.min_timeout_seconds <= coding.max_timeout_seconds:
+            raise ConfigError(
+                "coding.min_timeout_seconds must be positive and at most "
+                "coding.max_timeout_seconds"
+            )
+        for pattern in coding.abort_patterns:
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                raise ConfigError(
+                    f"Invalid coding.abort_patterns entry {pattern!r}: {e}"
+                ) from e
         if qc.escalation_mode not in ("never", "auto", "last_attempt"):
             raise ConfigError(
                 f"Invalid qc.escalation_mode: {qc.escalation_mode}. "
                 "Must be 'never', 'auto', or 'last_attempt'."
             )
+        if infra.retry_delay_seconds < 0 or infra.max_infra_retries < 0:
+            raise ConfigError(
+                "infra.retry_delay_seconds and infra.max_infra_retries "
+                "cannot be negative"
+            )
+        if daemon.concurrency < 1:
+            raise ConfigError("daemon.concurrency must be at least 1")
+        if daemon.poll_interval_seconds <= 0:
+            raise ConfigError("daemon.poll_interval_seconds must be positive")
+        if git.fetch_interval_seconds < 0:
+            raise ConfigError("git.fetch_interval_seconds cannot be negative")
+        if git.max_idle_worktrees < 0:
+            raise ConfigError("git.max_idle_worktrees cannot be negative")
+        if git.worktree_idle_seconds <= 0:
+            raise ConfigError("git.worktree_idle_seconds must be positive")
+        if observability.max_runs_retained < 1:
+            raise ConfigError("observability.max_runs_retained must be at least 1")
+        if not 0 <= observability.metrics_port <= 65535:
+            raise ConfigError("observability.metrics_port must be between 0 and 65535")
+        if observability.metrics_interval_seconds <= 0:
+            raise ConfigError("observability.metrics_interval_seconds must be positive")
 
         return cls(
             models=models,
@@ -179,4 +255,5 @@ class SmeltConfig:
             infra=infra,
             observability=observability,
             sanity=sanity,
+            daemon=daemon,
         )
@@ -0,0 +1,174 @@
+"""Long-running worker loop that drains the task queue continuously.
+
+`smelt run` pays the full startup cost (imports, config, SQLite, repo context)
+for every task. The Daemon keeps those warm: each worker owns a PipelineRunner
+built once by the injected factory and polls the store for ready tasks until
+it is asked to stop (SIGTERM/SIGINT or `stop()`). The factory returns a
+context manager, so the resources a worker's runner owns (its database
+connection, git processes) are closed when the worker exits.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import logging
+import signal
+import threading
+from collections.abc import Callable
+from types import FrameType
+
+from smelt.config import DaemonConfig
+from smelt.pipeline.runner import PipelineResult, PipelineRunner
+
+logger = logging.getLogger(__name__)
+
+# Builds a runner for one worker, closing what it owns on exit. Called from
+# inside the worker thread, so thread-bound resources (e.g. SQLite
+# connections) can be created there.
+RunnerFactory = Callable[[], contextlib.AbstractContextManager[PipelineRunner]]
+ResultCallback = Callable[[PipelineResult], None]
+
+
+class Daemon:
+    """Runs `concurrency` workers that repeatedly claim and execute tasks.
+
+    Workers share nothing except what the runner factory closes over (LLM
+    client, coding agent, context builder). Task claiming is atomic in the
+    store, so workers never run the same task twice.
+    """
+
+    def __init__(
+        self,
+        *,
+        config: DaemonConfig,
+        runner_factory: RunnerFactory,
+        on_result: ResultCallback | None = None,
+    ) -> None:
+        """Initialize the daemon.
+
+        Args:
+            config: Daemon configuration (concurrency, poll interval).
+            runner_factory: Creates one PipelineRunner per worker, as a
+                context manager that closes the runner's own resources.
+            on_result: Optional callback invoked after every executed task.
+        """
+        self._config = config
+        self._runner_factory = runner_factory
+        self._on_result = on_result
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._tasks_processed = 0
+
+    @property
+    def stopping(self) -> bool:
+        """True once a shutdown has been requested."""
+        return self._stop_event.is_set()
+
+    def stop(self) -> None:
+        """Request a graceful shutdown.
+
+        Workers finish the task they are currently executing, then exit.
+        """
+        if not self._stop_event.is_set():
+            logger.info("Daemon shutdown requested")
+        self._stop_event.set()
+
+    def install_signal_handlers(self) -> None:
+        """Route SIGTERM and SIGINT to `stop()`.
+
+        Must be called from the main thread.
+        """
+
+        def _handle(signum: int, frame: FrameType | None) -> None:
+            logger.info("Received signal %d", signum)
+            self.stop()
+
+        signal.signal(signal.SIGTERM, _handle)
+        signal.signal(signal.SIGINT, _handle)
+
+    def run(self) -> int:
+        """Start the workers and block until all of them have exited.
+
+        Returns:
+            The number of tasks executed (successfully or not).
+        """
+        workers = [
+            threading.Thread(
+                target=self._worker_loop,
+                args=(n,),
+                name=f"smelt-worker-{n}",
+                daemon=True,
+            )
+            for n in range(self._config.concurrency)
+        ]
+        logger.info("Starting daemon with %d worker(s)", len(workers))
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        logger.info("Daemon stopped after %d task(s)", self._tasks_processed)
+        return self._tasks_processed
+
+    def _start_runner(
+        self, worker_id: int, stack: contextlib.ExitStack
+    ) -> PipelineRunner | None:
+        """Build this worker's runner, retrying until it works or the daemon stops.
+
+        Args:
+            worker_id: Index of this worker (for log context only).
+            stack: Receives the runner's context, closed when the worker exits.
+
+        Returns:
+            The runner, or None if a shutdown was requested first.
+        """
+        while True:
+            try:
+                return stack.enter_context(self._runner_factory())
+            except Exception:
+                # Without this the worker would die silently, one fewer running
+                logger.exception("Worker %d: could not start a runner", worker_id)
+            if self._stop_event.wait(self._config.poll_interval_seconds):
+                return None
+
+    def _worker_loop(self, worker_id: int) -> None:
+        """Claim and execute tasks until a shutdown is requested.
+
+        Args:
+            worker_id: Index of this worker (for log context only).
+        """
+        with contextlib.ExitStack() as stack:
+            runner = self._start_runner(worker_id, stack)
+            if runner is None:
+                return
+            while not self._stop_event.is_set():
+                try:
+                    result = runner.run()
+                except Exception:
+                    # A crashed run must not take the whole daemon down
+                    logger.exception("Worker %d: pipeline run crashed", worker_id)
+                    self._stop_event.wait(self._config.poll_interval_seconds)
+                    continue
+
+                if not result.task_id:
+                    # Queue is empty: sleep until the next poll or a shutdown
+                    self._stop_event.wait(self._config.poll_interval_seconds)
+                    continue
+
+                with self._lock:
+                    self._tasks_processed += 1
+                logger.info(
+                    "Worker %d finished task %s (success=%s)",
+                    worker_id,
+                    result.task_id,
+                    result.success,
+                )
+                if self._on_result is not None:
+                    try:
+                        self._on_result(result)
+                    except Exception:
+                        # A failing callback must not stop this worker either
+                        logger.exception(
+                            "Worker %d: result callback failed for task %s",
+                            worker_id,
+                            result.task_id,
+                        )
@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 
 @dataclass(frozen=True)
@@ -13,9 +13,10 @@ class Task:
         id: Unique identifier for the task.
         description: Plain text explanation of what the task entails.
         status: Current state ('ready', 'blocked', 'in-progress', 'in-review',
-            'merged', 'failed', 'infra-error').
+            'speculative', 'merged', 'failed', 'infra-error').
         priority: Execution priority (higher executes earlier).
-        complexity: Estimated complexity (1-10) for logging/observability.
+        complexity: Estimated complexity (1-10), the task's scheduling weight
+            and the basis of its coding budget.
         context: Optional external text context (e.g. API spec).
         context_files: Comma-separated paths to relevant files.
         created_at: ISO8601 timestamp of creation.
@@ -46,6 +47,111 @@ class TaskDependency:
     depends_on: str
 
 
+@dataclass(frozen=True)
+class SubTask:
+    """A sub-task proposed by the Decomposer, before it is stored.
+
+    Attributes:
+        key: Identifier unique within one decomposition (not a task ID).
+        description: Specific, actionable description of the sub-task.
+        complexity: Estimated complexity (1-10).
+        depends_on: Keys of the sub-tasks that must be completed first.
+    """
+
+    key: str
+    description: str
+    complexity: int
+    depends_on: tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class Speculation:
+    """A provisional result built on top of a dependency still in review.
+
+    Attributes:
+        task_id: The task in 'speculative' status.
+        parent_id: The in-review dependency its branch was started from
+            (empty if that task no longer exists).
+        parent_sha: Commit of the parent branch the task was started from.
+        parent_status: Current status of the parent (None if it was deleted).
+    """
+
+    task_id: str
+    parent_id: str
+    parent_sha: str
+    parent_status: str | None
+
+
+@dataclass(frozen=True)
+class Checkpoint:
+    """Progress of an in-progress task, saved after every pipeline step.
+
+    A runner that dies mid-task leaves its checkpoint behind; the next run of
+    the task resumes from it instead of starting over.
+
+    Attributes:
+        task_id: The task being run.
+        run_id: The run that saved the checkpoint.
+        owner: Token of the runner process that holds the task (pid, boot
+            and process start time), to tell whether it is still alive.
+        base_sha: Commit the task branch started from ('' until pinned).
+        step: Index of the next stage-graph step (0: nothing done yet).
+        plan: The Architect's plan, once there is one.
+        attempt: The next step's attempt number, if it is in a retry loop.
+        feedback: Last failure output waiting for each stage, by stage name.
+        runs: Runs of each stage in the current retry loops, by stage name.
+        routes: Times each failure route was taken, in the graph's order.
+        snapshot: Commit holding the working tree when the step finished.
+        infra_retries: Times the task was retried after an infra error.
+        updated_at: When the checkpoint was saved (set by the store).
+    """
+
+    task_id: str
+    run_id: str
+    owner: str
+    base_sha: str = ""
+    step: int = 0
+    plan: str | None = None
+    attempt: int | None = None
+    feedback: dict[str, str] = field(default_factory=dict)
+    runs: dict[str, int] = field(default_factory=dict)
+    routes: tuple[int, ...] = ()
+    snapshot: str | None = None
+    infra_retries: int = 0
+    updated_at: str = ""
+
+
+@dataclass(frozen=True)
+class CachedPlan:
+    """An Architect plan kept so that re-running its task can skip planning.
+
+    Attributes:
+        task_id: The task the plan is for.
+        input_hash: Digest of the task description and context it answered.
+        base_sha: Base commit the task branch started from.
+        context_hash: Digest of the rendered repository context it was given.
+        plan: The plan.
+        created_at: When the plan was saved (set by the store).
+    """
+
+    task_id: str
+    input_hash: str
+    base_sha: str
+    context_hash: str
+    plan: str
+    created_at: str = ""
+
+    def reusable(self, *, input_hash: str, base_sha: str, context_hash: str) -> bool:
+        """True if the plan still fits the task and the repository.
+
+        The task must be unchanged. The repository may have moved, as long as
+        the context the Architect would see is the same.
+        """
+        return self.input_hash == input_hash and (
+            self.base_sha == base_sha or self.context_hash == context_hash
+        )
+
+
 @dataclass(frozen=True)
 class ToolResult:
     """Result from a single deterministic tool run.
@@ -87,14 +193,226 @@ class AgentResult:
     Attributes:
         success: True if the agent completed without error.
         session_id: Unique identifier for this agent session.
-        output: The agent's final output text.
+        output: The agent's final output text (the tail, for long sessions).
         duration_seconds: Wall-clock time the session took.
+        log_path: Path of the full session log file, if one was written.
     """
 
     success: bool
     session_id: str
     output: str
     duration_seconds: float
+    log_path: str | None = None
+
+
+@dataclass(frozen=True)
+class LLMUsage:
+    """Token usage, latency and cost of a single LLM call.
+
+    Attributes:
+        model: The model that served the call.
+        prompt_tokens: Input tokens billed (including cached ones).
+        completion_tokens: Output tokens generated.
+        cached_tokens: Input tokens served from the provider's prompt cache.
+        latency_seconds: Wall-clock time of the API call.
+        cost_usd: Estimated cost, or None if the model's pricing is unknown.
+    """
+
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int = 0
+    latency_seconds: float = 0.0
+    cost_usd: float | None = None
+
+
+@dataclass(frozen=True)
+class LLMResponse:
+    """Response from an LLM chat completion.
+
+    Attributes:
+        content: The model's response text.
+        usage: Token usage, latency and cost of the call.
+    """
+
+    content: str
+    usage: LLMUsage
+
+
+@dataclass(frozen=True)
+class UsageTotals:
+    """Aggregated LLM usage over a group of calls (a stage, model, run, ...).
+
+    Attributes:
+        key: What the totals are grouped by (stage name, model name, ...).
+        calls: Number of LLM calls.
+        prompt_tokens: Total input tokens.
+        completion_tokens: Total output tokens.
+        cached_tokens: Total input tokens served from cache.
+        latency_seconds: Total API latency.
+        cost_usd: Total estimated cost of the priced calls.
+        unpriced_calls: Calls whose cost could not be estimated.
+    """
+
+    key: str
+    calls: int
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int
+    latency_seconds: float
+    cost_usd: float
+    unpriced_calls: int
+
+
+@dataclass(frozen=True)
+class OutputLine:
+    """A single line of output streamed from a running coding agent session.
+
+    Attributes:
+        session_id: The agent session that produced the line.
+        stream: Which stream the line came from ('stdout' or 'stderr').
+        text: The line content, without the trailing newline.
+        elapsed_seconds: Seconds since the session started.
+    """
+
+    session_id: str
+    stream: str
+    text: str
+    elapsed_seconds: float
+
+
+@dataclass(frozen=True)
+class RunEvent:
+    """One entry in a pipeline run's structured event log.
+
+    Only the fields relevant to an event are set; the rest stay None and are
+    omitted from the serialized form.
+
+    Attributes:
+        run_id: The pipeline run the event belongs to.
+        task_id: The task being run.
+        event: Event kind ('run_started', 'stage_started', 'llm_call',
+            'stage_finished', 'run_finished').
+        elapsed_seconds: Monotonic seconds since the run started.
+        timestamp: Wall-clock ISO8601 time (UTC), for correlating with logs.
+        stage: Stage name for stage events.
+        attempt: Coder/QA attempt number (1-based) for retried stages.
+        duration_seconds: Stage or run duration for '*_finished' events, call
+            latency for 'llm_call' events.
+        passed: Whether the stage or run succeeded.
+        model: LLM model used by the stage.
+        input_tokens: Prompt tokens reported by the LLM provider.
+        output_tokens: Completion tokens reported by the LLM provider.
+        cost_usd: Estimated LLM cost of the stage.
+        exit_codes: Subprocess exit codes by tool name.
+        session_id: Coding agent session id.
+        message: Outcome or error message.
+        base_sha: Base-branch commit the task branch was created from.
+    """
+
+    run_id: str
+    task_id: str
+    event: str
+    elapsed_seconds: float
+    timestamp: str
+    stage: str | None = None
+    attempt: int | None = None
+    duration_seconds: float | None = None
+    passed: bool | None = None
+    model: str | None = None
+    input_tokens: int | None = None
+    output_tokens: int | None = None
+    cost_usd: float | None = None
+    exit_codes: dict[str, int] | None = None
+    session_id: str | None = None
+    message: str | None = None
+    base_sha: str | None = None
+
+
+@dataclass(frozen=True)
+class RunResult:
+    """Summary of a finished pipeline run, written as the run's result.json.
+
+    Attributes:
+        run_id: The pipeline run.
+        task_id: The task that was run.
+        passed: Whether the run succeeded.
+        stage_reached: The last stage that ran.
+        message: Outcome message.
+        duration_seconds: Total run duration.
+        usage_total: LLM usage over the whole run.
+        usage_by_stage: LLM usage per stage name.
+        usage_by_model: LLM usage per model.
+        attempts: Coder attempts made (0 if the coder never ran).
+        base_sha: Base-branch commit the run started from (empty if the run
+            ended before it was pinned).
+    """
+
+    run_id: str
+    task_id: str
+    passed: bool
+    stage_reached: str
+    message: str
+    duration_seconds: float
+    usage_total: UsageTotals
+    usage_by_stage: dict[str, UsageTotals]
+    usage_by_model: dict[str, UsageTotals]
+    attempts: int = 0
+    base_sha: str = ""
+
+
+@dataclass(frozen=True)
+class RunRecord:
+    """A finished pipeline run as stored in the `runs` table.
+
+    Attributes:
+        run_id: The pipeline run (also its log directory name).
+        task_id: The task that was run.
+        passed: Whether the run succeeded.
+        stage_reached: The last stage that ran.
+        message: Outcome message.
+        attempts: Coder attempts made.
+        duration_seconds: Total run duration.
+        prompt_tokens: LLM prompt tokens over the run.
+        completion_tokens: LLM completion tokens over the run.
+        cost_usd: Estimated LLM cost over the run.
+        finished_at: UTC time the run finished ('YYYY-MM-DD HH:MM:SS').
+        base_sha: Base-branch commit the run started from (may be empty).
+    """
+
+    run_id: str
+    task_id: str
+    passed: bool
+    stage_reached: str
+    message: str
+    attempts: int
+    duration_seconds: float
+    prompt_tokens: int
+    completion_tokens: int
+    cost_usd: float
+    finished_at: str
+    base_sha: str = ""
+
+
+@dataclass(frozen=True)
+class RunStats:
+    """Aggregates over a filtered set of runs.
+
+    Attributes:
+        runs: Number of runs.
+        passed: Number of successful runs.
+        p50_seconds: Median run duration (0 if there are no runs).
+        p95_seconds: 95th percentile run duration (0 if there are no runs).
+        tasks_per_day: Distinct tasks completed per calendar day spanned.
+        cost_usd: Total estimated LLM cost.
+    """
+
+    runs: int
+    passed: int
+    p50_seconds: float
+    p95_seconds: float
+    tasks_per_day: float
+    cost_usd: float
 
 
 @dataclass(frozen=True)
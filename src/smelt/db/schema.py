@@ -33,4 +33,85 @@ def init_db(conn: sqlite3.Connection) -> None:
             depends_on TEXT NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
             PRIMARY KEY (task_id, depends_on)
         );
+
+        -- Scheduling cache, maintained by TaskStore whenever edges or
+        -- statuses change: the complexity-weighted length of the longest
+        -- chain of unfinished tasks starting at each task, and how many
+        -- unfinished tasks transitively wait for it.
+        CREATE TABLE IF NOT EXISTS task_schedule (
+            task_id       TEXT PRIMARY KEY REFERENCES tasks(id) ON DELETE CASCADE,
+            critical_path INTEGER NOT NULL,
+            downstream    INTEGER NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS speculations (
+            task_id    TEXT PRIMARY KEY REFERENCES tasks(id) ON DELETE CASCADE,
+            parent_id  TEXT NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+            parent_sha TEXT NOT NULL,
+            created_at TEXT NOT NULL DEFAULT (datetime('now'))
+        );
+
+        -- Progress of in-progress tasks, so an interrupted run resumes
+        -- instead of starting over. counters holds the graph's retry state;
+        -- owner identifies the runner process holding the task.
+        CREATE TABLE IF NOT EXISTS checkpoints (
+            task_id       TEXT PRIMARY KEY REFERENCES tasks(id) ON DELETE CASCADE,
+            run_id        TEXT NOT NULL,
+            owner         TEXT NOT NULL,
+            base_sha      TEXT NOT NULL DEFAULT '',
+            step          INTEGER NOT NULL DEFAULT 0,
+            plan          TEXT,
+            attempt       INTEGER,
+            counters      TEXT NOT NULL DEFAULT '{}',
+            snapshot      TEXT,
+            infra_retries INTEGER NOT NULL DEFAULT 0,
+            updated_at    TEXT NOT NULL DEFAULT (datetime('now'))
+        );
+
+        -- Latest Architect plan per task, reused by later runs of the task
+        -- while the task and repository context are unchanged.
+        CREATE TABLE IF NOT EXISTS plans (
+            task_id      TEXT PRIMARY KEY REFERENCES tasks(id) ON DELETE CASCADE,
+            input_hash   TEXT NOT NULL,
+            base_sha     TEXT NOT NULL,
+            context_hash TEXT NOT NULL,
+            plan         TEXT NOT NULL,
+            created_at   TEXT NOT NULL DEFAULT (datetime('now'))
+        );
+
+        CREATE TABLE IF NOT EXISTS llm_usage (
+            id                INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id            TEXT NOT NULL,
+            task_id           TEXT NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+            stage             TEXT NOT NULL,
+            model             TEXT NOT NULL,
+            prompt_tokens     INTEGER NOT NULL,
+            completion_tokens INTEGER NOT NULL,
+            cached_tokens     INTEGER NOT NULL DEFAULT 0,
+            latency_seconds   REAL NOT NULL,
+            cost_usd          REAL,
+            created_at        TEXT NOT NULL DEFAULT (datetime('now'))
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_llm_usage_task ON llm_usage(task_id);
+        CREATE INDEX IF NOT EXISTS idx_llm_usage_run ON llm_usage(run_id);
+
+        CREATE TABLE IF NOT EXISTS runs (
+            run_id            TEXT PRIMARY KEY,
+            task_id           TEXT NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+            passed            INTEGER NOT NULL,
+            stage_reached     TEXT NOT NULL,
+            message           TEXT NOT NULL,
+            attempts          INTEGER NOT NULL DEFAULT 0,
+            base_sha          TEXT NOT NULL DEFAULT '',
+            duration_seconds  REAL NOT NULL,
+            prompt_tokens     INTEGER NOT NULL DEFAULT 0,
+            completion_tokens INTEGER NOT NULL DEFAULT 0,
+            cost_usd          REAL NOT NULL DEFAULT 0,
+            finished_at       TEXT NOT NULL DEFAULT (datetime('now'))
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_runs_finished ON runs(finished_at);
+        CREATE INDEX IF NOT EXISTS idx_runs_task ON runs(task_id, finished_at);
+        CREATE INDEX IF NOT EXISTS idx_runs_duration ON runs(duration_seconds);
         """)
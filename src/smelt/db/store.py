@@ -2,17 +2,110 @@
 
 from __future__ import annotations
 
+import json
+import math
 import sqlite3
 import uuid
-from collections.abc import Sequence
+from collections.abc import Callable, Iterable, Sequence
+from graphlib import TopologicalSorter
 
-from smelt.db.models import Task
+from smelt.db.models import (
+    CachedPlan,
+    Checkpoint,
+    LLMUsage,
+    RunRecord,
+    RunResult,
+    RunStats,
+    Speculation,
+    SubTask,
+    Task,
+    UsageTotals,
+)
 from smelt.exceptions import (
     CircularDependencyError,
     InvalidStatusTransitionError,
     TaskNotFoundError,
 )
 
+# Explicit priority first, then the task on the longest remaining chain of
+# work, then the one unblocking the most tasks (critical-path list scheduling)
+_NEXT_READY_TASK_QUERY: str = """
+SELECT t.id FROM tasks t
+LEFT JOIN task_schedule s ON s.task_id = t.id
+WHERE t.status = 'ready'
+  AND t.id NOT IN (
+    SELECT task_id FROM task_dependencies
+    WHERE depends_on NOT IN (
+      SELECT id FROM tasks WHERE status = 'merged'
+    )
+  )
+ORDER BY t.priority DESC, s.critical_path DESC, s.downstream DESC, t.created_at ASC
+LIMIT 1
+"""
+
+# Ready tasks whose only unmerged dependency is a single in-review task, so
+# they can start speculatively on top of that task's branch
+_SPECULATIVE_TASK_QUERY: str = """
+SELECT t.id FROM tasks t
+LEFT JOIN task_schedule s ON s.task_id = t.id
+WHERE t.status = 'ready'
+  AND t.id NOT IN (
+    SELECT td.task_id FROM task_dependencies td
+    JOIN tasks dep ON dep.id = td.depends_on
+    WHERE dep.status NOT IN ('merged', 'in-review')
+  )
+  AND (
+    SELECT COUNT(*) FROM task_dependencies td
+    JOIN tasks dep ON dep.id = td.depends_on
+    WHERE td.task_id = t.id AND dep.status = 'in-review'
+  ) = 1
+ORDER BY t.priority DESC, s.critical_path DESC, s.downstream DESC, t.created_at ASC
+LIMIT 1
+"""
+
+# Scheduling weight of tasks without a complexity estimate (middle of 1-10)
+_DEFAULT_COMPLEXITY: int = 5
+
+# The changed tasks (a JSON array) and everything they transitively depend on,
+# whose scheduling cache rows are stale
+_STALE_SCHEDULE_QUERY: str = """
+WITH RECURSIVE stale(id) AS (
+  SELECT value FROM json_each(?)
+  UNION
+  SELECT td.depends_on FROM task_dependencies td JOIN stale ON td.task_id = stale.id
+)
+SELECT t.id, t.status, t.complexity FROM tasks t JOIN stale ON stale.id = t.id
+"""
+
+# Unmerged tasks directly waiting on the given tasks, with their cached
+# critical path
+_WAITING_QUERY: str = """
+SELECT td.depends_on, td.task_id, COALESCE(s.critical_path, 0) AS critical_path
+FROM task_dependencies td
+JOIN tasks t ON t.id = td.task_id AND t.status != 'merged'
+LEFT JOIN task_schedule s ON s.task_id = td.task_id
+WHERE td.depends_on IN (SELECT value FROM json_each(?))
+"""
+
+# Number of unmerged tasks transitively waiting on each of the given tasks
+_DOWNSTREAM_QUERY: str = """
+WITH RECURSIVE down(root, id) AS (
+  SELECT td.depends_on, td.task_id FROM task_dependencies td
+  JOIN tasks t ON t.id = td.task_id AND t.status != 'merged'
+  WHERE td.depends_on IN (SELECT value FROM json_each(?))
+  UNION
+  SELECT down.root, td.task_id FROM down
+  JOIN task_dependencies td ON td.depends_on = down.id
+  JOIN tasks t ON t.id = td.task_id AND t.status != 'merged'
+)
+SELECT root, COUNT(*) FROM down GROUP BY root
+"""
+
+# Columns usage_totals may group by (interpolated into SQL, so kept explicit)
+_USAGE_GROUP_COLUMNS: frozenset[str] = frozenset(
+    {"model", "stage", "task_id", "run_id"}
+)
+
 
 class TaskStore:
     """SQLite-backed storage for tasks and their dependencies."""
@@ -23,6 +116,7 @@ class TaskStore:
             "blocked",
             "in-progress",
             "in-review",
+            "speculative",
             "merged",
             "failed",
             "infra-error",
@@ -38,6 +132,17 @@ class TaskStore:
         """
         self._conn = conn
         self._conn.row_factory = sqlite3.Row
+        # Databases created before the scheduling cache existed
+        unscheduled = self._conn.execute(
+            "SELECT 1 FROM tasks WHERE id NOT IN (SELECT task_id FROM task_schedule)"
+        ).fetchone()
+        if unscheduled:
+            with self._conn:
+                self._refresh_schedule(None)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._conn.close()
 
     def _generate_id(self) -> str:
         """Generate a short unique ID for a task."""
@@ -95,9 +200,9 @@ class TaskStore:
                 (task_id, description, priority, complexity, context, context_files),
             )
 
-            if depends_on:
-                for dep_id in depends_on:
-                    self.add_dependency(task_id, dep_id)
+            for dep_id in depends_on or ():
+                self._insert_dependency(task_id, dep_id)
+            self._refresh_schedule([task_id])
 
         return self.get_task(task_id)  # type: ignore[return-value] # We know it exists
 
@@ -126,6 +231,20 @@ class TaskStore:
         cursor = self._conn.execute(query, params)
         return [self._row_to_task(row) for row in cursor.fetchall()]
 
+    def count_by_status(self) -> dict[str, int]:
+        """Count tasks in every valid status (0 for statuses with no tasks)."""
+        cursor = self._conn.execute(
+            "SELECT status, COUNT(*) AS n FROM tasks GROUP BY status"
+        )
+        counts = dict.fromkeys(sorted(self.VALID_STATUSES), 0)
+        counts.update({row["status"]: row["n"] for row in cursor.fetchall()})
+        return counts
+
+    def task_statuses(self) -> dict[str, str]:
+        """Return the status of every task, by task id."""
+        cursor = self._conn.execute("SELECT id, status FROM tasks")
+        return {row["id"]: row["status"] for row in cursor.fetchall()}
+
     def update_status(self, task_id: str, new_status: str) -> None:
         """Update a task's status.
 
@@ -137,13 +256,19 @@ class TaskStore:
             raise InvalidStatusTransitionError(f"Invalid status: {new_status}")
 
         with self._conn:
-            cursor = self._conn.execute(
+            row = self._conn.execute(
+                "SELECT status FROM tasks WHERE id = ?", (task_id,)
+            ).fetchone()
+            if row is None:
+                raise TaskNotFoundError(f"Task '{task_id}' not found")
+            self._conn.execute(
                 "UPDATE tasks SET status = ?, updated_at = datetime('now') "
                 "WHERE id = ?",
                 (new_status, task_id),
             )
-            if cursor.rowcount == 0:
-                raise TaskNotFoundError(f"Task '{task_id}' not found")
+            # Only merged tasks drop out of the critical paths
+            if "merged" in (row["status"], new_status):
+                self._refresh_schedule([task_id])
 
     def pick_next_task(self) -> Task | None:
         """Pick the next executable task.
@@ -154,24 +279,376 @@ class TaskStore:
 
         Ordered by priority (highest first) then creation time (oldest first).
         """
-        query = """
-        SELECT * FROM tasks
-        WHERE status = 'ready'
-          AND id NOT IN (
-            SELECT task_id FROM task_dependencies
-            WHERE depends_on NOT IN (
-              SELECT id FROM tasks WHERE status = 'merged'
-            )
-          )
-        ORDER BY priority DESC, created_at ASC
-        LIMIT 1
-        """
-        cursor = self._conn.execute(query)
+        cursor = self._conn.execute(
+            f"SELECT * FROM tasks WHERE id = ({_NEXT_READY_TASK_QUERY})"
+        )
         row = cursor.fetchone()
         if not row:
             return None
         return self._row_to_task(row)
 
+    def claim_next_task(
+        self, *, speculative: bool = False, owner: str | None = None
+    ) -> Task | None:
+        """Atomically pick the next executable task and mark it 'in-progress'.
+
+        Selection follows the same rules as `pick_next_task`, but the pick and
+        the status change happen in a single UPDATE statement, so concurrent
+        workers sharing the database can never claim the same task.
+
+        Args:
+            speculative: If no task is executable, claim a ready task whose
+                only unmerged dependency is one task in review instead. The
+                caller must build it on top of that task's branch.
+            owner: Runner process token. If given, the task's checkpoint is
+                created (or taken over) for it in the claim's transaction,
+                so a claimed task always has an owner to check for liveness.
+
+        Returns:
+            The claimed task (with status 'in-progress'), or None if no task
+            is executable.
+        """
+        queries = [_NEXT_READY_TASK_QUERY]
+        if speculative:
+            queries.append(_SPECULATIVE_TASK_QUERY)
+        for query in queries:
+            with self._conn:
+                cursor = self._conn.execute(
+                    f"""
+                    UPDATE tasks
+                    SET status = 'in-progress', updated_at = datetime('now')
+                    WHERE status = 'ready' AND id = ({query})
+                    RETURNING *
+                    """
+                )
+                rows = cursor.fetchall()
+                if rows and owner is not None:
+                    self._own_checkpoint(rows[0]["id"], owner)
+            if rows:
+                return self._row_to_task(rows[0])
+        return None
+
+    def claim_task(self, task_id: str, *, owner: str) -> None:
+        """Mark a given task 'in-progress' for a runner process.
+
+        Like claim_next_task(owner=...), the status change and the task's
+        checkpoint owner are written in one transaction.
+
+        Args:
+            task_id: The task to run.
+            owner: Runner process token.
+
+        Raises:
+            TaskNotFoundError: If the task does not exist.
+        """
+        with self._conn:
+            row = self._conn.execute(
+                "SELECT status FROM tasks WHERE id = ?", (task_id,)
+            ).fetchone()
+            if row is None:
+                raise TaskNotFoundError(f"Task '{task_id}' not found")
+            self._conn.execute(
+                "UPDATE tasks SET status = 'in-progress', updated_at = datetime('now') "
+                "WHERE id = ?",
+                (task_id,),
+            )
+            if row["status"] == "merged":
+                self._refresh_schedule([task_id])
+            self._own_checkpoint(task_id, owner)
+
+    def _own_checkpoint(self, task_id: str, owner: str) -> None:
+        """Create a task's checkpoint for an owner, or hand the existing one over.
+
+        Must be called inside the transaction that claims the task.
+        """
+        self._conn.execute(
+            "INSERT INTO checkpoints (task_id, run_id, owner) VALUES (?, '', ?) "
+            "ON CONFLICT (task_id) DO UPDATE SET owner = excluded.owner",
+            (task_id, owner),
+        )
+
+    def update_status_if(self, task_id: str, expected: str, new_status: str) -> bool:
+        """Move a task to a new status only if it is in the expected one.
+
+        Lets concurrent workers race for a transition: exactly one of them
+        sees True.
+
+        Args:
+            task_id: The task to update.
+            expected: The status the task must currently have.
+            new_status: The status to set.
+
+        Returns:
+            True if the task was updated.
+
+        Raises:
+            InvalidStatusTransitionError: If the new status is not valid.
+        """
+        if new_status not in self.VALID_STATUSES:
+            raise InvalidStatusTransitionError(f"Invalid status: {new_status}")
+        with self._conn:
+            cursor = self._conn.execute(
+                "UPDATE tasks SET status = ?, updated_at = datetime('now') "
+                "WHERE id = ? AND status = ?",
+                (new_status, task_id, expected),
+            )
+            if cursor.rowcount and "merged" in (expected, new_status):
+                self._refresh_schedule([task_id])
+        return cursor.rowcount > 0
+
+    def record_speculation(self, task_id: str, parent_id: str, parent_sha: str) -> None:
+        """Remember that a task was started on top of an in-review task.
+
+        Args:
+            task_id: The speculatively started task.
+            parent_id: The in-review dependency it was built on.
+            parent_sha: Commit of the parent's branch it started from.
+        """
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO speculations (task_id, parent_id, parent_sha) "
+                "VALUES (?, ?, ?)",
+                (task_id, parent_id, parent_sha),
+            )
+
+    def speculations(self) -> list[Speculation]:
+        """List every task in 'speculative' status with its parent's state."""
+        cursor = self._conn.execute(
+            """
+            SELECT t.id, s.parent_id, s.parent_sha, p.status AS parent_status
+            FROM tasks t
+            LEFT JOIN speculations s ON s.task_id = t.id
+            LEFT JOIN tasks p ON p.id = s.parent_id
+            WHERE t.status = 'speculative'
+            ORDER BY t.updated_at ASC
+            """
+        )
+        return [
+            Speculation(
+                task_id=row["id"],
+                parent_id=row["parent_id"] or "",
+                parent_sha=row["parent_sha"] or "",
+                parent_status=row["parent_status"],
+            )
+            for row in cursor.fetchall()
+        ]
+
+    def resolve_speculation(
+        self, task_id: str, parent_sha: str, new_status: str
+    ) -> bool:
+        """Move a speculative task on, if it is still the speculation seen.
+
+        Like update_status_if(), but the task must also still be built on
+        parent_sha: a reconciler holding a listing from before the task was
+        invalidated and speculated again must not act on the new result.
+
+        Args:
+            task_id: The speculative task.
+            parent_sha: Parent commit of the speculation being resolved
+                (empty if the task has no speculation row).
+            new_status: The status to set.
+
+        Returns:
+            True if the task was updated.
+
+        Raises:
+            InvalidStatusTransitionError: If the new status is not valid.
+        """
+        if new_status not in self.VALID_STATUSES:
+            raise InvalidStatusTransitionError(f"Invalid status: {new_status}")
+        with self._conn:
+            cursor = self._conn.execute(
+                """
+                UPDATE tasks SET status = ?, updated_at = datetime('now')
+                WHERE id = ? AND status = 'speculative'
+                  AND COALESCE(
+                    (SELECT parent_sha FROM speculations WHERE task_id = ?), ''
+                  ) = ?
+                """,
+                (new_status, task_id, task_id, parent_sha),
+            )
+        return cursor.rowcount > 0
+
+    def save_checkpoint(self, checkpoint: Checkpoint) -> None:
+        """Save a task's checkpoint, replacing any earlier one.
+
+        The infra retry count is kept; only retry_infra_errors() changes it.
+
+        Args:
+            checkpoint: The task's progress.
+        """
+        counters = {
+            "feedback": checkpoint.feedback,
+            "runs": checkpoint.runs,
+            "routes": list(checkpoint.routes),
+        }
+        with self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO checkpoints (task_id, run_id, owner, base_sha, step,
+                                         plan, attempt, counters, snapshot)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (task_id) DO UPDATE SET
+                    run_id = excluded.run_id, owner = excluded.owner,
+                    base_sha = excluded.base_sha, step = excluded.step,
+                    plan = excluded.plan, attempt = excluded.attempt,
+                    counters = excluded.counters, snapshot = excluded.snapshot,
+                    updated_at = datetime('now')
+                """,
+                (
+                    checkpoint.task_id,
+                    checkpoint.run_id,
+                    checkpoint.owner,
+                    checkpoint.base_sha,
+                    checkpoint.step,
+                    checkpoint.plan,
+                    checkpoint.attempt,
+                    json.dumps(counters),
+                    checkpoint.snapshot,
+                ),
+            )
+
+    def get_checkpoint(self, task_id: str) -> Checkpoint | None:
+        """Return a task's checkpoint, or None if it has none."""
+        row = self._conn.execute(
+            "SELECT * FROM checkpoints WHERE task_id = ?", (task_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        counters = json.loads(row["counters"])
+        return Checkpoint(
+            task_id=row["task_id"],
+            run_id=row["run_id"],
+            owner=row["owner"],
+            base_sha=row["base_sha"],
+            step=row["step"],
+            plan=row["plan"],
+            attempt=row["attempt"],
+            feedback=counters.get("feedback", {}),
+            runs=counters.get("runs", {}),
+            routes=tuple(counters.get("routes", ())),
+            snapshot=row["snapshot"],
+            infra_retries=row["infra_retries"],
+            updated_at=row["updated_at"],
+        )
+
+    def delete_checkpoint(self, task_id: str) -> None:
+        """Forget a task's checkpoint once its run is over."""
+        with self._conn:
+            self._conn.execute("DELETE FROM checkpoints WHERE task_id = ?", (task_id,))
+
+    def requeue_interrupted(self, is_alive: Callable[[str, str], bool]) -> list[str]:
+        """Make in-progress tasks whose runner is gone 'ready' again.
+
+        A task is interrupted if the runner process owning its checkpoint is
+        no longer running it. Its checkpoint is kept, so the worker that
+        claims it next resumes where the dead runner stopped.
+
+        Args:
+            is_alive: Tells whether a task's owner (called with the task id
+                and owner token) is still running it.
+
+        Returns:
+            The ids of the requeued tasks.
+        """
+        cursor = self._conn.execute(
+            """
+            SELECT c.task_id, c.owner FROM checkpoints c
+            JOIN tasks t ON t.id = c.task_id
+            WHERE t.status = 'in-progress'
+            """
+        )
+        return [
+            row["task_id"]
+            for row in cursor.fetchall()
+            if not is_alive(row["task_id"], row["owner"])
+            and self.update_status_if(row["task_id"], "in-progress", "ready")
+        ]
+
+    def retry_infra_errors(
+        self, *, delay_seconds: int, max_retries: int
+    ) -> tuple[list[str], list[str]]:
+        """Make tasks that hit an infra error 'ready' again after a delay.
+
+        Only tasks with a checkpoint are retried (every claimed task has
+        one); each retry is counted on it and resumes from it.
+
+        Args:
+            delay_seconds: How long a task stays in 'infra-error' first.
+            max_retries: Retries per task before it is left in 'infra-error'.
+
+        Returns:
+            The ids of the requeued tasks, and of the tasks in 'infra-error'
+            that have used up their retries (whose checkpoints can go).
+        """
+        with self._conn:
+            requeued = [
+                row["id"]
+                for row in self._conn.execute(
+                    """
+                    UPDATE tasks
+                    SET status = 'ready', updated_at = datetime('now')
+                    WHERE status = 'infra-error'
+                      AND updated_at <= datetime('now', ?)
+                      AND id IN (SELECT task_id FROM checkpoints
+                                 WHERE infra_retries < ?)
+                    RETURNING id
+                    """,
+                    (f"-{delay_seconds} seconds", max_retries),
+                ).fetchall()
+            ]
+            self._conn.executemany(
+                "UPDATE checkpoints SET infra_retries = infra_retries + 1 "
+                "WHERE task_id = ?",
+                [(task_id,) for task_id in requeued],
+            )
+        exhausted = self._conn.execute(
+            """
+            SELECT c.task_id FROM checkpoints c
+            JOIN tasks t ON t.id = c.task_id
+            WHERE t.status = 'infra-error' AND c.infra_retries >= ?
+            """,
+            (max_retries,),
+        ).fetchall()
+        return requeued, [row["task_id"] for row in exhausted]
+
+    def save_plan(self, plan: CachedPlan) -> None:
+        """Keep a task's latest plan, replacing any earlier one."""
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO plans "
+                "(task_id, input_hash, base_sha, context_hash, plan) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    plan.task_id,
+                    plan.input_hash,
+                    plan.base_sha,
+                    plan.context_hash,
+                    plan.plan,
+                ),
+            )
+
+    def get_plan(self, task_id: str) -> CachedPlan | None:
+        """Return a task's saved plan, or None if it has none."""
+        row = self._conn.execute(
+            "SELECT * FROM plans WHERE task_id = ?", (task_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return CachedPlan(
+            task_id=row["task_id"],
+            input_hash=row["input_hash"],
+            base_sha=row["base_sha"],
+            context_hash=row["context_hash"],
+            plan=row["plan"],
+            created_at=row["created_at"],
+        )
+
+    def delete_plan(self, task_id: str) -> None:
+        """Forget a task's saved plan."""
+        with self._conn:
+            self._conn.execute("DELETE FROM plans WHERE task_id = ?", (task_id,))
+
     def add_dependency(self, task_id: str, depends_on: str) -> None:
         """Add a dependency relationship between two tasks.
 
@@ -183,6 +660,12 @@ class TaskStore:
             TaskNotFoundError: If either task does not exist.
             CircularDependencyError: If this relationship creates a cycle.
         """
+        with self._conn:
+            self._insert_dependency(task_id, depends_on)
+            self._refresh_schedule([depends_on])
+
+    def _insert_dependency(self, task_id: str, depends_on: str) -> None:
+        """Validate and insert a dependency edge in the current transaction."""
         if not self.get_task(task_id):
             raise TaskNotFoundError(f"Task '{task_id}' not found")
         if not self.get_task(depends_on):
@@ -197,13 +680,12 @@ class TaskStore:
                 f"Adding dependency {task_id} -> {depends_on} creates a cycle"
             )
 
-        with self._conn:
-            # Ignore if dependency already exists
-            self._conn.execute(
-                "INSERT OR IGNORE INTO task_dependencies (task_id, depends_on) "
-                "VALUES (?, ?)",
-                (task_id, depends_on),
-            )
+        # Ignore if dependency already exists
+        self._conn.execute(
+            "INSERT OR IGNORE INTO task_dependencies (task_id, depends_on) "
+            "VALUES (?, ?)",
+            (task_id, depends_on),
+        )
 
     def get_dependencies(self, task_id: str) -> list[Task]:
         """Get all tasks that the given task depends on."""
@@ -215,6 +697,368 @@ class TaskStore:
         cursor = self._conn.execute(query, (task_id,))
         return [self._row_to_task(row) for row in cursor.fetchall()]
 
+    def split_task(self, task_id: str, subtasks: Sequence[SubTask]) -> list[Task]:
+        """Replace a task with its sub-tasks in a single transaction.
+
+        Each sub-task inherits the parent's priority, context and dependencies,
+        and every task that depended on the parent depends on all sub-tasks
+        instead. The parent's recorded LLM usage moves to the first sub-task,
+        so the spend stays in the totals, and the parent task is deleted.
+
+        Args:
+            task_id: The task being split. It must not have started yet.
+            subtasks: Sub-tasks in topological order: every `depends_on` key
+                must name a sub-task listed before it.
+
+        Returns:
+            The created tasks, in the same order as `subtasks`.
+
+        Raises:
+            TaskNotFoundError: If the task or a sub-task dependency key does
+                not exist.
+            InvalidStatusTransitionError: If the task is not 'ready' or
+                'blocked'.
+            CircularDependencyError: If a sub-task depends on itself or on a
+                sub-task listed after it.
+        """
+        parent = self.get_task(task_id)
+        if parent is None:
+            raise TaskNotFoundError(f"Task '{task_id}' not found")
+        if parent.status not in ("ready", "blocked"):
+            raise InvalidStatusTransitionError(
+                f"Cannot split task '{task_id}' with status '{parent.status}'"
+            )
+
+        keys = {sub.key for sub in subtasks}
+        ids: dict[str, str] = {}
+        edges: list[tuple[str, str]] = []
+        for sub in subtasks:
+            sub_id = self._generate_id()
+            for dep in sub.depends_on:
+                if dep in ids:
+                    edges.append((sub_id, ids[dep]))
+                elif dep in keys:
+                    raise CircularDependencyError(
+                        f"Sub-task '{sub.key}' is listed before its dependency '{dep}'"
+                    )
+                else:
+                    raise TaskNotFoundError(
+                        f"Sub-task '{sub.key}' depends on unknown sub-task '{dep}'"
+                    )
+            ids[sub.key] = sub_id
+
+        upstream = [t.id for t in self.get_dependencies(task_id)]
+        cursor = self._conn.execute(
+            "SELECT task_id FROM task_dependencies WHERE depends_on = ?", (task_id,)
+        )
+        downstream = [row[0] for row in cursor.fetchall()]
+        edges += [(ids[s.key], dep) for s in subtasks for dep in upstream]
+        edges += [(dep, ids[s.key]) for s in subtasks for dep in downstream]
+
+        with self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO tasks
+                (id, description, priority, complexity, context, context_files)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (
+                        ids[sub.key],
+                        sub.description,
+                        parent.priority,
+                        sub.complexity,
+                        parent.context,
+                        parent.context_files,
+                    )
+                    for sub in subtasks
+                ],
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO task_dependencies (task_id, depends_on) "
+                "VALUES (?, ?)",
+                edges,
+            )
+            self._conn.executemany(
+                "UPDATE llm_usage SET task_id = ? WHERE task_id = ?",
+                [(first, task_id) for first in [*ids.values()][:1]],
+            )
+            self._conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+            self._refresh_schedule(ids.values())
+
+        return [self.get_task(ids[sub.key]) for sub in subtasks]  # type: ignore[misc]
+
+    def record_usage(
+        self, *, run_id: str, task_id: str, entries: Sequence[tuple[str, LLMUsage]]
+    ) -> None:
+        """Persist the LLM calls made during a pipeline run.
+
+        Args:
+            run_id: The pipeline run that made the calls.
+            task_id: The task the run executed.
+            entries: (stage, usage) for every call, e.g. UsageLedger.entries.
+        """
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO llm_usage (run_id, task_id, stage, model, "
+                "prompt_tokens, completion_tokens, cached_tokens, "
+                "latency_seconds, cost_usd) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        run_id,
+                        task_id,
+                        stage,
+                        u.model,
+                        u.prompt_tokens,
+                        u.completion_tokens,
+                        u.cached_tokens,
+                        u.latency_seconds,
+                        u.cost_usd,
+                    )
+                    for stage, u in entries
+                ],
+            )
+
+    def usage_totals(
+        self, group_by: str = "model", task_id: str | None = None
+    ) -> list[UsageTotals]:
+        """Aggregate recorded LLM usage.
+
+        Args:
+            group_by: Column to group by: 'model', 'stage', 'task_id' or 'run_id'.
+            task_id: Only include calls made for this task.
+
+        Returns:
+            One UsageTotals per group, most expensive first.
+
+        Raises:
+            ValueError: If group_by is not a supported column.
+        """
+        if group_by not in _USAGE_GROUP_COLUMNS:
+            raise ValueError(
+                f"Cannot group usage by '{group_by}'. "
+                f"Valid columns: {sorted(_USAGE_GROUP_COLUMNS)}"
+            )
+        where, params = ("WHERE task_id = ?", (task_id,)) if task_id else ("", ())
+        cursor = self._conn.execute(
+            f"""
+            SELECT {group_by} AS key,
+                   COUNT(*) AS calls,
+                   SUM(prompt_tokens) AS prompt_tokens,
+                   SUM(completion_tokens) AS completion_tokens,
+                   SUM(cached_tokens) AS cached_tokens,
+                   SUM(latency_seconds) AS latency_seconds,
+                   TOTAL(cost_usd) AS cost_usd,
+                   SUM(cost_usd IS NULL) AS unpriced_calls
+            FROM llm_usage {where}
+            GROUP BY {group_by}
+            ORDER BY cost_usd DESC, key ASC
+            """,
+            params,
+        )
+        return [
+            UsageTotals(
+                key=row["key"],
+                calls=row["calls"],
+                prompt_tokens=row["prompt_tokens"],
+                completion_tokens=row["completion_tokens"],
+                cached_tokens=row["cached_tokens"],
+                latency_seconds=row["latency_seconds"],
+                cost_usd=row["cost_usd"],
+                unpriced_calls=row["unpriced_calls"],
+            )
+            for row in cursor.fetchall()
+        ]
+
+    def record_run(self, result: RunResult) -> None:
+        """Persist the summary of a finished pipeline run.
+
+        Args:
+            result: The run summary produced by RunRecorder.finish().
+        """
+        total = result.usage_total
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO runs (run_id, task_id, passed, stage_reached, message, "
+                "attempts, base_sha, duration_seconds, prompt_tokens, "
+                "completion_tokens, cost_usd) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    result.run_id,
+                    result.task_id,
+                    int(result.passed),
+                    result.stage_reached,
+                    result.message,
+                    result.attempts,
+                    result.base_sha,
+                    result.duration_seconds,
+                    total.prompt_tokens,
+                    total.completion_tokens,
+                    total.cost_usd,
+                ),
+            )
+
+    def list_runs(
+        self,
+        *,
+        task_id: str | None = None,
+        passed: bool | None = None,
+        since: str | None = None,
+        complexity: int | None = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> list[RunRecord]:
+        """List finished runs, most recent first.
+
+        Args:
+            task_id: Only runs of this task.
+            passed: Only successful (True) or failed (False) runs.
+            since: Only runs finished at or after this UTC date/time
+                ('YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS').
+            complexity: Only runs of tasks with this complexity estimate.
+            limit: Maximum number of runs to return.
+            offset: Number of matching runs to skip (for paging).
+
+        Returns:
+            One page of runs.
+        """
+        where, params = _run_filters(task_id, passed, since, complexity)
+        cursor = self._conn.execute(
+            f"SELECT * FROM runs {where} "
+            "ORDER BY finished_at DESC, rowid DESC LIMIT ? OFFSET ?",
+            (*params, limit, offset),
+        )
+        return [
+            RunRecord(
+                run_id=row["run_id"],
+                task_id=row["task_id"],
+                passed=bool(row["passed"]),
+                stage_reached=row["stage_reached"],
+                message=row["message"],
+                attempts=row["attempts"],
+                duration_seconds=row["duration_seconds"],
+                prompt_tokens=row["prompt_tokens"],
+                completion_tokens=row["completion_tokens"],
+                cost_usd=row["cost_usd"],
+                finished_at=row["finished_at"],
+                base_sha=row["base_sha"],
+            )
+            for row in cursor.fetchall()
+        ]
+
+    def run_stats(
+        self,
+        *,
+        task_id: str | None = None,
+        passed: bool | None = None,
+        since: str | None = None,
+        complexity: int | None = None,
+    ) -> RunStats:
+        """Aggregate the runs matching the same filters as list_runs().
+
+        Percentiles use the nearest-rank method and are read with ORDER BY
+        ... OFFSET queries instead of loading every duration. These walk the
+        duration index, except with a task or time filter, where SQLite sorts
+        the runs found through the task or finish-time index.
+
+        Args:
+            task_id: Only runs of this task.
+            passed: Only successful (True) or failed (False) runs.
+            since: Only runs finished at or after this UTC date/time.
+            complexity: Only runs of tasks with this complexity estimate.
+
+        Returns:
+            Counts, duration percentiles, throughput and cost.
+        """
+        where, params = _run_filters(task_id, passed, since, complexity)
+        row = self._conn.execute(
+            f"""
+            SELECT COUNT(*) AS runs,
+                   TOTAL(passed) AS passed,
+                   TOTAL(cost_usd) AS cost_usd,
+                   COUNT(DISTINCT CASE WHEN passed THEN task_id END) AS tasks_done,
+                   CAST(julianday(date(MAX(finished_at)))
+                        - julianday(date(MIN(finished_at))) AS INTEGER) + 1 AS days
+            FROM runs {where}
+            """,
+            params,
+        ).fetchone()
+        runs: int = row["runs"]
+
+        def percentile(p: float) -> float:
+            if not runs:
+                return 0.0
+            rank = max(math.ceil(p * runs), 1)
+            value: float = self._conn.execute(
+                f"SELECT duration_seconds FROM runs {where} "
+                "ORDER BY duration_seconds LIMIT 1 OFFSET ?",
+                (*params, rank - 1),
+            ).fetchone()[0]
+            return value
+
+        return RunStats(
+            runs=runs,
+            passed=int(row["passed"]),
+            p50_seconds=percentile(0.5),
+            p95_seconds=percentile(0.95),
+            tasks_per_day=row["tasks_done"] / row["days"] if runs else 0.0,
+            cost_usd=row["cost_usd"],
+        )
+
+    def _refresh_schedule(self, changed: Iterable[str] | None) -> None:
+        """Recompute the scheduling cache after edges or statuses changed.
+
+        A task's critical path and downstream count depend only on the tasks
+        that wait for it, so a change to a task invalidates that task and
+        everything it transitively depends on. Only those rows are read and
+        rewritten: critical paths extend the cached rows of the dependents
+        outside that set, and downstream counts walk the dependency edges in
+        SQL. Must be called inside the transaction that made the change.
+
+        Args:
+            changed: Tasks whose own status or dependents changed, or None
+                to rebuild the cache for every task.
+        """
+        if changed is None:
+            rows = self._conn.execute("SELECT id, status, complexity FROM tasks")
+        else:
+            rows = self._conn.execute(_STALE_SCHEDULE_QUERY, (json.dumps([*changed]),))
+        weights: dict[str, int] = {}
+        merged: set[str] = set()
+        for row in rows:
+            weights[row["id"]] = row["complexity"] or _DEFAULT_COMPLEXITY
+            if row["status"] == "merged":
+                merged.add(row["id"])
+        stale = json.dumps([*weights])
+
+        # Unmerged tasks directly waiting on each stale task, with their cache
+        waiting: dict[str, dict[str, int]] = {task: {} for task in weights}
+        for row in self._conn.execute(_WAITING_QUERY, (stale,)):
+            waiting[row["depends_on"]][row["task_id"]] = row["critical_path"]
+        downstream: dict[str, int] = dict(
+            self._conn.execute(_DOWNSTREAM_QUERY, (stale,)).fetchall()
+        )
+
+        critical: dict[str, int] = {}
+        graph = {
+            task: [d for d in dependents if d in waiting]
+            for task, dependents in waiting.items()
+        }
+        # Dependents come first in this order
+        for task in TopologicalSorter(graph).static_order():
+            if task in merged:
+                critical[task], downstream[task] = 0, 0
+                continue
+            critical[task] = weights[task] + max(
+                (critical.get(d, cached) for d, cached in waiting[task].items()),
+                default=0,
+            )
+
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO task_schedule (task_id, critical_path, downstream) "
+            "VALUES (?, ?, ?)",
+            [(task, critical[task], downstream.get(task, 0)) for task in weights],
+        )
+
     def _path_exists(self, start_id: str, target_id: str) -> bool:
         """BFS to check if there is a dependency path from start_id to target_id."""
         visited = set()
@@ -236,3 +1080,28 @@ class TaskStore:
                 queue.extend(neighbors)
 
         return False
+
+
+def _run_filters(
+    task_id: str | None,
+    passed: bool | None,
+    since: str | None,
+    complexity: int | None,
+) -> tuple[str, tuple[str | int, ...]]:
+    """Build the WHERE clause shared by list_runs() and run_stats()."""
+    clauses: list[str] = []
+    params: list[str | int] = []
+    if task_id is not None:
+        clauses.append("task_id = ?")
+        params.append(task_id)
+    if passed is not None:
+        clauses.append("passed = ?")
+        params.append(int(passed))
+    if since is not None:
+        clauses.append("finished_at >= ?")
+        params.append(since)
+    if complexity is not None:
+        clauses.append("task_id IN (SELECT id FROM tasks WHERE complexity = ?)")
+        params.append(complexity)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, tuple(params)
@@ -0,0 +1,427 @@
+"""Structured per-run event log.
+
+Every pipeline run gets its own directory under the observability log dir
+(`.smelt/runs/{run_id}/`) holding an append-only `events.jsonl`: one JSON
+object per stage boundary, with monotonic timings, durations, models, token
+usage, subprocess exit codes and agent session ids. `checkpoint.json` holds
+the latest checkpoint of the task's progress. When the run finishes,
+`result.json` summarizes its outcome and LLM cost per stage and per model.
+
+Writes never happen on the pipeline thread. Events are queued and a single
+background writer appends them in batches, then prunes old run directories
+so that at most `max_runs_retained` are kept.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import shutil
+import threading
+import time
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+
+from smelt.db.models import Checkpoint, LLMUsage, RunEvent, RunResult
+from smelt.pipeline.stages import StageOutput
+from smelt.usage import UsageLedger, summarize
+
+logger = logging.getLogger(__name__)
+
+EVENTS_FILE_NAME: str = "events.jsonl"
+RESULT_FILE_NAME: str = "result.json"
+CHECKPOINT_FILE_NAME: str = "checkpoint.json"
+# Upper bound on events written per batch, so close() is never starved
+_MAX_BATCH: int = 256
+
+EventSink = Callable[[RunEvent | RunResult | Checkpoint], None]
+# (run directory, event, checkpoint or result) — None asks the writer to exit
+_WriterItem = tuple[Path, RunEvent | RunResult | Checkpoint] | None
+
+
+class EventLog:
+    """Owns the run directories and the background writer thread.
+
+    Thread-safe: concurrent runs (e.g. daemon workers) share one EventLog.
+    Call close() on shutdown to flush pending events.
+    """
+
+    def __init__(self, *, log_dir: Path, max_runs_retained: int) -> None:
+        """Initialize the event log.
+
+        Args:
+            log_dir: Directory holding one subdirectory per run.
+            max_runs_retained: Number of most recent run directories to keep.
+        """
+        self._log_dir = log_dir
+        self._max_runs_retained = max_runs_retained
+        self._queue: queue.Queue[_WriterItem] = queue.Queue()
+        self._lock = threading.Lock()
+        self._writer: threading.Thread | None = None
+        self._prune_requested = threading.Event()
+
+    def start_run(
+        self, task_id: str, *, observers: Sequence[EventSink] = ()
+    ) -> RunRecorder:
+        """Begin recording a new run and emit its 'run_started' event.
+
+        Args:
+            task_id: The task the run executes.
+            observers: Extra sinks that also receive the run's events
+                (e.g. metrics).
+
+        Returns:
+            A recorder bound to the new run's directory.
+        """
+        run_id = new_run_id(task_id)
+        return RunRecorder.start(
+            run_id=run_id, task_id=task_id, sinks=[self.sink_for(run_id), *observers]
+        )
+
+    def sink_for(self, run_id: str) -> EventSink:
+        """Return a sink that appends events to a run's directory.
+
+        Args:
+            run_id: The run whose directory receives the events.
+
+        Returns:
+            A sink that hands events to the background writer.
+        """
+        run_dir = self._log_dir / run_id
+        self._prune_requested.set()
+        return lambda item: self._enqueue(run_dir, item)
+
+    def flush(self) -> None:
+        """Block until every queued event has been written."""
+        self._queue.join()
+
+    def close(self) -> None:
+        """Flush pending events and stop the writer thread."""
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._queue.put(None)
+            writer.join()
+
+    def _enqueue(self, run_dir: Path, event: RunEvent | RunResult | Checkpoint) -> None:
+        """Hand an event to the writer thread, starting it if needed."""
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._write_loop, name="smelt-event-writer", daemon=True
+                )
+                self._writer.start()
+        self._queue.put((run_dir, event))
+
+    def _write_loop(self) -> None:
+        """Append queued events in batches until asked to stop."""
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            while len(batch) < _MAX_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines: dict[Path, list[str]] = {}
+            files: dict[Path, RunResult | Checkpoint] = {}
+            for item in batch:
+                if item is None:
+                    stopping = True
+                elif isinstance(item[1], RunEvent):
+                    lines.setdefault(item[0], []).append(_serialize(item[1]))
+                else:
+                    name = (
+                        RESULT_FILE_NAME
+                        if isinstance(item[1], RunResult)
+                        else CHECKPOINT_FILE_NAME
+                    )
+                    files[item[0] / name] = item[1]
+            try:
+                self._write_batch(lines, files)
+            except OSError:
+                logger.exception("Failed to write run events to %s", self._log_dir)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_batch(
+        self,
+        lines: dict[Path, list[str]],
+        files: dict[Path, RunResult | Checkpoint],
+    ) -> None:
+        """Append events and write results and checkpoints, then prune if due."""
+        for run_dir, run_lines in lines.items():
+            run_dir.mkdir(parents=True, exist_ok=True)
+            with (run_dir / EVENTS_FILE_NAME).open("a", encoding="utf-8") as f:
+                f.writelines(run_lines)
+        for path, data in files.items():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(asdict(data), indent=2) + "\n", encoding="utf-8")
+        if self._prune_requested.is_set():
+            self._prune_requested.clear()
+            self._prune()
+
+    def _prune(self) -> None:
+        """Delete the oldest run directories beyond max_runs_retained."""
+        if not self._log_dir.is_dir():
+            return
+        # Run ids start with a UTC timestamp, so name order is age order
+        runs = sorted(
+            d.name for d in self._log_dir.iterdir() if (d / EVENTS_FILE_NAME).is_file()
+        )
+        for name in runs[: max(len(runs) - self._max_runs_retained, 0)]:
+            shutil.rmtree(self._log_dir / name, ignore_errors=True)
+
+
+@dataclass
+class StageSpan:
+    """Outcome details filled in while a stage runs.
+
+    Attributes:
+        passed: Whether the stage succeeded (None if not reported).
+        session_id: Coding agent session id, if the stage ran an agent.
+        exit_codes: Subprocess exit codes by tool name.
+        usage: Usage of the LLM calls the stage made.
+        base_sha: Base-branch commit pinned by the stage.
+    """
+
+    passed: bool | None = None
+    session_id: str | None = None
+    exit_codes: dict[str, int] | None = None
+    usage: tuple[LLMUsage, ...] = ()
+    base_sha: str | None = None
+
+    def record(self, output: StageOutput) -> None:
+        """Copy the loggable details of a stage's output into the span."""
+        self.passed = output.passed
+        self.session_id = output.session_id
+        if output.tool_results:
+            self.exit_codes = {r.tool_name: r.return_code for r in output.tool_results}
+        self.usage += output.usage
+
+
+class RunRecorder:
+    """Emits the events of a single pipeline run.
+
+    A recorder without sinks (see disabled()) accepts every call and
+    writes nothing, so callers never need to check whether logging is on.
+    LLM usage reported by stages is accumulated in `usage` either way.
+    """
+
+    def __init__(
+        self, *, run_id: str, task_id: str, sinks: Sequence[EventSink] = ()
+    ) -> None:
+        """Initialize the recorder.
+
+        Args:
+            run_id: Unique id of the run (also its directory name).
+            task_id: The task the run executes.
+            sinks: Each receives every event and the final result.
+        """
+        self.run_id = run_id
+        self.usage = UsageLedger()
+        self._task_id = task_id
+        self._sinks = tuple(sinks)
+        self._start = time.monotonic()
+        self._attempts = 0
+        self._base_sha = ""
+
+    @classmethod
+    def start(
+        cls, *, run_id: str, task_id: str, sinks: Sequence[EventSink]
+    ) -> RunRecorder:
+        """Create a recorder and emit the run's 'run_started' event.
+
+        Args:
+            run_id: Unique id of the run.
+            task_id: The task the run executes.
+            sinks: Each receives every event and the final result.
+
+        Returns:
+            The started recorder.
+        """
+        recorder = cls(run_id=run_id, task_id=task_id, sinks=sinks)
+        recorder.emit("run_started")
+        return recorder
+
+    @classmethod
+    def disabled(cls, task_id: str) -> RunRecorder:
+        """Return a recorder that discards all events."""
+        return cls(run_id=new_run_id(task_id), task_id=task_id)
+
+    def emit(
+        self,
+        event: str,
+        *,
+        stage: str | None = None,
+        attempt: int | None = None,
+        duration_seconds: float | None = None,
+        passed: bool | None = None,
+        model: str | None = None,
+        message: str | None = None,
+        span: StageSpan | None = None,
+    ) -> None:
+        """Emit one event, stamped with the run's elapsed monotonic time.
+
+        Args:
+            event: Event kind.
+            stage: Stage name, for stage events.
+            attempt: Attempt number, for retried stages.
+            duration_seconds: Duration, for '*_finished' events.
+            passed: Outcome, for '*_finished' events.
+            model: LLM model used.
+            message: Outcome or error message.
+            span: Stage details (session id, exit codes, token usage).
+        """
+        if not self._sinks:
+            return
+        span = span or StageSpan()
+        totals = summarize(stage or event, span.usage) if span.usage else None
+        self._publish(
+            RunEvent(
+                run_id=self.run_id,
+                task_id=self._task_id,
+                event=event,
+                elapsed_seconds=round(time.monotonic() - self._start, 6),
+                timestamp=datetime.now(UTC).isoformat(),
+                stage=stage,
+                attempt=attempt,
+                duration_seconds=duration_seconds,
+                passed=passed if passed is not None else span.passed,
+                model=model,
+                input_tokens=totals.prompt_tokens if totals else None,
+                output_tokens=totals.completion_tokens if totals else None,
+                cost_usd=totals.cost_usd if totals else None,
+                exit_codes=span.exit_codes,
+                session_id=span.session_id,
+                message=message,
+                base_sha=span.base_sha,
+            )
+        )
+
+    @contextmanager
+    def stage(
+        self, name: str, *, attempt: int | None = None, model: str | None = None
+    ) -> Iterator[StageSpan]:
+        """Emit 'stage_started', then 'stage_finished' with the stage duration.
+
+        The yielded span collects outcome details while the stage runs. If the
+        stage raises, it is recorded as failed with the error message.
+
+        Args:
+            name: Stage name.
+            attempt: Attempt number, for retried stages.
+            model: LLM model the stage uses.
+
+        Yields:
+            The span to fill in with the stage outcome.
+        """
+        self.emit("stage_started", stage=name, attempt=attempt, model=model)
+        if attempt is not None:
+            self._attempts = max(self._attempts, attempt)
+        span = StageSpan()
+        start = time.monotonic()
+        message: str | None = None
+        try:
+            yield span
+        except Exception as e:
+            span.passed = False
+            message = str(e)
+            raise
+        finally:
+            self.usage.add(name, span.usage)
+            self._base_sha = span.base_sha or self._base_sha
+            for usage in span.usage:
+                self._emit_llm_call(name, attempt, usage)
+            self.emit(
+                "stage_finished",
+                stage=name,
+                attempt=attempt,
+                duration_seconds=round(time.monotonic() - start, 6),
+                model=model,
+                message=message,
+                span=span,
+            )
+
+    def _emit_llm_call(self, stage: str, attempt: int | None, usage: LLMUsage) -> None:
+        """Emit an 'llm_call' event for one LLM call made by a stage."""
+        self.emit(
+            "llm_call",
+            stage=stage,
+            attempt=attempt,
+            duration_seconds=round(usage.latency_seconds, 6),
+            model=usage.model,
+            span=StageSpan(usage=(usage,)),
+        )
+
+    def checkpoint(self, checkpoint: Checkpoint) -> None:
+        """Write the task's latest checkpoint to the run's directory.
+
+        Args:
+            checkpoint: The task's progress after the step that just ended.
+        """
+        self._publish(checkpoint)
+
+    def finish(self, *, passed: bool, stage: str, message: str) -> RunResult:
+        """Emit 'run_finished' and write the run's result summary.
+
+        Args:
+            passed: Whether the run succeeded.
+            stage: The last stage reached.
+            message: Outcome message.
+
+        Returns:
+            The run summary, including LLM usage per stage and per model.
+        """
+        duration = round(time.monotonic() - self._start, 6)
+        self.emit(
+            "run_finished",
+            stage=stage,
+            duration_seconds=duration,
+            passed=passed,
+            message=message,
+        )
+        result = RunResult(
+            run_id=self.run_id,
+            task_id=self._task_id,
+            passed=passed,
+            stage_reached=stage,
+            message=message,
+            duration_seconds=duration,
+            usage_total=self.usage.total(),
+            usage_by_stage=self.usage.by_stage(),
+            usage_by_model=self.usage.by_model(),
+            attempts=self._attempts,
+            base_sha=self._base_sha,
+        )
+        self._publish(result)
+        return result
+
+    def _publish(self, item: RunEvent | RunResult | Checkpoint) -> None:
+        """Hand an event, checkpoint or result to every sink."""
+        for sink in self._sinks:
+            sink(item)
+
+
+def new_run_id(task_id: str) -> str:
+    """Return a unique run id that sorts by start time.
+
+    Args:
+        task_id: The task the run executes.
+
+    Returns:
+        '{UTC timestamp}-{task_id}'.
+    """
+    return f"{datetime.now(UTC).strftime('%Y%m%dT%H%M%S%fZ')}-{task_id}"
+
+
+def _serialize(event: RunEvent) -> str:
+    """Render an event as one JSON line, omitting unset fields."""
+    data = {k: v for k, v in asdict(event).items() if v is not None}
+    return json.dumps(data, separators=(",", ":")) + "\n"
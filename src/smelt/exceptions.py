@@ -35,10 +35,18 @@ class AgentTimeoutError(AgentError):
     """Raised when a coding agent session exceeds its timeout."""
 
 
+class AgentAbortedError(AgentError):
+    """Raised when a coding agent session is stopped early by an output monitor."""
+
+
 class LLMError(SmeltError):
     """Raised when a direct LLM API call fails."""
 
 
+class DecompositionError(SmeltError):
+    """Raised when the Decomposer's response is not a valid sub-task list."""
+
+
 class InfraError(SmeltError):
     """Raised for infrastructure errors (rate limit, API down). Auto-retryable."""
 
@@ -1,24 +1,85 @@
-"""Git operations wrapper for the Smelt orchestrator."""
+"""Git operations wrapper for the Smelt orchestrator.
+
+Commands that change refs or the working tree run one git process each.
+Reads (resolving revisions, checking branches, reading file contents at a
+revision) go through long-lived `git cat-file --batch-check` / `--batch`
+processes instead, so they cost a pipe round trip rather than a fork/exec
+and a fresh repository and index load.
+
+WorktreePool keeps linked worktrees warm between tasks, so each task gets
+its own checkout without touching the user's main working tree.
+BaseBranchSync fetches the base branch at most once per interval and pins
+tasks to the fetched commit, so concurrent tasks share a single fetch.
+PushBatcher does the same for publishing: branches finished while a push
+is in flight go out together in the next `git push`.
+"""
 
 from __future__ import annotations
 
+import contextlib
+import logging
+import os
+import shutil
 import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import IO, cast
 
 from smelt.config import GitConfig
 from smelt.exceptions import GitError
 
+logger = logging.getLogger(__name__)
+
+# Ref keeping a task's latest working-tree snapshot reachable
+_SNAPSHOT_REF: str = "refs/smelt/checkpoints/{}"
+# Snapshots are internal commits; they must not need a configured user
+_SNAPSHOT_IDENTITY: Mapping[str, str] = {
+    "GIT_AUTHOR_NAME": "smelt",
+    "GIT_AUTHOR_EMAIL": "smelt@localhost",
+    "GIT_COMMITTER_NAME": "smelt",
+    "GIT_COMMITTER_EMAIL": "smelt@localhost",
+}
+
 
 class GitOps:
-    """Wrapper for git commands executed via subprocess."""
+    """Wrapper for git commands executed via subprocess.
+
+    Call close() when done to stop the cat-file helper processes (they are
+    only started by the first read that needs them).
+    """
 
     def __init__(self, repo_path: Path, config: GitConfig) -> None:
         """Initialize GitOps with a repository path and configuration."""
         self.repo_path = repo_path
         self.config = config
+        self._batch_check = _CatFile(repo_path, "--batch-check")
+        self._batch = _CatFile(repo_path, "--batch")
+
+    def close(self) -> None:
+        """Stop the cat-file helper processes, if running."""
+        self._batch_check.close()
+        self._batch.close()
 
-    def _run(self, *args: str) -> str:
-        """Run a git command safely and return stripped stdout."""
+    def at(self, path: Path) -> GitOps:
+        """Return a GitOps for another working tree of the same repository."""
+        return GitOps(path, self.config)
+
+    def branch_name(self, task_slug: str) -> str:
+        """Return the branch name used for a task."""
+        return f"{self.config.branch_prefix}{task_slug}"
+
+    def _run(
+        self, *args: str, stdin: str | None = None, env: Mapping[str, str] | None = None
+    ) -> str:
+        """Run a git command safely and return stripped stdout.
+
+        env holds extra environment variables for the command.
+        """
         try:
             result = subprocess.run(
                 ["git", *args],
@@ -26,6 +87,8 @@ class GitOps:
                 check=True,
                 capture_output=True,
                 text=True,
+                input=stdin,
+                env={**os.environ, **env} if env else None,
             )
             return result.stdout.strip()
         except subprocess.CalledProcessError as e:
@@ -36,17 +99,23 @@ class GitOps:
         """Checkout an existing branch."""
         self._run("checkout", branch_name)
 
-    def create_branch(self, task_slug: str) -> str:
-        """Create a new task branch from the base branch.
+    def create_branch(
+        self, task_slug: str, start_point: str | None = None, *, reset: bool = False
+    ) -> str:
+        """Create a new task branch and check it out.
 
         Args:
             task_slug: The unique slug for the task (e.g., '1a2b3c4d').
+            start_point: Commit to branch from (defaults to the base branch).
+            reset: Reset the branch to start_point if it already exists (e.g.
+                left behind by an interrupted run).
 
         Returns:
             The full name of the created branch.
         """
-        branch_name = f"{self.config.branch_prefix}{task_slug}"
-        self._run("checkout", "-b", branch_name, self.config.base_branch)
+        branch_name = self.branch_name(task_slug)
+        start = start_point or self.config.base_branch
+        self._run("checkout", "-B" if reset else "-b", branch_name, start)
         return branch_name
 
     def pull(self, branch: str | None = None) -> None:
@@ -56,6 +125,10 @@ class GitOps:
         else:
             self._run("pull")
 
+    def fetch(self, branch: str) -> None:
+        """Fetch a branch from origin into its remote-tracking ref."""
+        self._run("fetch", "origin", branch)
+
     def add_all(self) -> None:
         """Stage all modifications."""
         self._run("add", ".")
@@ -68,18 +141,702 @@ class GitOps:
         """Push a branch to origin and set upstream."""
         self._run("push", "-u", "origin", branch)
 
+    def delete_remote_branch(self, branch: str) -> None:
+        """Delete a branch on origin."""
+        self._run("push", "origin", "--delete", branch)
+
+    def push_branches(self, branches: Sequence[str]) -> dict[str, str]:
+        """Push several branches to origin in one `git push`, setting upstreams.
+
+        The push is not atomic: refs the remote accepts are updated even if
+        others are rejected.
+
+        Args:
+            branches: Local branch names.
+
+        Returns:
+            An error message for every branch that was not pushed (empty if
+            all were).
+        """
+        proc = subprocess.run(
+            ["git", "push", "--porcelain", "-u", "origin", *branches],
+            cwd=self.repo_path,
+            capture_output=True,
+            text=True,
+        )
+        failed: dict[str, str] = {}
+        reported: set[str] = set()
+        # Porcelain ref lines: '<flag>\t<src>:<dst>\t<summary>', '!' = rejected
+        for line in proc.stdout.splitlines():
+            flag, _, rest = line.partition("\t")
+            ref, _, summary = rest.partition("\t")
+            if not ref:
+                continue
+            branch = ref.partition(":")[0].removeprefix("refs/heads/")
+            reported.add(branch)
+            if flag == "!":
+                failed[branch] = summary
+        if proc.returncode != 0:
+            error = proc.stderr.strip() or f"git push exited {proc.returncode}"
+            failed.update({b: error for b in branches if b not in reported})
+        return failed
+
+    def rebase(self, onto: str, upstream: str) -> None:
+        """Replay the current branch's commits after `upstream` onto `onto`.
+
+        A rebase that stops on a conflict is aborted, leaving the branch as
+        it was.
+
+        Raises:
+            GitError: If the commits do not apply cleanly.
+        """
+        try:
+            self._run("rebase", "--onto", onto, upstream)
+        except GitError:
+            with contextlib.suppress(GitError):
+                self._run("rebase", "--abort")
+            raise
+
+    def contains(self, commit: str, base: str) -> bool:
+        """True if base holds the changes of commit, merged or squash-merged.
+
+        A commit is contained if it is an ancestor of base, if the files it
+        changed (since it forked from base) are the same on base, or if a
+        commit on base since the fork has the same patch id as its changes.
+
+        Args:
+            commit: The commit whose changes to look for (e.g. a merged branch).
+            base: The commit to look in (e.g. origin/<base>).
+        """
+        try:
+            self._run("merge-base", "--is-ancestor", commit, base)
+        except GitError:
+            pass
+        else:
+            return True
+        fork = self._run("merge-base", commit, base)
+        paths = self._run("diff", "--name-only", fork, commit).splitlines()
+        if not paths:
+            return True
+        try:
+            self._run("diff", "--quiet", commit, base, "--", *paths)
+        except GitError:
+            pass
+        else:
+            return True
+        changes = self._run("diff", fork, commit)
+        patch_id = self._run("patch-id", "--stable", stdin=f"{changes}\n").split()[0]
+        log = self._run("log", "-p", "--no-merges", f"{fork}..{base}")
+        ids = self._run("patch-id", "--stable", stdin=f"{log}\n").splitlines()
+        return any(line.split()[0] == patch_id for line in ids)
+
+    def diff_head(self) -> str:
+        """Return the working tree's changes against HEAD, new files included.
+
+        Untracked files are marked with `add --intent-to-add` so they show
+        up in the diff; their content is not staged.
+        """
+        self._run("add", "--all", "--intent-to-add")
+        return self._run("diff", "HEAD")
+
+    def snapshot(self, task_slug: str) -> str:
+        """Commit the working tree as it is, without touching HEAD or the index.
+
+        Untracked files are included. The commit is kept reachable under
+        refs/smelt/checkpoints/<task_slug> until drop_snapshot().
+
+        Args:
+            task_slug: The task the working tree belongs to.
+
+        Returns:
+            The snapshot commit's sha.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            # A copy of the real index keeps its stat cache, so only changed
+            # files are hashed
+            index = Path(tmp) / "index"
+            real_index = self.repo_path / self._run("rev-parse", "--git-path", "index")
+            if real_index.is_file():
+                shutil.copyfile(real_index, index)
+            env = {"GIT_INDEX_FILE": str(index)}
+            self._run("add", "--all", env=env)
+            tree = self._run("write-tree", env=env)
+        sha = self._run(
+            "commit-tree",
+            tree,
+            "-p",
+            "HEAD",
+            "-m",
+            "smelt checkpoint",
+            env=_SNAPSHOT_IDENTITY,
+        )
+        self._run("update-ref", _SNAPSHOT_REF.format(task_slug), sha)
+        return sha
+
+    def restore_snapshot(self, sha: str) -> None:
+        """Make the working tree and index match a snapshot(), keeping HEAD."""
+        self._run("read-tree", "-u", "--reset", sha)
+
+    def drop_snapshot(self, task_slug: str) -> None:
+        """Delete the ref keeping a task's snapshot reachable, if any."""
+        self._run("update-ref", "-d", _SNAPSHOT_REF.format(task_slug))
+
+    def has_staged_changes(self) -> bool:
+        """True if the index differs from HEAD."""
+        try:
+            self._run("diff", "--cached", "--quiet")
+        except GitError:
+            return True
+        return False
+
     def current_branch(self) -> str:
-        """Get the name of the currently checked out branch."""
-        return self._run("branch", "--show-current")
+        """Get the name of the currently checked out branch ('' if detached)."""
+        try:
+            return self._run("symbolic-ref", "--quiet", "--short", "HEAD")
+        except GitError:
+            return ""
+
+    def rev_parse(self, rev: str) -> str | None:
+        """Resolve a revision to an object id via the batch-check process.
+
+        Args:
+            rev: Any revision git understands (branch, tag, 'HEAD~1', 'rev:path').
+
+        Returns:
+            The full object id, or None if the revision does not exist.
+        """
+        header = self._batch_check.query(rev)
+        return header.split(" ", 1)[0] if header is not None else None
 
     def branch_exists(self, name: str) -> bool:
         """Check whether a branch exists locally."""
+        return self.rev_parse(f"refs/heads/{name}") is not None
+
+    def read_file(self, rev: str, path: str) -> bytes | None:
+        """Read a file's contents at a revision via the batch process.
+
+        Args:
+            rev: The revision to read from (e.g. the base branch).
+            path: Path relative to the repository root.
+
+        Returns:
+            The file contents, or None if the file does not exist at rev.
+        """
+        return self._batch.read(f"{rev}:{path}")
+
+    def list_branches(self, prefix: str) -> dict[str, str]:
+        """List local branches under a prefix.
+
+        Args:
+            prefix: Branch name prefix, e.g. 'smelt/'.
+
+        Returns:
+            Commit SHA by branch name.
+        """
+        listing = self._run(
+            "for-each-ref",
+            "--format=%(objectname) %(refname)",
+            f"refs/heads/{prefix}",
+        )
+        branches = {}
+        for line in listing.splitlines():
+            sha, _, ref = line.partition(" ")
+            branches[ref.removeprefix("refs/heads/")] = sha
+        return branches
+
+    def delete_branches(self, branches: Mapping[str, str]) -> None:
+        """Delete several branches in one `update-ref --stdin` transaction.
+
+        Each branch is only deleted if it still points at the given commit;
+        if any does not, nothing is deleted.
+
+        Args:
+            branches: Expected commit SHA by branch name.
+
+        Raises:
+            GitError: If the transaction failed.
+        """
+        if not branches:
+            return
+        commands = "".join(
+            f"delete refs/heads/{name} {sha}\n" for name, sha in branches.items()
+        )
+        self._run("update-ref", "--stdin", stdin=commands)
+
+    def worktrees(self) -> list[WorktreeInfo]:
+        """List the repository's worktrees, the main working tree first."""
+        listing = self._run("worktree", "list", "--porcelain")
+        worktrees = []
+        for block in listing.split("\n\n"):
+            fields = dict(line.partition(" ")[::2] for line in block.splitlines())
+            worktrees.append(
+                WorktreeInfo(
+                    path=Path(fields["worktree"]),
+                    head=fields.get("HEAD", ""),
+                    branch=fields["branch"].removeprefix("refs/heads/")
+                    if "branch" in fields
+                    else None,
+                    prunable="prunable" in fields,
+                )
+            )
+        return worktrees
+
+    def remove_worktree(self, path: Path) -> None:
+        """Delete a linked worktree and its administrative files.
+
+        Falls back to deleting the directory and pruning if git refuses
+        (e.g. the worktree is already half removed).
+        """
         try:
-            self._run("show-ref", "--verify", "--quiet", f"refs/heads/{name}")
-            return True
+            self._run("worktree", "remove", "--force", str(path))
         except GitError:
-            return False
+            shutil.rmtree(path, ignore_errors=True)
+            with contextlib.suppress(GitError):
+                self.prune_worktrees()
+
+    def add_worktree(self, path: Path, branch: str, start_point: str) -> None:
+        """Create a linked worktree with branch checked out at start_point.
+
+        The branch is created, or reset if it exists.
+        """
+        self._run("worktree", "add", "--force", "-B", branch, str(path), start_point)
+
+    def prune_worktrees(self) -> None:
+        """Drop the administrative files of worktrees whose directory is gone."""
+        self._run("worktree", "prune")
+
+    def detach(self) -> None:
+        """Detach HEAD at its commit, freeing the branch for other worktrees."""
+        self._run("checkout", "--detach")
+
+    def reset_hard(self, branch: str, start_point: str) -> None:
+        """Check out branch reset to start_point, discarding local changes.
+
+        The branch may be checked out in another worktree.
+        """
+        self._run(
+            "checkout", "--force", "--ignore-other-worktrees", "-B", branch, start_point
+        )
+
+    def clean(self) -> None:
+        """Delete untracked files and directories from the working tree."""
+        self._run("clean", "-fd")
+
+    def gc_auto(self) -> None:
+        """Let git pack refs and objects if its thresholds are exceeded."""
+        self._run("gc", "--auto", "--quiet")
 
     def delete_branch(self, name: str) -> None:
         """Delete a local branch."""
         self._run("branch", "-D", name)
+
+
+class BaseBranchSync:
+    """Shared, rate-limited fetch of the base branch from origin.
+
+    pin() returns the commit of `origin/<base>`, fetching first if the last
+    fetch is older than the interval. The fetch runs under a lock, so
+    workers that ask at the same time wait for one fetch and get the same
+    commit instead of each pulling. If a fetch fails after an earlier one
+    succeeded, the previous commit is reused.
+    """
+
+    def __init__(self, git: GitOps, *, branch: str, interval_seconds: float) -> None:
+        """Initialize the sync.
+
+        Args:
+            git: GitOps for the repository to fetch into.
+            branch: The base branch to fetch.
+            interval_seconds: Minimum time between fetches (0 fetches on every
+                pin()).
+        """
+        self._git = git
+        self._branch = branch
+        self._interval = interval_seconds
+        self._sha: str | None = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    def pin(self, *, fresh: bool = False) -> str:
+        """Return the commit tasks should branch from.
+
+        Args:
+            fresh: Fetch even if the last fetch is recent, and never fall
+                back to an earlier commit.
+
+        Returns:
+            The full SHA of `origin/<base>` as of the latest fetch.
+
+        Raises:
+            GitError: If the base branch could not be fetched and no earlier
+                fetch succeeded (or fresh is set).
+        """
+        with self._lock:
+            now = time.monotonic()
+            if (
+                not fresh
+                and self._sha is not None
+                and now - self._fetched_at < self._interval
+            ):
+                return self._sha
+            try:
+                self._git.fetch(self._branch)
+                sha = self._git.rev_parse(f"refs/remotes/origin/{self._branch}")
+                if sha is None:
+                    raise GitError(f"origin/{self._branch} not found after fetch")
+            except GitError as e:
+                if self._sha is None or fresh:
+                    raise
+                logger.warning(
+                    "Fetching %s failed, reusing %s: %s", self._branch, self._sha, e
+                )
+                return self._sha
+            self._sha = sha
+            self._fetched_at = now
+            return sha
+
+
+@dataclass(frozen=True)
+class WorktreeInfo:
+    """One entry of `git worktree list`.
+
+    Attributes:
+        path: Root of the worktree's checkout.
+        head: Commit checked out.
+        branch: Branch checked out (None if detached).
+        prunable: True if git considers the worktree stale (e.g. its
+            directory is gone).
+    """
+
+    path: Path
+    head: str
+    branch: str | None
+    prunable: bool
+
+
+@dataclass
+class _PushRequest:
+    """A branch waiting to be pushed, and the outcome once it was."""
+
+    branch: str
+    done: threading.Event = field(default_factory=threading.Event)
+    error: str | None = None
+
+
+class PushBatcher:
+    """Coalesces concurrent branch pushes into one `git push`.
+
+    The first caller pushes its branch right away. Branches submitted while
+    that push is in flight queue up and go out together in a single push
+    with one refspec each, so N workers finishing at once cost two remote
+    round trips instead of N. push() returns once the caller's own branch
+    has been pushed, by whichever thread sent the batch.
+    """
+
+    def __init__(self, git: GitOps) -> None:
+        """Initialize the batcher.
+
+        Args:
+            git: GitOps for the repository holding the branches.
+        """
+        self._git = git
+        self._pending: list[_PushRequest] = []
+        self._flushing = False
+        self._lock = threading.Lock()
+
+    def push(self, branch: str) -> None:
+        """Push a branch to origin, batched with other concurrent pushes.
+
+        Args:
+            branch: Local branch name.
+
+        Raises:
+            GitError: If the branch was not pushed.
+        """
+        request = _PushRequest(branch)
+        with self._lock:
+            self._pending.append(request)
+            leader = not self._flushing
+            self._flushing = True
+        if leader:
+            self._flush()
+        request.done.wait()
+        if request.error is not None:
+            raise GitError(f"Failed to push {branch}: {request.error}")
+
+    def _flush(self) -> None:
+        """Push queued branches until the queue is empty."""
+        while True:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                if not batch:
+                    self._flushing = False
+                    return
+            branches = list(dict.fromkeys(r.branch for r in batch))
+            try:
+                failed = self._git.push_branches(branches)
+            except Exception as e:  # never leave the batch's waiters hanging
+                failed = dict.fromkeys(branches, str(e))
+            logger.info("Pushed %d branch(es) in one push", len(branches))
+            for request in batch:
+                request.error = failed.get(request.branch)
+                request.done.set()
+
+
+@dataclass(frozen=True)
+class Worktree:
+    """A pooled worktree leased to one task.
+
+    Attributes:
+        path: Root of the worktree's checkout.
+        branch: The task branch checked out in it.
+    """
+
+    path: Path
+    branch: str
+
+
+class WorktreePool:
+    """Reusable linked worktrees (`git worktree`) for running tasks.
+
+    acquire() hands out an idle worktree, switched to the task branch at the
+    start point with `checkout --force -B` and `clean`, so only the files
+    that differ from the previous task are rewritten; a new worktree is
+    added only when none is idle. release() detaches the worktree and keeps
+    it for the next task. Idle worktrees beyond `max_idle`, or unused for
+    `idle_seconds`, are removed. Existing worktrees under `root` (e.g. from
+    a previous daemon) are adopted on first use.
+
+    Thread-safe: daemon workers share one pool.
+    """
+
+    def __init__(
+        self, git: GitOps, *, root: Path, max_idle: int, idle_seconds: float
+    ) -> None:
+        """Initialize the pool.
+
+        Args:
+            git: GitOps for the main repository (used to add/remove worktrees).
+            root: Directory holding the pooled worktrees.
+            max_idle: Maximum number of idle worktrees kept warm.
+            idle_seconds: Idle worktrees unused for this long are removed.
+        """
+        self._git = git
+        self._root = root
+        self._max_idle = max_idle
+        self._idle_seconds = idle_seconds
+        # Idle worktree paths with the monotonic time they were released
+        self._idle: list[tuple[Path, float]] = []
+        self._leased: set[Path] = set()
+        self._adopted = False
+        self._lock = threading.Lock()
+
+    def acquire(self, branch: str, start_point: str) -> Worktree:
+        """Check out a task branch in a pooled worktree.
+
+        Args:
+            branch: Task branch to create (or reset) at start_point.
+            start_point: Commit-ish the branch starts from.
+
+        Returns:
+            The leased worktree.
+
+        Raises:
+            GitError: If no worktree could be prepared.
+        """
+        with self._lock:
+            self._adopt()
+            path = self._idle.pop()[0] if self._idle else None
+            if path is None:
+                path = self._root / f"wt-{uuid.uuid4().hex[:8]}"
+            self._leased.add(path)
+
+        try:
+            if path.exists():
+                try:
+                    self._recycle(path, branch, start_point)
+                    return Worktree(path=path, branch=branch)
+                except GitError as e:
+                    logger.warning("Discarding broken worktree %s: %s", path, e)
+                    self._remove(path)
+            self._root.mkdir(parents=True, exist_ok=True)
+            self._git.add_worktree(path, branch, start_point)
+            return Worktree(path=path, branch=branch)
+        except GitError:
+            with self._lock:
+                self._leased.discard(path)
+            raise
+
+    def release(self, worktree: Worktree) -> None:
+        """Return a worktree to the pool and collect expired idle ones.
+
+        The worktree is detached so its task branch can be checked out
+        elsewhere (e.g. by a retry in another worktree).
+
+        Args:
+            worktree: A worktree returned by acquire().
+        """
+        try:
+            self._worktree_git(worktree.path).detach()
+        except GitError as e:
+            logger.warning("Discarding worktree %s: %s", worktree.path, e)
+            with self._lock:
+                self._leased.discard(worktree.path)
+            self._remove(worktree.path)
+            return
+        with self._lock:
+            self._leased.discard(worktree.path)
+            self._idle.append((worktree.path, time.monotonic()))
+        self.gc()
+
+    def gc(self) -> int:
+        """Remove idle worktrees that expired or exceed max_idle.
+
+        Returns:
+            The number of worktrees removed.
+        """
+        now = time.monotonic()
+        with self._lock:
+            # Most recently used last; keep the warmest max_idle worktrees
+            self._idle.sort(key=lambda item: item[1])
+            keep_from = max(len(self._idle) - self._max_idle, 0)
+            victims = [
+                path
+                for i, (path, released) in enumerate(self._idle)
+                if i < keep_from or now - released > self._idle_seconds
+            ]
+            self._idle = [item for item in self._idle if item[0] not in victims]
+        for path in victims:
+            self._remove(path)
+        return len(victims)
+
+    @property
+    def idle(self) -> list[Path]:
+        """Paths of the idle worktrees, least recently used first."""
+        with self._lock:
+            return [path for path, _ in sorted(self._idle, key=lambda i: i[1])]
+
+    def _worktree_git(self, path: Path) -> GitOps:
+        """Return a GitOps for a pooled worktree.
+
+        Raises:
+            GitError: If the directory is no longer a linked worktree; git
+                would otherwise fall through to the enclosing repository.
+        """
+        if not (path / ".git").is_file():
+            raise GitError(f"{path} is not a git worktree")
+        return self._git.at(path)
+
+    def _recycle(self, path: Path, branch: str, start_point: str) -> None:
+        """Switch an idle worktree to a new task branch and clean it."""
+        worktree_git = self._worktree_git(path)
+        worktree_git.reset_hard(branch, start_point)
+        worktree_git.clean()
+
+    def _remove(self, path: Path) -> None:
+        """Delete a worktree and its administrative files."""
+        self._git.remove_worktree(path)
+
+    def _adopt(self) -> None:
+        """Pick up worktrees left under root by a previous process (locked)."""
+        if self._adopted:
+            return
+        self._adopted = True
+        if not self._root.is_dir():
+            return
+        with contextlib.suppress(GitError):
+            self._git.prune_worktrees()
+        try:
+            worktrees = self._git.worktrees()
+        except GitError:
+            return
+        root = self._root.resolve()
+        now = time.monotonic()
+        for worktree in worktrees:
+            if worktree.path.parent == root:
+                self._idle.append((self._root / worktree.path.name, now))
+
+
+class _CatFile:
+    """A lazily started, long-lived `git cat-file` process.
+
+    Queries are written one per line to stdin and answered in order on
+    stdout. Access is serialized with a lock so one instance can be shared
+    between threads. If the process dies it is restarted on the next query.
+    """
+
+    def __init__(self, repo_path: Path, mode: str) -> None:
+        self._repo_path = repo_path
+        self._mode = mode
+        self._proc: subprocess.Popen[bytes] | None = None
+        self._lock = threading.Lock()
+
+    def query(self, spec: str) -> str | None:
+        """Return the header line for an object, or None if it is missing."""
+        with self._lock:
+            header, _ = self._request(spec)
+            return header
+
+    def read(self, spec: str) -> bytes | None:
+        """Return an object's contents (--batch mode), or None if missing."""
+        with self._lock:
+            _, content = self._request(spec)
+            return content
+
+    def close(self) -> None:
+        """Stop the process (it exits when its stdin closes)."""
+        with self._lock:
+            self._stop()
+
+    def _request(self, spec: str) -> tuple[str | None, bytes | None]:
+        """Send one query and read its answer. Caller holds the lock."""
+        if "\n" in spec:
+            raise GitError(f"Invalid revision: {spec!r}")
+        stdin, stdout = self._pipes()
+        try:
+            stdin.write(spec.encode("utf-8") + b"\n")
+            stdin.flush()
+            header = stdout.readline().decode("utf-8").rstrip("\n")
+            if not header:
+                raise GitError(f"git cat-file {self._mode} exited unexpectedly")
+            if header.endswith((" missing", " ambiguous")):
+                return None, None
+            content = None
+            if self._mode == "--batch":
+                size = int(header.rsplit(" ", 1)[1])
+                # Content is followed by a single newline
+                content = stdout.read(size + 1)[:size]
+            return header, content
+        except OSError as e:
+            self._stop()
+            raise GitError(f"git cat-file {self._mode} failed: {e}") from e
+        except GitError:
+            self._stop()
+            raise
+
+    def _pipes(self) -> tuple[IO[bytes], IO[bytes]]:
+        """Return the process's stdin and stdout, starting it if needed."""
+        if self._proc is None:
+            try:
+                self._proc = subprocess.Popen(
+                    ["git", "cat-file", self._mode],
+                    cwd=self._repo_path,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                )
+            except OSError as e:
+                raise GitError(f"Failed to start git cat-file: {e}") from e
+        # Both pipes exist: the process was started with stdin/stdout=PIPE
+        return cast(IO[bytes], self._proc.stdin), cast(IO[bytes], self._proc.stdout)
+
+    def _stop(self) -> None:
+        """Close the process's pipes and reap it."""
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        for pipe in (proc.stdin, proc.stdout):
+            # A dead process can make flushing stdin fail; it is reaped anyway
+            with contextlib.suppress(OSError):
+                cast(IO[bytes], pipe).close()
+        proc.wait()
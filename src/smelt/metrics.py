@@ -0,0 +1,559 @@
+"""OpenMetrics / Prometheus metrics for the pipeline runner.
+
+PipelineMetrics turns the runner's structured run events into counters,
+gauges and histograms (stage durations, QA pass rates, LLM latency, tokens,
+cost and errors), plus a few direct measurements the events do not carry:
+task claim latency, worker utilization and queue depth by status.
+
+Metrics are exposed either through a local HTTP endpoint (MetricsServer) or
+by periodically writing a file for node_exporter's textfile collector
+(TextfileExporter). Both render the same registry.
+"""
+
+from __future__ import annotations
+
+import bisect
+import logging
+import os
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterator, Mapping, Sequence
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from smelt.db.models import Checkpoint, RunEvent, RunResult
+
+logger = logging.getLogger(__name__)
+
+OPENMETRICS_CONTENT_TYPE: str = (
+    "application/openmetrics-text; version=1.0.0; charset=utf-8"
+)
+PROMETHEUS_CONTENT_TYPE: str = "text/plain; version=0.0.4; charset=utf-8"
+
+# Pipeline timings range from milliseconds (store, git) to tens of minutes
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+    600.0,
+    1800.0,
+)
+
+_LabelValues = tuple[str, ...]
+QueueDepthSource = Callable[[], Mapping[str, int]]
+
+
+class _Metric(ABC):
+    """Base class: a named metric family with fixed label names."""
+
+    kind: str = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str]) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, label_values: Mapping[str, str]) -> _LabelValues:
+        """Check a sample's labels and order their values like self.labels."""
+        if set(label_values) != set(self.labels):
+            raise ValueError(
+                f"{self.name} expects labels {self.labels}, got {sorted(label_values)}"
+            )
+        return tuple(str(label_values[name]) for name in self.labels)
+
+    @abstractmethod
+    def samples(self, openmetrics: bool) -> Iterator[str]:
+        """Yield the rendered sample lines of this family."""
+        ...  # pragma: no cover
+
+    def _labels(self, values: _LabelValues, extra: str = "") -> str:
+        """Render label values, plus an extra rendered pair, as '{a="1",...}'."""
+        pairs = [
+            f'{name}="{_escape(value)}"'
+            for name, value in zip(self.labels, values, strict=True)
+        ]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter(_Metric):
+    """A monotonically increasing value per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()) -> None:
+        """Initialize the counter (name without the '_total' suffix)."""
+        super().__init__(name, help_text, labels)
+        self._values: dict[_LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Increase the counter for a label set."""
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        """Return the current value for a label set (0 if never incremented)."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self, openmetrics: bool) -> Iterator[str]:
+        """Yield one '_total' sample per label set."""
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}_total{self._labels(key)} {_format(value)}"
+
+
+class Gauge(_Metric):
+    """A value that can go up and down per label set."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()) -> None:
+        """Initialize the gauge."""
+        super().__init__(name, help_text, labels)
+        self._values: dict[_LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        """Set the gauge for a label set."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Add to the gauge for a label set (negative amounts decrease it)."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        """Return the current value for a label set (0 if never set)."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def replace_all(self, values: Mapping[_LabelValues, float]) -> None:
+        """Replace every label set at once (for values computed at scrape)."""
+        with self._lock:
+            self._values = dict(values)
+
+    def samples(self, openmetrics: bool) -> Iterator[str]:
+        """Yield one sample per label set."""
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{self._labels(key)} {_format(value)}"
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, per label set."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        """Initialize the histogram with sorted upper bounds (+Inf implied)."""
+        super().__init__(name, help_text, labels)
+        self._bounds = tuple(sorted(buckets))
+        # label set -> (per-bucket counts incl. +Inf, sum)
+        self._values: dict[_LabelValues, tuple[list[int], float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record one observation for a label set."""
+        key = self._key(labels)
+        index = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self._bounds) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels: str) -> int:
+        """Return the number of observations for a label set."""
+        with self._lock:
+            counts, _ = self._values.get(self._key(labels), ([0], 0.0))
+            return sum(counts)
+
+    def samples(self, openmetrics: bool) -> Iterator[str]:
+        """Yield cumulative '_bucket' samples, then '_count' and '_sum'."""
+        with self._lock:
+            items = sorted((k, (list(c), s)) for k, (c, s) in self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip((*self._bounds, None), counts, strict=True):
+                cumulative += count
+                le = "+Inf" if bound is None else _format(bound)
+                labels = self._labels(key, f'le="{le}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_count{self._labels(key)} {cumulative}"
+            yield f"{self.name}_sum{self._labels(key)} {_format(total)}"
+
+
+class MetricsRegistry:
+    """A set of metric families rendered together.
+
+    Collectors registered with add_collector() run just before every render,
+    for values that are cheaper to compute on demand (e.g. queue depth).
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty registry."""
+        self._metrics: list[_Metric] = []
+        self._collectors: list[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        """Create and register a counter."""
+        return self._register(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Gauge:
+        """Create and register a gauge."""
+        return self._register(Gauge(name, help_text, labels))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """Create and register a histogram."""
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Run `collector` before every render to refresh on-demand values."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self, *, openmetrics: bool = True) -> str:
+        """Render every metric family in the exposition format.
+
+        Args:
+            openmetrics: Render OpenMetrics 1.0 (True) or the Prometheus text
+                format 0.0.4 used by node_exporter's textfile collector.
+
+        Returns:
+            The exposition text.
+        """
+        with self._lock:
+            collectors = list(self._collectors)
+            metrics = list(self._metrics)
+        for collector in collectors:
+            try:
+                collector()
+            except Exception:
+                # A failing collector must not break the whole scrape
+                logger.exception("Metrics collector failed")
+
+        lines: list[str] = []
+        for metric in metrics:
+            # OpenMetrics names the counter family without '_total';
+            # the Prometheus text format names it after the sample
+            family = (
+                f"{metric.name}_total"
+                if metric.kind == "counter" and not openmetrics
+                else metric.name
+            )
+            lines.append(f"# HELP {family} {metric.help_text}")
+            lines.append(f"# TYPE {family} {metric.kind}")
+            lines.extend(metric.samples(openmetrics))
+        if openmetrics:
+            lines.append("# EOF")
+        return "".join(f"{line}\n" for line in lines)
+
+    def _register[M: _Metric](self, metric: M) -> M:
+        with self._lock:
+            if any(m.name == metric.name for m in self._metrics):
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics.append(metric)
+        return metric
+
+
+class PipelineMetrics:
+    """The pipeline's metric families, fed by runner events and hooks.
+
+    Pass `observe` as a run event sink; call observe_claim() and busy()
+    from the runner, and watch_queue() once to expose queue depth.
+    """
+
+    def __init__(self, registry: MetricsRegistry | None = None) -> None:
+        """Create the pipeline metric families in a registry.
+
+        Args:
+            registry: Registry to register into (a new one if None).
+        """
+        self.registry = registry or MetricsRegistry()
+        r = self.registry
+        self.tasks = r.gauge(
+            "smelt_tasks", "Tasks in the roadmap by status.", ["status"]
+        )
+        self.claim_seconds = r.histogram(
+            "smelt_task_claim_seconds", "Time to claim the next ready task."
+        )
+        self.claims = r.counter(
+            "smelt_task_claims", "Task claim attempts by result.", ["result"]
+        )
+        self.workers = r.gauge("smelt_workers", "Configured pipeline workers.")
+        self.workers_busy = r.gauge(
+            "smelt_workers_busy", "Workers currently executing a task."
+        )
+        self.runs = r.counter("smelt_runs", "Finished pipeline runs.", ["outcome"])
+        self.run_seconds = r.histogram(
+            "smelt_run_duration_seconds", "Wall time of whole pipeline runs."
+        )
+        self.stage_seconds = r.histogram(
+            "smelt_stage_duration_seconds", "Wall time of pipeline stages.", ["stage"]
+        )
+        self.stage_runs = r.counter(
+            "smelt_stage_runs", "Finished stages by outcome.", ["stage", "outcome"]
+        )
+        self.qa_checks = r.counter(
+            "smelt_qa_checks", "QA tool runs by tool and outcome.", ["tool", "outcome"]
+        )
+        self.llm_seconds = r.histogram(
+            "smelt_llm_request_duration_seconds", "LLM call latency.", ["model"]
+        )
+        self.llm_tokens = r.counter(
+            "smelt_llm_tokens", "LLM tokens by model and kind.", ["model", "kind"]
+        )
+        self.llm_cost = r.counter(
+            "smelt_llm_cost_usd", "Estimated LLM cost in USD.", ["model"]
+        )
+        self.llm_errors = r.counter(
+            "smelt_llm_errors", "Stages whose LLM call failed.", ["model", "stage"]
+        )
+
+    def observe(self, item: RunEvent | RunResult | Checkpoint) -> None:
+        """Update metrics from one run event (a RunRecorder sink).
+
+        Args:
+            item: A run event, checkpoint or the final run result (only
+                events are used; 'run_finished' carries the outcome).
+        """
+        if not isinstance(item, RunEvent):
+            return
+        if item.event == "llm_call" and item.model:
+            self._observe_llm_call(item)
+        elif item.event == "stage_finished" and item.stage:
+            self._observe_stage(item)
+        elif item.event == "run_finished":
+            self.runs.inc(outcome=_outcome(item.passed))
+            self.run_seconds.observe(item.duration_seconds or 0.0)
+
+    def observe_claim(self, seconds: float, *, claimed: bool) -> None:
+        """Record one attempt to claim the next task.
+
+        Args:
+            seconds: How long the claim query took.
+            claimed: Whether a task was claimed (False: the queue was empty).
+        """
+        self.claim_seconds.observe(seconds)
+        self.claims.inc(result="claimed" if claimed else "empty")
+
+    @contextmanager
+    def busy(self) -> Iterator[None]:
+        """Count a worker as busy for the duration of the block."""
+        self.workers_busy.inc()
+        try:
+            yield
+        finally:
+            self.workers_busy.inc(-1)
+
+    def watch_queue(self, source: QueueDepthSource) -> None:
+        """Refresh the task-count gauge from `source` at every render.
+
+        Args:
+            source: Returns the number of tasks per status. It is called
+                from the exporter's thread, so it must not share a SQLite
+                connection with the runner.
+        """
+
+        def collect() -> None:
+            counts = source()
+            self.tasks.replace_all({(status,): n for status, n in counts.items()})
+
+        self.registry.add_collector(collect)
+
+    def _observe_stage(self, event: RunEvent) -> None:
+        stage = event.stage or ""
+        self.stage_seconds.observe(event.duration_seconds or 0.0, stage=stage)
+        self.stage_runs.inc(stage=stage, outcome=_outcome(event.passed))
+        if stage == "qa":
+            for tool, code in (event.exit_codes or {}).items():
+                self.qa_checks.inc(tool=tool, outcome=_outcome(code == 0))
+        if event.model and event.message and event.passed is False:
+            # The stage raised while its LLM call was in flight
+            self.llm_errors.inc(model=event.model, stage=stage)
+
+    def _observe_llm_call(self, event: RunEvent) -> None:
+        model = event.model or ""
+        self.llm_seconds.observe(event.duration_seconds or 0.0, model=model)
+        for kind, tokens in (
+            ("prompt", event.input_tokens),
+            ("completion", event.output_tokens),
+        ):
+            self.llm_tokens.inc(tokens or 0, model=model, kind=kind)
+        self.llm_cost.inc(event.cost_usd or 0.0, model=model)
+
+
+class TextfileExporter:
+    """Periodically writes the registry for node_exporter's textfile collector.
+
+    Each write goes to a temp file in the same directory and is renamed into
+    place, so the collector never reads a partial file.
+    """
+
+    def __init__(
+        self, registry: MetricsRegistry, path: Path, *, interval_seconds: float
+    ) -> None:
+        """Initialize the exporter.
+
+        Args:
+            registry: The metrics to export.
+            path: Output file (should end in .prom for node_exporter).
+            interval_seconds: Seconds between background writes.
+        """
+        self._registry = registry
+        self._path = path
+        self._interval = interval_seconds
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def write(self) -> None:
+        """Render the registry and atomically replace the output file."""
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self._path.parent, prefix=".smelt-metrics-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self._registry.render(openmetrics=False))
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, self._path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def start(self) -> None:
+        """Start writing every interval in a background thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._loop, name="smelt-metrics-textfile", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread and write one final snapshot."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.write()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self._interval):
+            try:
+                self.write()
+            except OSError:
+                logger.exception("Failed to write metrics to %s", self._path)
+
+
+class MetricsServer:
+    """Serves the registry over HTTP at /metrics from a background thread."""
+
+    def __init__(self, registry: MetricsRegistry, *, host: str, port: int) -> None:
+        """Bind the server (port 0 picks a free port; see `port`).
+
+        Args:
+            registry: The metrics to serve.
+            host: Interface to bind (keep it local unless scraped remotely).
+            port: TCP port to listen on.
+        """
+        handler = _make_handler(registry)
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def port(self) -> int:
+        """The port the server is bound to."""
+        return int(self._server.server_address[1])
+
+    def start(self) -> None:
+        """Start serving in a background thread."""
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="smelt-metrics-http", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop serving (if started) and release the port."""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+
+def _make_handler(registry: MetricsRegistry) -> type[BaseHTTPRequestHandler]:
+    """Build a request handler class bound to a registry."""
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            # Prometheus asks for OpenMetrics via Accept; default to 0.0.4
+            openmetrics = "application/openmetrics-text" in self.headers.get(
+                "Accept", ""
+            )
+            body = registry.render(openmetrics=openmetrics).encode("utf-8")
+            self.send_response(200)
+            self.send_header(
+                "Content-Type",
+                OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE,
+            )
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: object) -> None:
+            logger.debug("metrics: " + format, *args)
+
+    return _Handler
+
+
+def _outcome(passed: bool | None) -> str:
+    return "passed" if passed else "failed"
+
+
+def _format(value: float) -> str:
+    """Format a sample value: integers without a decimal point."""
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the exposition formats."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
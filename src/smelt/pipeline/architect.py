@@ -94,7 +94,7 @@ class ArchitectStage(Stage):
             feedback_section=feedback_section,
         )
 
-        plan = self._llm.complete(
+        response = self._llm.complete(
             model=self._models.architect,
             system_prompt=_ARCHITECT_SYSTEM_PROMPT,
             user_prompt=user_prompt,
@@ -102,6 +102,7 @@ class ArchitectStage(Stage):
 
         return StageOutput(
             passed=True,
-            output=plan,
+            output=response.content,
             escalate_to=None,
+            usage=(response.usage,),
         )
@@ -0,0 +1,104 @@
+"""Per-task coding budgets: the Coder's timeout and retries for one task.
+
+`coding.timeout_seconds` and `coding.max_retries` are the budget of a task of
+middle complexity (5 of 1-10). With `coding.adaptive_budgets`, a task's own
+budget is derived from its complexity and from recent runs of tasks with the
+same complexity:
+
+- The complexity sets the baseline: the configured timeout scaled by
+  complexity, and one retry fewer for simple tasks, one more for hard ones.
+  This is how simple tasks fail fast.
+- History can only raise it: with enough runs, passed or failed, the timeout
+  grows to the slowest typical attempt (95th percentile of run duration per
+  Coder attempt) plus headroom, and the retries to the retries those runs
+  typically used, i.e. their Coder attempts after the first (at most one
+  over the configured maximum). Runs that timed
+  out or ran out of retries pull the budget up, and a budget that was too
+  small can never hold itself down.
+
+The timeout is clamped to [min_timeout_seconds, max_timeout_seconds].
+
+Tasks without a complexity estimate keep the configured budget.
+"""
+
+from __future__ import annotations
+
+import math
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+from smelt.config import CodingConfig
+from smelt.db.models import RunRecord
+
+# Complexity the configured timeout and retries are meant for
+_REFERENCE_COMPLEXITY: int = 5
+# At or below this complexity a task gets one retry fewer, at or above
+# _HARD_COMPLEXITY one more
+_SIMPLE_COMPLEXITY: int = 3
+_HARD_COMPLEXITY: int = 8
+# Runs of similar tasks needed before history may raise the budget
+_MIN_HISTORY_RUNS: int = 5
+# Headroom on the historical per-attempt duration
+_HISTORY_HEADROOM: float = 1.5
+
+
+@dataclass(frozen=True)
+class CodingBudget:
+    """Timeout and retries granted to the Coder for one task.
+
+    Attributes:
+        timeout_seconds: Limit on each Coder session.
+        max_retries: Times QA, review or QC may send the task back to the Coder.
+        basis: What the budget was derived from ('config', 'complexity' or
+            'history'), for the run's events.
+    """
+
+    timeout_seconds: int
+    max_retries: int
+    basis: str
+
+
+def coding_budget(
+    config: CodingConfig, complexity: int | None, history: Sequence[RunRecord]
+) -> CodingBudget:
+    """Derive a task's coding budget from its complexity and similar runs.
+
+    Args:
+        config: Coding configuration with the reference budget and limits.
+        complexity: The task's complexity estimate (1-10), or None.
+        history: Recent runs (passed or failed) of tasks with the same
+            complexity.
+
+    Returns:
+        The budget for the task's Coder stage.
+    """
+    if not config.adaptive_budgets or complexity is None:
+        return CodingBudget(config.timeout_seconds, config.max_retries, "config")
+
+    retries = config.max_retries
+    if complexity <= _SIMPLE_COMPLEXITY:
+        retries = max(retries - 1, 0)
+    elif complexity >= _HARD_COMPLEXITY:
+        retries += 1
+    timeout = config.timeout_seconds * complexity / _REFERENCE_COMPLEXITY
+    basis = "complexity"
+
+    runs = [run for run in history if run.attempts > 0]
+    if len(runs) >= _MIN_HISTORY_RUNS:
+        per_attempt = sorted(run.duration_seconds / run.attempts for run in runs)
+        # The first Coder attempt is not a retry
+        used_retries = sorted(max(run.attempts - 1, 0) for run in runs)
+        seen_timeout = _percentile(per_attempt, 0.95) * _HISTORY_HEADROOM
+        seen_retries = min(int(_percentile(used_retries, 0.95)), config.max_retries + 1)
+        if seen_timeout > timeout or seen_retries > retries:
+            timeout = max(timeout, seen_timeout)
+            retries = max(retries, seen_retries)
+            basis = "history"
+
+    timeout = min(max(timeout, config.min_timeout_seconds), config.max_timeout_seconds)
+    return CodingBudget(math.ceil(timeout), retries, basis)
+
+
+def _percentile(values: Sequence[float], p: float) -> float:
+    """Nearest-rank percentile of sorted, non-empty values."""
+    return values[max(math.ceil(p * len(values)), 1) - 1]
@@ -2,14 +2,22 @@
 
 The coder invokes a CodingAgent (e.g. Goose) with full file access. It
 receives the architect plan and any failure feedback from a prior QA run.
+When the agent supports resumable sessions, retries continue the previous
+session and send only the QA failure instead of the full prompt.
 """
 
 from __future__ import annotations
 
-from smelt.agents.protocols import CodingAgent
+import logging
+
+from smelt.agents.protocols import CodingAgent, ResumableCodingAgent
 from smelt.config import CodingConfig
+from smelt.db.models import AgentResult
+from smelt.exceptions import AgentAbortedError, AgentError, AgentTimeoutError
 from smelt.pipeline.stages import Stage, StageInput, StageOutput
 
+logger = logging.getLogger(__name__)
+
 _CODER_PROMPT_TEMPLATE: str = """\
 ## Task
 {task_description}
@@ -33,6 +41,16 @@ _FAILURE_SECTION_TEMPLATE: str = """\
 
 """
 
+_RETRY_PROMPT_TEMPLATE: str = """\
+## QA Failure — Fix These Issues
+{failure}
+
+## Instructions
+Your previous changes did not pass QA. The task, plan and repository context
+are earlier in this session. Fix the issues above without undoing work that
+already passes. When done, signal completion by stopping.
+"""
+
 
 class CoderStage(Stage):
     """Writes code via a coding agent following the architect's plan.
@@ -40,6 +58,9 @@ class CoderStage(Stage):
     The stage is agnostic to the underlying coding agent — it depends on
     the CodingAgent protocol only. Swapping Goose for another agent requires
     no changes here.
+
+    A stage instance serves one task: it remembers the agent session of the
+    previous attempt so retries can resume it.
     """
 
     def __init__(
@@ -59,6 +80,7 @@ class CoderStage(Stage):
         self._agent = agent
         self._config = config
         self._working_dir = working_dir
+        self._session_id: str | None = None
 
     @property
     def name(self) -> str:
@@ -74,6 +96,61 @@ class CoderStage(Stage):
         Returns:
             StageOutput with the agent's output and pass/fail status.
         """
+        result = self._resume(stage_input) or self._run_fresh(stage_input)
+        self._session_id = result.session_id
+
+        return StageOutput(
+            passed=result.success,
+            output=result.output,
+            escalate_to=None,
+            session_id=result.session_id,
+        )
+
+    def _resume(self, stage_input: StageInput) -> AgentResult | None:
+        """Continue the previous session with only the QA failure, if possible.
+
+        Args:
+            stage_input: Pipeline stage input carrying the last failure.
+
+        Returns:
+            The resumed session's result, or None when resuming is not
+            applicable (first attempt, disabled, unsupported agent) or the
+            session could not be resumed.
+        """
+        if (
+            not stage_input.last_failure
+            or self._session_id is None
+            or not self._config.resume_sessions
+            or not isinstance(self._agent, ResumableCodingAgent)
+        ):
+            return None
+
+        try:
+            return self._agent.resume_session(
+                session_id=self._session_id,
+                prompt=_RETRY_PROMPT_TEMPLATE.format(failure=stage_input.last_failure),
+                working_dir=self._working_dir,
+                timeout_seconds=self._config.timeout_seconds,
+            )
+        except (AgentTimeoutError, AgentAbortedError):
+            raise
+        except AgentError as e:
+            logger.warning(
+                "Could not resume agent session %s, starting a new one: %s",
+                self._session_id,
+                e,
+            )
+            return None
+
+    def _run_fresh(self, stage_input: StageInput) -> AgentResult:
+        """Start a new agent session with the full prompt.
+
+        Args:
+            stage_input: Pipeline stage input with task, plan, and prior failures.
+
+        Returns:
+            The agent session result.
+        """
         failure_section = ""
         if stage_input.last_failure:
             failure_section = _FAILURE_SECTION_TEMPLATE.format(
@@ -87,15 +164,9 @@ class CoderStage(Stage):
             failure_section=failure_section,
         )
 
-        result = self._agent.run_session(
+        return self._agent.run_session(
             prompt=prompt,
             working_dir=self._working_dir,
             timeout_seconds=self._config.timeout_seconds,
             read_only=False,
         )
-
-        return StageOutput(
-            passed=result.success,
-            output=result.output,
-            escalate_to=None,
-        )
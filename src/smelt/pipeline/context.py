@@ -9,6 +9,7 @@ from __future__ import annotations
 
 import contextlib
 import os
+import threading
 from pathlib import Path
 
 from smelt.config import ContextConfig
@@ -69,6 +70,9 @@ _SUPPORTED_EXTENSIONS: frozenset[str] = frozenset(
     }
 )
 
+# Cached signatures per absolute file path: (mtime_ns, size, signatures)
+_SignatureCache = dict[Path, tuple[int, int, list[str]]]
+
 
 class RepoContextBuilder:
     """Builds a token-budgeted repository context snapshot.
@@ -76,6 +80,10 @@ class RepoContextBuilder:
     Uses tree-sitter to extract function/class signatures from source files.
     Falls back to a simple regex-style scan when tree-sitter grammars are
     not available for a particular language.
+
+    Extracted signatures are cached per file (keyed on mtime and size), so a
+    long-lived builder only re-parses files that changed between builds.
+    The builder is safe to share between worker threads.
     """
 
     def __init__(self, *, config: ContextConfig) -> None:
@@ -85,6 +93,8 @@ class RepoContextBuilder:
             config: Context configuration controlling the token budget.
         """
         self._config = config
+        self._signature_cache: _SignatureCache = {}
+        self._lock = threading.Lock()
 
     def build(self, repo_path: Path) -> RepoContext:
         """Scan the repository and build a context snapshot.
@@ -97,7 +107,8 @@ class RepoContextBuilder:
         """
         file_tree = _build_file_tree(repo_path)
         config_files = _read_config_files(repo_path)
-        signatures = _extract_signatures(repo_path)
+        with self._lock:
+            signatures = _extract_signatures(repo_path, self._signature_cache)
         token_count = (len(file_tree) + len(signatures)) // 4
 
         return RepoContext(
@@ -183,7 +194,7 @@ def _read_config_files(repo_path: Path) -> dict[str, str]:
     return result
 
 
-def _extract_signatures(repo_path: Path) -> str:
+def _extract_signatures(repo_path: Path, cache: _SignatureCache | None = None) -> str:
     """Extract function and class signatures from all source files.
 
     Attempts tree-sitter parsing first; falls back to simple line scanning
@@ -191,11 +202,15 @@ def _extract_signatures(repo_path: Path) -> str:
 
     Args:
         repo_path: Repository root.
+        cache: Optional per-file signature cache. Files whose mtime and size
+            are unchanged reuse their cached signatures; entries for files
+            under repo_path that no longer exist are evicted.
 
     Returns:
         Multi-line string with one signature per line, prefixed by file path.
     """
     lines: list[str] = []
+    seen: set[Path] = set()
 
     for root, dirs, files in os.walk(repo_path):
         root_path = Path(root)
@@ -208,14 +223,48 @@ def _extract_signatures(repo_path: Path) -> str:
                 continue
 
             rel_path = file_path.relative_to(repo_path)
-            sigs = _extract_from_file(file_path, ext)
+            if cache is None:
+                sigs = _extract_from_file(file_path, ext)
+            else:
+                seen.add(file_path)
+                sigs = _cached_extract(file_path, ext, cache)
             if sigs:
                 lines.append(f"\n# {rel_path}")
                 lines.extend(sigs)
 
+    if cache is not None:
+        stale = [p for p in cache if p.is_relative_to(repo_path) and p not in seen]
+        for path in stale:
+            del cache[path]
+
     return "\n".join(lines)
 
 
+def _cached_extract(file_path: Path, ext: str, cache: _SignatureCache) -> list[str]:
+    """Extract signatures from a file, reusing cached results when unchanged.
+
+    Args:
+        file_path: Absolute path to the source file.
+        ext: File extension (e.g. '.py').
+        cache: Signature cache to consult and update.
+
+    Returns:
+        List of signature strings.
+    """
+    try:
+        stat = file_path.stat()
+    except OSError:  # pragma: no cover
+        return []
+
+    cached = cache.get(file_path)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+
+    sigs = _extract_from_file(file_path, ext)
+    cache[file_path] = (stat.st_mtime_ns, stat.st_size, sigs)
+    return sigs
+
+
 def _extract_from_file(file_path: Path, ext: str) -> list[str]:
     """Extract signatures from a single source file.
 
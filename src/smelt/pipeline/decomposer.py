@@ -0,0 +1,263 @@
+"""Decomposer stage: LLM-based splitting of large tasks into sub-tasks.
+
+The Decomposer receives a task description, external context and repository
+context, and asks the decomposer model for a JSON list of sub-tasks with
+complexity estimates and `depends_on` edges. The response is validated and
+topologically sorted before anything is stored, so a cyclic or dangling
+dependency graph is rejected as a whole.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass
+from graphlib import CycleError, TopologicalSorter
+
+from smelt.agents.protocols import LLMClient
+from smelt.config import ModelsConfig
+from smelt.db.models import LLMUsage, SubTask
+from smelt.exceptions import CircularDependencyError, DecompositionError
+from smelt.pipeline.stages import Stage, StageInput, StageOutput
+
+_DECOMPOSER_SYSTEM_PROMPT: str = """\
+You are an expert technical lead splitting a development task into sub-tasks.
+
+You will be given:
+- The task description
+- External context (API specs, design docs, requirements)
+- Repository context (file tree, key configs, code signatures)
+
+Split the task into the smallest set of sub-tasks that can each be implemented,
+tested and reviewed as one pull request. Prefer independent sub-tasks: only
+add a dependency when a sub-task cannot start before another one is merged.
+If the task is already small enough, return it as a single sub-task.
+
+Respond with JSON only, in exactly this shape:
+{"subtasks": [{"id": "short-key", "description": "...", "complexity": 3,
+"depends_on": ["other-key"]}]}
+
+- id: a short key, unique within your answer
+- description: specific and actionable, naming the files or modules involved
+- complexity: an integer from 1 (trivial) to 10 (very hard)
+- depends_on: ids of sub-tasks in your answer that must be merged first
+"""
+
+_DECOMPOSER_USER_TEMPLATE: str = """\
+## Task
+{task_description}
+
+## External Context
+{task_context}
+
+## Repository Context
+{repo_context}"""
+
+_MIN_COMPLEXITY: int = 1
+_MAX_COMPLEXITY: int = 10
+_CODE_FENCE = re.compile(r"^```(?:json)?\s*\n(.*)\n```$", re.DOTALL)
+
+
+@dataclass(frozen=True)
+class Decomposition:
+    """Validated result of one Decomposer call.
+
+    Attributes:
+        subtasks: Sub-tasks in topological order (dependencies first).
+        usage: Usage of the LLM call.
+    """
+
+    subtasks: tuple[SubTask, ...]
+    usage: LLMUsage
+
+    @property
+    def atomic(self) -> bool:
+        """True if the task was not split."""
+        return len(self.subtasks) == 1
+
+
+class DecomposerStage(Stage):
+    """Splits a task into dependent sub-tasks using a direct LLM call.
+
+    Runs once per task, outside the per-run pipeline. The output of
+    `execute` is the validated sub-task list as JSON.
+    """
+
+    def __init__(self, *, llm: LLMClient, models: ModelsConfig) -> None:
+        """Initialize the Decomposer stage.
+
+        Args:
+            llm: LLM client satisfying the LLMClient protocol.
+            models: Model configuration specifying which model to use.
+        """
+        self._llm = llm
+        self._models = models
+
+    @property
+    def name(self) -> str:
+        """Human-readable stage name."""
+        return "decomposer"
+
+    def decompose(self, stage_input: StageInput) -> Decomposition:
+        """Ask the decomposer model for sub-tasks and validate them.
+
+        Args:
+            stage_input: Pipeline stage input with task description and context.
+
+        Returns:
+            The sub-tasks in topological order, with the call's usage.
+
+        Raises:
+            DecompositionError: If the response is not a valid sub-task list.
+            CircularDependencyError: If the sub-task dependencies form a cycle.
+        """
+        user_prompt = _DECOMPOSER_USER_TEMPLATE.format(
+            task_description=stage_input.task_description,
+            task_context=stage_input.task_context or "None provided.",
+            repo_context=stage_input.repo_context,
+        )
+        response = self._llm.complete(
+            model=self._models.decomposer,
+            system_prompt=_DECOMPOSER_SYSTEM_PROMPT,
+            user_prompt=user_prompt,
+        )
+        subtasks = topological_order(parse_subtasks(response.content))
+        return Decomposition(subtasks=subtasks, usage=response.usage)
+
+    def execute(self, stage_input: StageInput) -> StageOutput:
+        """Decompose the task.
+
+        Args:
+            stage_input: Pipeline stage input with task description and context.
+
+        Returns:
+            StageOutput with passed=True and the ordered sub-tasks as JSON.
+
+        Raises:
+            DecompositionError: If the response is not a valid sub-task list.
+            CircularDependencyError: If the sub-task dependencies form a cycle.
+        """
+        result = self.decompose(stage_input)
+        output = json.dumps(
+            {
+                "subtasks": [
+                    {
+                        "id": sub.key,
+                        "description": sub.description,
+                        "complexity": sub.complexity,
+                        "depends_on": list(sub.depends_on),
+                    }
+                    for sub in result.subtasks
+                ]
+            },
+            indent=2,
+        )
+        return StageOutput(
+            passed=True, output=output, escalate_to=None, usage=(result.usage,)
+        )
+
+
+def parse_subtasks(text: str) -> tuple[SubTask, ...]:
+    """Parse and validate the Decomposer's JSON response.
+
+    Args:
+        text: The model's response, optionally wrapped in a ```json fence.
+
+    Returns:
+        The sub-tasks in the order the model listed them.
+
+    Raises:
+        DecompositionError: If the JSON is malformed, a field is missing or
+            has the wrong type, an id is repeated, or a `depends_on` entry
+            names an unknown sub-task.
+    """
+    text = text.strip()
+    fenced = _CODE_FENCE.match(text)
+    if fenced:
+        text = fenced.group(1)
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise DecompositionError(f"Decomposer returned invalid JSON: {e}") from e
+
+    items = data.get("subtasks") if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise DecompositionError("Decomposer response has no 'subtasks' list")
+
+    subtasks = [_parse_subtask(item, index) for index, item in enumerate(items)]
+    keys = [sub.key for sub in subtasks]
+    for sub in subtasks:
+        if keys.count(sub.key) > 1:
+            raise DecompositionError(f"Duplicate sub-task id '{sub.key}'")
+        for dep in sub.depends_on:
+            if dep not in keys:
+                raise DecompositionError(
+                    f"Sub-task '{sub.key}' depends on unknown sub-task '{dep}'"
+                )
+    return tuple(subtasks)
+
+
+def topological_order(subtasks: tuple[SubTask, ...]) -> tuple[SubTask, ...]:
+    """Order sub-tasks so that every sub-task follows its dependencies.
+
+    Sub-tasks are emitted in waves of tasks whose dependencies are all
+    satisfied, keeping the model's order within a wave.
+
+    Args:
+        subtasks: Sub-tasks whose `depends_on` keys all exist.
+
+    Returns:
+        The same sub-tasks, dependencies first.
+
+    Raises:
+        CircularDependencyError: If the dependencies form a cycle.
+    """
+    by_key = {sub.key: sub for sub in subtasks}
+    position = {key: index for index, key in enumerate(by_key)}
+    sorter = TopologicalSorter({sub.key: sub.depends_on for sub in subtasks})
+    try:
+        sorter.prepare()
+    except CycleError as e:
+        cycle = ", ".join(sorted(set(e.args[1]), key=position.__getitem__))
+        raise CircularDependencyError(
+            f"Sub-task dependencies form a cycle among: {cycle}"
+        ) from e
+    ordered: list[SubTask] = []
+    while sorter.is_active():
+        wave = sorted(sorter.get_ready(), key=position.__getitem__)
+        ordered.extend(by_key[key] for key in wave)
+        sorter.done(*wave)
+    return tuple(ordered)
+
+
+def _parse_subtask(item: object, index: int) -> SubTask:
+    """Validate one entry of the 'subtasks' list."""
+    if not isinstance(item, dict):
+        raise DecompositionError(f"Sub-task {index} is not an object")
+    key = item.get("id")
+    description = item.get("description")
+    complexity = item.get("complexity")
+    depends_on = item.get("depends_on", [])
+    if not isinstance(key, str) or not key.strip():
+        raise DecompositionError(f"Sub-task {index} has no 'id'")
+    if not isinstance(description, str) or not description.strip():
+        raise DecompositionError(f"Sub-task '{key}' has no 'description'")
+    if (
+        not isinstance(complexity, int)
+        or isinstance(complexity, bool)
+        or not _MIN_COMPLEXITY <= complexity <= _MAX_COMPLEXITY
+    ):
+        raise DecompositionError(
+            f"Sub-task '{key}' complexity must be an integer from "
+            f"{_MIN_COMPLEXITY} to {_MAX_COMPLEXITY}"
+        )
+    if not isinstance(depends_on, list) or not all(
+        isinstance(dep, str) for dep in depends_on
+    ):
+        raise DecompositionError(f"Sub-task '{key}' depends_on must be a list of ids")
+    return SubTask(
+        key=key,
+        description=description.strip(),
+        complexity=complexity,
+        depends_on=tuple(dict.fromkeys(depends_on)),
+    )
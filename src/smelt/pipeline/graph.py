@@ -0,0 +1,347 @@
+"""Declarative stage graph: the order of stages and where failures go.
+
+A StageGraph is a sequence of steps. Each step holds one or more stages that
+do not depend on each other; a step with several stages runs them
+concurrently. When every stage of a step passes, the graph moves on to the
+next step. When a stage fails, its StageOutput.escalate_to picks one of its
+Routes, which sends the run back to an earlier stage with the failure as
+that stage's `last_failure`.
+
+Retry limits live on the graph, not in the stages:
+
+- Node.retries caps how often routes may send the run back to a stage (the
+  Coder's retries). A stage with retries starts a retry loop: stages after
+  it record its run count as their attempt number.
+- Route.budget caps how often one route may be taken. An exhausted route
+  either fails the run or, with on_exhausted='skip', stops its source stage
+  from running at all (the reviewer leaving the decision to QA).
+
+Going back to a stage resets the counters of every later stage and of every
+route into a later stage, so a re-plan gives the Coder its retries back.
+
+After every step the graph reports its Progress (next step, counters,
+pending feedback); a run given that Progress carries on from there.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections import Counter
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+
+from smelt.events import RunRecorder
+from smelt.pipeline.stages import Stage, StageInput, StageOutput
+
+logger = logging.getLogger(__name__)
+
+# Name prefix of the helper threads that run a step's stages side by side
+STAGE_THREAD_PREFIX: str = "smelt-stage"
+
+
+@dataclass(frozen=True)
+class Node:
+    """A stage in the graph.
+
+    Attributes:
+        stage: The stage to run.
+        model: Model recorded on the stage's events, for LLM stages.
+        retries: How many times routes may send the run back to this stage,
+            or None for no limit beyond the route budgets.
+        then: Derives the input of later stages from the current input and
+            this stage's output once its step passes (e.g. store the plan).
+    """
+
+    stage: Stage
+    model: str | None = None
+    retries: int | None = None
+    then: Callable[[StageInput, StageOutput], StageInput] | None = None
+
+    @property
+    def name(self) -> str:
+        """The stage's name, which routes refer to."""
+        return self.stage.name
+
+
+@dataclass(frozen=True)
+class Route:
+    """Where a failure of one stage sends the run.
+
+    Attributes:
+        source: Name of the failing stage.
+        target: Name of an earlier stage to run again.
+        budget: How many times the route may be taken, or None for no limit.
+        on_exhausted: 'fail' to fail the run once the budget is used up, or
+            'skip' to stop running the source stage instead.
+        feedback: Heading put above the failure output in the target's
+            last_failure (None passes the output as is).
+    """
+
+    source: str
+    target: str
+    budget: int | None = None
+    on_exhausted: str = "fail"
+    feedback: str | None = None
+
+
+@dataclass(frozen=True)
+class Progress:
+    """A graph run between two steps, with everything needed to resume it.
+
+    Attributes:
+        step: Index of the next step to run (the number of steps once the
+            last one passed).
+        state: Input carried to the next step (plan, diff).
+        runs: Runs of each stage since its counter was last reset.
+        routes: Times each route was taken, in the graph's route order.
+        feedback: Failure output waiting for stages of the next step.
+        attempt: The next step's attempt number, if it is in a retry loop.
+    """
+
+    step: int
+    state: StageInput
+    runs: dict[str, int]
+    routes: tuple[int, ...]
+    feedback: dict[str, str]
+    attempt: int | None
+
+
+@dataclass(frozen=True)
+class GraphResult:
+    """Outcome of running a StageGraph.
+
+    Attributes:
+        passed: True if every step passed.
+        stage: The stage whose failure ended the run, or the last stage run.
+        attempt: The stage's attempt number, if it is in a retry loop.
+    """
+
+    passed: bool
+    stage: str
+    attempt: int | None
+
+
+class StageGraph:
+    """Runs stages step by step and routes failures back along Routes."""
+
+    def __init__(
+        self, steps: Sequence[Sequence[Node]], routes: Sequence[Route]
+    ) -> None:
+        """Initialize and validate the graph.
+
+        Args:
+            steps: Steps in order; the stages of one step run concurrently.
+            routes: Failure routes. A stage's first route is its default, used
+                when its output does not escalate to another route's target.
+
+        Raises:
+            ValueError: If a stage name repeats, a route names an unknown
+                stage or does not lead back to an earlier step, or a route's
+                on_exhausted is not 'fail' or 'skip'.
+        """
+        self._steps = tuple(tuple(step) for step in steps)
+        self._routes = tuple(routes)
+        self._step_of: dict[str, int] = {}
+        for index, step in enumerate(self._steps):
+            for node in step:
+                if node.name in self._step_of:
+                    raise ValueError(f"Stage {node.name!r} appears twice")
+                self._step_of[node.name] = index
+        for route in self._routes:
+            name = f"Route {route.source} → {route.target}"
+            if route.source not in self._step_of or route.target not in self._step_of:
+                raise ValueError(f"{name}: unknown stage")
+            if self._step_of[route.target] >= self._step_of[route.source]:
+                raise ValueError(f"{name} must lead to an earlier step")
+            if route.on_exhausted not in ("fail", "skip"):
+                raise ValueError(f"Invalid on_exhausted: {route.on_exhausted!r}")
+
+    def run(
+        self,
+        stage_input: StageInput,
+        recorder: RunRecorder,
+        *,
+        resume: Progress | None = None,
+        on_progress: Callable[[Progress], None] | None = None,
+    ) -> GraphResult:
+        """Run the graph to completion.
+
+        Args:
+            stage_input: Input of the first step (ignored when resuming).
+            recorder: Receives an event at every stage boundary.
+            resume: Progress reported by an earlier, interrupted run to
+                continue from instead of the first step.
+            on_progress: Called after every step that passes or is sent
+                back, with what is needed to resume from there.
+
+        Returns:
+            GraphResult: passed once the last step passes, failed when a
+            failure has no route left.
+        """
+        state = stage_input if resume is None else resume.state
+        index = 0 if resume is None else resume.step
+        runs: Counter[str] = Counter(resume.runs if resume else {})
+        taken: Counter[int] = Counter(dict(enumerate(resume.routes)) if resume else {})
+        feedback: dict[str, str] = dict(resume.feedback) if resume else {}
+        last = self._steps[0][0].name
+        while index < len(self._steps):
+            step = [
+                node for node in self._steps[index] if not self._skipped(node, taken)
+            ]
+            for node in step:
+                runs[node.name] += 1
+            attempt, last_attempt = self._attempt(index, runs)
+            inputs = [
+                replace(
+                    state,
+                    last_failure=feedback.pop(node.name, None),
+                    last_attempt=last_attempt,
+                )
+                for node in step
+            ]
+            outputs = self._run_step(step, inputs, attempt, recorder)
+
+            failed = [
+                (n, o) for n, o in zip(step, outputs, strict=True) if not o.passed
+            ]
+            if not failed:
+                for node, output in zip(step, outputs, strict=True):
+                    last = node.name
+                    if node.then is not None:
+                        state = node.then(state, output)
+                index += 1
+            else:
+                routed: list[tuple[int, StageOutput]] = []
+                for node, output in failed:
+                    route = self._route(node.name, output.escalate_to)
+                    budget = None if route is None else self._routes[route].budget
+                    if route is None or (budget is not None and taken[route] >= budget):
+                        logger.info("Stage %s failed with no route left", node.name)
+                        return GraphResult(
+                            passed=False, stage=node.name, attempt=attempt
+                        )
+                    taken[route] += 1
+                    routed.append((route, output))
+
+                index = min(self._step_of[self._routes[r].target] for r, _ in routed)
+                for node in self._steps[index]:
+                    if node.retries is not None and runs[node.name] > node.retries:
+                        failed_stage = failed[0][0].name
+                        logger.info(
+                            "Stage %s failed with no retries left", failed_stage
+                        )
+                        return GraphResult(
+                            passed=False, stage=failed_stage, attempt=attempt
+                        )
+                for r, output in routed:
+                    route_ = self._routes[r]
+                    if self._step_of[route_.target] != index:
+                        continue
+                    text = output.output
+                    if route_.feedback is not None:
+                        text = f"{route_.feedback}:\n{text}"
+                    if route_.target in feedback:
+                        text = f"{feedback[route_.target]}\n\n{text}"
+                    feedback[route_.target] = text
+                    logger.info(
+                        "Stage %s failed, back to %s", route_.source, route_.target
+                    )
+                self._reset_after(index, runs, taken, feedback)
+
+            if on_progress is not None:
+                on_progress(
+                    Progress(
+                        step=index,
+                        state=state,
+                        runs=dict(runs),
+                        routes=tuple(taken[r] for r in range(len(self._routes))),
+                        feedback=dict(feedback),
+                        attempt=self._next_attempt(index, runs),
+                    )
+                )
+        return GraphResult(passed=True, stage=last, attempt=None)
+
+    def _attempt(self, index: int, runs: Counter[str]) -> tuple[int | None, bool]:
+        """Attempt number of a step and whether its retry loop is on its last try.
+
+        The attempt is the run count of the nearest stage with retries at or
+        before the step (None if there is none).
+        """
+        for step in reversed(self._steps[: index + 1]):
+            for node in step:
+                if node.retries is not None:
+                    attempt = runs[node.name]
+                    return attempt, attempt == node.retries + 1
+        return None, False
+
+    def _next_attempt(self, index: int, runs: Counter[str]) -> int | None:
+        """Attempt number the step at index will run as."""
+        upcoming = Counter(runs)
+        for node in self._steps[index] if index < len(self._steps) else ():
+            upcoming[node.name] += 1
+        return self._attempt(index, upcoming)[0]
+
+    def _skipped(self, node: Node, taken: Counter[int]) -> bool:
+        """True if a 'skip' route of the node has used up its budget."""
+        return any(
+            route.source == node.name
+            and route.on_exhausted == "skip"
+            and route.budget is not None
+            and taken[index] >= route.budget
+            for index, route in enumerate(self._routes)
+        )
+
+    def _route(self, source: str, escalate_to: str | None) -> int | None:
+        """Index of the route a failure takes: escalate_to's, else the default."""
+        routes = [i for i, route in enumerate(self._routes) if route.source == source]
+        for index in routes:
+            if self._routes[index].target == escalate_to:
+                return index
+        return routes[0] if routes else None
+
+    def _reset_after(
+        self,
+        index: int,
+        runs: Counter[str],
+        taken: Counter[int],
+        feedback: dict[str, str],
+    ) -> None:
+        """Forget the runs, route counts and feedback of steps after index."""
+        for step in self._steps[index + 1 :]:
+            for node in step:
+                runs.pop(node.name, None)
+                feedback.pop(node.name, None)
+        for route_index, route in enumerate(self._routes):
+            if self._step_of[route.target] > index:
+                taken.pop(route_index, None)
+
+    @staticmethod
+    def _run_step(
+        step: Sequence[Node],
+        inputs: Sequence[StageInput],
+        attempt: int | None,
+        recorder: RunRecorder,
+    ) -> list[StageOutput]:
+        """Run a step's stages, all but the first in helper threads."""
+        if not step:
+            return []
+        with ThreadPoolExecutor(
+            max_workers=max(1, len(step) - 1), thread_name_prefix=STAGE_THREAD_PREFIX
+        ) as pool:
+            futures = [
+                pool.submit(_run_node, node, stage_input, attempt, recorder)
+                for node, stage_input in zip(step[1:], inputs[1:], strict=True)
+            ]
+            first = _run_node(step[0], inputs[0], attempt, recorder)
+            return [first, *(future.result() for future in futures)]
+
+
+def _run_node(
+    node: Node, stage_input: StageInput, attempt: int | None, recorder: RunRecorder
+) -> StageOutput:
+    """Run one stage inside its own stage span."""
+    with recorder.stage(node.name, attempt=attempt, model=node.model) as span:
+        output = node.stage.execute(stage_input)
+        span.record(output)
+    return output
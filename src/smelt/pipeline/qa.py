@@ -1,11 +1,19 @@
 """QA stage: deterministic quality checks with no LLM involvement.
 
 Runs pytest, ruff, and mypy based on configuration. Aggregates results
-and produces a human-readable summary truncated for Coder retry prompts.
+and produces a human-readable summary for Coder retry prompts.
+
+The summary lists each failing test or diagnostic once, keyed by an error
+signature that survives line shifts (test id; file, rule and message). From
+the second attempt on, it is a delta against the previous attempt: newly
+failing, still failing, and what now passes, so the Coder neither re-reads
+the full output nor reworks what it already fixed. Output that yields no
+signatures is truncated and passed on as is.
 """
 
 from __future__ import annotations
 
+import re
 import subprocess
 from pathlib import Path
 
@@ -15,6 +23,16 @@ from smelt.pipeline.stages import Stage, StageInput, StageOutput
 
 _TRUNCATE_MAX_LINES: int = 50
 _TRUNCATE_HALF: int = _TRUNCATE_MAX_LINES // 2
+# Most issues listed per tool and group before the rest are counted
+_MAX_ISSUES: int = 25
+
+# One failure per line. The signature is `path: key` (or `key` without a
+# path); line and column numbers are left out so it survives edits.
+_ISSUE_PATTERNS: dict[str, re.Pattern[str]] = {
+    "pytest": re.compile(r"^(?:FAILED|ERROR) (?P<key>.+?)(?: - .*)?$"),
+    "ruff": re.compile(r"^(?P<path>\S+?):\d+:\d+: (?P<key>[A-Z]+\d+ .+)$"),
+    "mypy": re.compile(r"^(?P<path>\S+?):\d+: error: (?P<key>.+)$"),
+}
 
 
 class QAStage(Stage):
@@ -22,6 +40,9 @@ class QAStage(Stage):
 
     This stage never calls an LLM. Every check is a subprocess invocation
     with captured output. All results are aggregated into a QAResult.
+
+    A stage instance serves one task: it remembers the failures of the
+    previous attempt to report the next one as a delta.
     """
 
     def __init__(self, *, config: QAConfig, repo_path: Path) -> None:
@@ -33,6 +54,8 @@ class QAStage(Stage):
         """
         self._config = config
         self._repo_path = repo_path
+        # Issue signatures of the previous attempt, by tool (None before it)
+        self._previous: dict[str, set[str]] | None = None
 
     @property
     def name(self) -> str:
@@ -69,6 +92,7 @@ class QAStage(Stage):
             passed=qa_result.passed,
             output=qa_result.summary,
             escalate_to=None if qa_result.passed else "coder",
+            tool_results=qa_result.tool_results,
         )
 
     def _run_tool(self, cmd: list[str], tool_name: str) -> ToolResult:
@@ -111,7 +135,7 @@ class QAStage(Stage):
 
     def _run_ruff(self) -> ToolResult:
         """Run ruff check."""
-        return self._run_tool(["ruff", "check", "."], "ruff")
+        return self._run_tool(["ruff", "check", "--output-format=concise", "."], "ruff")
 
     def _run_mypy(self) -> ToolResult:
         """Run mypy."""
@@ -120,25 +144,110 @@ class QAStage(Stage):
     def _build_summary(self, results: list[ToolResult]) -> str:
         """Build a human-readable summary of all tool results.
 
+        Also records this attempt's issues for the next attempt's delta.
+
         Args:
             results: Results from all tools that ran.
 
         Returns:
             A summary string — 'All QA checks passed.' on success, or
-            per-tool failure details on failure.
+            per-tool failure details (a delta after the first attempt).
         """
-        failures = [r for r in results if not r.passed]
-        if not failures:
+        previous, current = self._previous, {}
+        parts: list[str] = []
+        for r in results:
+            issues = {} if r.passed else _issues(r.tool_name, r.stdout)
+            if r.passed or issues:
+                current[r.tool_name] = set(issues)
+            before = None if previous is None else previous.get(r.tool_name)
+            if r.passed:
+                if before:
+                    parts.append(
+                        f"## {r.tool_name} now passes "
+                        f"({len(before)} issue(s) fixed; keep those fixes)"
+                    )
+                continue
+            header = f"## {r.tool_name} FAILED (exit {r.return_code})"
+            if not issues:
+                truncated = _truncate_output(r.stdout, max_lines=_TRUNCATE_MAX_LINES)
+                parts.append(f"{header}\n{truncated}")
+            else:
+                parts.append(f"{header}\n{_render_delta(issues, before)}")
+        self._previous = current
+
+        if all(r.passed for r in results):
             passed_names = ", ".join(r.tool_name for r in results)
             return f"All QA checks passed. ({passed_names})"
-
-        parts: list[str] = []
-        for f in failures:
-            truncated = _truncate_output(f.stdout, max_lines=_TRUNCATE_MAX_LINES)
-            parts.append(f"## {f.tool_name} FAILED (exit {f.return_code})\n{truncated}")
         return "\n\n".join(parts)
 
 
+def _issues(tool_name: str, output: str) -> dict[str, list[str]]:
+    """Group a tool's failure lines by error signature, in output order.
+
+    Args:
+        tool_name: The tool that produced the output.
+        output: The tool's stdout.
+
+    Returns:
+        The lines of each signature (empty if the output has none).
+    """
+    pattern = _ISSUE_PATTERNS.get(tool_name)
+    issues: dict[str, list[str]] = {}
+    if pattern is None:
+        return issues
+    for line in output.splitlines():
+        match = pattern.match(line.strip())
+        if match is None:
+            continue
+        path = match.groupdict().get("path")
+        signature = f"{path}: {match['key']}" if path else match["key"]
+        issues.setdefault(signature, []).append(line.strip())
+    return issues
+
+
+def _render_delta(issues: dict[str, list[str]], before: set[str] | None) -> str:
+    """List a tool's issues, split against the previous attempt's if known.
+
+    Args:
+        issues: This attempt's lines by signature.
+        before: The previous attempt's signatures, or None on the first
+            attempt (or if they are unknown).
+
+    Returns:
+        One line per signature, grouped into newly failing, still failing
+        and now passing when there is a previous attempt.
+    """
+    if before is None:
+        return _render_issues(issues, list(issues))
+    groups = [
+        ("Newly failing", [s for s in issues if s not in before]),
+        ("Still failing", [s for s in issues if s in before]),
+    ]
+    parts = [
+        f"{title}:\n{_render_issues(issues, signatures)}"
+        for title, signatures in groups
+        if signatures
+    ]
+    fixed = sorted(before - issues.keys())
+    if fixed:
+        extra = len(fixed) - _MAX_ISSUES
+        more = f" and {extra} more" if extra > 0 else ""
+        shown = ", ".join(fixed[:_MAX_ISSUES])
+        parts.append(f"Now passing (keep these fixes): {shown}{more}")
+    return "\n".join(parts)
+
+
+def _render_issues(issues: dict[str, list[str]], signatures: list[str]) -> str:
+    """Render one line per signature: its first line and a repeat count."""
+    lines = []
+    for signature in signatures[:_MAX_ISSUES]:
+        first, *repeats = issues[signature]
+        lines.append(f"- {first} (+{len(repeats)} more)" if repeats else f"- {first}")
+    if len(signatures) > _MAX_ISSUES:
+        lines.append(f"- ... and {len(signatures) - _MAX_ISSUES} more")
+    return "\n".join(lines)
+
+
 def _truncate_output(output: str, *, max_lines: int) -> str:
     """Truncate tool output to the most relevant lines.
 
@@ -0,0 +1,247 @@
+"""QC stage: cheap LLM intent check on a compacted diff.
+
+QC answers one question: did the change do what the task asked? It needs no
+repository context, so the prompt holds only the task, the plan and the diff,
+compacted by compact_diff (context lines dropped, files ranked by relevance
+to the task and plan, cut to a token budget). That keeps the check within
+reach of the cheap QC model.
+
+`qc.escalation_mode` decides when QC may send a failure back to the
+Architect instead of the Coder: never, on every attempt ('auto'), or only on
+the Coder's final attempt ('last_attempt').
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from dataclasses import dataclass
+
+from smelt.agents.protocols import LLMClient
+from smelt.config import ModelsConfig, QCConfig
+from smelt.pipeline.stages import Stage, StageInput, StageOutput
+
+logger = logging.getLogger(__name__)
+
+_QC_SYSTEM_PROMPT: str = """\
+You verify that a code change does what its task asked for.
+
+You will be given the task, the implementation plan, and the diff of the
+change. The diff is compacted: unchanged context lines are removed and files
+least related to the task may be omitted (they are listed by name).
+
+Judge intent only; code style and quality are reviewed elsewhere:
+- Does the change implement the task?
+- Does it follow the plan?
+- Do the tests cover what the task required?
+- Was anything missed or misinterpreted?
+
+List each gap briefly. End your answer with exactly one line:
+`VERDICT: PASS` or `VERDICT: FAIL`.
+"""
+
+_ESCALATION_INSTRUCTIONS: str = """\
+If the verdict is FAIL, add one more line after it: `ROUTE: CODER` if the code
+can be fixed by following the current plan, or `ROUTE: ARCHITECT` if the plan
+itself misreads the task.
+"""
+
+_QC_USER_TEMPLATE: str = """\
+## Task
+{task_description}
+
+## Implementation Plan
+{plan}
+
+## Diff
+```diff
+{diff}
+```
+"""
+
+_VERDICT = re.compile(r"^\W*VERDICT:\s*(PASS|FAIL)\b", re.MULTILINE | re.IGNORECASE)
+_ROUTE = re.compile(r"^\W*ROUTE:\s*(CODER|ARCHITECT)\b", re.MULTILINE | re.IGNORECASE)
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]{2,}")
+# A path named in the task or plan outweighs any number of shared identifiers
+_MENTIONED_PATH_SCORE: int = 1_000
+
+
+class QCStage(Stage):
+    """Checks a candidate against the task and plan with the cheap QC model.
+
+    If the model gives no verdict the stage passes, leaving the decision to
+    QA and review.
+    """
+
+    def __init__(
+        self, *, llm: LLMClient, models: ModelsConfig, config: QCConfig
+    ) -> None:
+        """Initialize the QC stage.
+
+        Args:
+            llm: LLM client satisfying the LLMClient protocol.
+            models: Model configuration specifying which model to use.
+            config: QC configuration (escalation mode, diff budget).
+        """
+        self._llm = llm
+        self._models = models
+        self._config = config
+
+    @property
+    def name(self) -> str:
+        """Human-readable stage name."""
+        return "qc"
+
+    def execute(self, stage_input: StageInput) -> StageOutput:
+        """Check whether the diff does what the task asked.
+
+        Args:
+            stage_input: Pipeline stage input with task, plan and diff. Its
+                last_attempt flag lets QC escalate in 'last_attempt' mode.
+
+        Returns:
+            StageOutput with passed=False and the gaps QC found if the change
+            misses the task. escalate_to is 'architect' if QC was allowed to
+            escalate and blamed the plan, 'coder' otherwise.
+        """
+        mode = self._config.escalation_mode
+        may_escalate = mode == "auto" or (
+            mode == "last_attempt" and stage_input.last_attempt
+        )
+        system_prompt = _QC_SYSTEM_PROMPT
+        if may_escalate:
+            system_prompt = f"{_QC_SYSTEM_PROMPT}\n{_ESCALATION_INSTRUCTIONS}"
+        plan = stage_input.plan or "No plan provided."
+        diff = compact_diff(
+            stage_input.diff or "",
+            relevant_to=f"{stage_input.task_description}\n{plan}",
+            max_tokens=self._config.max_diff_tokens,
+        )
+        response = self._llm.complete(
+            model=self._models.qc,
+            system_prompt=system_prompt,
+            user_prompt=_QC_USER_TEMPLATE.format(
+                task_description=stage_input.task_description,
+                plan=plan,
+                diff=diff or "(no changes)",
+            ),
+        )
+        usage = (response.usage,)
+
+        verdicts = _VERDICT.findall(response.content)
+        if not verdicts:
+            logger.warning("QC gave no verdict, treating it as passed")
+            return StageOutput(
+                passed=True, output=response.content, escalate_to=None, usage=usage
+            )
+        if verdicts[-1].upper() == "PASS":
+            return StageOutput(
+                passed=True, output=response.content, escalate_to=None, usage=usage
+            )
+        routes = _ROUTE.findall(response.content)
+        to_architect = (
+            may_escalate and bool(routes) and routes[-1].upper() == "ARCHITECT"
+        )
+        findings = [
+            line
+            for line in response.content.strip().splitlines()
+            if not (_VERDICT.match(line) or _ROUTE.match(line))
+        ]
+        return StageOutput(
+            passed=False,
+            output="\n".join(findings).strip(),
+            escalate_to="architect" if to_architect else "coder",
+            usage=usage,
+        )
+
+
+@dataclass(frozen=True)
+class _FileDiff:
+    """The changed lines of one file in a diff."""
+
+    path: str
+    lines: tuple[str, ...]
+    added: int
+    removed: int
+
+    def render(self) -> str:
+        """Render the file's header and changed lines as diff text."""
+        return "\n".join((f"--- {self.path}", *self.lines))
+
+
+def compact_diff(diff: str, *, relevant_to: str, max_tokens: int) -> str:
+    """Shrink a unified diff to the files most relevant to a task.
+
+    Context lines and per-file headers are dropped, leaving hunk headers and
+    changed lines. Files are ranked by relevance (named in relevant_to first,
+    then by how many of its identifiers their changed lines share) and kept
+    in that order while they fit the budget; the rest are listed by name.
+
+    Args:
+        diff: A unified diff, as from `git diff`.
+        relevant_to: Text the change should be judged against (task, plan).
+        max_tokens: Estimated token budget for the result (4 chars/token).
+
+    Returns:
+        The compacted diff.
+    """
+    files = _split_files(diff)
+    terms = {t.lower() for t in _IDENTIFIER.findall(relevant_to)}
+    ranked = sorted(files, key=lambda f: -_relevance(f, relevant_to, terms))
+
+    budget = max_tokens * 4
+    kept: list[str] = []
+    omitted: list[_FileDiff] = []
+    for file in ranked:
+        text = file.render()
+        if len(text) <= budget:
+            kept.append(text)
+            budget -= len(text) + 1
+        elif not kept:
+            # Always show some of the most relevant file
+            kept.append(text[:budget] + "\n... (truncated)")
+            budget = 0
+        else:
+            omitted.append(file)
+    if omitted:
+        names = ", ".join(f"{f.path} (+{f.added}/-{f.removed})" for f in omitted)
+        kept.append(f"... {len(omitted)} more file(s) omitted: {names}")
+    return "\n".join(kept)
+
+
+def _split_files(diff: str) -> list[_FileDiff]:
+    """Split a unified diff into per-file changed lines."""
+    files: list[_FileDiff] = []
+    path: str | None = None
+    lines: list[str] = []
+
+    def flush() -> None:
+        """Close the file being read, if any, with its line counts."""
+        if path is not None:
+            added = sum(1 for line in lines if line.startswith("+"))
+            removed = sum(1 for line in lines if line.startswith("-"))
+            files.append(_FileDiff(path, tuple(lines), added, removed))
+
+    in_hunk = False
+    for line in diff.splitlines():
+        if line.startswith("diff --git "):
+            flush()
+            path = line.rpartition(" b/")[2]
+            lines = []
+            in_hunk = False
+        elif line.startswith("@@"):
+            in_hunk = True
+            lines.append(line)
+        elif line.startswith(("+", "-")) if in_hunk else line.startswith("Binary"):
+            lines.append(line)
+    flush()
+    return files
+
+
+def _relevance(file: _FileDiff, text: str, terms: set[str]) -> int:
+    """Score a file's relevance to the task and plan text."""
+    score = 0
+    if file.path in text or file.path.rsplit("/", 1)[-1] in text:
+        score += _MENTIONED_PATH_SCORE
+    changed = " ".join(line for line in file.lines if not line.startswith("@@"))
+    return score + len(terms & {t.lower() for t in _IDENTIFIER.findall(changed)})
@@ -0,0 +1,137 @@
+"""Reviewer stage: read-only coding agent session that reviews the Coder's diff.
+
+The Reviewer judges code quality only (security, edge cases, consistency
+with the codebase, test quality); intent is QC's job. It runs the coding
+agent in read-only mode, so it can open any file but never change the
+working tree, which lets the runner review a candidate while QA tests it.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+
+from smelt.agents.protocols import CodingAgent
+from smelt.config import ReviewerConfig
+from smelt.exceptions import AgentError
+from smelt.pipeline.stages import Stage, StageInput, StageOutput
+
+logger = logging.getLogger(__name__)
+
+_REVIEWER_PROMPT_TEMPLATE: str = """\
+You are a senior engineer reviewing a change before it is tested and merged.
+You may read any file in the repository, but you must not modify anything.
+
+## Task
+{task_description}
+
+## Implementation Plan
+{plan}
+
+## Repository Context
+{repo_context}
+
+## Diff
+```diff
+{diff}
+```
+
+## Instructions
+Review the diff for code quality only:
+- Security holes
+- Missed edge cases and error handling
+- Naming and patterns inconsistent with the rest of the codebase
+- Missing or weak tests
+
+Do not judge whether the change does what the task asks; that is checked
+separately. List each problem with the file and what to change. Ignore
+nitpicks that do not affect correctness, safety or maintainability.
+End your answer with exactly one line: `VERDICT: PASS` or `VERDICT: FAIL`.
+"""
+
+_VERDICT = re.compile(r"^\W*VERDICT:\s*(PASS|FAIL)\b.*$", re.MULTILINE | re.IGNORECASE)
+_MAX_DIFF_CHARS: int = 40_000
+_MAX_FEEDBACK_LINES: int = 60
+
+
+class ReviewerStage(Stage):
+    """Reviews the candidate diff in a read-only coding agent session.
+
+    The review is advisory next to QA: if the agent fails or gives no
+    verdict, the stage passes and QA alone decides.
+    """
+
+    def __init__(
+        self, *, agent: CodingAgent, config: ReviewerConfig, working_dir: str
+    ) -> None:
+        """Initialize the Reviewer stage.
+
+        Args:
+            agent: Coding agent satisfying the CodingAgent protocol.
+            config: Reviewer configuration (timeout).
+            working_dir: Directory the agent should read (the task's tree).
+        """
+        self._agent = agent
+        self._config = config
+        self._working_dir = working_dir
+
+    @property
+    def name(self) -> str:
+        """Human-readable stage name."""
+        return "reviewer"
+
+    def execute(self, stage_input: StageInput) -> StageOutput:
+        """Review the diff in stage_input.
+
+        Args:
+            stage_input: Pipeline stage input with task, plan and diff.
+
+        Returns:
+            StageOutput with passed=False and the review findings if the
+            reviewer asked for changes, passed=True otherwise.
+        """
+        diff = stage_input.diff or "(no changes)"
+        if len(diff) > _MAX_DIFF_CHARS:
+            diff = diff[:_MAX_DIFF_CHARS] + "\n... (diff truncated; read the files)"
+        prompt = _REVIEWER_PROMPT_TEMPLATE.format(
+            task_description=stage_input.task_description,
+            plan=stage_input.plan or "No plan provided.",
+            repo_context=stage_input.repo_context,
+            diff=diff,
+        )
+        try:
+            result = self._agent.run_session(
+                prompt=prompt,
+                working_dir=self._working_dir,
+                timeout_seconds=self._config.timeout_seconds,
+                read_only=True,
+            )
+        except AgentError as e:
+            logger.warning("Review skipped, the agent failed: %s", e)
+            return StageOutput(
+                passed=True, output=f"Review skipped: {e}", escalate_to=None
+            )
+
+        verdicts = _VERDICT.findall(result.output)
+        if not result.success or not verdicts:
+            logger.warning("Review gave no verdict, treating it as passed")
+            return StageOutput(
+                passed=True,
+                output=result.output,
+                escalate_to=None,
+                session_id=result.session_id,
+            )
+        passed = verdicts[-1].upper() == "PASS"
+        return StageOutput(
+            passed=passed,
+            output=_findings(result.output),
+            escalate_to=None if passed else "coder",
+            session_id=result.session_id,
+        )
+
+
+def _findings(output: str) -> str:
+    """Return the review text before the final verdict, last lines only."""
+    last = list(_VERDICT.finditer(output))[-1]
+    lines = output[: last.start()].strip().splitlines()
+    return "\n".join(lines[-_MAX_FEEDBACK_LINES:])
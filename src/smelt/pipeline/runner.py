@@ -1,31 +1,84 @@
 """Pipeline runner: orchestrates the full task execution pipeline.
 
 The PipelineRunner ties together all stages: sanity check, repo context,
-architect, coder, and QA. It manages status transitions, retry loops,
-and error classification (task error vs infra error).
+architect, coder, reviewer and QA (run side by side on each candidate), QC,
+and publishing the task branch for review. It manages status transitions and
+error classification (task error vs infra error); the stage order and where
+failures are routed are declared as a StageGraph (see smelt.pipeline.graph).
+
+Every task branches from `origin/<base>` at a commit pinned by a shared
+BaseBranchSync (at most one fetch per interval), recorded on the run. With a
+WorktreePool, each task runs in its own pooled worktree, so the user's main
+working tree is never checked out or modified. In speculative mode a task
+may instead start from the branch of a dependency still in review; see
+smelt.speculation.
+
+After every step of the stage graph the task's progress (plan, attempt
+counters, pending failure feedback and a snapshot commit of the working
+tree) is checkpointed to the database and the run directory. If the runner
+process dies or the run crashes, the task is requeued (a crash after an
+infra-error delay) and resumes from that checkpoint instead of paying for
+the Architect and earlier attempts again.
+Each plan is also kept with the task; a later run of an unchanged task
+reuses it unless the repository context it was made from has changed.
+
+The Coder's timeout and retries are set per task from its complexity and the
+durations of earlier runs of similar tasks; see smelt.pipeline.budget.
 """
 
 from __future__ import annotations
 
+import contextlib
+import hashlib
 import logging
-from dataclasses import dataclass
+import os
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass, replace
 from pathlib import Path
 
-from smelt.agents.protocols import CodingAgent, LLMClient
+from smelt.agents.protocols import CodingAgent, LLMClient, RunScopedCodingAgent
 from smelt.config import SmeltConfig
-from smelt.db.models import Task
+from smelt.db.models import CachedPlan, Checkpoint, Task, ToolResult
 from smelt.db.store import TaskStore
-from smelt.exceptions import AgentError, InfraError, LLMError, SanityCheckError
-from smelt.git import GitOps
+from smelt.events import EventLog, RunRecorder, StageSpan, new_run_id
+from smelt.exceptions import (
+    AgentError,
+    GitError,
+    InfraError,
+    LLMError,
+    SanityCheckError,
+)
+from smelt.git import BaseBranchSync, GitOps, PushBatcher, WorktreePool
+from smelt.metrics import PipelineMetrics
 from smelt.pipeline.architect import ArchitectStage
+from smelt.pipeline.budget import CodingBudget, coding_budget
 from smelt.pipeline.coder import CoderStage
 from smelt.pipeline.context import RepoContextBuilder
+from smelt.pipeline.graph import Node, Progress, Route, StageGraph
 from smelt.pipeline.qa import QAStage
+from smelt.pipeline.qc import QCStage
+from smelt.pipeline.reviewer import ReviewerStage
 from smelt.pipeline.sanity import SanityChecker
-from smelt.pipeline.stages import StageInput
+from smelt.pipeline.stages import StageInput, StageOutput
+from smelt.speculation import SpeculationReconciler
 
 logger = logging.getLogger(__name__)
 
+# Longest commit subject summary before it is truncated
+_COMMIT_SUMMARY_CHARS: int = 72
+
+# Stage names as shown in failure messages
+_STAGE_LABELS: dict[str, str] = {"qa": "QA", "reviewer": "Review", "qc": "QC"}
+
+# Stage-graph steps: the Architect, the Coder, then QA and review of the
+# candidate (where rebased speculative results resume)
+_VERIFY_STEP: int = 2
+
+# Recent runs of similar tasks that may raise a coding budget
+_BUDGET_HISTORY_RUNS: int = 20
+
 
 @dataclass(frozen=True)
 class PipelineResult:
@@ -36,12 +89,55 @@ class PipelineResult:
         success: True if the pipeline completed all stages successfully.
         stage_reached: The last stage that ran (for debugging).
         message: Human-readable outcome message.
+        run_id: Id of the run (its log directory name); empty if no task ran.
     """
 
     task_id: str
     success: bool
     stage_reached: str
     message: str
+    run_id: str = ""
+
+
+class TaskClaims:
+    """Tasks claimed by the runners of one process, shared between them.
+
+    Claims are recorded in the store under this process's owner token. A
+    task this process owns but is not running (in here) was left behind by a
+    run that ended without releasing it, so it is requeued like a task whose
+    owning process died.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the claims of the current process."""
+        self.owner = _process_token(os.getpid())
+        self._running: set[str] = set()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def claiming(self) -> Iterator[None]:
+        """Serialize requeueing and claiming between this process's runners."""
+        with self._lock:
+            yield
+
+    def hold(self, task_id: str) -> None:
+        """Record that a run of this process is executing a task."""
+        self._running.add(task_id)
+
+    def release(self, task_id: str) -> None:
+        """Record that the run executing a task is over."""
+        self._running.discard(task_id)
+
+    def owner_alive(self, task_id: str, owner: str) -> bool:
+        """Tell whether the runner that owns a task is still running it.
+
+        A task owned by this process is alive only while one of its runs
+        holds it; one owned by another process, while that process exists.
+        """
+        if owner == self.owner:
+            return task_id in self._running
+        pid = int(owner.partition(":")[0])
+        return _pid_alive(pid) and _process_token(pid) == owner
 
 
 class PipelineRunner:
@@ -60,6 +156,13 @@ class PipelineRunner:
         llm: LLMClient,
         agent: CodingAgent,
         repo_path: Path,
+        context_builder: RepoContextBuilder | None = None,
+        event_log: EventLog | None = None,
+        metrics: PipelineMetrics | None = None,
+        worktrees: WorktreePool | None = None,
+        base_sync: BaseBranchSync | None = None,
+        pusher: PushBatcher | None = None,
+        claims: TaskClaims | None = None,
     ) -> None:
         """Initialize the pipeline runner.
 
@@ -70,6 +173,20 @@ class PipelineRunner:
             llm: LLM client for Architect and future LLM stages.
             agent: Coding agent for Coder and future agent stages.
             repo_path: Absolute path to the repository root.
+            context_builder: Optional repo context builder to reuse across runs
+                (keeps its signature cache warm). A new one is created if None.
+            event_log: Optional structured event log; each run is recorded to
+                its own events file. Nothing is recorded if None.
+            metrics: Optional metrics fed with the run's events, task claim
+                latency and worker utilization.
+            worktrees: Optional worktree pool. If given, each task runs in its
+                own pooled worktree instead of the main working tree.
+            base_sync: Base-branch sync to share between runners (daemon
+                workers). A new one is created if None.
+            pusher: Push batcher to share between runners (daemon workers).
+                A new one is created if None.
+            claims: Task claims to share between the runners of this process
+                (daemon workers). A new one is created if None.
         """
         self._config = config
         self._store = store
@@ -77,6 +194,31 @@ class PipelineRunner:
         self._llm = llm
         self._agent = agent
         self._repo_path = repo_path
+        self._context_builder = context_builder or RepoContextBuilder(
+            config=config.context
+        )
+        self._event_log = event_log
+        self._metrics = metrics
+        self._worktrees = worktrees
+        self._base_sync = base_sync or BaseBranchSync(
+            git,
+            branch=config.git.base_branch,
+            interval_seconds=config.git.fetch_interval_seconds,
+        )
+        self._pusher = pusher or PushBatcher(git)
+        self._claims = claims or TaskClaims()
+        self._speculation = (
+            SpeculationReconciler(
+                store=store,
+                git=git,
+                base_sync=self._base_sync,
+                worktrees=worktrees,
+                interval_seconds=config.git.fetch_interval_seconds,
+                verify_step=_VERIFY_STEP,
+            )
+            if config.git.speculative
+            else None
+        )
 
     def run(self, task: Task | None = None) -> PipelineResult:
         """Execute the pipeline for a task.
@@ -90,24 +232,174 @@ class PipelineRunner:
         Returns:
             PipelineResult describing the outcome.
         """
-        # 1. Pick task
-        if task is None:
-            task = self._store.pick_next_task()
+        # 1-2. Pick task and mark it in-progress atomically
+        owner = self._claims.owner
+        if task is None and self._speculation is not None:
+            self._speculation.reconcile()
+        with self._claims.claiming():
             if task is None:
-                return PipelineResult(
-                    task_id="",
-                    success=False,
-                    stage_reached="pick",
-                    message="No ready tasks found.",
+                self._requeue_interrupted()
+                self._retry_infra_errors()
+                task = self._claim_next_task(owner)
+            else:
+                self._store.claim_task(task.id, owner=owner)
+            if task is not None:
+                self._claims.hold(task.id)
+        if task is None:
+            return PipelineResult(
+                task_id="",
+                success=False,
+                stage_reached="pick",
+                message="No ready tasks found.",
+            )
+
+        busy = self._metrics.busy() if self._metrics else contextlib.nullcontext()
+        try:
+            with busy:
+                recorder = self._start_recorder(task)
+                try:
+                    checkpoint = self._claim_checkpoint(task, recorder.run_id)
+                    result = self._run_task(task, recorder, checkpoint)
+                except Exception as e:
+                    # Unexpected errors are infra errors: retried, not lost
+                    self._store.update_status(task.id, "infra-error")
+                    self._finish(
+                        task, recorder, passed=False, stage="pipeline", message=str(e)
+                    )
+                    raise
+                self._finish(
+                    task,
+                    recorder,
+                    passed=result.success,
+                    stage=result.stage_reached,
+                    message=result.message,
                 )
+        finally:
+            # Anything still in-progress now belongs to a run that is over
+            self._claims.release(task.id)
+        return replace(result, run_id=recorder.run_id)
+
+    def _claim_next_task(self, owner: str) -> Task | None:
+        """Claim the next ready task for owner, recording the claim latency."""
+        start = time.monotonic()
+        task = self._store.claim_next_task(
+            speculative=self._speculation is not None, owner=owner
+        )
+        if self._metrics is not None:
+            self._metrics.observe_claim(
+                time.monotonic() - start, claimed=task is not None
+            )
+        return task
+
+    def _requeue_interrupted(self) -> None:
+        """Make tasks left in-progress by a dead runner ready to resume."""
+        for task_id in self._store.requeue_interrupted(self._claims.owner_alive):
+            logger.info("Task %s was interrupted; requeued to resume", task_id)
+
+    def _retry_infra_errors(self) -> None:
+        """Requeue tasks whose infra-error delay is over, within their retries.
+
+        Tasks out of retries stay in 'infra-error' and lose their checkpoint.
+        """
+        config = self._config.infra
+        requeued, exhausted = self._store.retry_infra_errors(
+            delay_seconds=config.retry_delay_seconds,
+            max_retries=config.max_infra_retries,
+        )
+        for task_id in requeued:
+            logger.info("Retrying task %s after an infra error", task_id)
+        for task_id in exhausted:
+            logger.warning("Task %s is out of infra-error retries", task_id)
+            self._drop_checkpoint(task_id)
+
+    def _claim_checkpoint(self, task: Task, run_id: str) -> Checkpoint:
+        """Record this run on the checkpoint the claim gave this process.
+
+        Args:
+            task: The claimed task.
+            run_id: Id of the run about to execute it.
+
+        Returns:
+            The checkpoint to resume from (step 0 if there is nothing to
+            resume).
+        """
+        checkpoint = replace(
+            self._store.get_checkpoint(task.id)
+            or Checkpoint(task_id=task.id, run_id=run_id, owner=self._claims.owner),
+            run_id=run_id,
+        )
+        if checkpoint.step:
+            logger.info("Resuming task %s from step %d", task.id, checkpoint.step)
+        self._store.save_checkpoint(checkpoint)
+        return checkpoint
+
+    def _drop_checkpoint(self, task_id: str) -> None:
+        """Delete a task's checkpoint and its working-tree snapshot."""
+        self._store.delete_checkpoint(task_id)
+        try:
+            self._git.drop_snapshot(task_id)
+        except GitError as e:
+            logger.warning("Could not delete the snapshot of task %s: %s", task_id, e)
+
+    def _start_recorder(self, task: Task) -> RunRecorder:
+        """Start recording a run to the event log and metrics, if configured."""
+        observers = [self._metrics.observe] if self._metrics is not None else []
+        if self._event_log is not None:
+            return self._event_log.start_run(task.id, observers=observers)
+        if observers:
+            return RunRecorder.start(
+                run_id=new_run_id(task.id), task_id=task.id, sinks=observers
+            )
+        return RunRecorder.disabled(task.id)
+
+    def _finish(
+        self,
+        task: Task,
+        recorder: RunRecorder,
+        *,
+        passed: bool,
+        stage: str,
+        message: str,
+    ) -> None:
+        """Close the run's event log and persist its summary and LLM usage.
+
+        Args:
+            task: The task that was run.
+            recorder: The run's recorder (holds the usage ledger).
+            passed: Whether the run succeeded.
+            stage: The last stage reached.
+            message: Outcome message.
+        """
+        self._store.record_run(
+            recorder.finish(passed=passed, stage=stage, message=message)
+        )
+        entries = recorder.usage.entries
+        if entries:
+            self._store.record_usage(
+                run_id=recorder.run_id, task_id=task.id, entries=entries
+            )
 
-        # 2. Mark in-progress atomically
-        self._store.update_status(task.id, "in-progress")
+    def _run_task(
+        self, task: Task, recorder: RunRecorder, checkpoint: Checkpoint
+    ) -> PipelineResult:
+        """Execute a claimed task and classify any errors.
 
+        The checkpoint is deleted once the run is over, except after an infra
+        error: the automatic retry (see _retry_infra_errors) resumes from it.
+
+        Args:
+            task: The task to execute (already marked in-progress).
+            recorder: Receives the run's stage events.
+            checkpoint: Progress to resume from.
+
+        Returns:
+            PipelineResult describing the outcome.
+        """
         try:
-            return self._execute(task)
+            result = self._execute(task, recorder, checkpoint)
         except SanityCheckError as e:
             # Sanity check failed: revert task to ready, a bug ticket was created
+            self._drop_checkpoint(task.id)
             self._store.update_status(task.id, "ready")
             logger.warning("Sanity check failed for task %s: %s", task.id, e)
             return PipelineResult(
@@ -128,6 +420,7 @@ class PipelineRunner:
             )
         except (AgentError, LLMError) as e:
             # Task-level error: needs human attention
+            self._drop_checkpoint(task.id)
             self._store.update_status(task.id, "failed")
             logger.error("Task error for task %s: %s", task.id, e)
             return PipelineResult(
@@ -136,105 +429,518 @@ class PipelineRunner:
                 stage_reached="pipeline",
                 message=str(e),
             )
+        self._drop_checkpoint(task.id)
+        return result
 
-    def _execute(self, task: Task) -> PipelineResult:
+    def _execute(
+        self, task: Task, recorder: RunRecorder, checkpoint: Checkpoint
+    ) -> PipelineResult:
         """Run the pipeline stages for a task.
 
         Args:
             task: The task to execute.
+            recorder: Receives an event at every stage boundary.
+            checkpoint: Progress to resume from.
 
         Returns:
             PipelineResult from the final stage outcome.
         """
-        # 3. Sanity check on the base branch
-        self._run_sanity_check(task)
+        parent = self._speculation_parent(task)
+        # 3-4. Sanity check on the base branch, then create the task branch
+        with self._workspace(task, recorder, parent, checkpoint) as (workdir, sha):
+            return self._execute_in(
+                task, recorder, workdir, parent, replace(checkpoint, base_sha=sha)
+            )
 
-        # 4. Create task branch
-        self._git.create_branch(task.id)
-        logger.info("Created branch for task %s", task.id)
+    def _speculation_parent(self, task: Task) -> Task | None:
+        """Return the in-review dependency to build on, in speculative mode."""
+        if self._speculation is None:
+            return None
+        deps = self._store.get_dependencies(task.id)
+        return next((dep for dep in deps if dep.status == "in-review"), None)
 
-        # 5. Build repo context (shared across all stages in this run)
-        context_builder = RepoContextBuilder(config=self._config.context)
-        repo_context = context_builder.build(self._repo_path)
-        rendered = repo_context.render(self._config.context.max_tokens)
+    def _start_point(self, task: Task, parent: Task | None) -> str:
+        """Pin the commit the task branch starts from.
+
+        Args:
+            task: The task being executed.
+            parent: In-review dependency to build on, or None for the base
+                branch.
 
-        # 6. Architect: plan the implementation
-        architect = ArchitectStage(llm=self._llm, models=self._config.models)
-        arch_input = StageInput(
+        Returns:
+            The pinned base-branch commit, or the head of the parent's branch
+            on origin (recorded as the task's speculation).
+
+        Raises:
+            InfraError: If the parent's branch could not be fetched.
+        """
+        if parent is None:
+            return self._base_sync.pin()
+        branch = self._git.branch_name(parent.id)
+        try:
+            self._git.fetch(branch)
+        except GitError as e:
+            raise InfraError(str(e)) from e
+        sha = self._git.rev_parse(f"refs/remotes/origin/{branch}")
+        if sha is None:
+            raise InfraError(f"origin/{branch} not found after fetch")
+        self._store.record_speculation(task.id, parent.id, sha)
+        logger.info("Starting task %s speculatively on %s", task.id, branch)
+        return sha
+
+    @contextlib.contextmanager
+    def _workspace(
+        self,
+        task: Task,
+        recorder: RunRecorder,
+        parent: Task | None,
+        checkpoint: Checkpoint,
+    ) -> Iterator[tuple[Path, str]]:
+        """Prepare the task branch and yield the directory to work in.
+
+        The task branch starts at the base-branch commit pinned by the sync,
+        or at the head of the parent's branch when running speculatively.
+        Without a worktree pool the main working tree is checked out at that
+        commit, sanity-checked and switched to the task branch. With a pool,
+        the task branch is checked out in a pooled worktree, which is
+        sanity-checked and returned to the pool when the block exits.
+
+        When resuming from a checkpoint, the branch starts at the
+        checkpoint's commit instead, the sanity check is skipped (it passed
+        before the checkpoint was taken) and the snapshot of the working
+        tree is restored.
+
+        Args:
+            task: The task being executed.
+            recorder: Receives the sanity and branch stage events.
+            parent: In-review dependency to build on, or None.
+            checkpoint: Progress to resume from.
+
+        Yields:
+            The working directory for the context, coder and QA stages, and
+            the commit the task branch started from.
+
+        Raises:
+            SanityCheckError: If tests on the base branch are failing.
+            InfraError: If the checkpoint's snapshot could not be restored.
+        """
+        resume = checkpoint.step > 0
+        if self._worktrees is None:
+            if resume:
+                base_sha = checkpoint.base_sha
+            else:
+                with recorder.stage("sanity") as span:
+                    span.base_sha = base_sha = self._start_point(task, parent)
+                    self._git.checkout_branch(base_sha)
+                    self._record_sanity(
+                        span, self._run_sanity_check(task, self._repo_path)
+                    )
+            with recorder.stage("branch") as span:
+                self._git.create_branch(task.id, start_point=base_sha, reset=True)
+                if resume:
+                    span.base_sha = base_sha
+                    self._restore(self._git, checkpoint)
+            logger.info("Created branch for task %s", task.id)
+            yield self._repo_path, base_sha
+            return
+
+        with recorder.stage("branch") as span:
+            span.base_sha = base_sha = (
+                checkpoint.base_sha if resume else self._start_point(task, parent)
+            )
+            worktree = self._worktrees.acquire(self._git.branch_name(task.id), base_sha)
+        logger.info("Checked out task %s in worktree %s", task.id, worktree.path)
+        try:
+            if resume:
+                self._restore(self._git.at(worktree.path), checkpoint)
+            else:
+                with recorder.stage("sanity") as span:
+                    self._record_sanity(
+                        span, self._run_sanity_check(task, worktree.path)
+                    )
+            yield worktree.path, base_sha
+        finally:
+            self._worktrees.release(worktree)
+
+    def _restore(self, git: GitOps, checkpoint: Checkpoint) -> None:
+        """Restore a checkpoint's working-tree snapshot, if it has one.
+
+        Raises:
+            InfraError: If the snapshot could not be restored. The checkpoint
+                is reset to the start, so the retry starts over.
+        """
+        if checkpoint.snapshot is None:
+            return
+        try:
+            git.restore_snapshot(checkpoint.snapshot)
+        except GitError as e:
+            self._drop_checkpoint(checkpoint.task_id)
+            self._store.save_checkpoint(
+                Checkpoint(
+                    task_id=checkpoint.task_id,
+                    run_id=checkpoint.run_id,
+                    owner=checkpoint.owner,
+                )
+            )
+            raise InfraError(f"Could not restore checkpoint: {e}") from e
+
+    def _execute_in(
+        self,
+        task: Task,
+        recorder: RunRecorder,
+        workdir: Path,
+        parent: Task | None,
+        checkpoint: Checkpoint,
+    ) -> PipelineResult:
+        """Run the context, architect and coder/review/QA/QC stages in a working tree.
+
+        Args:
+            task: The task to execute.
+            recorder: Receives an event at every stage boundary.
+            workdir: Working tree checked out on the task branch.
+            parent: In-review dependency the branch was built on, or None.
+            checkpoint: Progress to resume from; saved again after every step.
+
+        Returns:
+            PipelineResult from the final stage outcome.
+        """
+        # 5. Build repo context (shared across all stages in this run)
+        with recorder.stage("context"):
+            repo_context = self._context_builder.build(workdir)
+            rendered = repo_context.render(self._config.context.max_tokens)
+
+        # 6-9. Architect, then the Coder retry loop: each candidate is
+        #      reviewed while QA tests it, and QC checks intent once both pass
+        git = self._git if workdir == self._repo_path else self._git.at(workdir)
+        plan_key = CachedPlan(
+            task_id=task.id,
+            input_hash=_digest(task.description, task.context or ""),
+            base_sha=checkpoint.base_sha,
+            context_hash=_digest(rendered),
+            plan="",
+        )
+        budget = self._coding_budget(task, recorder)
+        # Session logs go to the run's directory and are pruned with it
+        agent = (
+            self._agent.for_run(recorder.run_id)
+            if isinstance(self._agent, RunScopedCodingAgent)
+            else self._agent
+        )
+        graph = self._stage_graph(workdir, git, plan_key, budget, agent)
+        state = StageInput(
             task_description=task.description,
             task_context=task.context,
             repo_context=rendered,
-            plan=None,
+            plan=checkpoint.plan,
             last_failure=None,
         )
-        arch_output = architect.execute(arch_input)
-        plan = arch_output.output
-        logger.info("Architect produced plan for task %s", task.id)
+        resume = None
+        if checkpoint.step:
+            resume = Progress(
+                step=checkpoint.step,
+                state=replace(state, diff=git.diff_head()),
+                runs=checkpoint.runs,
+                routes=checkpoint.routes,
+                feedback=checkpoint.feedback,
+                attempt=checkpoint.attempt,
+            )
+        else:
+            resume = self._reuse_plan(plan_key, state, recorder)
+        outcome = graph.run(
+            state,
+            recorder,
+            resume=resume,
+            on_progress=lambda progress: self._save_progress(
+                recorder, git, checkpoint, progress
+            ),
+        )
+        if outcome.passed:
+            logger.info("All checks passed for task %s", task.id)
+            return self._publish(task, recorder, git, parent)
+
+        # The plan may be what failed; plan afresh if the task is retried
+        self._store.delete_plan(task.id)
+        self._store.update_status(task.id, "failed")
+        label = _STAGE_LABELS.get(outcome.stage, outcome.stage)
+        return PipelineResult(
+            task_id=task.id,
+            success=False,
+            stage_reached=outcome.stage,
+            message=(
+                f"{label} failed after {outcome.attempt} attempt(s). "
+                "Task marked failed."
+            ),
+        )
 
-        # 7. Coder + QA retry loop
-        coder = CoderStage(
-            agent=self._agent,
-            config=self._config.coding,
-            working_dir=str(self._repo_path),
+    def _reuse_plan(
+        self, plan_key: CachedPlan, state: StageInput, recorder: RunRecorder
+    ) -> Progress | None:
+        """Skip the Architect if the task's saved plan is still valid.
+
+        Args:
+            plan_key: The task and repository the run would plan for.
+            state: Input of the graph's first step.
+            recorder: Receives a 'plan_reused' event if the plan is reused.
+
+        Returns:
+            Progress starting after the Architect with the saved plan, or
+            None to plan afresh.
+        """
+        cached = self._store.get_plan(plan_key.task_id)
+        if cached is None or not cached.reusable(
+            input_hash=plan_key.input_hash,
+            base_sha=plan_key.base_sha,
+            context_hash=plan_key.context_hash,
+        ):
+            return None
+        logger.info("Reusing the saved plan for task %s", plan_key.task_id)
+        recorder.emit(
+            "plan_reused", stage="architect", message=f"Planned on {cached.base_sha}"
+        )
+        # The Architect is the graph's first step
+        return Progress(
+            step=1,
+            state=replace(state, plan=cached.plan),
+            runs={},
+            routes=(),
+            feedback={},
+            attempt=None,
         )
-        qa = QAStage(config=self._config.qa, repo_path=self._repo_path)
 
-        last_failure: str | None = None
-        max_attempts = self._config.coding.max_retries + 1
+    def _coding_budget(self, task: Task, recorder: RunRecorder) -> CodingBudget:
+        """Derive the Coder's timeout and retries for a task.
 
-        for attempt in range(max_attempts):
+        Args:
+            task: The task to execute.
+            recorder: Receives a 'coding_budget' event if the budget differs
+                from the configured one.
+
+        Returns:
+            The task's coding budget.
+        """
+        config = self._config.coding
+        history = (
+            self._store.list_runs(
+                complexity=task.complexity, limit=_BUDGET_HISTORY_RUNS
+            )
+            if config.adaptive_budgets and task.complexity is not None
+            else []
+        )
+        budget = coding_budget(config, task.complexity, history)
+        if budget.basis != "config":
             logger.info(
-                "Coder attempt %d/%d for task %s", attempt + 1, max_attempts, task.id
+                "Coding budget for task %s: %ds per session, %d retries (%s)",
+                task.id,
+                budget.timeout_seconds,
+                budget.max_retries,
+                budget.basis,
             )
-            coder_input = StageInput(
-                task_description=task.description,
-                task_context=task.context,
-                repo_context=rendered,
-                plan=plan,
-                last_failure=last_failure,
+            recorder.emit(
+                "coding_budget",
+                stage="coder",
+                message=(
+                    f"{budget.timeout_seconds}s per session, "
+                    f"{budget.max_retries} retries (from {budget.basis})"
+                ),
             )
-            coder.execute(coder_input)
+        return budget
+
+    def _keep_plan(
+        self, plan_key: CachedPlan, state: StageInput, output: StageOutput
+    ) -> StageInput:
+        """Save a new plan for reuse and pass it on to the later stages."""
+        self._store.save_plan(replace(plan_key, plan=output.output))
+        return replace(state, plan=output.output)
+
+    def _save_progress(
+        self,
+        recorder: RunRecorder,
+        git: GitOps,
+        checkpoint: Checkpoint,
+        progress: Progress,
+    ) -> None:
+        """Checkpoint the graph's progress, with a snapshot of the working tree.
 
-            qa_input = StageInput(
-                task_description=task.description,
-                task_context=task.context,
-                repo_context=rendered,
-                plan=plan,
-                last_failure=None,
+        A snapshot that cannot be taken skips the checkpoint: resuming from
+        the previous one only repeats work.
+        """
+        try:
+            snapshot = git.snapshot(checkpoint.task_id)
+        except GitError as e:
+            logger.warning("Could not checkpoint task %s: %s", checkpoint.task_id, e)
+            return
+        saved = replace(
+            checkpoint,
+            step=progress.step,
+            plan=progress.state.plan,
+            attempt=progress.attempt,
+            feedback=progress.feedback,
+            runs=progress.runs,
+            routes=progress.routes,
+            snapshot=snapshot,
+        )
+        self._store.save_checkpoint(saved)
+        recorder.checkpoint(saved)
+
+    def _stage_graph(
+        self,
+        workdir: Path,
+        git: GitOps,
+        plan_key: CachedPlan,
+        budget: CodingBudget,
+        agent: CodingAgent,
+    ) -> StageGraph:
+        """Build the stage graph for one task's working tree.
+
+        Args:
+            workdir: Working tree checked out on the task branch.
+            git: GitOps for that working tree.
+            plan_key: Where the Architect's plans are saved for reuse.
+            budget: The Coder's timeout and retries for this task.
+            agent: Coding agent for the Coder and Reviewer of this run.
+
+        Returns:
+            The graph: architect, coder, QA and reviewer side by side, QC.
+        """
+        config = self._config
+        reviewer_nodes = (
+            (
+                Node(
+                    ReviewerStage(
+                        agent=agent,
+                        config=config.reviewer,
+                        working_dir=str(workdir),
+                    )
+                ),
             )
-            qa_output = qa.execute(qa_input)
+            if config.reviewer.enabled
+            else ()
+        )
+        return StageGraph(
+            steps=(
+                (
+                    Node(
+                        ArchitectStage(llm=self._llm, models=config.models),
+                        model=config.models.architect,
+                        then=lambda state, out: self._keep_plan(plan_key, state, out),
+                    ),
+                ),
+                (
+                    Node(
+                        CoderStage(
+                            agent=agent,
+                            config=replace(
+                                config.coding, timeout_seconds=budget.timeout_seconds
+                            ),
+                            working_dir=str(workdir),
+                        ),
+                        retries=budget.max_retries,
+                        then=lambda state, _: replace(state, diff=git.diff_head()),
+                    ),
+                ),
+                (
+                    Node(QAStage(config=config.qa, repo_path=workdir)),
+                    *reviewer_nodes,
+                ),
+                (
+                    Node(
+                        QCStage(llm=self._llm, models=config.models, config=config.qc),
+                        model=config.models.qc,
+                    ),
+                ),
+            ),
+            routes=(
+                Route("qa", "coder"),
+                *(
+                    (
+                        Route(
+                            "reviewer",
+                            "coder",
+                            budget=config.reviewer.max_retries,
+                            on_exhausted="skip",
+                            feedback="Code review requested changes",
+                        ),
+                    )
+                    if config.reviewer.enabled
+                    else ()
+                ),
+                Route(
+                    "qc",
+                    "coder",
+                    feedback="QC found the change does not do what the task asked",
+                ),
+                # Re-plan once; a second escalation fails the task
+                Route("qc", "architect", budget=1, feedback="Intent mismatch (QC)"),
+            ),
+        )
+
+    def _publish(
+        self, task: Task, recorder: RunRecorder, git: GitOps, parent: Task | None
+    ) -> PipelineResult:
+        """Commit the task's changes, push its branch and mark it in-review.
+
+        A task built on an in-review parent is marked 'speculative' instead,
+        until the parent is merged.
+
+        Args:
+            task: The task whose QA passed.
+            recorder: Receives the publish stage events.
+            git: GitOps for the working tree checked out on the task branch.
+            parent: In-review dependency the branch was built on, or None.
 
-            if qa_output.passed:
-                logger.info("QA passed for task %s", task.id)
+        Returns:
+            PipelineResult for the published (or empty) change.
+
+        Raises:
+            InfraError: If the branch could not be pushed.
+        """
+        branch = self._git.branch_name(task.id)
+        with recorder.stage("publish") as span:
+            git.add_all()
+            if not git.has_staged_changes():
+                span.passed = False
+                self._store.update_status(task.id, "failed")
                 return PipelineResult(
                     task_id=task.id,
-                    success=True,
-                    stage_reached="qa",
-                    message="All QA checks passed. Ready for review.",
+                    success=False,
+                    stage_reached="publish",
+                    message="QA passed but the coder made no changes to publish.",
                 )
-
-            last_failure = qa_output.output
-            logger.info(
-                "QA failed (attempt %d/%d) for task %s",
-                attempt + 1,
-                max_attempts,
-                task.id,
+            git.commit(_commit_message(task))
+            try:
+                self._pusher.push(branch)
+            except GitError as e:
+                raise InfraError(str(e)) from e
+            self._store.update_status(
+                task.id, "in-review" if parent is None else "speculative"
+            )
+            span.passed = True
+        logger.info("Pushed %s for task %s", branch, task.id)
+        message = f"All QA checks passed. Pushed {branch} for review."
+        if parent is not None:
+            message = (
+                f"All QA checks passed. Pushed {branch}, provisional until "
+                f"{parent.id} is merged."
             )
-
-        # All retries exhausted
-        self._store.update_status(task.id, "failed")
         return PipelineResult(
-            task_id=task.id,
-            success=False,
-            stage_reached="qa",
-            message=f"QA failed after {max_attempts} attempt(s). Task marked failed.",
+            task_id=task.id, success=True, stage_reached="publish", message=message
         )
 
-    def _run_sanity_check(self, task: Task) -> None:
-        """Checkout the base branch, pull, and run the sanity check.
+    @staticmethod
+    def _record_sanity(span: StageSpan, result: ToolResult) -> None:
+        """Record a sanity check's outcome on its stage span."""
+        span.passed = result.passed
+        span.exit_codes = {result.tool_name: result.return_code}
+
+    def _run_sanity_check(self, task: Task, repo_path: Path) -> ToolResult:
+        """Run the sanity check on a tree checked out at the base branch.
 
         Args:
             task: The task being processed (used for log context only).
+            repo_path: The working tree to test.
+
+        Returns:
+            The sanity check's pytest result.
 
         Raises:
             SanityCheckError: If tests on the base branch are failing.
@@ -244,12 +950,55 @@ class PipelineRunner:
             self._config.git.base_branch,
             task.id,
         )
-        self._git.checkout_branch(self._config.git.base_branch)
-        self._git.pull(self._config.git.base_branch)
-
         checker = SanityChecker(
             store=self._store,
             config=self._config.sanity,
-            repo_path=self._repo_path,
+            repo_path=repo_path,
         )
-        checker.check()
+        return checker.check()
+
+
+def _digest(*parts: str) -> str:
+    """Return a hex digest identifying the given strings."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _pid_alive(pid: int) -> bool:
+    """True if a process with this id is running (on this machine)."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Running, but owned by another user
+        return True
+    return True
+
+
+def _process_token(pid: int) -> str:
+    """Identify a process so that a reused pid does not match it.
+
+    The token holds the pid, the boot id and the process start time where
+    /proc has them, so a runner restarted with the same pid (as in a fresh
+    container) does not pass for the dead one. Elsewhere it is the pid.
+    """
+    try:
+        boot = Path("/proc/sys/kernel/random/boot_id").read_text().strip()
+        stat = Path(f"/proc/{pid}/stat").read_text()
+    except OSError:
+        return str(pid)
+    # Fields after the command name start at field 3; starttime is field 22
+    start = stat.rpartition(")")[2].split()[19]
+    return f"{pid}:{boot}:{start}"
+
+
+def _commit_message(task: Task) -> str:
+    """Build the task branch's commit message from the task description."""
+    summary = task.description.strip().split("\n", 1)[0].strip() or task.id
+    if len(summary) > _COMMIT_SUMMARY_CHARS:
+        summary = summary[: _COMMIT_SUMMARY_CHARS - 1] + "…"
+    return f"smelt: {summary}\n\nTask: {task.id}"
@@ -9,6 +9,8 @@ from __future__ import annotations
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 
+from smelt.db.models import LLMUsage, ToolResult
+
 
 @dataclass(frozen=True)
 class StageInput:
@@ -20,6 +22,10 @@ class StageInput:
         repo_context: Rendered repository context string from tree-sitter.
         plan: Architect's implementation plan (None for the Architect itself).
         last_failure: Last failure output from a prior stage (for retry loops).
+        diff: The Coder's changes against the task branch's start, for stages
+            that review a candidate.
+        last_attempt: True when the retry loop the stage is in has no
+            retries left (e.g. lets QC escalate in 'last_attempt' mode).
     """
 
     task_description: str
@@ -27,6 +33,8 @@ class StageInput:
     repo_context: str
     plan: str | None
     last_failure: str | None
+    diff: str | None = None
+    last_attempt: bool = False
 
 
 @dataclass(frozen=True)
@@ -37,11 +45,17 @@ class StageOutput:
         passed: True if the stage succeeded.
         output: Stage-specific output (plan text, QA summary, agent output, etc.).
         escalate_to: If set, the pipeline should escalate to 'coder' or 'architect'.
+        session_id: Coding agent session id, for stages that run an agent.
+        tool_results: Individual tool results, for stages that run tools.
+        usage: Usage of every LLM call the stage made.
     """
 
     passed: bool
     output: str
     escalate_to: str | None
+    session_id: str | None = None
+    tool_results: tuple[ToolResult, ...] = ()
+    usage: tuple[LLMUsage, ...] = ()
 
 
 class Stage(ABC):
@@ -0,0 +1,383 @@
+"""Built-in profiler for a single pipeline run (`smelt run --profile`).
+
+RunProfiler combines three views of where a run spent its time:
+
+- cProfile, for exact call counts and cumulative times of every function
+  (including the orchestration hot paths: repo context building, SQLite,
+  git and QA subprocesses);
+- a sampling thread that records the run's call stacks in the collapsed
+  "folded" format read by flamegraph.pl, speedscope and inferno;
+- a record of every subprocess the run started, with the smelt function
+  that started it, its exit code and its wall time.
+
+The run's threads are the thread that starts the profiler and the stage
+helper threads (QA and Reviewer side by side). cProfile sees every thread
+(it hooks sys.monitoring, which is interpreter-wide); stack samples and the
+subprocess record are limited to the run's threads, and processes started by
+other threads are left alone.
+
+Profiling is opt-in and adds noticeable overhead, so timings should be read
+relative to each other rather than as absolute numbers.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import json
+import pstats
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from types import FrameType, TracebackType
+from typing import Any
+
+from smelt.pipeline.graph import STAGE_THREAD_PREFIX
+
+PSTATS_FILE_NAME: str = "profile.pstats"
+FOLDED_FILE_NAME: str = "profile.folded"
+SUMMARY_FILE_NAME: str = "profile.json"
+
+_DEFAULT_SAMPLE_INTERVAL_SECONDS: float = 0.005
+_DEFAULT_TOP_FUNCTIONS: int = 25
+_MAX_ARGV_CHARS: int = 120
+
+# (label, source file suffix, function name) of the orchestration hot paths
+_HOT_PATHS: tuple[tuple[str, str, str], ...] = (
+    ("RepoContextBuilder.build", "smelt/pipeline/context.py", "build"),
+    ("GitOps._run", "smelt/git.py", "_run"),
+    ("QAStage._run_tool", "smelt/pipeline/qa.py", "_run_tool"),
+)
+# cProfile reports C functions under the '~' file; SQLite calls are all C
+_SQLITE_LABEL: str = "SQLite (sqlite3 C calls)"
+
+
+@dataclass(frozen=True)
+class FunctionStat:
+    """Aggregated cProfile timings for one function.
+
+    Attributes:
+        name: 'file:line(function)' or a hot-path label.
+        calls: Number of calls, not counting recursive ones.
+        own_seconds: Time spent in the function itself.
+        cumulative_seconds: Time including everything it called.
+    """
+
+    name: str
+    calls: int
+    own_seconds: float
+    cumulative_seconds: float
+
+
+@dataclass(frozen=True)
+class SubprocessCall:
+    """One subprocess started during the profiled run.
+
+    Attributes:
+        command: The command line (truncated).
+        caller: Qualified name of the smelt function that started it.
+        return_code: Exit code (None if the process was never waited on).
+        duration_seconds: Wall time from start until it was reaped.
+    """
+
+    command: str
+    caller: str
+    return_code: int | None
+    duration_seconds: float
+
+
+@dataclass(frozen=True)
+class ProfileFiles:
+    """Paths of the files written by RunProfiler.write().
+
+    Attributes:
+        pstats: cProfile dump (snakeviz, flameprof, `python -m pstats`).
+        folded: Collapsed stacks for flame graph tools.
+        summary: Top functions, hot paths and subprocesses as JSON.
+    """
+
+    pstats: Path
+    folded: Path
+    summary: Path
+
+
+class RunProfiler:
+    """Profiles a run between start() and stop().
+
+    Use as a context manager around the code to profile. Subprocess tracking
+    wraps subprocess.Popen while active; the wrappers only record processes
+    started by the run's threads. Only one profiler should run at a time.
+    """
+
+    def __init__(
+        self, *, sample_interval_seconds: float = _DEFAULT_SAMPLE_INTERVAL_SECONDS
+    ) -> None:
+        """Initialize the profiler.
+
+        Args:
+            sample_interval_seconds: Seconds between stack samples.
+        """
+        self._interval = sample_interval_seconds
+        self._profile = cProfile.Profile()
+        self._stacks: Counter[str] = Counter()
+        self._subprocesses: list[SubprocessCall] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: threading.Thread | None = None
+        self._restore: Callable[[], None] | None = None
+        self._target_thread = 0
+        self.wall_seconds = 0.0
+        self._start = 0.0
+
+    def __enter__(self) -> RunProfiler:
+        """Start profiling."""
+        self.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        """Stop profiling, also when the profiled code raised."""
+        self.stop()
+
+    def start(self) -> None:
+        """Start profiling a run on the calling thread."""
+        self._target_thread = threading.get_ident()
+        self._restore = self._patch_popen()
+        self._stop.clear()
+        self._sampler = threading.Thread(
+            target=self._sample_loop, name="smelt-profiler", daemon=True
+        )
+        self._sampler.start()
+        self._start = time.perf_counter()
+        self._profile.enable()
+
+    def stop(self) -> None:
+        """Stop profiling and restore subprocess.Popen."""
+        self._profile.disable()
+        self.wall_seconds = time.perf_counter() - self._start
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+        if self._restore is not None:
+            self._restore()
+            self._restore = None
+
+    @property
+    def subprocesses(self) -> list[SubprocessCall]:
+        """Every subprocess reaped during the run, in completion order."""
+        with self._lock:
+            return list(self._subprocesses)
+
+    @property
+    def stacks(self) -> dict[str, int]:
+        """Sample counts per folded stack ('outer;...;inner')."""
+        with self._lock:
+            return dict(self._stacks)
+
+    def top_functions(self, limit: int = _DEFAULT_TOP_FUNCTIONS) -> list[FunctionStat]:
+        """Return the functions with the highest cumulative time.
+
+        Args:
+            limit: Maximum number of functions to return.
+
+        Returns:
+            Functions ordered by cumulative time, slowest first.
+        """
+        stats = _raw_stats(self._profile)
+        ranked = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)
+        return [
+            FunctionStat(
+                name=_function_name(func),
+                calls=calls,
+                own_seconds=own,
+                cumulative_seconds=cumulative,
+            )
+            for func, (calls, _, own, cumulative, _) in ranked[:limit]
+        ]
+
+    def hot_paths(self) -> list[FunctionStat]:
+        """Return the timings of the orchestration hot paths.
+
+        Returns:
+            One entry per hot path (repo context, git, QA tools, SQLite),
+            with zero calls if it never ran.
+        """
+        stats = _raw_stats(self._profile)
+        result = []
+        for label, file_suffix, name in _HOT_PATHS:
+            matches = [
+                v
+                for (file, _, func), v in stats.items()
+                if func == name and file.replace("\\", "/").endswith(file_suffix)
+            ]
+            result.append(_sum_stats(label, matches))
+        sqlite = [v for (file, _, func), v in stats.items() if _is_sqlite(file, func)]
+        result.append(_sum_stats(_SQLITE_LABEL, sqlite))
+        return result
+
+    def write(self, directory: Path) -> ProfileFiles:
+        """Write the profile files into a directory.
+
+        Args:
+            directory: Output directory (usually the run's log directory).
+
+        Returns:
+            The paths written.
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        files = ProfileFiles(
+            pstats=directory / PSTATS_FILE_NAME,
+            folded=directory / FOLDED_FILE_NAME,
+            summary=directory / SUMMARY_FILE_NAME,
+        )
+        self._profile.dump_stats(files.pstats)
+        files.folded.write_text(
+            "".join(f"{stack} {n}\n" for stack, n in sorted(self.stacks.items())),
+            encoding="utf-8",
+        )
+        summary = {
+            "wall_seconds": round(self.wall_seconds, 6),
+            "hot_paths": [asdict(s) for s in self.hot_paths()],
+            "top_functions": [asdict(s) for s in self.top_functions()],
+            "subprocesses": [asdict(s) for s in self.subprocesses],
+        }
+        files.summary.write_text(json.dumps(summary, indent=2) + "\n", "utf-8")
+        return files
+
+    def _in_run(self, thread: threading.Thread) -> bool:
+        """True for the profiled thread and the stage helper threads."""
+        return thread.ident == self._target_thread or thread.name.startswith(
+            STAGE_THREAD_PREFIX
+        )
+
+    def _sample_loop(self) -> None:
+        """Record the stacks of the run's threads every interval."""
+        while not self._stop.wait(self._interval):
+            frames = sys._current_frames()
+            stacks = [
+                _fold(frames[thread.ident])
+                for thread in threading.enumerate()
+                if thread.ident in frames and self._in_run(thread)
+            ]
+            with self._lock:
+                self._stacks.update(stacks)
+
+    def _patch_popen(self) -> Callable[[], None]:
+        """Time every Popen from construction until it is first reaped.
+
+        subprocess.run() and the Goose adapter both end with Popen.wait(), so
+        patching __init__ and wait covers every subprocess smelt starts.
+
+        Returns:
+            A callable that restores the original methods.
+        """
+        original_init = subprocess.Popen.__init__
+        original_wait = subprocess.Popen.wait
+        profiler = self
+
+        # Any: the wrappers forward Popen's ~25 parameters untouched, whatever
+        # their types, and accept a Popen of either text or bytes streams
+        def init(popen: subprocess.Popen[Any], args: Any, *a: Any, **kw: Any) -> None:
+            original_init(popen, args, *a, **kw)
+            if not profiler._in_run(threading.current_thread()):
+                return
+            popen._smelt_profile = (  # type: ignore[attr-defined]
+                time.perf_counter(),
+                _command_line(args),
+                _smelt_caller(sys._getframe(1)),
+            )
+
+        def wait(popen: subprocess.Popen[Any], *a: Any, **kw: Any) -> int:
+            code = original_wait(popen, *a, **kw)
+            pending = popen.__dict__.pop("_smelt_profile", None)
+            if pending is not None:
+                started, command, caller = pending
+                call = SubprocessCall(
+                    command=command,
+                    caller=caller,
+                    return_code=code,
+                    duration_seconds=time.perf_counter() - started,
+                )
+                with profiler._lock:
+                    profiler._subprocesses.append(call)
+            return code
+
+        subprocess.Popen.__init__ = init  # type: ignore[method-assign,assignment]
+        subprocess.Popen.wait = wait  # type: ignore[method-assign,assignment]
+
+        def restore() -> None:
+            subprocess.Popen.__init__ = original_init  # type: ignore[method-assign]
+            subprocess.Popen.wait = original_wait  # type: ignore[method-assign]
+
+        return restore
+
+
+# pstats entry: (primitive calls, total calls, own time, cumulative, callers)
+_StatEntry = tuple[int, int, float, float, object]
+
+
+def _raw_stats(profile: cProfile.Profile) -> dict[tuple[str, int, str], _StatEntry]:
+    """Return cProfile's per-function stats table."""
+    stats: dict[tuple[str, int, str], _StatEntry] = pstats.Stats(profile).stats  # type: ignore[attr-defined]
+    return stats
+
+
+def _sum_stats(label: str, entries: list[_StatEntry]) -> FunctionStat:
+    """Aggregate several stats entries under one label."""
+    return FunctionStat(
+        name=label,
+        calls=sum(e[0] for e in entries),
+        own_seconds=sum(e[2] for e in entries),
+        cumulative_seconds=sum(e[3] for e in entries),
+    )
+
+
+def _function_name(func: tuple[str, int, str]) -> str:
+    """Render a cProfile function key as 'file:line(function)'."""
+    file, line, name = func
+    return name if file == "~" else f"{file}:{line}({name})"
+
+
+def _is_sqlite(file: str, func: str) -> bool:
+    """True for cProfile's entries of sqlite3 C methods."""
+    return file == "~" and "sqlite3" in func
+
+
+def _fold(frame: FrameType | None) -> str:
+    """Render a stack as 'module:function;...' from outermost to innermost."""
+    names = []
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "?")
+        names.append(f"{module}:{frame.f_code.co_qualname}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def _smelt_caller(frame: FrameType | None) -> str:
+    """Return the innermost smelt function on a stack (outside this module)."""
+    while frame is not None:
+        module = str(frame.f_globals.get("__name__", ""))
+        if module.startswith("smelt.") and module != __name__:
+            return f"{module}:{frame.f_code.co_qualname}"
+        frame = frame.f_back
+    return "?"
+
+
+def _command_line(args: object) -> str:
+    """Render Popen args as a short command line."""
+    if isinstance(args, list | tuple):
+        text = " ".join(str(a) for a in args)
+    else:
+        text = str(args)
+    if len(text) > _MAX_ARGV_CHARS:
+        return text[: _MAX_ARGV_CHARS - 1] + "…"
+    return text
@@ -0,0 +1,190 @@
+"""Speculative execution on top of dependencies that are still in review.
+
+Tasks are normally released only once every dependency is merged, so a
+chain of tasks serializes on human review. With `git.speculative` enabled,
+a worker that finds nothing executable may claim a task whose only unmerged
+dependency is in review, and build it on that dependency's branch. The
+result is pushed but kept provisional in the 'speculative' status until
+SpeculationReconciler sees the parent resolve:
+
+- parent merged: once a fresh fetch of the base branch holds the parent's
+  changes, the task's own commits are rebased onto it and the task is
+  requeued with a checkpoint that resumes the pipeline at QA on the rebased
+  tree, so the result is checked again before it goes to review;
+- parent branch moved, or parent left review without being merged: the
+  provisional branch is deleted from origin and the task is 'ready' again.
+
+Every worker runs its own reconciler. Each resolution is a conditional
+store update on the task's current speculation, so when two reconcilers
+act on the same listing only one of them promotes or invalidates the task.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import logging
+import time
+from collections.abc import Iterator
+
+from smelt.db.models import Checkpoint, Speculation
+from smelt.db.store import TaskStore
+from smelt.exceptions import GitError
+from smelt.git import BaseBranchSync, GitOps, WorktreePool
+
+logger = logging.getLogger(__name__)
+
+
+class SpeculationReconciler:
+    """Promotes or invalidates provisional results when their parent changes.
+
+    Runs at most once per interval, since checking whether an in-review
+    parent moved costs a fetch of its branch.
+    """
+
+    def __init__(
+        self,
+        *,
+        store: TaskStore,
+        git: GitOps,
+        base_sync: BaseBranchSync,
+        worktrees: WorktreePool | None,
+        interval_seconds: float,
+        verify_step: int,
+    ) -> None:
+        """Initialize the reconciler.
+
+        Args:
+            store: Task store holding the speculative tasks.
+            git: GitOps for the main repository.
+            base_sync: Pins the base-branch commit promoted tasks rebase onto.
+            worktrees: Worktree pool to rebase in. Without one, the main
+                working tree is checked out on the task branch.
+            interval_seconds: Minimum seconds between two reconciliations.
+            verify_step: Stage-graph step a promoted task resumes at (the
+                step that runs QA on a candidate).
+        """
+        self._store = store
+        self._git = git
+        self._base_sync = base_sync
+        self._worktrees = worktrees
+        self._interval = interval_seconds
+        self._verify_step = verify_step
+        self._last: float | None = None
+
+    def reconcile(self) -> int:
+        """Check every speculative task against its parent.
+
+        Returns:
+            The number of tasks requeued, to be verified or redone (0 if the
+            interval has not elapsed yet).
+        """
+        now = time.monotonic()
+        if self._last is not None and now - self._last < self._interval:
+            return 0
+        self._last = now
+
+        changed = 0
+        for spec in self._store.speculations():
+            if spec.parent_status == "merged":
+                changed += self._promote(spec)
+            elif spec.parent_status != "in-review":
+                changed += self._invalidate(spec, "its dependency left review")
+            elif self._parent_moved(spec):
+                changed += self._invalidate(spec, "its dependency's branch changed")
+        return changed
+
+    def _parent_moved(self, spec: Speculation) -> bool:
+        """True if the parent's branch on origin no longer is at parent_sha."""
+        branch = self._git.branch_name(spec.parent_id)
+        try:
+            self._git.fetch(branch)
+        except GitError as e:
+            logger.warning("Could not fetch %s: %s", branch, e)
+            return False
+        return self._git.rev_parse(f"refs/remotes/origin/{branch}") != spec.parent_sha
+
+    def _invalidate(self, spec: Speculation, reason: str) -> int:
+        """Discard a provisional result and make its task ready again."""
+        if not self._store.resolve_speculation(spec.task_id, spec.parent_sha, "ready"):
+            return 0
+        self._delete_remote(spec.task_id)
+        logger.info("Speculative task %s invalidated: %s", spec.task_id, reason)
+        return 1
+
+    def _promote(self, spec: Speculation) -> int:
+        """Rebase a provisional result onto the base branch and requeue it.
+
+        The base is fetched afresh: a cached commit may predate the parent's
+        merge, and rebasing onto it would drop the parent's changes. Until
+        the base holds them, the task stays speculative.
+        """
+        try:
+            base_sha = self._base_sync.pin(fresh=True)
+            merged = self._git.contains(spec.parent_sha, base_sha)
+        except GitError as e:
+            logger.warning("Could not check the merge of %s: %s", spec.parent_id, e)
+            return 0
+        if not merged:
+            logger.info(
+                "Speculative task %s waits for %s to reach the base branch",
+                spec.task_id,
+                spec.parent_id,
+            )
+            return 0
+        if not self._store.resolve_speculation(
+            spec.task_id, spec.parent_sha, "in-progress"
+        ):
+            return 0
+        branch = self._git.branch_name(spec.task_id)
+        try:
+            tip = self._git.rev_parse(f"refs/heads/{branch}")
+            if tip is None:
+                raise GitError(f"Branch {branch} not found")
+            with self._checkout(branch, tip) as git:
+                git.rebase(base_sha, spec.parent_sha)
+                snapshot = git.snapshot(spec.task_id)
+        except GitError as e:
+            logger.warning("Could not rebase speculative task %s: %s", spec.task_id, e)
+            self._store.update_status(spec.task_id, "ready")
+            self._delete_remote(spec.task_id)
+            return 1
+        plan = self._store.get_plan(spec.task_id)
+        self._store.save_checkpoint(
+            Checkpoint(
+                task_id=spec.task_id,
+                run_id="",
+                owner="",
+                base_sha=base_sha,
+                step=self._verify_step,
+                plan=plan.plan if plan is not None else None,
+                attempt=1,
+                runs={"coder": 1},
+                snapshot=snapshot,
+            )
+        )
+        # The verified result is published afresh
+        self._delete_remote(spec.task_id)
+        self._store.update_status(spec.task_id, "ready")
+        logger.info("Speculative task %s rebased and queued for QA", spec.task_id)
+        return 1
+
+    @contextlib.contextmanager
+    def _checkout(self, branch: str, tip: str) -> Iterator[GitOps]:
+        """Check out a task branch and yield a GitOps for that working tree."""
+        if self._worktrees is None:
+            self._git.checkout_branch(branch)
+            yield self._git
+            return
+        worktree = self._worktrees.acquire(branch, tip)
+        try:
+            yield self._git.at(worktree.path)
+        finally:
+            self._worktrees.release(worktree)
+
+    def _delete_remote(self, task_id: str) -> None:
+        """Delete a task's provisional branch from origin, if it is there."""
+        branch = self._git.branch_name(task_id)
+        try:
+            self._git.delete_remote_branch(branch)
+        except GitError as e:
+            logger.warning("Could not delete %s from origin: %s", branch, e)
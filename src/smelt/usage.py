@@ -0,0 +1,80 @@
+"""Per-run accumulation of LLM token usage and cost.
+
+A UsageLedger collects every LLM call made during one pipeline run, tagged
+with the stage that made it, and rolls the calls up per stage, per model and
+in total for the run's result.json and the roadmap database.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections.abc import Callable, Iterable, Sequence
+
+from smelt.db.models import LLMUsage, UsageTotals
+
+
+class UsageLedger:
+    """Accumulates the LLM calls of one run. Thread-safe."""
+
+    def __init__(self) -> None:
+        """Initialize an empty ledger."""
+        self._entries: list[tuple[str, LLMUsage]] = []
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, usages: Iterable[LLMUsage]) -> None:
+        """Record LLM calls made by a stage.
+
+        Args:
+            stage: Name of the stage that made the calls.
+            usages: Usage of each call.
+        """
+        with self._lock:
+            self._entries.extend((stage, usage) for usage in usages)
+
+    @property
+    def entries(self) -> list[tuple[str, LLMUsage]]:
+        """Every recorded call as (stage, usage), in order."""
+        with self._lock:
+            return list(self._entries)
+
+    def total(self) -> UsageTotals:
+        """Return the usage of the whole run."""
+        return summarize("total", [usage for _, usage in self.entries])
+
+    def by_stage(self) -> dict[str, UsageTotals]:
+        """Return the usage per stage name."""
+        return self._group(lambda stage, _: stage)
+
+    def by_model(self) -> dict[str, UsageTotals]:
+        """Return the usage per model."""
+        return self._group(lambda _, usage: usage.model)
+
+    def _group(self, key: Callable[[str, LLMUsage], str]) -> dict[str, UsageTotals]:
+        """Summarize the calls per group name, as key(stage, usage) gives it."""
+        groups: dict[str, list[LLMUsage]] = {}
+        for stage, usage in self.entries:
+            groups.setdefault(key(stage, usage), []).append(usage)
+        return {name: summarize(name, usages) for name, usages in groups.items()}
+
+
+def summarize(key: str, usages: Sequence[LLMUsage]) -> UsageTotals:
+    """Aggregate LLM calls into totals.
+
+    Args:
+        key: Label for the group (stage, model, ...).
+        usages: The calls to aggregate.
+
+    Returns:
+        The summed usage. Calls without a cost estimate are counted in
+        unpriced_calls rather than treated as free.
+    """
+    return UsageTotals(
+        key=key,
+        calls=len(usages),
+        prompt_tokens=sum(u.prompt_tokens for u in usages),
+        completion_tokens=sum(u.completion_tokens for u in usages),
+        cached_tokens=sum(u.cached_tokens for u in usages),
+        latency_seconds=sum(u.latency_seconds for u in usages),
+        cost_usd=sum(u.cost_usd for u in usages if u.cost_usd is not None),
+        unpriced_calls=sum(1 for u in usages if u.cost_usd is None),
+    )
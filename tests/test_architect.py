@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 from smelt.config import ModelsConfig
+from smelt.db.models import LLMResponse, LLMUsage
 from smelt.pipeline.architect import ArchitectStage
 from smelt.pipeline.stages import StageInput
 
@@ -22,7 +23,7 @@ class _FakeLLM:
         user_prompt: str,
         max_tokens: int = 4096,
         temperature: float = 0.0,
-    ) -> str:
+    ) -> LLMResponse:
         self.calls.append(
             {
                 "model": model,
@@ -32,7 +33,10 @@ class _FakeLLM:
                 "temperature": temperature,
             }
         )
-        return self.response
+        return LLMResponse(
+            content=self.response,
+            usage=LLMUsage(model=model, prompt_tokens=100, completion_tokens=20),
+        )
 
 
 def _make_input(
@@ -116,3 +120,11 @@ def test_architect_name() -> None:
     llm = _FakeLLM()
     stage = ArchitectStage(llm=llm, models=ModelsConfig())
     assert stage.name == "architect"
+
+
+def test_architect_reports_llm_usage() -> None:
+    stage = ArchitectStage(llm=_FakeLLM(), models=ModelsConfig())
+    output = stage.execute(_make_input())
+    assert len(output.usage) == 1
+    assert output.usage[0].model == ModelsConfig().architect
+    assert output.usage[0].prompt_tokens == 100
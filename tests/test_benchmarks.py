@@ -0,0 +1,54 @@
+"""Smoke tests for the pipeline benchmark harness."""
+
+from __future__ import annotations
+
+import json
+import subprocess
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from benchmarks.instrument import Instrumentation
+from benchmarks.pipeline_bench import BenchmarkParams, main, run_benchmark
+from smelt.pipeline.qa import QAStage
+
+
+def test_run_benchmark_reports_stages_and_subprocesses(tmp_path: Path) -> None:
+    params = BenchmarkParams(tasks=2, modules=3, functions_per_module=2, qa_failures=1)
+
+    report = run_benchmark(params, tmp_path)
+
+    assert report.succeeded == 2
+    assert report.stages["qa"].calls == 4  # one failing attempt + one pass each
+    assert report.stages["coder"].calls == 4
+    assert report.stages["reviewer"].calls == 4  # alongside every QA run
+    assert report.stages["context"].calls == 2
+    assert report.subprocesses["pytest"] == 6  # sanity + two QA runs per task
+    assert report.subprocesses["git"] > 0
+    assert report.peak_rss_kib > 0
+    assert report.tasks_per_hour > 0
+    assert "qa" in report.render()
+
+
+def test_instrumentation_restores_originals() -> None:
+    execute = QAStage.__dict__["execute"]
+    popen_init = subprocess.Popen.__init__
+
+    with Instrumentation().installed():
+        assert QAStage.__dict__["execute"] is not execute
+
+    assert QAStage.__dict__["execute"] is execute
+    assert subprocess.Popen.__init__ is popen_init
+
+
+def test_cli_writes_json_report(tmp_path: Path) -> None:
+    out = tmp_path / "bench.json"
+    result = CliRunner().invoke(
+        main, ["--tasks", "1", "--modules", "1", "--json", str(out)]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "tasks: 1/1 passed" in result.output
+    data = json.loads(out.read_text())
+    assert data["succeeded"] == 1
+    assert "tasks_per_hour" in data
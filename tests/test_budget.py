@@ -0,0 +1,106 @@
+"""Tests for per-task coding budgets."""
+
+from __future__ import annotations
+
+from dataclasses import replace
+
+import pytest
+
+from smelt.config import CodingConfig
+from smelt.db.models import RunRecord
+from smelt.pipeline.budget import CodingBudget, coding_budget
+
+
+def _run(duration: float, attempts: int, *, passed: bool = True) -> RunRecord:
+    return RunRecord(
+        run_id="r",
+        task_id="t",
+        passed=passed,
+        stage_reached="publish",
+        message="ok",
+        attempts=attempts,
+        duration_seconds=duration,
+        prompt_tokens=0,
+        completion_tokens=0,
+        cost_usd=0.0,
+        finished_at="2026-03-01 10:00:00",
+    )
+
+
+def test_task_without_complexity_keeps_the_configured_budget() -> None:
+    config = CodingConfig(timeout_seconds=600, max_retries=3)
+    assert coding_budget(config, None, [_run(10.0, 1)] * 5) == CodingBudget(
+        600, 3, "config"
+    )
+
+
+def test_disabled_adaptive_budgets_keep_the_configured_budget() -> None:
+    config = CodingConfig(adaptive_budgets=False)
+    assert coding_budget(config, 9, []) == CodingBudget(600, 3, "config")
+
+
+@pytest.mark.parametrize(
+    ("complexity", "timeout", "retries"),
+    [(1, 120, 2), (3, 360, 2), (5, 600, 3), (8, 960, 4), (10, 1200, 4)],
+)
+def test_complexity_scales_the_budget(
+    complexity: int, timeout: int, retries: int
+) -> None:
+    budget = coding_budget(CodingConfig(), complexity, [])
+    assert budget == CodingBudget(timeout, retries, "complexity")
+
+
+def test_timeout_is_clamped() -> None:
+    config = CodingConfig(
+        timeout_seconds=3000, min_timeout_seconds=100, max_timeout_seconds=2000
+    )
+    assert coding_budget(config, 10, []).timeout_seconds == 2000
+    assert (
+        coding_budget(replace(config, timeout_seconds=300), 1, []).timeout_seconds
+        == 100
+    )
+
+
+def test_simple_task_without_retries_stays_at_zero() -> None:
+    assert coding_budget(CodingConfig(max_retries=0), 1, []).max_retries == 0
+
+
+def test_history_raises_the_retries() -> None:
+    # Per attempt: 100s, 100s, 100s, 150s, 400s; 95th percentile 400s.
+    # Retries used: 0, 1, 2, 0, 0; 95th percentile 2
+    history = [
+        _run(100.0, 1),
+        _run(200.0, 2),
+        _run(300.0, 3),
+        _run(150.0, 1),
+        _run(400.0, 1),
+    ]
+    budget = coding_budget(CodingConfig(max_retries=1), 5, history)
+    # One retry more than configured at most
+    assert budget == CodingBudget(600, 2, "history")
+
+
+def test_first_attempts_are_not_counted_as_retries() -> None:
+    # Every run used exactly the configured 3 retries (4 Coder attempts)
+    budget = coding_budget(CodingConfig(max_retries=3), 5, [_run(400.0, 4)] * 5)
+    assert budget == CodingBudget(600, 3, "complexity")
+
+
+def test_history_never_lowers_the_budget() -> None:
+    # Every similar task passed first try, quickly
+    budget = coding_budget(CodingConfig(), 8, [_run(30.0, 1)] * 5)
+    assert budget == CodingBudget(960, 4, "complexity")
+
+
+def test_failed_runs_raise_the_budget() -> None:
+    # Two runs used up 4 attempts and timed out on each (~960s per attempt)
+    history = [_run(300.0, 1)] * 3 + [_run(3840.0, 4, passed=False)] * 2
+    budget = coding_budget(CodingConfig(max_retries=2), 5, history)
+    assert budget == CodingBudget(1440, 3, "history")
+
+
+def test_too_little_history_falls_back_to_complexity() -> None:
+    # Runs without coder attempts say nothing about coding time
+    history = [_run(50.0, 1)] * 4 + [_run(50.0, 0)]
+    budget = coding_budget(CodingConfig(), 5, history)
+    assert budget == CodingBudget(600, 3, "complexity")
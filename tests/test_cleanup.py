@@ -0,0 +1,160 @@
+"""Tests for stale branch and worktree cleanup."""
+
+from __future__ import annotations
+
+import shutil
+import sqlite3
+import subprocess
+from collections.abc import Iterator
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+from smelt.cleanup import RepoCleaner
+from smelt.config import GitConfig
+from smelt.db.schema import init_db
+from smelt.db.store import TaskStore
+from smelt.exceptions import GitError
+from smelt.git import GitOps, WorktreePool
+
+
+@pytest.fixture
+def store() -> TaskStore:
+    conn = sqlite3.connect(":memory:")
+    init_db(conn)
+    return TaskStore(conn)
+
+
+@pytest.fixture
+def git(tmp_path: Path) -> Iterator[GitOps]:
+    repo = tmp_path / "repo"
+    repo.mkdir()
+
+    def run(*args: str) -> None:
+        subprocess.run(["git", *args], cwd=repo, check=True, capture_output=True)
+
+    run("init", "-q", "-b", "main")
+    (repo / "README.md").write_text("hello\n")
+    run("add", ".")
+    run("-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "init")
+    ops = GitOps(repo, GitConfig(base_branch="main"))
+    yield ops
+    ops.close()
+
+
+def _task_with_branch(store: TaskStore, git: GitOps, status: str) -> str:
+    task = store.add_task(f"{status} task")
+    store.update_status(task.id, status)
+    git._run("branch", git.branch_name(task.id), "main")
+    return git.branch_name(task.id)
+
+
+def _cleaner(store: TaskStore, git: GitOps) -> RepoCleaner:
+    return RepoCleaner(store=store, git=git, worktree_root=_root(git))
+
+
+def _root(git: GitOps) -> Path:
+    return git.repo_path / ".smelt" / "worktrees"
+
+
+def test_plan_keeps_branches_of_live_tasks(store: TaskStore, git: GitOps) -> None:
+    failed = _task_with_branch(store, git, "failed")
+    merged = _task_with_branch(store, git, "merged")
+    ready = _task_with_branch(store, git, "ready")
+    in_review = _task_with_branch(store, git, "in-review")
+    in_progress = _task_with_branch(store, git, "in-progress")
+    speculative = _task_with_branch(store, git, "speculative")
+    git._run("branch", "smelt/deleted-task", "main")
+    git._run("branch", "feature/mine", "main")
+
+    plan = _cleaner(store, git).plan()
+
+    assert set(plan.branches) == {failed, merged, ready, "smelt/deleted-task"}
+    assert plan.branches[failed] == git._run("rev-parse", "main")
+    assert in_review not in plan.branches
+    assert in_progress not in plan.branches
+    assert speculative not in plan.branches
+    assert plan.worktrees == ()
+    assert plan.empty is False
+
+
+def test_plan_protects_checked_out_branches(store: TaskStore, git: GitOps) -> None:
+    current = _task_with_branch(store, git, "failed")
+    elsewhere = _task_with_branch(store, git, "failed")
+    git._run("checkout", "-q", current)
+    outside = git.repo_path.parent / "outside"
+    git._run("worktree", "add", "-q", str(outside), elsewhere)
+    detached = git.repo_path.parent / "detached"
+    git._run("worktree", "add", "-q", "--detach", str(detached))
+
+    plan = _cleaner(store, git).plan()
+
+    assert plan.branches == {}
+    assert plan.empty is True
+
+
+def test_plan_selects_idle_stale_and_missing_pool_worktrees(
+    store: TaskStore, git: GitOps
+) -> None:
+    pool = WorktreePool(git, root=_root(git), max_idle=5, idle_seconds=3600)
+    idle = pool.acquire(_task_with_branch(store, git, "failed"), "main")
+    pool.release(idle)
+    stale = pool.acquire(_task_with_branch(store, git, "failed"), "main")
+    live = pool.acquire(_task_with_branch(store, git, "in-progress"), "main")
+    missing = pool.acquire(_task_with_branch(store, git, "in-review"), "main")
+    shutil.rmtree(missing.path)
+
+    plan = _cleaner(store, git).plan()
+
+    assert set(plan.worktrees) == {idle.path, stale.path, missing.path}
+    assert live.path not in plan.worktrees
+    assert stale.branch in plan.branches
+    assert live.branch not in plan.branches
+
+
+def test_apply_deletes_in_one_transaction(
+    store: TaskStore, git: GitOps, mocker: MagicMock
+) -> None:
+    pool = WorktreePool(git, root=_root(git), max_idle=5, idle_seconds=3600)
+    worktree = pool.acquire(_task_with_branch(store, git, "failed"), "main")
+    other = _task_with_branch(store, git, "merged")
+    kept = _task_with_branch(store, git, "in-review")
+    cleaner = _cleaner(store, git)
+    plan = cleaner.plan()
+    run = mocker.spy(git, "_run")
+
+    cleaner.apply(plan)
+    commands = [c.args for c in run.call_args_list]
+
+    assert git.list_branches("smelt/") == {kept: git._run("rev-parse", "main")}
+    assert not worktree.path.exists()
+    update_refs = [c for c in run.call_args_list if c.args[0] == "update-ref"]
+    assert len(update_refs) == 1
+    assert f"delete refs/heads/{other} " in update_refs[0].kwargs["stdin"]
+    assert commands[-1] == ("gc", "--auto", "--quiet")
+    assert cleaner.plan().empty is True
+
+
+def test_apply_deletes_nothing_if_a_branch_moved(store: TaskStore, git: GitOps) -> None:
+    first = _task_with_branch(store, git, "failed")
+    second = _task_with_branch(store, git, "failed")
+    cleaner = _cleaner(store, git)
+    plan = cleaner.plan()
+    git._run(
+        "-c",
+        "user.name=t",
+        "-c",
+        "user.email=t@t",
+        "commit",
+        "-q",
+        "--allow-empty",
+        "-m",
+        "x",
+    )
+    git._run("branch", "-f", second, "HEAD")
+
+    with pytest.raises(GitError):
+        cleaner.apply(plan)
+
+    assert set(git.list_branches("smelt/")) == {first, second}
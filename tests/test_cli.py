@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+import sqlite3
+import subprocess
 from pathlib import Path
 from unittest.mock import MagicMock
 
@@ -117,6 +119,255 @@ class TestRunCommand:
         assert task.id in result.output
 
 
+def _free_port() -> int:
+    import socket
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+class TestAgentWiring:
+    def test_run_verbose_streams_agent_output(self, mocker: MagicMock) -> None:
+        from smelt.cli import _print_agent_line
+
+        _mock_runner(mocker, True, "qa", "Done.")
+        mock_make_agent = mocker.patch("smelt.cli._make_agent")
+        runner = CliRunner()
+
+        result = runner.invoke(cli, ["run", "--verbose"])
+        assert result.exit_code == 0
+        assert mock_make_agent.call_args.kwargs["on_output"] is _print_agent_line
+
+        result = runner.invoke(cli, ["run"])
+        assert result.exit_code == 0
+        assert mock_make_agent.call_args.kwargs["on_output"] is None
+
+    def test_make_agent_logs_and_monitors(self, tmp_path: Path) -> None:
+        from smelt.agents.monitors import RepeatedLineMonitor
+        from smelt.cli import _make_agent
+        from smelt.config import ObservabilityConfig, SmeltConfig
+
+        config = SmeltConfig(
+            observability=ObservabilityConfig(log_dir=str(tmp_path / "runs"))
+        )
+        agent = _make_agent(config)
+
+        assert agent._log_dir == tmp_path / "runs"
+        assert agent._on_output is None
+        assert agent._monitor_factory is not None
+        monitors = agent._monitor_factory()
+        assert isinstance(monitors[0], RepeatedLineMonitor)
+
+    def test_run_records_events_and_closes_log(self, mocker: MagicMock) -> None:
+        _mock_runner(mocker, True, "qa", "Done.")
+        mock_runner_cls = mocker.patch(
+            "smelt.pipeline.runner.PipelineRunner",
+            return_value=MagicMock(),
+        )
+        mock_make_log = mocker.patch("smelt.cli._make_event_log")
+        runner = CliRunner()
+
+        runner.invoke(cli, ["run"])
+
+        event_log = mock_make_log.return_value
+        assert mock_runner_cls.call_args.kwargs["event_log"] is event_log
+        event_log.close.assert_called_once()
+        metrics = mock_runner_cls.call_args.kwargs["metrics"]
+        assert metrics.workers.value() == 1
+
+    def test_serve_metrics_over_http_and_textfile(self, tmp_path: Path) -> None:
+        import urllib.request
+
+        from smelt.cli import _get_db, _serve_metrics
+        from smelt.config import ObservabilityConfig, SmeltConfig
+
+        _get_db().add_task(description="queued")
+        textfile = tmp_path / "metrics" / "smelt.prom"
+        config = SmeltConfig(
+            observability=ObservabilityConfig(
+                metrics_port=0, metrics_textfile=str(textfile)
+            )
+        )
+        with _serve_metrics(config, workers=3) as metrics:
+            assert metrics.workers.value() == 3
+        text = textfile.read_text()
+        assert 'smelt_tasks{status="ready"} 1' in text
+        assert "smelt_workers 3" in text
+
+        config = SmeltConfig(
+            observability=ObservabilityConfig(metrics_port=_free_port())
+        )
+        with _serve_metrics(config, workers=1):
+            url = f"http://127.0.0.1:{config.observability.metrics_port}/metrics"
+            with urllib.request.urlopen(url) as response:
+                body = response.read().decode()
+        assert 'smelt_tasks{status="ready"} 1' in body
+
+    def test_run_profile_writes_to_run_directory(
+        self, mocker: MagicMock, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+    ) -> None:
+        from smelt.pipeline.runner import PipelineResult
+
+        def run(task: object) -> PipelineResult:
+            subprocess.run(["git", "--version"], capture_output=True, check=True)
+            return PipelineResult(
+                task_id="t1",
+                success=True,
+                stage_reached="qa",
+                message="ok",
+                run_id="r1",
+            )
+
+        _mock_runner(mocker, True, "qa", "ok")
+        mocker.patch("smelt.pipeline.runner.PipelineRunner").return_value.run = run
+        monkeypatch.chdir(tmp_path)
+
+        result = CliRunner().invoke(cli, ["run", "--profile"])
+
+        assert result.exit_code == 0
+        assert "Hot paths" in result.output
+        assert "Subprocesses (1)" in result.output
+        assert "profile written to" in result.output
+        assert (tmp_path / ".smelt" / "runs" / "r1" / "profile.folded").is_file()
+
+    def test_run_profile_without_task_writes_nothing(
+        self, mocker: MagicMock, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+    ) -> None:
+        _mock_runner(mocker, False, "pick", "No ready tasks found.")
+        monkeypatch.chdir(tmp_path)
+
+        result = CliRunner().invoke(cli, ["run", "--profile"])
+
+        assert result.exit_code == 0
+        assert "Top functions" in result.output
+        assert "Subprocesses" not in result.output
+        assert not (tmp_path / ".smelt" / "runs").exists()
+
+    def test_make_event_log_uses_observability_config(self, tmp_path: Path) -> None:
+        from smelt.cli import _make_event_log
+        from smelt.config import ObservabilityConfig, SmeltConfig
+
+        config = SmeltConfig(
+            observability=ObservabilityConfig(
+                log_dir=str(tmp_path / "runs"), max_runs_retained=7
+            )
+        )
+        event_log = _make_event_log(config)
+
+        assert event_log._log_dir == tmp_path / "runs"
+        assert event_log._max_runs_retained == 7
+
+    def test_print_agent_line(self, capsys: pytest.CaptureFixture[str]) -> None:
+        from smelt.cli import _print_agent_line
+        from smelt.db.models import OutputLine
+
+        _print_agent_line(
+            OutputLine(
+                session_id="s", stream="stdout", text="[bold]x[/]", elapsed_seconds=1
+            )
+        )
+        assert "goose │ [bold]x[/]" in capsys.readouterr().out
+
+
+class TestDaemonCommand:
+    def _patch_daemon(self, mocker: MagicMock, processed: int = 0) -> MagicMock:
+        mocker.patch("smelt.agents.llm_client.LiteLLMClient")
+        mocker.patch("smelt.agents.goose_adapter.GooseAdapter")
+        mock_daemon_cls = mocker.patch("smelt.daemon.Daemon")
+        mock_daemon_cls.return_value.run.return_value = processed
+        return mock_daemon_cls
+
+    def test_daemon_runs_until_stopped(self, mocker: MagicMock) -> None:
+        mock_daemon_cls = self._patch_daemon(mocker, processed=3)
+        runner = CliRunner()
+        result = runner.invoke(cli, ["daemon"])
+
+        assert result.exit_code == 0
+        assert "daemon started with 1 worker(s)" in result.output
+        assert "daemon stopped after 3 task(s)" in result.output
+        assert "share the repository working tree" not in result.output
+        instance = mock_daemon_cls.return_value
+        instance.install_signal_handlers.assert_called_once()
+        instance.run.assert_called_once()
+
+    def test_daemon_cli_overrides_config(self, mocker: MagicMock) -> None:
+        mock_daemon_cls = self._patch_daemon(mocker)
+        runner = CliRunner()
+        result = runner.invoke(
+            cli, ["daemon", "--concurrency", "2", "--poll-interval", "0.5"]
+        )
+
+        assert result.exit_code == 0
+        daemon_config = mock_daemon_cls.call_args.kwargs["config"]
+        assert daemon_config.concurrency == 2
+        assert daemon_config.poll_interval_seconds == 0.5
+        assert "share the repository working tree" not in result.output
+
+    def test_daemon_warns_about_shared_tree_without_worktrees(
+        self, mocker: MagicMock, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+    ) -> None:
+        mock_daemon_cls = self._patch_daemon(mocker)
+        (tmp_path / "smelt.toml").write_text("[git]\nuse_worktrees = false\n")
+        monkeypatch.chdir(tmp_path)
+        runner = CliRunner()
+        result = runner.invoke(cli, ["daemon", "--concurrency", "2"])
+
+        assert result.exit_code == 0
+        assert "share the repository working tree" in result.output
+        with mock_daemon_cls.call_args.kwargs["runner_factory"]() as worker:
+            assert worker._worktrees is None
+
+    def test_daemon_rejects_invalid_concurrency(self, mocker: MagicMock) -> None:
+        mock_daemon_cls = self._patch_daemon(mocker)
+        runner = CliRunner()
+        result = runner.invoke(cli, ["daemon", "--concurrency", "0"])
+
+        assert result.exit_code != 0
+        assert "concurrency must be >= 1" in result.output
+        mock_daemon_cls.assert_not_called()
+
+    def test_daemon_factory_builds_runners_sharing_warm_state(
+        self, mocker: MagicMock
+    ) -> None:
+        from smelt.pipeline.runner import PipelineResult, PipelineRunner
+
+        mock_daemon_cls = self._patch_daemon(mocker)
+        runner = CliRunner()
+        result = runner.invoke(cli, ["daemon"])
+        assert result.exit_code == 0
+
+        kwargs = mock_daemon_cls.call_args.kwargs
+        with (
+            kwargs["runner_factory"]() as first,
+            kwargs["runner_factory"]() as second,
+        ):
+            assert isinstance(first, PipelineRunner)
+            assert first._context_builder is second._context_builder
+            assert first._llm is second._llm
+            assert first._store is not second._store
+            assert first._git is not second._git
+            assert first._event_log is second._event_log
+            assert first._metrics is second._metrics
+            assert first._worktrees is second._worktrees
+            assert first._base_sync is second._base_sync
+            assert first._pusher is second._pusher
+            assert first._claims is second._claims
+            assert first._worktrees is not None
+            close_git = mocker.spy(first._git, "close")
+        # A worker's own store and git processes are closed when it exits
+        close_git.assert_called_once()
+        with pytest.raises(sqlite3.ProgrammingError):
+            first._store.count_by_status()
+
+        kwargs["on_result"](
+            PipelineResult(task_id="t1", success=True, stage_reached="qa", message="ok")
+        )
+        kwargs["on_result"](
+            PipelineResult(task_id="t2", success=False, stage_reached="qa", message="x")
+        )
+
+
 class TestAddCommand:
     def test_add_basic(self) -> None:
         runner = CliRunner()
@@ -235,21 +486,193 @@ class TestReplayCommand:
         assert result.exit_code != 0
 
 
-class TestStubs:
-    def test_history(self) -> None:
-        runner = CliRunner()
-        result = runner.invoke(cli, ["history"])
+class TestHistoryCommand:
+    def _record_runs(self) -> str:
+        from smelt.db.models import RunResult, UsageTotals
+
+        store = _get_db()
+        task = store.add_task("t1")
+        total = UsageTotals("total", 1, 1200, 300, 0, 1.0, 0.25, 0)
+        for i, passed in enumerate([False, True, True]):
+            store.record_run(
+                RunResult(
+                    run_id=f"run-{i}",
+                    task_id=task.id,
+                    passed=passed,
+                    stage_reached="qa",
+                    message="m",
+                    duration_seconds=10.0 * (i + 1),
+                    usage_total=total,
+                    usage_by_stage={},
+                    usage_by_model={},
+                    attempts=i + 1,
+                    base_sha="0123456789abcdef",
+                )
+            )
+        return task.id
+
+    def test_history_empty(self) -> None:
+        result = CliRunner().invoke(cli, ["history"])
         assert result.exit_code == 0
+        assert "no runs recorded" in result.output
+
+    def test_history_lists_runs_and_aggregates(self) -> None:
+        task_id = self._record_runs()
+
+        result = CliRunner().invoke(cli, ["history"])
 
-    def test_cleanup(self) -> None:
-        runner = CliRunner()
-        result = runner.invoke(cli, ["cleanup"])
         assert result.exit_code == 0
+        assert "page 1/1" in result.output
+        assert "run-2" in result.output
+        assert "01234567" in result.output
+        assert "0123456789" not in result.output
+        assert "1,500" in result.output
+        assert "3 run(s), 2 passed (67%)" in result.output
+        assert "p50 20.0s · p95 30.0s" in result.output
+        assert "1.0 tasks/day · $0.75" in result.output
+
+        result = CliRunner().invoke(
+            cli, ["history", "--task", task_id, "--failed", "--since", "2000-01-01"]
+        )
+        assert "1 run(s), 0 passed" in result.output
+
+        result = CliRunner().invoke(cli, ["history", "--limit", "2", "--page", "2"])
+        assert "page 2/2" in result.output
+        assert "run-0" in result.output
+        assert "run-2" not in result.output
+
+
+class TestCleanupCommand:
+    @pytest.fixture
+    def repo(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+        repo = tmp_path / "repo"
+        repo.mkdir()
+        subprocess.run(["git", "init", "-q", "-b", "main"], cwd=repo, check=True)
+        subprocess.run(
+            [
+                *("git", "-c", "user.name=t", "-c", "user.email=t@t"),
+                *("commit", "-q", "--allow-empty", "-m", "init"),
+            ],
+            cwd=repo,
+            check=True,
+        )
+        monkeypatch.chdir(repo)
+        return repo
 
-    def test_decompose(self) -> None:
-        runner = CliRunner()
-        result = runner.invoke(cli, ["decompose", "task-99"])
+    def _branch(self, repo: Path, status: str) -> str:
+        store = _get_db()
+        task = store.add_task(f"{status} task")
+        store.update_status(task.id, status)
+        subprocess.run(["git", "branch", f"smelt/{task.id}"], cwd=repo, check=True)
+        return f"smelt/{task.id}"
+
+    def _branches(self, repo: Path) -> str:
+        return subprocess.run(
+            ["git", "branch", "--list", "smelt/*"],
+            cwd=repo,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+
+    def test_cleanup_dry_run_then_delete(self, repo: Path) -> None:
+        stale = self._branch(repo, "failed")
+        live = self._branch(repo, "in-review")
+        idle = repo / ".smelt" / "worktrees" / "wt-idle"
+        subprocess.run(
+            ["git", "worktree", "add", "-q", "--detach", str(idle)],
+            cwd=repo,
+            check=True,
+        )
+
+        result = CliRunner().invoke(cli, ["cleanup", "--dry-run"])
         assert result.exit_code == 0
+        assert stale in result.output
+        assert live not in result.output
+        assert "Dry run: nothing deleted" in result.output
+        assert "wt-idle" in result.output
+        assert stale in self._branches(repo)
+        assert idle.exists()
+
+        result = CliRunner().invoke(cli, ["cleanup"])
+        assert result.exit_code == 0
+        assert "Deleted 1 branch(es) and 1 worktree(s)" in result.output
+        assert not idle.exists()
+        assert stale not in self._branches(repo)
+        assert live in self._branches(repo)
+
+        result = CliRunner().invoke(cli, ["cleanup"])
+        assert "Nothing to clean up" in result.output
+
+    def test_cleanup_outside_a_repository_fails(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setenv("GIT_CEILING_DIRECTORIES", str(tmp_path))
+        monkeypatch.chdir(tmp_path)
+        result = CliRunner().invoke(cli, ["cleanup"])
+        assert result.exit_code != 0
+        assert "Error:" in result.output
+
+
+class TestDecomposeCommand:
+    def _patch_llm(self, mocker: MagicMock, content: str) -> None:
+        from smelt.db.models import LLMResponse, LLMUsage
+
+        mocker.patch("smelt.pipeline.context.RepoContextBuilder")
+        llm_cls = mocker.patch("smelt.agents.llm_client.LiteLLMClient")
+        llm_cls.return_value.complete.return_value = LLMResponse(
+            content=content,
+            usage=LLMUsage(model="m", prompt_tokens=1, completion_tokens=1),
+        )
+
+    def test_decompose_splits_task(self, mocker: MagicMock) -> None:
+        self._patch_llm(
+            mocker,
+            '{"subtasks": ['
+            '{"id": "api", "description": "Add API", "complexity": 5,'
+            ' "depends_on": ["db"]},'
+            '{"id": "db", "description": "Add schema", "complexity": 2}]}',
+        )
+        task = _get_db().add_task("Build billing")
+
+        result = CliRunner().invoke(cli, ["decompose", task.id])
+
+        assert result.exit_code == 0, result.output
+        assert f"Split {task.id} into 2 sub-task(s)." in result.output
+        store = _get_db()
+        assert store.get_task(task.id) is None
+        schema, api = sorted(store.list_tasks(), key=lambda t: t.complexity or 0)
+        assert [t.id for t in store.get_dependencies(api.id)] == [schema.id]
+        assert schema.id in result.output
+        (usage,) = store.usage_totals("stage")
+        assert (usage.key, usage.prompt_tokens) == ("decomposer", 1)
+
+    def test_decompose_leaves_atomic_task(self, mocker: MagicMock) -> None:
+        self._patch_llm(
+            mocker, '{"subtasks": [{"id": "a", "description": "x", "complexity": 1}]}'
+        )
+        task = _get_db().add_task("Fix typo")
+
+        result = CliRunner().invoke(cli, ["decompose", task.id])
+
+        assert result.exit_code == 0
+        assert "left unchanged" in result.output
+        assert _get_db().get_task(task.id) is not None
+        assert _get_db().usage_totals("task_id", task_id=task.id)[0].calls == 1
+
+    def test_decompose_reports_invalid_response(self, mocker: MagicMock) -> None:
+        self._patch_llm(mocker, "I cannot help with that.")
+        task = _get_db().add_task("Build billing")
+
+        result = CliRunner().invoke(cli, ["decompose", task.id])
+
+        assert result.exit_code != 0
+        assert "invalid JSON" in result.output
+
+    def test_decompose_unknown_task(self) -> None:
+        result = CliRunner().invoke(cli, ["decompose", "task-99"])
+        assert result.exit_code != 0
+        assert "not found" in result.output
 
 
 class TestPackageMetadata:
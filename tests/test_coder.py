@@ -2,8 +2,11 @@
 
 from __future__ import annotations
 
+import pytest
+
 from smelt.config import CodingConfig
 from smelt.db.models import AgentResult
+from smelt.exceptions import AgentError, AgentTimeoutError
 from smelt.pipeline.coder import CoderStage
 from smelt.pipeline.stages import StageInput
 
@@ -146,3 +149,107 @@ def test_coder_name() -> None:
     agent = _FakeAgent()
     stage = CoderStage(agent=agent, config=CodingConfig(), working_dir="/repo")
     assert stage.name == "coder"
+
+
+class _ResumableAgent(_FakeAgent):
+    """Fake agent that also supports resuming sessions."""
+
+    def __init__(self, resume_error: Exception | None = None) -> None:
+        super().__init__()
+        self._resume_error = resume_error
+        self.resumes: list[dict[str, object]] = []
+
+    def resume_session(
+        self,
+        *,
+        session_id: str,
+        prompt: str,
+        working_dir: str,
+        timeout_seconds: int,
+    ) -> AgentResult:
+        self.resumes.append({"session_id": session_id, "prompt": prompt})
+        if self._resume_error is not None:
+            raise self._resume_error
+        return AgentResult(
+            success=True,
+            session_id=session_id,
+            output="fixed",
+            duration_seconds=0.5,
+        )
+
+
+def test_coder_retry_resumes_previous_session_with_failure_only() -> None:
+    agent = _ResumableAgent()
+    stage = CoderStage(agent=agent, config=CodingConfig(), working_dir="/repo")
+
+    stage.execute(_make_input(repo="## File Tree\nHUGE CONTEXT"))
+    output = stage.execute(
+        _make_input(repo="## File Tree\nHUGE CONTEXT", last_failure="FAILED t_x")
+    )
+
+    assert len(agent.calls) == 1
+    assert len(agent.resumes) == 1
+    resume = agent.resumes[0]
+    assert resume["session_id"] == "fake-session"
+    prompt = str(resume["prompt"])
+    assert "FAILED t_x" in prompt
+    assert "HUGE CONTEXT" not in prompt
+    assert "1. Modify auth.py" not in prompt
+    assert output.output == "fixed"
+
+
+def test_coder_first_attempt_never_resumes() -> None:
+    agent = _ResumableAgent()
+    stage = CoderStage(agent=agent, config=CodingConfig(), working_dir="/repo")
+
+    stage.execute(_make_input(last_failure="FAILED from a previous run"))
+
+    assert agent.resumes == []
+    assert len(agent.calls) == 1
+
+
+def test_coder_resume_disabled_by_config() -> None:
+    agent = _ResumableAgent()
+    config = CodingConfig(resume_sessions=False)
+    stage = CoderStage(agent=agent, config=config, working_dir="/repo")
+
+    stage.execute(_make_input())
+    stage.execute(_make_input(last_failure="FAILED t_x"))
+
+    assert agent.resumes == []
+    assert len(agent.calls) == 2
+    assert "Previous QA Failure" in str(agent.calls[1]["prompt"])
+
+
+def test_coder_non_resumable_agent_gets_full_prompt_on_retry() -> None:
+    agent = _FakeAgent()
+    stage = CoderStage(agent=agent, config=CodingConfig(), working_dir="/repo")
+
+    stage.execute(_make_input())
+    stage.execute(_make_input(last_failure="FAILED t_x"))
+
+    assert len(agent.calls) == 2
+    assert "1. Modify auth.py" in str(agent.calls[1]["prompt"])
+
+
+def test_coder_falls_back_to_fresh_session_when_resume_fails() -> None:
+    agent = _ResumableAgent(resume_error=AgentError("session not found"))
+    stage = CoderStage(agent=agent, config=CodingConfig(), working_dir="/repo")
+
+    stage.execute(_make_input())
+    output = stage.execute(_make_input(last_failure="FAILED t_x"))
+
+    assert len(agent.resumes) == 1
+    assert len(agent.calls) == 2
+    assert "FAILED t_x" in str(agent.calls[1]["prompt"])
+    assert output.output == "code written"
+
+
+def test_coder_resume_timeout_is_not_swallowed() -> None:
+    agent = _ResumableAgent(resume_error=AgentTimeoutError("timed out"))
+    stage = CoderStage(agent=agent, config=CodingConfig(), working_dir="/repo")
+
+    stage.execute(_make_input())
+    with pytest.raises(AgentTimeoutError):
+        stage.execute(_make_input(last_failure="FAILED t_x"))
+    assert len(agent.calls) == 1
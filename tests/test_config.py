@@ -74,7 +74,107 @@ def test_validation_errors(tmp_path: Path) -> None:
     with pytest.raises(ConfigError, match="cannot be negative"):
         SmeltConfig.from_toml(p)
 
+    # Timeout bounds out of order
+    p.write_text("[coding]\nmin_timeout_seconds = 900\nmax_timeout_seconds = 600")
+    with pytest.raises(ConfigError, match="min_timeout_seconds must be positive"):
+        SmeltConfig.from_toml(p)
+
+    # Negative infra retries
+    p.write_text("[infra]\nmax_infra_retries = -1")
+    with pytest.raises(ConfigError, match="max_infra_retries cannot be negative"):
+        SmeltConfig.from_toml(p)
+
     # Invalid QC mode
     p.write_text("[qc]\nescalation_mode = 'invalid'")
     with pytest.raises(ConfigError, match=r"Invalid qc\.escalation_mode"):
         SmeltConfig.from_toml(p)
+
+    p.write_text("[qc]\nmax_diff_tokens = 0")
+    with pytest.raises(ConfigError, match=r"qc\.max_diff_tokens must be positive"):
+        SmeltConfig.from_toml(p)
+
+
+def test_daemon_section(tmp_path: Path) -> None:
+    p = tmp_path / "smelt.toml"
+    p.write_text("[daemon]\nconcurrency = 4\npoll_interval_seconds = 0.5\n")
+    config = SmeltConfig.from_toml(p)
+    assert config.daemon.concurrency == 4
+    assert config.daemon.poll_interval_seconds == 0.5
+
+
+def test_daemon_validation_errors(tmp_path: Path) -> None:
+    p = tmp_path / "smelt.toml"
+
+    p.write_text("[daemon]\nconcurrency = 0")
+    with pytest.raises(ConfigError, match="concurrency must be at least 1"):
+        SmeltConfig.from_toml(p)
+
+    p.write_text("[daemon]\npoll_interval_seconds = 0")
+    with pytest.raises(ConfigError, match="poll_interval_seconds must be positive"):
+        SmeltConfig.from_toml(p)
+
+
+def test_git_worktree_validation_errors(tmp_path: Path) -> None:
+    p = tmp_path / "smelt.toml"
+
+    p.write_text("[git]\nfetch_interval_seconds = -1")
+    with pytest.raises(ConfigError, match="fetch_interval_seconds cannot be negative"):
+        SmeltConfig.from_toml(p)
+
+    p.write_text("[git]\nmax_idle_worktrees = -1")
+    with pytest.raises(ConfigError, match="max_idle_worktrees cannot be negative"):
+        SmeltConfig.from_toml(p)
+
+    p.write_text("[git]\nworktree_idle_seconds = 0")
+    with pytest.raises(ConfigError, match="worktree_idle_seconds must be positive"):
+        SmeltConfig.from_toml(p)
+
+
+def test_observability_retention_validation(tmp_path: Path) -> None:
+    p = tmp_path / "smelt.toml"
+    p.write_text("[observability]\nmax_runs_retained = 0")
+    with pytest.raises(ConfigError, match="max_runs_retained must be at least 1"):
+        SmeltConfig.from_toml(p)
+
+
+@pytest.mark.parametrize(
+    ("body", "message"),
+    [
+        ("metrics_port = 70000", "metrics_port must be between 0 and 65535"),
+        ("metrics_port = -1", "metrics_port must be between 0 and 65535"),
+        ("metrics_interval_seconds = 0", "metrics_interval_seconds must be positive"),
+    ],
+)
+def test_observability_metrics_validation(
+    tmp_path: Path, body: str, message: str
+) -> None:
+    p = tmp_path / "smelt.toml"
+    p.write_text(f"[observability]\n{body}")
+    with pytest.raises(ConfigError, match=message):
+        SmeltConfig.from_toml(p)
+
+
+def test_coding_abort_patterns_loaded_as_tuple(tmp_path: Path) -> None:
+    p = tmp_path / "smelt.toml"
+    p.write_text(
+        '[coding]\nabort_patterns = ["Error:", "Traceback"]\nmax_pattern_matches = 3\n'
+    )
+    config = SmeltConfig.from_toml(p)
+    assert config.coding.abort_patterns == ("Error:", "Traceback")
+    assert config.coding.max_pattern_matches == 3
+
+
+def test_coding_abort_validation_errors(tmp_path: Path) -> None:
+    p = tmp_path / "smelt.toml"
+
+    p.write_text("[coding]\nmax_repeated_lines = -1")
+    with pytest.raises(ConfigError, match="max_repeated_lines cannot be negative"):
+        SmeltConfig.from_toml(p)
+
+    p.write_text("[coding]\nmax_pattern_matches = 0")
+    with pytest.raises(ConfigError, match="max_pattern_matches must be at least 1"):
+        SmeltConfig.from_toml(p)
+
+    p.write_text("[coding]\nabort_patterns = ['(unclosed']")
+    with pytest.raises(ConfigError, match=r"Invalid coding\.abort_patterns"):
+        SmeltConfig.from_toml(p)
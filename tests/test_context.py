@@ -3,10 +3,12 @@
 from __future__ import annotations
 
 from pathlib import Path
+from unittest.mock import MagicMock
 
 import pytest
 
 from smelt.config import ContextConfig
+from smelt.pipeline import context as context_module
 from smelt.pipeline.context import (
     RepoContextBuilder,
     _build_file_tree,
@@ -190,3 +192,50 @@ def test_first_line_empty_definition_skipped() -> None:
     assert sigs is not None
     # All entries should be non-empty (the guard works)
     assert all(s.strip() for s in sigs)
+
+
+def test_builder_reuses_cached_signatures_for_unchanged_files(
+    repo: Path, mocker: MagicMock
+) -> None:
+    builder = RepoContextBuilder(config=ContextConfig(max_tokens=4000))
+    first = builder.build(repo)
+
+    spy = mocker.spy(context_module, "_extract_from_file")
+    second = builder.build(repo)
+
+    assert second.signatures == first.signatures
+    spy.assert_not_called()
+
+
+def test_builder_reparses_changed_files(repo: Path) -> None:
+    builder = RepoContextBuilder(config=ContextConfig(max_tokens=4000))
+    builder.build(repo)
+
+    (repo / "src" / "main.py").write_text("def goodbye(name):\n    pass\n")
+    ctx = builder.build(repo)
+
+    assert "goodbye" in ctx.signatures
+    assert "def hello" not in ctx.signatures
+
+
+def test_builder_evicts_deleted_files(repo: Path) -> None:
+    builder = RepoContextBuilder(config=ContextConfig(max_tokens=4000))
+    builder.build(repo)
+
+    (repo / "src" / "utils.py").unlink()
+    ctx = builder.build(repo)
+
+    assert "Helper" not in ctx.signatures
+    assert repo / "src" / "utils.py" not in builder._signature_cache
+
+
+def test_builder_keeps_cache_entries_of_other_repos(
+    repo: Path, tmp_path_factory: pytest.TempPathFactory
+) -> None:
+    other = tmp_path_factory.mktemp("other")
+    (other / "mod.py").write_text("def other():\n    pass\n")
+    builder = RepoContextBuilder(config=ContextConfig(max_tokens=4000))
+    builder.build(other)
+    builder.build(repo)
+
+    assert other / "mod.py" in builder._signature_cache
@@ -0,0 +1,198 @@
+"""Tests for the long-running Daemon worker loop."""
+
+from __future__ import annotations
+
+import contextlib
+import signal
+import threading
+from collections.abc import Iterator
+from unittest.mock import MagicMock
+
+from smelt.config import DaemonConfig
+from smelt.daemon import Daemon
+from smelt.pipeline.runner import PipelineResult
+
+_NO_TASK = PipelineResult(
+    task_id="", success=False, stage_reached="pick", message="No ready tasks found."
+)
+
+
+def _result(task_id: str, success: bool = True) -> PipelineResult:
+    return PipelineResult(
+        task_id=task_id, success=success, stage_reached="qa", message="done"
+    )
+
+
+class _ScriptedRunner:
+    """Fake runner that replays scripted outcomes, then stops the daemon."""
+
+    def __init__(
+        self,
+        daemon: Daemon,
+        outcomes: list[PipelineResult | Exception],
+        *,
+        stop_when_done: bool = True,
+    ) -> None:
+        self._daemon = daemon
+        self._outcomes = list(outcomes)
+        self._stop_when_done = stop_when_done
+        self.calls = 0
+        self.closed = False
+
+    def run(self) -> PipelineResult:
+        self.calls += 1
+        if not self._outcomes:
+            if self._stop_when_done:
+                self._daemon.stop()
+            return _NO_TASK
+        outcome = self._outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def _make_daemon(
+    outcomes: list[PipelineResult | Exception],
+    *,
+    concurrency: int = 1,
+    on_result: MagicMock | None = None,
+) -> tuple[Daemon, list[_ScriptedRunner]]:
+    runners: list[_ScriptedRunner] = []
+    lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def factory() -> Iterator[_ScriptedRunner]:
+        with lock:
+            # Only the first worker gets the script; others see an empty queue
+            first = not runners
+            runner = _ScriptedRunner(
+                daemon, outcomes if first else [], stop_when_done=first
+            )
+            runners.append(runner)
+        try:
+            yield runner
+        finally:
+            runner.closed = True
+
+    daemon = Daemon(
+        config=DaemonConfig(concurrency=concurrency, poll_interval_seconds=0.01),
+        runner_factory=factory,  # type: ignore[arg-type]
+        on_result=on_result,
+    )
+    return daemon, runners
+
+
+def test_processes_tasks_until_stopped() -> None:
+    on_result = MagicMock()
+    daemon, runners = _make_daemon(
+        [_result("t1"), _result("t2", success=False)], on_result=on_result
+    )
+
+    processed = daemon.run()
+
+    assert processed == 2
+    assert [c.args[0].task_id for c in on_result.call_args_list] == ["t1", "t2"]
+    assert daemon.stopping is True
+    assert runners[0].calls == 3
+
+
+def test_empty_queue_polls_without_counting() -> None:
+    daemon, runners = _make_daemon([_NO_TASK, _NO_TASK, _result("t1")])
+
+    processed = daemon.run()
+
+    assert processed == 1
+    assert runners[0].calls == 4
+
+
+def test_crashed_run_does_not_kill_worker() -> None:
+    daemon, runners = _make_daemon([RuntimeError("boom"), _result("t1")])
+
+    processed = daemon.run()
+
+    assert processed == 1
+    assert runners[0].calls == 3
+
+
+def test_failing_result_callback_does_not_kill_worker() -> None:
+    on_result = MagicMock(side_effect=[RuntimeError("boom"), None])
+    daemon, runners = _make_daemon([_result("t1"), _result("t2")], on_result=on_result)
+
+    processed = daemon.run()
+
+    assert processed == 2
+    assert [c.args[0].task_id for c in on_result.call_args_list] == ["t1", "t2"]
+    assert runners[0].calls == 3
+
+
+def test_worker_closes_its_runner_on_exit() -> None:
+    daemon, runners = _make_daemon([_result("t1")], concurrency=2)
+
+    daemon.run()
+
+    assert len(runners) == 2
+    assert all(runner.closed for runner in runners)
+
+
+def test_failing_runner_factory_is_retried() -> None:
+    attempts: list[int] = []
+
+    @contextlib.contextmanager
+    def factory() -> Iterator[_ScriptedRunner]:
+        attempts.append(len(attempts))
+        if len(attempts) == 1:
+            raise RuntimeError("database locked")
+        yield _ScriptedRunner(daemon, [_result("t1")])
+
+    daemon = Daemon(
+        config=DaemonConfig(concurrency=1, poll_interval_seconds=0.01),
+        runner_factory=factory,  # type: ignore[arg-type]
+    )
+
+    assert daemon.run() == 1
+    assert len(attempts) == 2
+
+
+def test_stop_while_runner_factory_fails() -> None:
+    @contextlib.contextmanager
+    def factory() -> Iterator[_ScriptedRunner]:
+        daemon.stop()
+        raise RuntimeError("database locked")
+        yield  # pragma: no cover
+
+    daemon = Daemon(
+        config=DaemonConfig(concurrency=1, poll_interval_seconds=0.01),
+        runner_factory=factory,  # type: ignore[arg-type]
+    )
+
+    assert daemon.run() == 0
+
+
+def test_runs_one_runner_per_worker() -> None:
+    daemon, runners = _make_daemon([_result("t1")], concurrency=3)
+
+    processed = daemon.run()
+
+    assert processed == 1
+    assert len(runners) == 3
+
+
+def test_stop_before_run_exits_immediately() -> None:
+    daemon, runners = _make_daemon([_result("t1")])
+    daemon.stop()
+    daemon.stop()  # idempotent
+
+    assert daemon.run() == 0
+    assert runners[0].calls == 0
+
+
+def test_signal_handlers_request_stop(mocker: MagicMock) -> None:
+    mock_signal = mocker.patch("signal.signal")
+    daemon, _ = _make_daemon([])
+
+    daemon.install_signal_handlers()
+
+    registered = {c.args[0]: c.args[1] for c in mock_signal.call_args_list}
+    assert set(registered) == {signal.SIGTERM, signal.SIGINT}
+    registered[signal.SIGTERM](signal.SIGTERM, None)
+    assert daemon.stopping is True
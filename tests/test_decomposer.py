@@ -0,0 +1,150 @@
+"""Tests for the Decomposer stage."""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from smelt.config import ModelsConfig
+from smelt.db.models import LLMResponse, LLMUsage, SubTask
+from smelt.exceptions import CircularDependencyError, DecompositionError
+from smelt.pipeline.decomposer import (
+    DecomposerStage,
+    parse_subtasks,
+    topological_order,
+)
+from smelt.pipeline.stages import StageInput
+
+
+class _FakeLLM:
+    """Fake LLMClient that records calls and returns a canned response."""
+
+    def __init__(self, response: str) -> None:
+        self.response = response
+        self.calls: list[dict[str, object]] = []
+
+    def complete(
+        self,
+        *,
+        model: str,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int = 4096,
+        temperature: float = 0.0,
+    ) -> LLMResponse:
+        self.calls.append(
+            {"model": model, "system_prompt": system_prompt, "user_prompt": user_prompt}
+        )
+        return LLMResponse(
+            content=self.response,
+            usage=LLMUsage(model=model, prompt_tokens=100, completion_tokens=20),
+        )
+
+
+def _response(*subtasks: dict[str, object]) -> str:
+    return json.dumps({"subtasks": list(subtasks)})
+
+
+def _sub(key: str, *deps: str, complexity: int = 3) -> dict[str, object]:
+    return {
+        "id": key,
+        "description": f"Do {key}",
+        "complexity": complexity,
+        "depends_on": list(deps),
+    }
+
+
+def _make_input(context: str | None = None) -> StageInput:
+    return StageInput(
+        task_description="Build billing",
+        task_context=context,
+        repo_context="## File Tree\nsrc/",
+        plan=None,
+        last_failure=None,
+    )
+
+
+def test_decompose_orders_subtasks_and_uses_decomposer_model() -> None:
+    llm = _FakeLLM(_response(_sub("api", "schema"), _sub("schema"), _sub("ui")))
+    stage = DecomposerStage(llm=llm, models=ModelsConfig(decomposer="big-model"))
+
+    result = stage.decompose(_make_input(context="Stripe spec"))
+
+    assert [s.key for s in result.subtasks] == ["schema", "ui", "api"]
+    assert result.subtasks[2].depends_on == ("schema",)
+    assert not result.atomic
+    assert result.usage.model == "big-model"
+    call = llm.calls[0]
+    assert call["model"] == "big-model"
+    assert "Build billing" in str(call["user_prompt"])
+    assert "Stripe spec" in str(call["user_prompt"])
+
+
+def test_execute_returns_subtasks_as_json() -> None:
+    llm = _FakeLLM(_response(_sub("only", complexity=2)))
+    stage = DecomposerStage(llm=llm, models=ModelsConfig())
+
+    output = stage.execute(_make_input())
+
+    assert stage.name == "decomposer"
+    assert output.passed is True
+    assert output.escalate_to is None
+    assert len(output.usage) == 1
+    assert json.loads(output.output) == {"subtasks": [_sub("only", complexity=2)]}
+    assert "None provided." in str(llm.calls[0]["user_prompt"])
+
+
+def test_decompose_rejects_cycles() -> None:
+    llm = _FakeLLM(_response(_sub("a", "b"), _sub("b", "a"), _sub("c")))
+    stage = DecomposerStage(llm=llm, models=ModelsConfig())
+    with pytest.raises(CircularDependencyError, match="among: a, b"):
+        stage.decompose(_make_input())
+
+
+def test_parse_accepts_code_fence_and_missing_depends_on() -> None:
+    body = '{"subtasks": [{"id": "a", "description": " x ", "complexity": 1}]}'
+    text = f"```json\n{body}\n```"
+    assert parse_subtasks(text) == (SubTask(key="a", description="x", complexity=1),)
+
+
+def test_parse_deduplicates_depends_on() -> None:
+    (_, sub) = parse_subtasks(_response(_sub("a"), _sub("b", "a", "a")))
+    assert sub.depends_on == ("a",)
+
+
+@pytest.mark.parametrize(
+    ("text", "error"),
+    [
+        ("not json", "invalid JSON"),
+        ("[]", "no 'subtasks' list"),
+        ('{"subtasks": []}', "no 'subtasks' list"),
+        ('{"subtasks": ["a"]}', "Sub-task 0 is not an object"),
+        (_response({"description": "x", "complexity": 1}), "has no 'id'"),
+        (
+            _response({"id": "a", "description": " ", "complexity": 1}),
+            "no 'description'",
+        ),
+        (_response(_sub("a", complexity=11)), "from 1 to 10"),
+        (_response({**_sub("a"), "complexity": True}), "from 1 to 10"),
+        (_response({**_sub("a"), "depends_on": "b"}), "must be a list"),
+        (_response({**_sub("a"), "depends_on": [1]}), "must be a list"),
+        (_response(_sub("a"), _sub("a")), "Duplicate sub-task id 'a'"),
+        (_response(_sub("a", "zzz")), "unknown sub-task 'zzz'"),
+    ],
+)
+def test_parse_rejects_malformed_responses(text: str, error: str) -> None:
+    with pytest.raises(DecompositionError, match=error):
+        parse_subtasks(text)
+
+
+def test_topological_order_rejects_self_dependency() -> None:
+    with pytest.raises(CircularDependencyError):
+        topological_order(
+            (SubTask(key="a", description="a", complexity=1, depends_on=("a",)),)
+        )
+
+
+def test_topological_order_keeps_model_order_within_a_wave() -> None:
+    subtasks = parse_subtasks(_response(_sub("c", "b"), _sub("b"), _sub("a")))
+    assert [sub.key for sub in topological_order(subtasks)] == ["b", "a", "c"]
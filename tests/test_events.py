@@ -0,0 +1,245 @@
+"""Tests for the structured per-run event log."""
+
+from __future__ import annotations
+
+import json
+import threading
+from dataclasses import asdict
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+from smelt.db.models import LLMUsage, RunEvent, ToolResult
+from smelt.events import (
+    EVENTS_FILE_NAME,
+    RESULT_FILE_NAME,
+    EventLog,
+    RunRecorder,
+    StageSpan,
+)
+from smelt.pipeline.stages import StageOutput
+
+
+def _events(run_dir: Path) -> list[dict[str, object]]:
+    lines = (run_dir / EVENTS_FILE_NAME).read_text().splitlines()
+    return [json.loads(line) for line in lines]
+
+
+def test_run_events_written_to_run_directory(tmp_path: Path) -> None:
+    event_log = EventLog(log_dir=tmp_path, max_runs_retained=10)
+
+    recorder = event_log.start_run("t1")
+    with recorder.stage("qa", attempt=2) as span:
+        span.passed = True
+    recorder.finish(passed=True, stage="qa", message="ok")
+    event_log.close()
+
+    run_dir = tmp_path / recorder.run_id
+    assert recorder.run_id.endswith("-t1")
+    events = _events(run_dir)
+    assert [e["event"] for e in events] == [
+        "run_started",
+        "stage_started",
+        "stage_finished",
+        "run_finished",
+    ]
+    finished = events[2]
+    assert finished["stage"] == "qa"
+    assert finished["attempt"] == 2
+    assert finished["passed"] is True
+    assert float(str(finished["duration_seconds"])) >= 0
+    # Unset fields are omitted, not written as null
+    assert "model" not in finished
+    assert "session_id" not in events[0]
+
+
+def test_stage_exception_recorded_and_reraised(tmp_path: Path) -> None:
+    event_log = EventLog(log_dir=tmp_path, max_runs_retained=10)
+    recorder = event_log.start_run("t1")
+
+    with pytest.raises(ValueError, match="boom"), recorder.stage("coder"):
+        raise ValueError("boom")
+    event_log.close()
+
+    finished = _events(tmp_path / recorder.run_id)[-1]
+    assert finished["event"] == "stage_finished"
+    assert finished["passed"] is False
+    assert finished["message"] == "boom"
+
+
+def test_stage_usage_reported_in_event_and_result(tmp_path: Path) -> None:
+    event_log = EventLog(log_dir=tmp_path, max_runs_retained=10)
+    recorder = event_log.start_run("t1")
+    output = StageOutput(
+        passed=True,
+        output="plan",
+        escalate_to=None,
+        usage=(
+            LLMUsage("opus", 1000, 200, cached_tokens=800, cost_usd=0.05),
+            LLMUsage("haiku", 300, 50, cost_usd=None),
+        ),
+    )
+    with recorder.stage("architect", model="opus") as span:
+        span.record(output)
+    with recorder.stage("qa") as span:
+        span.passed = True
+
+    result = recorder.finish(passed=True, stage="qa", message="ok")
+    event_log.close()
+
+    run_dir = tmp_path / recorder.run_id
+    events = _events(run_dir)
+    opus_call, haiku_call, architect = events[2:5]
+    assert (opus_call["event"], opus_call["model"]) == ("llm_call", "opus")
+    assert opus_call["input_tokens"] == 1000
+    assert haiku_call["model"] == "haiku"
+    assert haiku_call["cost_usd"] == 0
+    assert architect["input_tokens"] == 1300
+    assert architect["output_tokens"] == 250
+    assert architect["cost_usd"] == 0.05
+    assert "input_tokens" not in events[6]
+
+    on_disk = json.loads((run_dir / RESULT_FILE_NAME).read_text())
+    assert on_disk == json.loads(json.dumps(asdict(result)))
+    assert on_disk["passed"] is True
+    assert on_disk["usage_total"]["calls"] == 2
+    assert on_disk["usage_total"]["unpriced_calls"] == 1
+    assert set(on_disk["usage_by_stage"]) == {"architect"}
+    assert on_disk["usage_by_model"]["opus"]["cached_tokens"] == 800
+    assert on_disk["usage_by_model"]["haiku"]["cost_usd"] == 0
+
+
+def test_span_records_stage_output() -> None:
+    span = StageSpan()
+    span.record(
+        StageOutput(
+            passed=False,
+            output="x",
+            escalate_to="coder",
+            session_id="s1",
+            tool_results=(
+                ToolResult("pytest", False, "", "", 1),
+                ToolResult("ruff", True, "", "", 0),
+            ),
+        )
+    )
+    assert span.passed is False
+    assert span.session_id == "s1"
+    assert span.exit_codes == {"pytest": 1, "ruff": 0}
+
+    span.record(StageOutput(passed=True, output="plan", escalate_to=None))
+    assert span.passed is True
+    assert span.exit_codes == {"pytest": 1, "ruff": 0}
+
+
+def test_disabled_recorder_records_nothing(tmp_path: Path) -> None:
+    recorder = RunRecorder.disabled("t1")
+    with recorder.stage("qa") as span:
+        span.passed = True
+    recorder.finish(passed=True, stage="qa", message="ok")
+    assert recorder.run_id.endswith("-t1")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_result_counts_coder_attempts() -> None:
+    recorder = RunRecorder.disabled("t1")
+    for attempt in (1, 2, 3):
+        with recorder.stage("coder", attempt=attempt):
+            pass
+    with recorder.stage("qa"):
+        pass
+    assert recorder.finish(passed=False, stage="qa", message="x").attempts == 3
+
+
+def test_writes_happen_off_the_calling_thread(tmp_path: Path) -> None:
+    writers: list[str] = []
+    original_open = Path.open
+
+    def spying_open(self: Path, *args: object, **kwargs: object) -> object:
+        writers.append(threading.current_thread().name)
+        return original_open(self, *args, **kwargs)  # type: ignore[call-overload]
+
+    event_log = EventLog(log_dir=tmp_path, max_runs_retained=10)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(Path, "open", spying_open)
+        event_log.start_run("t1").finish(passed=True, stage="qa", message="ok")
+        event_log.flush()
+    event_log.close()
+
+    assert writers
+    assert set(writers) == {"smelt-event-writer"}
+
+
+def test_retention_keeps_most_recent_runs(tmp_path: Path) -> None:
+    (tmp_path / "goose-abc.log").write_text("agent log, not a run")
+    event_log = EventLog(log_dir=tmp_path, max_runs_retained=2)
+
+    run_ids = []
+    for n in range(4):
+        recorder = event_log.start_run(f"t{n}")
+        run_ids.append(recorder.run_id)
+        event_log.flush()
+    event_log.close()
+
+    remaining = sorted(p.name for p in tmp_path.iterdir() if p.is_dir())
+    assert remaining == sorted(run_ids[-2:])
+    assert (tmp_path / "goose-abc.log").exists()
+
+
+def test_prune_tolerates_missing_log_dir(tmp_path: Path) -> None:
+    event_log = EventLog(log_dir=tmp_path / "missing", max_runs_retained=1)
+    event_log._prune()
+    assert not (tmp_path / "missing").exists()
+
+
+def test_write_failure_is_logged_not_raised(tmp_path: Path) -> None:
+    blocker = tmp_path / "runs"
+    blocker.write_text("a file where the log dir should be")
+    event_log = EventLog(log_dir=blocker, max_runs_retained=1)
+    mock_logger = MagicMock()
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr("smelt.events.logger", mock_logger)
+        event_log.start_run("t1")
+        event_log.flush()
+    event_log.close()
+
+    mock_logger.exception.assert_called_once()
+
+
+def test_close_without_events_is_a_no_op(tmp_path: Path) -> None:
+    event_log = EventLog(log_dir=tmp_path, max_runs_retained=1)
+    event_log.close()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_close_then_reuse_restarts_writer(tmp_path: Path) -> None:
+    event_log = EventLog(log_dir=tmp_path, max_runs_retained=10)
+    first = event_log.start_run("t1")
+    event_log.close()
+    second = event_log.start_run("t2")
+    event_log.close()
+
+    assert (tmp_path / first.run_id / EVENTS_FILE_NAME).exists()
+    assert (tmp_path / second.run_id / EVENTS_FILE_NAME).exists()
+
+
+def test_batches_are_bounded(tmp_path: Path) -> None:
+    event_log = EventLog(log_dir=tmp_path, max_runs_retained=10)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr("smelt.events._MAX_BATCH", 1)
+        recorder = event_log.start_run("t1")
+        for _ in range(5):
+            recorder.emit("stage_started", stage="qa")
+        event_log.close()
+
+    assert len(_events(tmp_path / recorder.run_id)) == 6
+
+
+def test_run_event_defaults() -> None:
+    event = RunEvent(
+        run_id="r", task_id="t", event="run_started", elapsed_seconds=0, timestamp=""
+    )
+    assert event.stage is None
+    assert event.exit_codes is None
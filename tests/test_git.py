@@ -1,6 +1,10 @@
 """Unit tests for the GitOps wrapper."""
 
+import io
 import subprocess
+import threading
+import time
+from collections.abc import Iterator
 from pathlib import Path
 from unittest.mock import MagicMock
 
@@ -8,7 +12,13 @@ import pytest
 
 from smelt.config import GitConfig
 from smelt.exceptions import GitError
-from smelt.git import GitOps
+from smelt.git import (
+    BaseBranchSync,
+    GitOps,
+    PushBatcher,
+    Worktree,
+    WorktreePool,
+)
 
 
 @pytest.fixture
@@ -64,6 +74,14 @@ def test_create_branch(git: GitOps, mocker: MagicMock) -> None:
     assert branch_name == "smelt/task-123"
     mock_run.assert_called_once_with("checkout", "-b", "smelt/task-123", "main")
 
+    mock_run.reset_mock()
+    git.create_branch("task-9", start_point="abc123")
+    mock_run.assert_called_once_with("checkout", "-b", "smelt/task-9", "abc123")
+
+    mock_run.reset_mock()
+    git.create_branch("task-9", start_point="abc123", reset=True)
+    mock_run.assert_called_once_with("checkout", "-B", "smelt/task-9", "abc123")
+
 
 def test_pull(git: GitOps, mocker: MagicMock) -> None:
     mock_run = mocker.patch.object(git, "_run")
@@ -75,6 +93,17 @@ def test_pull(git: GitOps, mocker: MagicMock) -> None:
     mock_run.assert_called_once_with("pull")
 
 
+def test_fetch_and_other_trees(git: GitOps, mocker: MagicMock) -> None:
+    mock_run = mocker.patch.object(git, "_run")
+    git.fetch("main")
+    mock_run.assert_called_once_with("fetch", "origin", "main")
+
+    other = git.at(Path("/elsewhere"))
+    assert other.repo_path == Path("/elsewhere")
+    assert other.config is git.config
+    assert git.branch_name("task-1") == "smelt/task-1"
+
+
 def test_add_commit_push(git: GitOps, mocker: MagicMock) -> None:
     mock_run = mocker.patch.object(git, "_run")
 
@@ -92,23 +121,586 @@ def test_current_branch(git: GitOps, mocker: MagicMock) -> None:
     mock_run = mocker.patch.object(git, "_run", return_value="main")
     result = git.current_branch()
     assert result == "main"
-    mock_run.assert_called_once_with("branch", "--show-current")
+    mock_run.assert_called_once_with("symbolic-ref", "--quiet", "--short", "HEAD")
 
+    mock_run.side_effect = GitError("detached")
+    assert git.current_branch() == ""
 
-def test_branch_exists(git: GitOps, mocker: MagicMock) -> None:
-    # First test True case (success)
-    mock_run = mocker.patch.object(git, "_run")
-    assert git.branch_exists("my-branch") is True
-    mock_run.assert_called_once_with(
-        "show-ref", "--verify", "--quiet", "refs/heads/my-branch"
-    )
 
-    # Second test False case (raises GitError)
-    mock_run.side_effect = GitError("failed")
-    assert git.branch_exists("fake-branch") is False
+def test_delete_branches_without_branches_runs_nothing(
+    git: GitOps, mocker: MagicMock
+) -> None:
+    mock_run = mocker.patch.object(git, "_run")
+    git.delete_branches({})
+    mock_run.assert_not_called()
 
 
 def test_delete_branch(git: GitOps, mocker: MagicMock) -> None:
     mock_run = mocker.patch.object(git, "_run")
     git.delete_branch("my-branch")
     mock_run.assert_called_once_with("branch", "-D", "my-branch")
+
+
+def test_worktree_commands(git: GitOps, mocker: MagicMock) -> None:
+    mock_run = mocker.patch.object(git, "_run")
+    git.add_worktree(Path("/wt"), "smelt/a", "main")
+    git.prune_worktrees()
+    git.detach()
+    git.reset_hard("smelt/a", "main")
+    git.clean()
+    assert [c.args for c in mock_run.call_args_list] == [
+        ("worktree", "add", "--force", "-B", "smelt/a", "/wt", "main"),
+        ("worktree", "prune"),
+        ("checkout", "--detach"),
+        ("checkout", "--force", "--ignore-other-worktrees", "-B", "smelt/a", "main"),
+        ("clean", "-fd"),
+    ]
+
+
+# ---------------------------------------------------------------------------
+# cat-file batch reads (real repository)
+# ---------------------------------------------------------------------------
+
+
+@pytest.fixture
+def real_git(tmp_path: Path, config: GitConfig) -> Iterator[GitOps]:
+    def run(*args: str) -> None:
+        subprocess.run(["git", *args], cwd=tmp_path, check=True, capture_output=True)
+
+    run("init", "-q", "-b", "main")
+    (tmp_path / "README.md").write_text("hello\n")
+    run("add", ".")
+    run("-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "init")
+    ops = GitOps(tmp_path, config)
+    yield ops
+    ops.close()
+
+
+def test_branch_exists(real_git: GitOps) -> None:
+    assert real_git.branch_exists("main") is True
+    assert real_git.branch_exists("smelt/x") is False
+
+    # The long-lived process sees refs created after it started
+    real_git._run("branch", "smelt/x")
+    assert real_git.branch_exists("smelt/x") is True
+    real_git.delete_branch("smelt/x")
+    assert real_git.branch_exists("smelt/x") is False
+
+
+def test_rev_parse_and_read_file(real_git: GitOps) -> None:
+    head = real_git._run("rev-parse", "HEAD")
+    assert real_git.rev_parse("main") == head
+    assert real_git.rev_parse("no-such-rev") is None
+    assert real_git.read_file("main", "README.md") == b"hello\n"
+    assert real_git.read_file("main", "missing.txt") is None
+    assert real_git.current_branch() == "main"
+
+
+def test_diff_head_includes_new_files_without_staging_them(real_git: GitOps) -> None:
+    (real_git.repo_path / "README.md").write_text("hello\nworld\n")
+    (real_git.repo_path / "new.py").write_text("x = 1\n")
+
+    diff = real_git.diff_head()
+
+    assert "+world" in diff
+    assert "+x = 1" in diff
+    assert real_git._run("diff", "--cached", "--stat") == ""
+
+
+def test_snapshot_and_restore_working_tree(real_git: GitOps) -> None:
+    head = real_git._run("rev-parse", "HEAD")
+    (real_git.repo_path / "README.md").write_text("changed\n")
+    (real_git.repo_path / "new.py").write_text("x = 1\n")
+
+    sha = real_git.snapshot("task-1")
+
+    assert real_git._run("rev-parse", "HEAD") == head
+    assert real_git._run("status", "--porcelain") == "M README.md\n?? new.py"
+    assert real_git._run("rev-parse", "refs/smelt/checkpoints/task-1") == sha
+    real_git._run("checkout", "--force", "main")
+    real_git._run("clean", "-fdq")
+
+    real_git.restore_snapshot(sha)
+
+    assert (real_git.repo_path / "README.md").read_text() == "changed\n"
+    assert (real_git.repo_path / "new.py").read_text() == "x = 1\n"
+    assert real_git._run("rev-parse", "HEAD") == head
+
+    real_git.drop_snapshot("task-1")
+    assert real_git.rev_parse("refs/smelt/checkpoints/task-1") is None
+
+
+def test_snapshot_without_index(real_git: GitOps) -> None:
+    (real_git.repo_path / ".git" / "index").unlink()
+
+    sha = real_git.snapshot("task-1")
+
+    assert real_git._run("show", f"{sha}:README.md") == "hello"
+
+
+def _commit_file(git: GitOps, name: str, text: str) -> str:
+    (git.repo_path / name).write_text(text)
+    git._run("add", name)
+    git._run("-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", name)
+    return git._run("rev-parse", "HEAD")
+
+
+def test_contains_merged_and_squash_merged_changes(real_git: GitOps) -> None:
+    real_git._run("checkout", "-q", "-b", "feature")
+    _commit_file(real_git, "a.txt", "a\n")
+    feature = _commit_file(real_git, "b.txt", "b\n")
+    real_git._run("checkout", "-q", "main")
+    assert real_git.contains(feature, "main") is False
+    assert real_git.contains("main", feature) is True
+
+    # Squash merge: the same files on main
+    real_git._run("checkout", "-q", "feature", "--", "a.txt", "b.txt")
+    squashed = _commit_file(real_git, "a.txt", "a\n")
+    assert real_git.contains(feature, squashed) is True
+
+    # ... even once they changed again: the squash commit's patch id matches
+    _commit_file(real_git, "b.txt", "b2\n")
+    assert real_git.contains(feature, "main") is True
+
+
+def test_contains_a_commit_without_changes(real_git: GitOps) -> None:
+    empty_commit = real_git._run(
+        "-c",
+        "user.name=t",
+        "-c",
+        "user.email=t@t",
+        "commit-tree",
+        "HEAD^{tree}",
+        "-p",
+        "HEAD",
+        "-m",
+        "empty",
+    )
+    _commit_file(real_git, "other.txt", "o\n")
+    assert real_git.contains(empty_commit, "main") is True
+
+
+def test_reads_reuse_one_process(real_git: GitOps, mocker: MagicMock) -> None:
+    popen = mocker.spy(subprocess, "Popen")
+    for _ in range(5):
+        real_git.branch_exists("main")
+        real_git.read_file("main", "README.md")
+    assert popen.call_count == 2
+
+
+def test_concurrent_reads(real_git: GitOps) -> None:
+    results: list[bytes | None] = []
+
+    def read() -> None:
+        for _ in range(20):
+            results.append(real_git.read_file("main", "README.md"))
+
+    threads = [threading.Thread(target=read) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [b"hello\n"] * 80
+
+
+def test_cat_file_restarts_after_process_dies(real_git: GitOps) -> None:
+    assert real_git.branch_exists("main")
+    proc = real_git._batch_check._proc
+    assert proc is not None
+    proc.kill()
+    proc.wait()
+
+    with pytest.raises(GitError):
+        real_git.branch_exists("main")
+    assert real_git._batch_check._proc is None
+    assert real_git.branch_exists("main") is True
+
+
+def test_cat_file_reports_unexpected_exit(git: GitOps) -> None:
+    fake = MagicMock(stdin=io.BytesIO(), stdout=io.BytesIO(b""))
+    git._batch._proc = fake
+
+    with pytest.raises(GitError, match="exited unexpectedly"):
+        git.read_file("main", "README.md")
+    fake.wait.assert_called_once()
+    assert git._batch._proc is None
+
+
+def test_cat_file_rejects_multiline_spec(real_git: GitOps) -> None:
+    with pytest.raises(GitError, match="Invalid revision"):
+        real_git.rev_parse("main\nHEAD")
+
+
+def test_cat_file_start_failure(git: GitOps, mocker: MagicMock) -> None:
+    mocker.patch("subprocess.Popen", side_effect=FileNotFoundError("git"))
+    with pytest.raises(GitError, match="Failed to start git cat-file"):
+        git.rev_parse("HEAD")
+
+
+def test_close_without_reads(git: GitOps) -> None:
+    git.close()
+    git.close()
+
+
+# ---------------------------------------------------------------------------
+# Worktree pool (real repository)
+# ---------------------------------------------------------------------------
+
+
+def _pool(git: GitOps, **kwargs: float) -> WorktreePool:
+    options: dict[str, float] = {"max_idle": 2, "idle_seconds": 3600.0}
+    options.update(kwargs)
+    return WorktreePool(
+        git,
+        root=git.repo_path / ".smelt" / "worktrees",
+        max_idle=int(options["max_idle"]),
+        idle_seconds=options["idle_seconds"],
+    )
+
+
+def test_pool_leaves_main_tree_untouched(real_git: GitOps) -> None:
+    pool = _pool(real_git)
+    worktree = pool.acquire("smelt/a", "main")
+
+    assert worktree.branch == "smelt/a"
+    assert worktree.path.parent == real_git.repo_path / ".smelt" / "worktrees"
+    assert (worktree.path / "README.md").read_text() == "hello\n"
+    assert real_git.at(worktree.path).current_branch() == "smelt/a"
+    assert real_git.current_branch() == "main"
+    assert real_git._run("status", "--porcelain", "--untracked-files=no") == ""
+
+
+def test_pool_recycles_released_worktrees(real_git: GitOps) -> None:
+    pool = _pool(real_git)
+    first = pool.acquire("smelt/a", "main")
+    (first.path / "README.md").write_text("changed\n")
+    (first.path / "scratch").mkdir()
+    (first.path / "scratch" / "notes.txt").write_text("x")
+    pool.release(first)
+    assert pool.idle == [first.path]
+    assert real_git.at(first.path).current_branch() == ""
+
+    second = pool.acquire("smelt/b", "main")
+
+    assert second.path == first.path
+    assert pool.idle == []
+    assert (second.path / "README.md").read_text() == "hello\n"
+    assert not (second.path / "scratch").exists()
+    assert real_git.at(second.path).current_branch() == "smelt/b"
+
+
+def test_pool_collects_surplus_and_expired_worktrees(real_git: GitOps) -> None:
+    pool = _pool(real_git, max_idle=1)
+    first = pool.acquire("smelt/a", "main")
+    second = pool.acquire("smelt/b", "main")
+    assert first.path != second.path
+    pool.release(first)
+    pool.release(second)
+
+    assert pool.idle == [second.path]
+    assert not first.path.exists()
+    assert "smelt/a" not in real_git._run("worktree", "list")
+
+    expiring = _pool(real_git, idle_seconds=1e-9)
+    worktree = expiring.acquire("smelt/c", "main")
+    expiring.release(worktree)
+    assert expiring.idle == []
+    assert not worktree.path.exists()
+
+
+def test_pool_adopts_worktrees_from_previous_process(real_git: GitOps) -> None:
+    previous = _pool(real_git)
+    worktree = previous.acquire("smelt/a", "main")
+    previous.release(worktree)
+
+    pool = _pool(real_git)
+    assert pool.acquire("smelt/b", "main").path == worktree.path
+
+
+def test_pool_replaces_broken_worktrees(real_git: GitOps) -> None:
+    pool = _pool(real_git)
+    worktree = pool.acquire("smelt/a", "main")
+    pool.release(worktree)
+    # Without its .git file, git would operate on the enclosing repository
+    (worktree.path / ".git").unlink()
+
+    replacement = pool.acquire("smelt/b", "main")
+
+    assert (replacement.path / ".git").is_file()
+    assert real_git.at(replacement.path).current_branch() == "smelt/b"
+    assert real_git.current_branch() == "main"
+
+    (replacement.path / ".git").unlink()
+    pool.release(replacement)
+    assert pool.idle == []
+    assert not replacement.path.exists()
+
+
+def test_pool_acquire_failure_is_raised(real_git: GitOps) -> None:
+    pool = _pool(real_git)
+    with pytest.raises(GitError):
+        pool.acquire("smelt/a", "no-such-rev")
+    assert pool.idle == []
+
+    worktree = pool.acquire("smelt/a", "main")
+    pool.release(worktree)
+    with pytest.raises(GitError):
+        pool.acquire("smelt/b", "no-such-rev")
+    assert not worktree.path.exists()
+
+
+def test_pool_adoption_tolerates_git_failures(git: GitOps, mocker: MagicMock) -> None:
+    root = git.repo_path / ".smelt" / "worktrees"
+    root.mkdir(parents=True)
+    mock_run = mocker.patch.object(git, "_run", side_effect=GitError("locked"))
+    pool = WorktreePool(git, root=root, max_idle=1, idle_seconds=60)
+
+    with pytest.raises(GitError):
+        pool.acquire("smelt/a", "main")
+
+    commands = [c.args[:2] for c in mock_run.call_args_list]
+    assert commands == [
+        ("worktree", "prune"),
+        ("worktree", "list"),
+        ("worktree", "add"),
+    ]
+    assert pool.idle == []
+
+
+def test_pool_remove_falls_back_to_deleting_the_directory(
+    git: GitOps, mocker: MagicMock
+) -> None:
+    path = git.repo_path / "wt"
+    path.mkdir()
+    mock_run = mocker.patch.object(git, "_run", side_effect=GitError("locked"))
+    pool = WorktreePool(git, root=git.repo_path, max_idle=0, idle_seconds=60)
+
+    pool.release(Worktree(path=path, branch="smelt/a"))
+
+    assert not path.exists()
+    assert mock_run.call_args_list[-1].args == ("worktree", "prune")
+
+
+# ---------------------------------------------------------------------------
+# Base-branch sync (real repository with a bare origin)
+# ---------------------------------------------------------------------------
+
+
+@pytest.fixture
+def origin_git(real_git: GitOps, tmp_path: Path) -> GitOps:
+    origin = tmp_path.parent / f"{tmp_path.name}-origin.git"
+    subprocess.run(
+        ["git", "clone", "-q", "--bare", str(tmp_path), str(origin)],
+        check=True,
+        capture_output=True,
+    )
+    real_git._run("remote", "add", "origin", str(origin))
+    return real_git
+
+
+def _push_commit(git: GitOps, message: str) -> str:
+    """Commit on main in a scratch clone of origin and push it."""
+    origin = git._run("remote", "get-url", "origin")
+    clone = git.repo_path.parent / f"{git.repo_path.name}-clone"
+    if not clone.exists():
+        subprocess.run(
+            ["git", "clone", "-q", origin, str(clone)], check=True, capture_output=True
+        )
+    other = GitOps(clone, git.config)
+    other._run(
+        "-c",
+        "user.name=t",
+        "-c",
+        "user.email=t@t",
+        "commit",
+        "-q",
+        "--allow-empty",
+        "-m",
+        message,
+    )
+    other._run("push", "-q", "origin", "main")
+    return other._run("rev-parse", "HEAD")
+
+
+def test_sync_fetches_once_per_interval(origin_git: GitOps, mocker: MagicMock) -> None:
+    fetch = mocker.spy(origin_git, "fetch")
+    sync = BaseBranchSync(origin_git, branch="main", interval_seconds=3600)
+    first = sync.pin()
+    assert first == origin_git._run("rev-parse", "main")
+
+    _push_commit(origin_git, "upstream change")
+
+    assert sync.pin() == first
+    assert fetch.call_count == 1
+
+
+def test_sync_refetches_after_interval(origin_git: GitOps) -> None:
+    sync = BaseBranchSync(origin_git, branch="main", interval_seconds=0)
+    before = sync.pin()
+
+    pushed = _push_commit(origin_git, "upstream change")
+
+    assert sync.pin() == pushed != before
+    assert origin_git.current_branch() == "main"
+    assert origin_git._run("rev-parse", "main") == before
+
+
+def test_sync_shares_one_fetch_between_workers(
+    origin_git: GitOps, mocker: MagicMock
+) -> None:
+    fetch = mocker.spy(origin_git, "fetch")
+    sync = BaseBranchSync(origin_git, branch="main", interval_seconds=3600)
+    pinned: list[str] = []
+    threads = [
+        threading.Thread(target=lambda: pinned.append(sync.pin())) for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert fetch.call_count == 1
+    assert len(set(pinned)) == 1
+    assert len(pinned) == 8
+
+
+def test_sync_reuses_last_commit_when_fetch_fails(
+    git: GitOps, mocker: MagicMock, caplog: pytest.LogCaptureFixture
+) -> None:
+    fetch = mocker.patch.object(git, "fetch")
+    mocker.patch.object(git, "rev_parse", return_value="abc123")
+    sync = BaseBranchSync(git, branch="main", interval_seconds=0)
+    assert sync.pin() == "abc123"
+
+    fetch.side_effect = GitError("network down")
+    assert sync.pin() == "abc123"
+    assert "reusing abc123" in caplog.text
+    with pytest.raises(GitError, match="network down"):
+        sync.pin(fresh=True)
+
+
+def test_fresh_pin_fetches_within_the_interval(git: GitOps, mocker: MagicMock) -> None:
+    fetch = mocker.patch.object(git, "fetch")
+    mocker.patch.object(git, "rev_parse", return_value="abc123")
+    sync = BaseBranchSync(git, branch="main", interval_seconds=3600)
+    sync.pin()
+    sync.pin(fresh=True)
+    assert fetch.call_count == 2
+
+
+def test_sync_without_any_successful_fetch_raises(
+    git: GitOps, mocker: MagicMock
+) -> None:
+    mocker.patch.object(git, "fetch")
+    mocker.patch.object(git, "rev_parse", return_value=None)
+    sync = BaseBranchSync(git, branch="main", interval_seconds=60)
+    with pytest.raises(GitError, match="origin/main not found"):
+        sync.pin()
+
+
+# ---------------------------------------------------------------------------
+# Publishing: multi-ref push and push batching
+# ---------------------------------------------------------------------------
+
+
+def _commit_on(git: GitOps, branch: str, start: str = "main") -> None:
+    git._run("branch", "-f", branch, start)
+    worktree = git.repo_path.parent / f"{git.repo_path.name}-{branch.replace('/', '-')}"
+    git._run("worktree", "add", "-q", str(worktree), branch)
+    other = git.at(worktree)
+    (worktree / "change.txt").write_text(branch)
+    other.add_all()
+    assert other.has_staged_changes() is True
+    other._run("-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", branch)
+    assert other.has_staged_changes() is False
+
+
+def test_push_branches_sends_every_ref_in_one_push(
+    origin_git: GitOps, mocker: MagicMock
+) -> None:
+    _commit_on(origin_git, "smelt/a")
+    _commit_on(origin_git, "smelt/b")
+    popen = mocker.spy(subprocess, "Popen")
+
+    assert origin_git.push_branches(["smelt/a", "smelt/b"]) == {}
+
+    assert popen.call_count == 1
+    remote = origin_git._run("ls-remote", "--heads", "origin")
+    assert "refs/heads/smelt/a" in remote
+    assert "refs/heads/smelt/b" in remote
+    upstream = origin_git._run("rev-parse", "--abbrev-ref", "smelt/a@{upstream}")
+    assert upstream == "origin/smelt/a"
+
+
+def test_push_branches_reports_rejected_refs(origin_git: GitOps) -> None:
+    _commit_on(origin_git, "smelt/a")
+    assert origin_git.push_branches(["smelt/a"]) == {}
+    # Rewind the branch so the next push is not a fast-forward
+    origin_git._run("update-ref", "refs/heads/smelt/a", "main")
+    _commit_on(origin_git, "smelt/b")
+
+    failed = origin_git.push_branches(["smelt/a", "smelt/b"])
+
+    assert list(failed) == ["smelt/a"]
+    assert "rejected" in failed["smelt/a"]
+    assert "refs/heads/smelt/b" in origin_git._run("ls-remote", "--heads", "origin")
+
+
+def test_push_branches_without_remote_fails_every_branch(real_git: GitOps) -> None:
+    failed = real_git.push_branches(["main", "smelt/x"])
+    assert set(failed) == {"main", "smelt/x"}
+    assert "origin" in failed["main"]
+
+
+def test_push_batcher_coalesces_pushes_made_during_a_push(git: GitOps) -> None:
+    first_push_started = threading.Event()
+    release_first_push = threading.Event()
+    batches: list[list[str]] = []
+
+    def push_branches(branches: list[str]) -> dict[str, str]:
+        batches.append(list(branches))
+        if len(batches) == 1:
+            first_push_started.set()
+            release_first_push.wait()
+        return {"smelt/c": "[rejected] (non-fast-forward)"}
+
+    git.push_branches = push_branches  # type: ignore[method-assign]
+    batcher = PushBatcher(git)
+    errors: dict[str, str] = {}
+
+    def push(branch: str) -> None:
+        try:
+            batcher.push(branch)
+        except GitError as e:
+            errors[branch] = str(e)
+
+    leader = threading.Thread(target=push, args=("smelt/a",))
+    leader.start()
+    assert first_push_started.wait(5)
+    followers = [
+        threading.Thread(target=push, args=(branch,))
+        for branch in ("smelt/b", "smelt/c", "smelt/b")
+    ]
+    for thread in followers:
+        thread.start()
+    while len(batcher._pending) < 3:
+        time.sleep(0.001)
+    release_first_push.set()
+    for thread in [leader, *followers]:
+        thread.join()
+
+    assert batches == [["smelt/a"], ["smelt/b", "smelt/c"]]
+    assert list(errors) == ["smelt/c"]
+    assert "Failed to push smelt/c: [rejected]" in errors["smelt/c"]
+
+
+def test_push_batcher_fails_batch_when_push_crashes(
+    git: GitOps, mocker: MagicMock
+) -> None:
+    mocker.patch.object(git, "push_branches", side_effect=OSError("no git"))
+    batcher = PushBatcher(git)
+    with pytest.raises(GitError, match="no git"):
+        batcher.push("smelt/a")
+    # The batcher is usable again afterwards
+    mocker.patch.object(git, "push_branches", return_value={})
+    batcher.push("smelt/a")
@@ -2,25 +2,124 @@
 
 from __future__ import annotations
 
+import io
 import subprocess
+import threading
+from collections.abc import Iterator
+from pathlib import Path
 from unittest.mock import MagicMock
 
 import pytest
 
 from smelt.agents.goose_adapter import GooseAdapter
-from smelt.exceptions import AgentError, AgentTimeoutError
+from smelt.agents.protocols import (
+    OutputMonitor,
+    ResumableCodingAgent,
+    RunScopedCodingAgent,
+)
+from smelt.db.models import OutputLine
+from smelt.exceptions import AgentAbortedError, AgentError, AgentTimeoutError
 
 
-def _make_proc(stdout: str = "", stderr: str = "") -> MagicMock:
-    proc = MagicMock()
-    proc.stdout = stdout
-    proc.stderr = stderr
-    proc.returncode = 0
-    return proc
+class _BlockingStream:
+    """A pipe that yields some lines and then hangs until the process is killed."""
+
+    def __init__(self, lines: list[str], released: threading.Event) -> None:
+        self._lines = lines
+        self._released = released
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._lines
+        self._released.wait(timeout=5)
+
+
+class _RecordingStdin:
+    """Stand-in for the stdin pipe that records what was written."""
+
+    def __init__(self, *, broken: bool = False) -> None:
+        self.written = ""
+        self.closed = False
+        self._broken = broken
+
+    def write(self, text: str) -> int:
+        if self._broken:
+            raise BrokenPipeError
+        self.written += text
+        return len(text)
+
+    def close(self) -> None:
+        if self._broken:
+            raise BrokenPipeError
+        self.closed = True
+
+
+class _DrainedStream:
+    """A pipe that signals once all of its lines have been read."""
+
+    def __init__(self, lines: list[str], drained: threading.Event) -> None:
+        self._lines = lines
+        self._drained = drained
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._lines
+        self._drained.set()
+
+
+class _FullPipeStdin(_RecordingStdin):
+    """A stdin pipe that only accepts the prompt once the output is drained."""
+
+    def __init__(self, drained: threading.Event) -> None:
+        super().__init__()
+        self._drained = drained
+
+    def write(self, text: str) -> int:
+        assert self._drained.wait(timeout=5), "prompt written before output read"
+        return super().write(text)
+
+
+class _FakeProc:
+    """Stand-in for subprocess.Popen with scripted stdout/stderr."""
+
+    def __init__(
+        self,
+        stdout: str = "",
+        stderr: str = "",
+        returncode: int = 0,
+        *,
+        hang_stdout: bool = False,
+        hang_on_wait: bool = False,
+        broken_stdin: bool = False,
+    ) -> None:
+        self._killed = threading.Event()
+        self.stdin = _RecordingStdin(broken=broken_stdin)
+        self.stdout: object = (
+            _BlockingStream(stdout.splitlines(keepends=True), self._killed)
+            if hang_stdout
+            else io.StringIO(stdout)
+        )
+        self.stderr = io.StringIO(stderr)
+        self.returncode = returncode
+        self._hang_on_wait = hang_on_wait
+
+    @property
+    def killed(self) -> bool:
+        return self._killed.is_set()
+
+    def kill(self) -> None:
+        self._killed.set()
+
+    def wait(self, timeout: float | None = None) -> int:
+        if self._hang_on_wait and not self.killed:
+            raise subprocess.TimeoutExpired(cmd="goose", timeout=timeout or 0)
+        return self.returncode
+
+
+def _patch_popen(mocker: MagicMock, proc: _FakeProc) -> MagicMock:
+    return mocker.patch("subprocess.Popen", return_value=proc)
 
 
 def test_successful_session(mocker: MagicMock) -> None:
-    mocker.patch("subprocess.run", return_value=_make_proc(stdout="  done\n"))
+    _patch_popen(mocker, _FakeProc(stdout="  done\n"))
     adapter = GooseAdapter()
     result = adapter.run_session(
         prompt="implement feature X",
@@ -31,10 +130,11 @@ def test_successful_session(mocker: MagicMock) -> None:
     assert result.output == "done"
     assert result.duration_seconds >= 0.0
     assert len(result.session_id) == 8
+    assert result.log_path is None
 
 
 def test_read_only_flag_passed_in_command(mocker: MagicMock) -> None:
-    mock_run = mocker.patch("subprocess.run", return_value=_make_proc())
+    mock_popen = _patch_popen(mocker, _FakeProc())
     adapter = GooseAdapter()
     adapter.run_session(
         prompt="review code",
@@ -42,12 +142,12 @@ def test_read_only_flag_passed_in_command(mocker: MagicMock) -> None:
         timeout_seconds=30,
         read_only=True,
     )
-    cmd = mock_run.call_args[0][0]
+    cmd = mock_popen.call_args[0][0]
     assert "--no-write" in cmd
 
 
 def test_read_only_false_does_not_add_flag(mocker: MagicMock) -> None:
-    mock_run = mocker.patch("subprocess.run", return_value=_make_proc())
+    mock_popen = _patch_popen(mocker, _FakeProc())
     adapter = GooseAdapter()
     adapter.run_session(
         prompt="code",
@@ -55,54 +155,282 @@ def test_read_only_false_does_not_add_flag(mocker: MagicMock) -> None:
         timeout_seconds=30,
         read_only=False,
     )
-    cmd = mock_run.call_args[0][0]
+    cmd = mock_popen.call_args[0][0]
     assert "--no-write" not in cmd
 
 
-def test_timeout_raises_agent_timeout_error(mocker: MagicMock) -> None:
-    mocker.patch(
-        "subprocess.run",
-        side_effect=subprocess.TimeoutExpired(cmd="goose", timeout=30),
+def test_custom_executable(mocker: MagicMock) -> None:
+    mock_popen = _patch_popen(mocker, _FakeProc())
+    adapter = GooseAdapter(executable="/usr/local/bin/goose")
+    adapter.run_session(prompt="x", working_dir="/tmp", timeout_seconds=30)
+    cmd = mock_popen.call_args[0][0]
+    assert cmd[0] == "/usr/local/bin/goose"
+
+
+def test_prompt_passed_via_stdin(mocker: MagicMock) -> None:
+    proc = _FakeProc()
+    mock_popen = _patch_popen(mocker, proc)
+    adapter = GooseAdapter()
+    adapter.run_session(prompt="my prompt", working_dir="/tmp", timeout_seconds=30)
+    cmd = mock_popen.call_args[0][0]
+    assert cmd[cmd.index("--instructions") + 1] == "-"
+    assert "my prompt" not in cmd
+    assert "--text" not in cmd
+    assert mock_popen.call_args.kwargs["stdin"] == subprocess.PIPE
+    assert proc.stdin.written == "my prompt"
+    assert proc.stdin.closed is True
+
+
+def test_large_prompt_passed_via_instruction_file(mocker: MagicMock) -> None:
+    mocker.patch("smelt.agents.goose_adapter._STDIN_PROMPT_MAX_BYTES", 16)
+    seen: dict[str, str] = {}
+
+    def popen(cmd: list[str], **kwargs: object) -> _FakeProc:
+        path = cmd[cmd.index("--instructions") + 1]
+        seen["path"] = path
+        seen["content"] = Path(path).read_text(encoding="utf-8")
+        seen["mode"] = oct(Path(path).stat().st_mode & 0o777)
+        assert kwargs["stdin"] == subprocess.DEVNULL
+        return _FakeProc(stdout="ok\n")
+
+    mocker.patch("subprocess.Popen", side_effect=popen)
+    prompt = "a repository context much larger than the limit — ünïcode"
+    adapter = GooseAdapter()
+
+    result = adapter.run_session(prompt=prompt, working_dir="/tmp", timeout_seconds=30)
+
+    assert result.output == "ok"
+    assert seen["content"] == prompt
+    assert seen["mode"] == "0o600"
+    assert not Path(seen["path"]).exists()
+
+
+def test_instruction_file_removed_when_session_fails(mocker: MagicMock) -> None:
+    mocker.patch("smelt.agents.goose_adapter._STDIN_PROMPT_MAX_BYTES", 0)
+    mock_popen = _patch_popen(mocker, _FakeProc(stderr="crashed\n", returncode=1))
+    adapter = GooseAdapter()
+
+    with pytest.raises(AgentError, match="crashed"):
+        adapter.run_session(prompt="x", working_dir="/tmp", timeout_seconds=30)
+
+    cmd = mock_popen.call_args[0][0]
+    assert not Path(cmd[cmd.index("--instructions") + 1]).exists()
+
+
+def test_early_exit_before_reading_stdin_reports_exit_code(mocker: MagicMock) -> None:
+    _patch_popen(
+        mocker, _FakeProc(stderr="bad flag\n", returncode=2, broken_stdin=True)
     )
     adapter = GooseAdapter()
+    with pytest.raises(AgentError, match="exit 2"):
+        adapter.run_session(prompt="x", working_dir="/tmp", timeout_seconds=30)
+
+
+def test_output_lines_streamed_to_callback(mocker: MagicMock) -> None:
+    _patch_popen(mocker, _FakeProc(stdout="reading\nwriting\n", stderr="warn\n"))
+    seen: list[OutputLine] = []
+    adapter = GooseAdapter(on_output=seen.append)
+
+    result = adapter.run_session(prompt="x", working_dir="/tmp", timeout_seconds=30)
+
+    stdout_lines = [line.text for line in seen if line.stream == "stdout"]
+    assert stdout_lines == ["reading", "writing"]
+    assert [line.text for line in seen if line.stream == "stderr"] == ["warn"]
+    assert {line.session_id for line in seen} == {result.session_id}
+
+
+def test_session_log_written_to_log_dir(mocker: MagicMock, tmp_path: Path) -> None:
+    _patch_popen(mocker, _FakeProc(stdout="step 1\nstep 2\n", stderr="oops\n"))
+    adapter = GooseAdapter(log_dir=tmp_path / "logs")
+
+    result = adapter.run_session(prompt="x", working_dir="/tmp", timeout_seconds=30)
+
+    assert result.log_path is not None
+    log_path = Path(result.log_path)
+    assert log_path.parent == tmp_path / "logs"
+    assert result.session_id in log_path.name
+    content = log_path.read_text()
+    assert "[stdout] step 1" in content
+    assert "[stdout] step 2" in content
+    assert "[stderr] oops" in content
+
+
+def test_run_sessions_log_to_the_run_directory(
+    mocker: MagicMock, tmp_path: Path
+) -> None:
+    _patch_popen(mocker, _FakeProc(stdout="step 1\n"))
+    on_output = MagicMock()
+    adapter = GooseAdapter(log_dir=tmp_path, on_output=on_output).for_run("run-1")
+
+    result = adapter.run_session(prompt="x", working_dir="/tmp", timeout_seconds=30)
+
+    assert result.log_path is not None
+    assert Path(result.log_path).parent == tmp_path / "run-1"
+    on_output.assert_called_once()
+
+
+def test_output_kept_in_memory_is_bounded(mocker: MagicMock) -> None:
+    chatty = "".join(f"line {n}\n" for n in range(1000))
+    _patch_popen(mocker, _FakeProc(stdout=chatty))
+    adapter = GooseAdapter()
+
+    result = adapter.run_session(prompt="x", working_dir="/tmp", timeout_seconds=30)
+
+    lines = result.output.splitlines()
+    assert len(lines) == 200
+    assert lines[-1] == "line 999"
+    assert "line 0" not in lines
+
+
+def test_timeout_while_streaming_kills_process(mocker: MagicMock) -> None:
+    proc = _FakeProc(stdout="thinking\n", hang_stdout=True)
+    _patch_popen(mocker, proc)
+    adapter = GooseAdapter()
+
+    with pytest.raises(AgentTimeoutError, match="timed out"):
+        adapter.run_session(prompt="x", working_dir="/tmp", timeout_seconds=0)
+    assert proc.killed is True
+
+
+def test_timeout_waiting_for_exit_kills_process(mocker: MagicMock) -> None:
+    proc = _FakeProc(stdout="done\n", hang_on_wait=True)
+    _patch_popen(mocker, proc)
+    adapter = GooseAdapter()
+
     with pytest.raises(AgentTimeoutError, match="timed out"):
         adapter.run_session(prompt="x", working_dir="/tmp", timeout_seconds=30)
+    assert proc.killed is True
+
+
+class _AbortOn:
+    """Monitor that aborts when a marker string appears."""
+
+    def __init__(self, marker: str) -> None:
+        self._marker = marker
+        self.seen: list[str] = []
+
+    def observe(self, line: OutputLine) -> str | None:
+        self.seen.append(line.text)
+        return "stuck" if self._marker in line.text else None
+
+
+def test_monitor_abort_stops_session_early(mocker: MagicMock) -> None:
+    proc = _FakeProc(stdout="ok\nLOOP\nnever seen\n", hang_stdout=True)
+    _patch_popen(mocker, proc)
+    monitor = _AbortOn("LOOP")
+    adapter = GooseAdapter(monitor_factory=lambda: [monitor])
+
+    with pytest.raises(AgentAbortedError, match="aborted: stuck"):
+        adapter.run_session(prompt="x", working_dir="/tmp", timeout_seconds=30)
+    assert proc.killed is True
+    assert "never seen" not in monitor.seen
+
+
+def test_failing_output_callback_kills_process(mocker: MagicMock) -> None:
+    proc = _FakeProc(stdout="thinking\n", hang_stdout=True)
+    _patch_popen(mocker, proc)
+    adapter = GooseAdapter(on_output=MagicMock(side_effect=RuntimeError("boom")))
+
+    with pytest.raises(RuntimeError, match="boom"):
+        adapter.run_session(prompt="x", working_dir="/tmp", timeout_seconds=30)
+    assert proc.killed is True
+
+
+def test_fresh_monitors_created_per_session(mocker: MagicMock) -> None:
+    mocker.patch("subprocess.Popen", side_effect=lambda *a, **k: _FakeProc("hi\n"))
+    created: list[OutputMonitor] = []
+
+    def factory() -> list[OutputMonitor]:
+        monitor = _AbortOn("never")
+        created.append(monitor)
+        return [monitor]
+
+    adapter = GooseAdapter(monitor_factory=factory)
+    adapter.run_session(prompt="x", working_dir="/tmp", timeout_seconds=30)
+    adapter.run_session(prompt="y", working_dir="/tmp", timeout_seconds=30)
+
+    assert len(created) == 2
+    assert created[0] is not created[1]
 
 
 def test_non_zero_exit_raises_agent_error(mocker: MagicMock) -> None:
-    mocker.patch(
-        "subprocess.run",
-        side_effect=subprocess.CalledProcessError(
-            returncode=1, cmd="goose", stderr="crashed"
-        ),
-    )
+    _patch_popen(mocker, _FakeProc(stderr="crashed\n", returncode=1))
     adapter = GooseAdapter()
     with pytest.raises(AgentError, match="crashed"):
         adapter.run_session(prompt="x", working_dir="/tmp", timeout_seconds=60)
 
 
 def test_non_zero_exit_uses_stdout_when_no_stderr(mocker: MagicMock) -> None:
-    err = subprocess.CalledProcessError(returncode=1, cmd="goose")
-    err.stdout = "stdout error"
-    err.stderr = ""
-    mocker.patch("subprocess.run", side_effect=err)
+    _patch_popen(mocker, _FakeProc(stdout="stdout error\n", returncode=1))
     adapter = GooseAdapter()
     with pytest.raises(AgentError, match="stdout error"):
         adapter.run_session(prompt="x", working_dir="/tmp", timeout_seconds=60)
 
 
-def test_custom_executable(mocker: MagicMock) -> None:
-    mock_run = mocker.patch("subprocess.run", return_value=_make_proc())
-    adapter = GooseAdapter(executable="/usr/local/bin/goose")
-    adapter.run_session(prompt="x", working_dir="/tmp", timeout_seconds=30)
-    cmd = mock_run.call_args[0][0]
-    assert cmd[0] == "/usr/local/bin/goose"
+def test_missing_executable_raises_agent_error(mocker: MagicMock) -> None:
+    mocker.patch("subprocess.Popen", side_effect=FileNotFoundError("no goose"))
+    adapter = GooseAdapter()
+    with pytest.raises(AgentError, match="Failed to start Goose"):
+        adapter.run_session(prompt="x", working_dir="/tmp", timeout_seconds=60)
 
 
-def test_prompt_passed_via_text_flag(mocker: MagicMock) -> None:
-    mock_run = mocker.patch("subprocess.run", return_value=_make_proc())
+def test_session_is_named_for_later_resume(mocker: MagicMock) -> None:
+    mock_popen = _patch_popen(mocker, _FakeProc())
     adapter = GooseAdapter()
-    adapter.run_session(prompt="my prompt", working_dir="/tmp", timeout_seconds=30)
-    cmd = mock_run.call_args[0][0]
-    assert "--text" in cmd
-    assert "my prompt" in cmd
+    result = adapter.run_session(prompt="x", working_dir="/tmp", timeout_seconds=30)
+
+    cmd = mock_popen.call_args[0][0]
+    assert cmd[cmd.index("--name") + 1] == f"smelt-{result.session_id}"
+    assert "--resume" not in cmd
+
+
+def test_resume_session_continues_named_session(
+    mocker: MagicMock, tmp_path: Path
+) -> None:
+    mock_popen = _patch_popen(mocker, _FakeProc(stdout="fixed it\n"))
+    adapter = GooseAdapter(log_dir=tmp_path)
+
+    result = adapter.resume_session(
+        session_id="abcd1234",
+        prompt="fix the failing test",
+        working_dir="/repo",
+        timeout_seconds=30,
+    )
+
+    cmd = mock_popen.call_args[0][0]
+    assert cmd[cmd.index("--name") + 1] == "smelt-abcd1234"
+    assert "--resume" in cmd
+    assert cmd[cmd.index("--instructions") + 1] == "-"
+    assert mock_popen.return_value.stdin.written == "fix the failing test"
+    assert mock_popen.call_args.kwargs["cwd"] == "/repo"
+    assert result.session_id == "abcd1234"
+    assert result.output == "fixed it"
+    assert result.log_path == str(tmp_path / "goose-abcd1234.log")
+
+
+def test_prompt_is_written_while_output_is_read(mocker: MagicMock) -> None:
+    # Goose fills its output pipe before reading the whole prompt
+    drained = threading.Event()
+    proc = _FakeProc()
+    proc.stdout = _DrainedStream(["line\n"] * 100, drained)
+    proc.stdin = _FullPipeStdin(drained)
+    _patch_popen(mocker, proc)
+
+    result = GooseAdapter().run_session(
+        prompt="x" * 1000, working_dir="/tmp", timeout_seconds=30
+    )
+
+    assert result.success is True
+    assert proc.stdin.written == "x" * 1000
+    assert proc.stdin.closed is True
+
+
+def test_goose_adapter_is_resumable() -> None:
+    assert isinstance(GooseAdapter(), ResumableCodingAgent)
+
+
+def test_goose_adapter_is_run_scoped() -> None:
+    adapter = GooseAdapter()
+    assert isinstance(adapter, RunScopedCodingAgent)
+    # Without a log directory there is nothing to scope
+    assert adapter.for_run("run-1") is adapter
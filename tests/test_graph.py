@@ -0,0 +1,290 @@
+"""Tests for the declarative stage graph."""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import replace
+
+import pytest
+
+from smelt.db.models import RunEvent, RunResult
+from smelt.events import RunRecorder
+from smelt.pipeline.graph import Node, Progress, Route, StageGraph
+from smelt.pipeline.stages import Stage, StageInput, StageOutput
+
+
+class _ScriptedStage(Stage):
+    """Stage that records its inputs and replays scripted outcomes.
+
+    Each outcome is True (pass), False (fail) or the escalate_to target of
+    a failure. Once the script runs out the stage passes.
+    """
+
+    def __init__(self, name: str, *outcomes: bool | str) -> None:
+        self._name = name
+        self.outcomes = list(outcomes)
+        self.inputs: list[StageInput] = []
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def execute(self, stage_input: StageInput) -> StageOutput:
+        self.inputs.append(stage_input)
+        outcome = self.outcomes.pop(0) if self.outcomes else True
+        if outcome is True:
+            return StageOutput(passed=True, output=f"{self._name} ok", escalate_to=None)
+        return StageOutput(
+            passed=False,
+            output=f"{self._name} failed",
+            escalate_to=outcome if isinstance(outcome, str) else None,
+        )
+
+
+class _BarrierStage(Stage):
+    """Stage that only passes if another stage runs at the same time."""
+
+    def __init__(self, name: str, barrier: threading.Barrier) -> None:
+        self._name = name
+        self._barrier = barrier
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def execute(self, stage_input: StageInput) -> StageOutput:
+        self._barrier.wait(timeout=5)
+        return StageOutput(passed=True, output="", escalate_to=None)
+
+
+def _input() -> StageInput:
+    return StageInput(
+        task_description="task",
+        task_context=None,
+        repo_context="",
+        plan=None,
+        last_failure=None,
+    )
+
+
+def _recorder() -> tuple[RunRecorder, list[RunEvent | RunResult]]:
+    events: list[RunEvent | RunResult] = []
+    return RunRecorder(run_id="r", task_id="t", sinks=[events.append]), events
+
+
+def _stage_events(events: list[RunEvent | RunResult]) -> list[tuple[str, int | None]]:
+    return [
+        (e.stage or "", e.attempt)
+        for e in events
+        if isinstance(e, RunEvent) and e.event == "stage_started"
+    ]
+
+
+def test_passing_graph_threads_state_through_then() -> None:
+    plan = _ScriptedStage("plan")
+    code = _ScriptedStage("code")
+    graph = StageGraph(
+        steps=[
+            [Node(plan, then=lambda state, out: replace(state, plan=out.output))],
+            [Node(code)],
+        ],
+        routes=[],
+    )
+    recorder, events = _recorder()
+
+    result = graph.run(_input(), recorder)
+
+    assert (result.passed, result.stage, result.attempt) == (True, "code", None)
+    assert code.inputs[0].plan == "plan ok"
+    assert _stage_events(events) == [("plan", None), ("code", None)]
+
+
+def test_failures_route_back_with_feedback_until_retries_run_out() -> None:
+    code = _ScriptedStage("code")
+    check = _ScriptedStage("check", False, False, False)
+    graph = StageGraph(
+        steps=[[Node(code, retries=2)], [Node(check)]],
+        routes=[Route("check", "code", feedback="Check says")],
+    )
+    recorder, events = _recorder()
+
+    result = graph.run(_input(), recorder)
+
+    assert (result.passed, result.stage, result.attempt) == (False, "check", 3)
+    assert [i.last_failure for i in code.inputs] == [
+        None,
+        "Check says:\ncheck failed",
+        "Check says:\ncheck failed",
+    ]
+    assert [i.last_attempt for i in check.inputs] == [False, False, True]
+    assert _stage_events(events) == [
+        ("code", 1),
+        ("check", 1),
+        ("code", 2),
+        ("check", 2),
+        ("code", 3),
+        ("check", 3),
+    ]
+
+
+def test_stages_of_a_step_run_concurrently_and_failures_combine() -> None:
+    barrier = threading.Barrier(2)
+    code = _ScriptedStage("code")
+    lint = _ScriptedStage("lint", False)
+    review = _ScriptedStage("review", False)
+    graph = StageGraph(
+        steps=[
+            [Node(code, retries=1)],
+            [Node(_BarrierStage("a", barrier)), Node(_BarrierStage("b", barrier))],
+            [Node(lint), Node(review)],
+        ],
+        routes=[Route("lint", "code"), Route("review", "code", feedback="Review")],
+    )
+
+    result = graph.run(_input(), _recorder()[0])
+
+    assert result.passed is True
+    assert code.inputs[1].last_failure == "lint failed\n\nReview:\nreview failed"
+
+
+def test_escalation_picks_route_and_resets_later_counters() -> None:
+    plan = _ScriptedStage("plan")
+    code = _ScriptedStage("code")
+    check = _ScriptedStage("check", False, "plan", False)
+    graph = StageGraph(
+        steps=[[Node(plan)], [Node(code, retries=1)], [Node(check)]],
+        routes=[Route("check", "code"), Route("check", "plan", budget=1)],
+    )
+
+    result = graph.run(_input(), _recorder()[0])
+
+    # code ran twice, then check escalated: a re-plan restores code's retry
+    assert result.passed is True
+    assert len(plan.inputs) == 2
+    assert plan.inputs[1].last_failure == "check failed"
+    assert len(code.inputs) == 4
+    assert code.inputs[2].last_failure is None
+
+
+def test_earliest_target_wins_when_a_step_fails_two_ways() -> None:
+    plan = _ScriptedStage("plan")
+    code = _ScriptedStage("code")
+    graph = StageGraph(
+        steps=[
+            [Node(plan)],
+            [Node(code, retries=0)],
+            [Node(_ScriptedStage("lint", False)), Node(_ScriptedStage("qc", False))],
+        ],
+        routes=[Route("lint", "code"), Route("qc", "plan", budget=1)],
+    )
+
+    assert graph.run(_input(), _recorder()[0]).passed is True
+    assert plan.inputs[1].last_failure == "qc failed"
+    assert code.inputs[1].last_failure is None
+
+
+def test_exhausted_fail_route_fails_the_run() -> None:
+    check = _ScriptedStage("check", "plan", "plan")
+    graph = StageGraph(
+        steps=[[Node(_ScriptedStage("plan"))], [Node(check)]],
+        routes=[Route("check", "plan", budget=1)],
+    )
+    result = graph.run(_input(), _recorder()[0])
+    assert (result.passed, result.stage) == (False, "check")
+
+
+def test_exhausted_skip_route_stops_running_its_source() -> None:
+    code = _ScriptedStage("code")
+    review = _ScriptedStage("review", False, False)
+    graph = StageGraph(
+        steps=[[Node(code, retries=5)], [Node(review)]],
+        routes=[Route("review", "code", budget=1, on_exhausted="skip")],
+    )
+
+    result = graph.run(_input(), _recorder()[0])
+
+    assert result.passed is True
+    assert len(review.inputs) == 1
+    assert len(code.inputs) == 2
+
+
+def test_unrouted_failure_fails_the_run() -> None:
+    graph = StageGraph(steps=[[Node(_ScriptedStage("only", False))]], routes=[])
+    result = graph.run(_input(), _recorder()[0])
+    assert (result.passed, result.stage, result.attempt) == (False, "only", None)
+
+
+@pytest.mark.parametrize(
+    ("steps", "routes", "error"),
+    [
+        ([["a"], ["a"]], [], "appears twice"),
+        ([["a"], ["b"]], [Route("b", "zzz")], "unknown stage"),
+        ([["a"], ["b"]], [Route("a", "b")], "earlier step"),
+        ([["a"], ["b"]], [Route("b", "a", on_exhausted="retry")], "on_exhausted"),
+    ],
+)
+def test_invalid_graphs_are_rejected(
+    steps: list[list[str]], routes: list[Route], error: str
+) -> None:
+    nodes = [[Node(_ScriptedStage(name)) for name in step] for step in steps]
+    with pytest.raises(ValueError, match=error):
+        StageGraph(steps=nodes, routes=routes)
+
+
+class _CrashingStage(_ScriptedStage):
+    """Scripted stage that raises instead of running its first outcome."""
+
+    def execute(self, stage_input: StageInput) -> StageOutput:
+        if self.outcomes and self.outcomes[0] == "crash":
+            self.outcomes.pop(0)
+            raise RuntimeError("runner killed")
+        return super().execute(stage_input)
+
+
+def test_progress_resumes_an_interrupted_run() -> None:
+    def graph(plan: Stage, code: Stage, check: Stage) -> StageGraph:
+        return StageGraph(
+            steps=[
+                [Node(plan, then=lambda state, out: replace(state, plan=out.output))],
+                [Node(code, retries=2)],
+                [Node(check)],
+            ],
+            routes=[Route("check", "code", feedback="Check says")],
+        )
+
+    plan = _ScriptedStage("plan")
+    check = _ScriptedStage("check", False)
+    saved: list[Progress] = []
+    recorder, _ = _recorder()
+    with pytest.raises(RuntimeError, match="runner killed"):
+        graph(plan, _CrashingStage("code", True, "crash"), check).run(
+            _input(), recorder, on_progress=saved.append
+        )
+
+    assert [(p.step, p.attempt) for p in saved] == [(1, 1), (2, 1), (1, 2)]
+    assert saved[-1].state.plan == "plan ok"
+    assert saved[-1].runs == {"plan": 1, "code": 1}
+    assert saved[-1].routes == (1,)
+    assert saved[-1].feedback == {"code": "Check says:\ncheck failed"}
+
+    replan = _ScriptedStage("plan")
+    code = _ScriptedStage("code")
+    recorder, events = _recorder()
+    result = graph(replan, code, _ScriptedStage("check", False)).run(
+        _input(), recorder, resume=saved[-1], on_progress=saved.append
+    )
+
+    assert (result.passed, result.stage, result.attempt) == (True, "check", None)
+    assert replan.inputs == []
+    assert [i.last_failure for i in code.inputs] == [
+        "Check says:\ncheck failed",
+        "Check says:\ncheck failed",
+    ]
+    assert code.inputs[0].plan == "plan ok"
+    assert _stage_events(events) == [
+        ("code", 2),
+        ("check", 2),
+        ("code", 3),
+        ("check", 3),
+    ]
+    assert (saved[-1].step, saved[-1].attempt) == (3, 3)
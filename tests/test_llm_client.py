@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+from types import SimpleNamespace
 from unittest.mock import MagicMock
 
 import pytest
@@ -10,16 +11,25 @@ from smelt.agents.llm_client import LiteLLMClient
 from smelt.exceptions import InfraError, LLMError
 
 
-def _make_response(content: str | None) -> MagicMock:
+def _make_response(
+    content: str | None, usage: SimpleNamespace | None = None
+) -> MagicMock:
     msg = MagicMock()
     msg.content = content
     choice = MagicMock()
     choice.message = msg
     resp = MagicMock()
     resp.choices = [choice]
+    resp.model = "claude-opus-4-20250514"
+    resp.usage = usage or SimpleNamespace(prompt_tokens=120, completion_tokens=30)
     return resp
 
 
+@pytest.fixture(autouse=True)
+def _no_pricing_lookup(mocker: MagicMock) -> MagicMock:
+    return mocker.patch("litellm.completion_cost", return_value=0.0042)
+
+
 def test_successful_completion(mocker: MagicMock) -> None:
     mocker.patch("litellm.completion", return_value=_make_response("the plan is: ..."))
     client = LiteLLMClient()
@@ -28,7 +38,55 @@ def test_successful_completion(mocker: MagicMock) -> None:
         system_prompt="you are an architect",
         user_prompt="plan this task",
     )
-    assert result == "the plan is: ..."
+    assert result.content == "the plan is: ..."
+    assert result.usage.model == "claude-opus-4-20250514"
+    assert result.usage.prompt_tokens == 120
+    assert result.usage.completion_tokens == 30
+    assert result.usage.cached_tokens == 0
+    assert result.usage.cost_usd == 0.0042
+    assert result.usage.latency_seconds >= 0.0
+
+
+def test_cached_tokens_from_prompt_token_details(mocker: MagicMock) -> None:
+    usage = SimpleNamespace(
+        prompt_tokens=1000,
+        completion_tokens=10,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=800),
+    )
+    mocker.patch("litellm.completion", return_value=_make_response("ok", usage))
+    result = LiteLLMClient().complete(model="m", system_prompt="s", user_prompt="u")
+    assert result.usage.cached_tokens == 800
+
+
+def test_cached_tokens_from_anthropic_cache_reads(mocker: MagicMock) -> None:
+    usage = SimpleNamespace(
+        prompt_tokens=1000,
+        completion_tokens=10,
+        prompt_tokens_details=None,
+        cache_read_input_tokens=600,
+    )
+    mocker.patch("litellm.completion", return_value=_make_response("ok", usage))
+    result = LiteLLMClient().complete(model="m", system_prompt="s", user_prompt="u")
+    assert result.usage.cached_tokens == 600
+
+
+def test_missing_usage_and_unknown_pricing(
+    mocker: MagicMock, _no_pricing_lookup: MagicMock
+) -> None:
+    response = _make_response("ok")
+    response.usage = None
+    response.model = None
+    mocker.patch("litellm.completion", return_value=response)
+    _no_pricing_lookup.side_effect = Exception("model not mapped")
+
+    result = LiteLLMClient().complete(
+        model="custom/model", system_prompt="s", user_prompt="u"
+    )
+
+    assert result.usage.model == "custom/model"
+    assert result.usage.prompt_tokens == 0
+    assert result.usage.completion_tokens == 0
+    assert result.usage.cost_usd is None
 
 
 def test_empty_response_raises_llm_error_when_none(mocker: MagicMock) -> None:
@@ -0,0 +1,310 @@
+"""Tests for the pipeline metrics registry and exporters."""
+
+from __future__ import annotations
+
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+from smelt.db.models import RunEvent, RunResult, UsageTotals
+from smelt.metrics import (
+    OPENMETRICS_CONTENT_TYPE,
+    PROMETHEUS_CONTENT_TYPE,
+    MetricsRegistry,
+    MetricsServer,
+    PipelineMetrics,
+    TextfileExporter,
+)
+
+
+def _event(event: str, **fields: object) -> RunEvent:
+    return RunEvent(
+        run_id="r1",
+        task_id="t1",
+        event=event,
+        elapsed_seconds=0.0,
+        timestamp="2026-01-01T00:00:00+00:00",
+        **fields,  # type: ignore[arg-type]
+    )
+
+
+# ---------------------------------------------------------------------------
+# Registry and exposition format
+# ---------------------------------------------------------------------------
+
+
+def test_counter_rendering_in_both_formats() -> None:
+    registry = MetricsRegistry()
+    runs = registry.counter("smelt_runs", "Finished runs.", ["outcome"])
+    runs.inc(outcome="passed")
+    runs.inc(2, outcome="failed")
+
+    openmetrics = registry.render()
+    assert "# TYPE smelt_runs counter" in openmetrics
+    assert 'smelt_runs_total{outcome="failed"} 2' in openmetrics
+    assert 'smelt_runs_total{outcome="passed"} 1' in openmetrics
+    assert openmetrics.endswith("# EOF\n")
+
+    prometheus = registry.render(openmetrics=False)
+    assert "# TYPE smelt_runs_total counter" in prometheus
+    assert "# EOF" not in prometheus
+
+
+def test_counter_rejects_decrease_and_wrong_labels() -> None:
+    counter = MetricsRegistry().counter("c", "help", ["stage"])
+    with pytest.raises(ValueError, match="only increase"):
+        counter.inc(-1, stage="qa")
+    with pytest.raises(ValueError, match="expects labels"):
+        counter.inc(model="m")
+
+
+def test_duplicate_metric_name_rejected() -> None:
+    registry = MetricsRegistry()
+    registry.gauge("g", "help")
+    with pytest.raises(ValueError, match="already registered"):
+        registry.counter("g", "help")
+
+
+def test_gauge_set_inc_and_replace() -> None:
+    registry = MetricsRegistry()
+    gauge = registry.gauge("smelt_tasks", "Tasks.", ["status"])
+    gauge.set(3, status="ready")
+    gauge.inc(-1, status="ready")
+    assert gauge.value(status="ready") == 2
+
+    gauge.replace_all({("failed",): 1.5})
+    rendered = registry.render()
+    assert 'smelt_tasks{status="failed"} 1.5' in rendered
+    assert "ready" not in rendered
+
+
+def test_histogram_buckets_are_cumulative() -> None:
+    registry = MetricsRegistry()
+    hist = registry.histogram("h_seconds", "help", buckets=(1.0, 0.1))
+    for value in (0.05, 0.1, 0.5, 7.0):
+        hist.observe(value)
+
+    rendered = registry.render()
+    assert 'h_seconds_bucket{le="0.1"} 2' in rendered
+    assert 'h_seconds_bucket{le="1"} 3' in rendered
+    assert 'h_seconds_bucket{le="+Inf"} 4' in rendered
+    assert "h_seconds_count 4" in rendered
+    assert "h_seconds_sum 7.65" in rendered
+    assert hist.count() == 4
+    assert registry.histogram("other", "help", ["model"]).count(model="m") == 0
+
+
+def test_label_values_are_escaped() -> None:
+    registry = MetricsRegistry()
+    registry.counter("c", "help", ["tool"]).inc(tool='a"b\\c\nd')
+    assert 'c_total{tool="a\\"b\\\\c\\nd"} 1' in registry.render()
+
+
+def test_failing_collector_does_not_break_render(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    registry = MetricsRegistry()
+    registry.gauge("g", "help").set(1)
+
+    def broken() -> None:
+        raise RuntimeError("db locked")
+
+    registry.add_collector(broken)
+    assert "g 1" in registry.render()
+    assert "Metrics collector failed" in caplog.text
+
+
+# ---------------------------------------------------------------------------
+# PipelineMetrics
+# ---------------------------------------------------------------------------
+
+
+def test_stage_and_qa_events() -> None:
+    metrics = PipelineMetrics()
+    metrics.observe(
+        _event(
+            "stage_finished",
+            stage="qa",
+            duration_seconds=2.0,
+            passed=False,
+            exit_codes={"pytest": 1, "ruff": 0},
+        )
+    )
+    metrics.observe(_event("stage_finished", stage="coder", passed=True))
+
+    assert metrics.stage_seconds.count(stage="qa") == 1
+    assert metrics.stage_runs.value(stage="qa", outcome="failed") == 1
+    assert metrics.stage_runs.value(stage="coder", outcome="passed") == 1
+    assert metrics.qa_checks.value(tool="pytest", outcome="failed") == 1
+    assert metrics.qa_checks.value(tool="ruff", outcome="passed") == 1
+
+
+def test_llm_call_and_error_events() -> None:
+    metrics = PipelineMetrics()
+    metrics.observe(
+        _event(
+            "llm_call",
+            stage="architect",
+            model="m",
+            duration_seconds=1.5,
+            input_tokens=100,
+            output_tokens=20,
+            cost_usd=0.01,
+        )
+    )
+    metrics.observe(_event("llm_call", stage="architect", model="free"))
+    metrics.observe(
+        _event(
+            "stage_finished",
+            stage="architect",
+            model="m",
+            passed=False,
+            message="rate limited",
+        )
+    )
+
+    assert metrics.llm_seconds.count(model="m") == 1
+    assert metrics.llm_tokens.value(model="m", kind="prompt") == 100
+    assert metrics.llm_tokens.value(model="m", kind="completion") == 20
+    assert metrics.llm_cost.value(model="m") == 0.01
+    assert metrics.llm_cost.value(model="free") == 0
+    assert metrics.llm_errors.value(model="m", stage="architect") == 1
+
+
+def test_run_events_and_ignored_items() -> None:
+    metrics = PipelineMetrics()
+    metrics.observe(_event("run_started"))
+    metrics.observe(_event("run_finished", passed=True, duration_seconds=60.0))
+    metrics.observe(_event("llm_call"))
+    empty = UsageTotals(
+        key="total",
+        calls=0,
+        prompt_tokens=0,
+        completion_tokens=0,
+        cached_tokens=0,
+        latency_seconds=0.0,
+        cost_usd=0.0,
+        unpriced_calls=0,
+    )
+    metrics.observe(
+        RunResult(
+            run_id="r1",
+            task_id="t1",
+            passed=True,
+            stage_reached="qa",
+            message="ok",
+            duration_seconds=60.0,
+            usage_total=empty,
+            usage_by_stage={},
+            usage_by_model={},
+        )
+    )
+
+    assert metrics.runs.value(outcome="passed") == 1
+    assert metrics.run_seconds.count() == 1
+    assert metrics.llm_seconds.count(model="") == 0
+
+
+def test_claims_busy_and_queue_depth() -> None:
+    metrics = PipelineMetrics()
+    metrics.observe_claim(0.002, claimed=True)
+    metrics.observe_claim(0.001, claimed=False)
+    metrics.watch_queue(lambda: {"ready": 4, "in-progress": 1})
+
+    with metrics.busy():
+        assert metrics.workers_busy.value() == 1
+    assert metrics.workers_busy.value() == 0
+
+    rendered = metrics.registry.render()
+    assert 'smelt_task_claims_total{result="claimed"} 1' in rendered
+    assert 'smelt_task_claims_total{result="empty"} 1' in rendered
+    assert 'smelt_tasks{status="ready"} 4' in rendered
+    assert "smelt_task_claim_seconds_count 2" in rendered
+
+
+# ---------------------------------------------------------------------------
+# Exporters
+# ---------------------------------------------------------------------------
+
+
+def test_textfile_exporter_writes_atomically(tmp_path: Path) -> None:
+    registry = MetricsRegistry()
+    registry.gauge("smelt_workers", "Workers.").set(2)
+    path = tmp_path / "textfile" / "smelt.prom"
+    exporter = TextfileExporter(registry, path, interval_seconds=0.01)
+
+    exporter.start()
+    exporter.stop()
+
+    assert "smelt_workers 2" in path.read_text()
+    assert [p.name for p in path.parent.iterdir()] == ["smelt.prom"]
+
+
+def test_exporters_stop_without_start(tmp_path: Path) -> None:
+    registry = MetricsRegistry()
+    TextfileExporter(registry, tmp_path / "m.prom", interval_seconds=1).stop()
+    MetricsServer(registry, host="127.0.0.1", port=0).stop()
+    assert (tmp_path / "m.prom").read_text() == ""
+
+
+def test_textfile_exporter_cleans_up_on_failure(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    registry = MetricsRegistry()
+    path = tmp_path / "smelt.prom"
+
+    def fail(src: str, dst: Path) -> None:
+        raise OSError("read-only")
+
+    monkeypatch.setattr("os.replace", fail)
+    with pytest.raises(OSError, match="read-only"):
+        TextfileExporter(registry, path, interval_seconds=1).write()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_textfile_exporter_logs_background_failures(
+    tmp_path: Path, caplog: pytest.LogCaptureFixture
+) -> None:
+    registry = MetricsRegistry()
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    exporter = TextfileExporter(
+        registry, blocker / "smelt.prom", interval_seconds=0.001
+    )
+
+    exporter.start()
+    deadline = time.monotonic() + 5
+    while "Failed to write metrics" not in caplog.text:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+    with pytest.raises(OSError):
+        exporter.stop()
+
+
+def test_http_server_serves_both_formats() -> None:
+    registry = MetricsRegistry()
+    registry.counter("smelt_runs", "Runs.").inc()
+    server = MetricsServer(registry, host="127.0.0.1", port=0)
+    server.start()
+    base = f"http://127.0.0.1:{server.port}"
+    try:
+        with urllib.request.urlopen(f"{base}/metrics") as response:
+            assert response.headers["Content-Type"] == PROMETHEUS_CONTENT_TYPE
+            assert "# TYPE smelt_runs_total counter" in response.read().decode()
+
+        request = urllib.request.Request(
+            f"{base}/metrics?x=1",
+            headers={"Accept": "application/openmetrics-text; version=1.0.0"},
+        )
+        with urllib.request.urlopen(request) as response:
+            assert response.headers["Content-Type"] == OPENMETRICS_CONTENT_TYPE
+            assert response.read().decode().endswith("# EOF\n")
+
+        with pytest.raises(urllib.error.HTTPError) as excinfo:
+            urllib.request.urlopen(f"{base}/other")
+        assert excinfo.value.code == 404
+    finally:
+        server.stop()
@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from smelt.db.models import AgentResult, QAResult, RepoContext, ToolResult
+from smelt.db.models import AgentResult, CachedPlan, QAResult, RepoContext, ToolResult
 
 
 def test_tool_result_passed() -> None:
@@ -76,3 +76,13 @@ def test_repo_context_render_no_signatures_when_zero_budget() -> None:
     rendered = ctx.render(max_tokens=1)
     # No signatures section when budget is exhausted
     assert "Code Signatures" not in rendered
+
+
+def test_cached_plan_reusable_while_task_and_context_unchanged() -> None:
+    plan = CachedPlan(
+        task_id="t", input_hash="in", base_sha="a", context_hash="ctx", plan="p"
+    )
+    assert plan.reusable(input_hash="in", base_sha="a", context_hash="other")
+    assert plan.reusable(input_hash="in", base_sha="b", context_hash="ctx")
+    assert not plan.reusable(input_hash="in", base_sha="b", context_hash="other")
+    assert not plan.reusable(input_hash="new", base_sha="a", context_hash="ctx")
@@ -0,0 +1,83 @@
+"""Tests for the coding agent output monitors."""
+
+from __future__ import annotations
+
+from smelt.agents.monitors import (
+    PatternMonitor,
+    RepeatedLineMonitor,
+    build_monitors,
+)
+from smelt.agents.protocols import OutputMonitor
+from smelt.config import CodingConfig
+from smelt.db.models import OutputLine
+
+
+def _line(text: str) -> OutputLine:
+    return OutputLine(session_id="s1", stream="stdout", text=text, elapsed_seconds=0.0)
+
+
+def test_repeated_line_monitor_aborts_on_threshold() -> None:
+    monitor = RepeatedLineMonitor(max_repeats=3)
+    looping = _line("Running tool: read_file src/app.py")
+
+    assert monitor.observe(looping) is None
+    assert monitor.observe(_line("something else entirely")) is None
+    assert monitor.observe(looping) is None
+    reason = monitor.observe(looping)
+
+    assert reason is not None
+    assert "repeated 3 times" in reason
+    assert "read_file" in reason
+
+
+def test_repeated_line_monitor_ignores_short_and_decorative_lines() -> None:
+    monitor = RepeatedLineMonitor(max_repeats=2)
+    for _ in range(5):
+        assert monitor.observe(_line("ok")) is None
+        assert monitor.observe(_line("────────────────")) is None
+        assert monitor.observe(_line("")) is None
+
+
+def test_repeated_line_monitor_memory_is_bounded() -> None:
+    monitor = RepeatedLineMonitor(max_repeats=2)
+    assert monitor.observe(_line("the first distinct line")) is None
+    for n in range(10_000):
+        monitor.observe(_line(f"unique output line {n}"))
+
+    # The cap was hit, counts were reset, so the first line starts over
+    assert monitor.observe(_line("the first distinct line")) is None
+    assert len(monitor._counts) <= 10_000
+
+
+def test_pattern_monitor_counts_matching_lines() -> None:
+    monitor = PatternMonitor(patterns=[r"Error:", r"Traceback"], max_matches=2)
+
+    assert monitor.observe(_line("all good")) is None
+    assert monitor.observe(_line("Error: file not found")) is None
+    reason = monitor.observe(_line("Traceback (most recent call last):"))
+
+    assert reason is not None
+    assert "matched 2 times" in reason
+    assert "Traceback" in reason
+
+
+def test_build_monitors_defaults_to_repeat_detection_only() -> None:
+    monitors = build_monitors(CodingConfig())
+    assert len(monitors) == 1
+    assert isinstance(monitors[0], RepeatedLineMonitor)
+    assert isinstance(monitors[0], OutputMonitor)
+
+
+def test_build_monitors_with_patterns() -> None:
+    config = CodingConfig(abort_patterns=("Error:",), max_pattern_matches=4)
+    monitors = build_monitors(config)
+    assert [type(m) for m in monitors] == [RepeatedLineMonitor, PatternMonitor]
+
+
+def test_build_monitors_can_be_disabled() -> None:
+    assert build_monitors(CodingConfig(max_repeated_lines=0)) == []
+
+
+def test_build_monitors_returns_fresh_instances() -> None:
+    config = CodingConfig()
+    assert build_monitors(config)[0] is not build_monitors(config)[0]
@@ -0,0 +1,153 @@
+"""Tests for the built-in run profiler."""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from smelt.config import GitConfig
+from smelt.db.schema import init_db
+from smelt.db.store import TaskStore
+from smelt.git import GitOps
+from smelt.pipeline.graph import STAGE_THREAD_PREFIX
+from smelt.profiling import (
+    FOLDED_FILE_NAME,
+    PSTATS_FILE_NAME,
+    SUMMARY_FILE_NAME,
+    RunProfiler,
+    _command_line,
+)
+
+
+def _busy(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_records_hot_paths_and_subprocesses(tmp_path: Path) -> None:
+    original_init = subprocess.Popen.__init__
+    git = GitOps(tmp_path, GitConfig())
+    conn = sqlite3.connect(":memory:")
+    init_db(conn)
+
+    with RunProfiler() as profiler:
+        git._run("init", "-q")
+        TaskStore(conn).add_task("t1")
+        subprocess.run(["git", "--version"], capture_output=True, check=True)
+
+    assert subprocess.Popen.__init__ is original_init
+    hot = {stat.name: stat for stat in profiler.hot_paths()}
+    assert hot["GitOps._run"].calls == 1
+    assert hot["GitOps._run"].cumulative_seconds > 0
+    assert hot["QAStage._run_tool"].calls == 0
+    assert hot["SQLite (sqlite3 C calls)"].calls > 0
+
+    init_call, version_call = profiler.subprocesses
+    assert init_call.caller == "smelt.git:GitOps._run"
+    assert init_call.command == "git init -q"
+    assert init_call.return_code == 0
+    assert init_call.duration_seconds > 0
+    assert version_call.caller == "?"
+    assert profiler.wall_seconds > 0
+
+
+def test_samples_stacks_and_ranks_functions() -> None:
+    with RunProfiler(sample_interval_seconds=0.001) as profiler:
+        _busy(0.05)
+
+    assert any(stack.endswith("test_profiling:_busy") for stack in profiler.stacks)
+    top = profiler.top_functions(limit=3)
+    assert len(top) == 3
+    assert top[0].cumulative_seconds >= top[-1].cumulative_seconds
+    assert any("_busy" in stat.name for stat in profiler.top_functions())
+
+
+def test_write_produces_flamegraph_ready_files(tmp_path: Path) -> None:
+    with RunProfiler(sample_interval_seconds=0.001) as profiler:
+        _busy(0.02)
+        sqlite3.connect(":memory:").execute("SELECT 1")
+
+    files = profiler.write(tmp_path / "run")
+
+    assert files.pstats.name == PSTATS_FILE_NAME
+    assert files.pstats.stat().st_size > 0
+    assert files.folded.name == FOLDED_FILE_NAME
+    for line in files.folded.read_text().splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert ";" in stack
+        assert int(count) > 0
+    assert files.summary.name == SUMMARY_FILE_NAME
+    summary = json.loads(files.summary.read_text())
+    assert set(summary) == {
+        "wall_seconds",
+        "hot_paths",
+        "top_functions",
+        "subprocesses",
+    }
+    assert any("execute" in f["name"] for f in summary["top_functions"])
+
+
+def test_stage_helper_threads_are_profiled() -> None:
+    def helper() -> None:
+        _busy(0.05)
+        subprocess.run(["git", "--version"], capture_output=True, check=True)
+
+    with (
+        RunProfiler(sample_interval_seconds=0.001) as profiler,
+        ThreadPoolExecutor(thread_name_prefix=STAGE_THREAD_PREFIX) as pool,
+    ):
+        pool.submit(helper).result()
+
+    assert any(stack.endswith("test_profiling:_busy") for stack in profiler.stacks)
+    assert [call.command for call in profiler.subprocesses] == ["git --version"]
+
+
+def test_other_threads_are_left_alone() -> None:
+    def other() -> None:
+        _busy(0.05)
+        subprocess.run(["git", "--version"], capture_output=True, check=True)
+
+    with RunProfiler(sample_interval_seconds=0.001) as profiler:
+        thread = threading.Thread(target=other, name="smelt-worker-1")
+        thread.start()
+        thread.join()
+
+    assert not any("_busy" in stack for stack in profiler.stacks)
+    assert profiler.subprocesses == []
+
+
+def test_stops_when_profiled_code_raises() -> None:
+    original_wait = subprocess.Popen.wait
+    with pytest.raises(RuntimeError), RunProfiler():
+        raise RuntimeError("boom")
+    assert subprocess.Popen.wait is original_wait
+
+
+def test_stop_without_start_is_harmless() -> None:
+    profiler = RunProfiler()
+    profiler.stop()
+    assert profiler.subprocesses == []
+    assert profiler.stacks == {}
+
+
+def test_unwaited_process_is_not_recorded() -> None:
+    with RunProfiler() as profiler:
+        proc = subprocess.Popen(["git", "--version"], stdout=subprocess.DEVNULL)
+    proc.wait()
+    assert profiler.subprocesses == []
+
+
+def test_command_line_rendering() -> None:
+    assert _command_line("git status") == "git status"
+    assert _command_line(["ruff", Path("src")]) == "ruff src"
+    long = _command_line(["x" * 200])
+    assert len(long) == 120
+    assert long.endswith("…")
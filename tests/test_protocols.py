@@ -2,8 +2,8 @@
 
 from __future__ import annotations
 
-from smelt.agents.protocols import CodingAgent, LLMClient
-from smelt.db.models import AgentResult
+from smelt.agents.protocols import CodingAgent, LLMClient, ResumableCodingAgent
+from smelt.db.models import AgentResult, LLMResponse, LLMUsage
 
 
 class _FakeCodingAgent:
@@ -33,8 +33,11 @@ class _FakeLLMClient:
         user_prompt: str,
         max_tokens: int = 4096,
         temperature: float = 0.0,
-    ) -> str:
-        return f"response:{user_prompt}"
+    ) -> LLMResponse:
+        return LLMResponse(
+            content=f"response:{user_prompt}",
+            usage=LLMUsage(model=model, prompt_tokens=100, completion_tokens=20),
+        )
 
 
 def test_coding_agent_protocol_satisfied() -> None:
@@ -66,7 +69,7 @@ def test_llm_client_protocol_satisfied() -> None:
         system_prompt="you are helpful",
         user_prompt="plan this",
     )
-    assert result == "response:plan this"
+    assert result.content == "response:plan this"
 
 
 def test_coding_agent_isinstance_check() -> None:
@@ -75,3 +78,7 @@ def test_coding_agent_isinstance_check() -> None:
 
 def test_llm_client_isinstance_check() -> None:
     assert isinstance(_FakeLLMClient(), LLMClient)
+
+
+def test_plain_coding_agent_is_not_resumable() -> None:
+    assert not isinstance(_FakeCodingAgent(), ResumableCodingAgent)
@@ -8,7 +8,7 @@ from unittest.mock import MagicMock
 import pytest
 
 from smelt.config import QAConfig
-from smelt.pipeline.qa import QAStage, _truncate_output
+from smelt.pipeline.qa import QAStage, _issues, _truncate_output
 from smelt.pipeline.stages import StageInput
 
 
@@ -192,3 +192,133 @@ def test_truncate_output_long() -> None:
     # Should have 10 lines from each end plus the marker
     result_lines = result.splitlines()
     assert len(result_lines) == 21  # 10 + 1 marker + 10
+
+
+def _scripted_tools(mocker: MagicMock, *attempts: dict[str, str]) -> None:
+    """Patch subprocess.run to replay tool outputs; a missing tool passes."""
+    remaining = list(attempts)
+    current: dict[str, str] = {}
+
+    def side_effect(cmd: list[str], **kwargs: object) -> MagicMock:
+        nonlocal current
+        if cmd[0] == "pytest":
+            current = remaining.pop(0)
+        stdout = current.get(cmd[0])
+        return _make_proc(0 if stdout is None else 1, stdout or "ok")
+
+    mocker.patch("subprocess.run", side_effect=side_effect)
+
+
+def test_failures_listed_once_per_signature(
+    repo_path: Path,
+    default_config: QAConfig,
+    stage_input: StageInput,
+    mocker: MagicMock,
+) -> None:
+    _scripted_tools(
+        mocker,
+        {
+            "pytest": (
+                "F.\n____ test_a ____\nlong traceback\n"
+                "FAILED tests/test_x.py::test_a - assert 1 == 2\n1 failed"
+            ),
+            "ruff": "a.py:1:8: F401 [*] `os` imported but unused\nFound 1 error.",
+            "mypy": (
+                "b.py:3: error: Incompatible types  [assignment]\n"
+                "b.py:3: note: see docs\n"
+                "b.py:9: error: Incompatible types  [assignment]\n"
+                "Found 2 errors in 1 file"
+            ),
+        },
+    )
+    stage = QAStage(config=default_config, repo_path=repo_path)
+
+    output = stage.execute(stage_input).output
+
+    assert output == (
+        "## pytest FAILED (exit 1)\n"
+        "- FAILED tests/test_x.py::test_a - assert 1 == 2\n\n"
+        "## ruff FAILED (exit 1)\n"
+        "- a.py:1:8: F401 [*] `os` imported but unused\n\n"
+        "## mypy FAILED (exit 1)\n"
+        "- b.py:3: error: Incompatible types  [assignment] (+1 more)"
+    )
+
+
+def test_retry_reports_the_delta_against_the_previous_attempt(
+    repo_path: Path,
+    default_config: QAConfig,
+    stage_input: StageInput,
+    mocker: MagicMock,
+) -> None:
+    _scripted_tools(
+        mocker,
+        {
+            "pytest": "FAILED t.py::test_a - x\nFAILED t.py::test_b - y",
+            "mypy": "b.py:3: error: Bad  [misc]",
+        },
+        # test_b moved lines but is the same failure; mypy is fixed
+        {"pytest": "FAILED t.py::test_b - y changed\nERROR t.py::test_c"},
+        {"pytest": "nothing parseable"},
+        {},
+    )
+    stage = QAStage(config=default_config, repo_path=repo_path)
+    stage.execute(stage_input)
+
+    second = stage.execute(stage_input).output
+    third = stage.execute(stage_input).output
+    fourth = stage.execute(stage_input)
+
+    assert second == (
+        "## pytest FAILED (exit 1)\n"
+        "Newly failing:\n"
+        "- ERROR t.py::test_c\n"
+        "Still failing:\n"
+        "- FAILED t.py::test_b - y changed\n"
+        "Now passing (keep these fixes): t.py::test_a\n\n"
+        "## mypy now passes (1 issue(s) fixed; keep those fixes)"
+    )
+    assert third == "## pytest FAILED (exit 1)\nnothing parseable"
+    assert fourth.passed is True
+    assert fourth.output == "All QA checks passed. (pytest, ruff, mypy)"
+
+
+def test_long_issue_lists_are_capped(
+    repo_path: Path,
+    stage_input: StageInput,
+    mocker: MagicMock,
+) -> None:
+    failing = [f"FAILED t.py::test_{i:02} - x" for i in range(30)]
+    _scripted_tools(
+        mocker,
+        {"pytest": "\n".join(failing)},
+        {"pytest": "FAILED t.py::test_new"},
+    )
+    config = QAConfig(run_tests=True, run_linter=False, run_type_checker=False)
+    stage = QAStage(config=config, repo_path=repo_path)
+
+    first = stage.execute(stage_input).output
+    second = stage.execute(stage_input).output
+
+    assert first.count("\n- FAILED") == 25
+    assert first.endswith("- ... and 5 more")
+    assert second.endswith("t.py::test_24 and 5 more")
+
+
+def test_repeated_failure_is_still_failing(
+    repo_path: Path,
+    stage_input: StageInput,
+    mocker: MagicMock,
+) -> None:
+    _scripted_tools(mocker, {"pytest": "FAILED t.py::a"}, {"pytest": "FAILED t.py::a"})
+    config = QAConfig(run_tests=True, run_linter=False, run_type_checker=False)
+    stage = QAStage(config=config, repo_path=repo_path)
+    stage.execute(stage_input)
+
+    output = stage.execute(stage_input).output
+
+    assert output == "## pytest FAILED (exit 1)\nStill failing:\n- FAILED t.py::a"
+
+
+def test_issues_of_unknown_tool() -> None:
+    assert _issues("eslint", "FAILED t.py::a") == {}
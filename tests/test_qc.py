@@ -0,0 +1,182 @@
+"""Tests for the QC stage and diff compaction."""
+
+from __future__ import annotations
+
+from dataclasses import replace
+
+import pytest
+
+from smelt.config import ModelsConfig, QCConfig
+from smelt.db.models import LLMResponse, LLMUsage
+from smelt.pipeline.qc import QCStage, compact_diff
+from smelt.pipeline.stages import StageInput
+
+
+class _FakeLLM:
+    """Fake LLMClient that records calls and returns a canned response."""
+
+    def __init__(self, response: str) -> None:
+        self.response = response
+        self.calls: list[dict[str, object]] = []
+
+    def complete(
+        self,
+        *,
+        model: str,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int = 4096,
+        temperature: float = 0.0,
+    ) -> LLMResponse:
+        self.calls.append(
+            {"model": model, "system_prompt": system_prompt, "user_prompt": user_prompt}
+        )
+        return LLMResponse(
+            content=self.response,
+            usage=LLMUsage(model=model, prompt_tokens=50, completion_tokens=5),
+        )
+
+
+def _file(path: str, *changed: str) -> str:
+    body = "\n".join(changed)
+    return (
+        f"diff --git a/{path} b/{path}\n"
+        "index 1111111..2222222 100644\n"
+        f"--- a/{path}\n"
+        f"+++ b/{path}\n"
+        "@@ -1,3 +1,3 @@\n"
+        " unchanged context\n"
+        f"{body}\n"
+    )
+
+
+DIFF = _file("src/limits.py", "-old = 1", "+def rate_limit(): ...") + _file(
+    "docs/notes.md", "+misc"
+)
+
+
+def _make_input(diff: str | None = DIFF) -> StageInput:
+    return StageInput(
+        task_description="Add rate_limit to the API",
+        task_context="Ignored by QC",
+        repo_context="## File Tree\nsrc/",
+        plan="Edit src/limits.py",
+        last_failure=None,
+        diff=diff,
+    )
+
+
+def _stage(llm: _FakeLLM, mode: str = "last_attempt") -> QCStage:
+    return QCStage(
+        llm=llm,
+        models=ModelsConfig(qc="cheap-model"),
+        config=QCConfig(escalation_mode=mode),
+    )
+
+
+def test_pass_sends_task_plan_and_compacted_diff_to_qc_model() -> None:
+    llm = _FakeLLM("All covered.\nVERDICT: PASS")
+    stage = _stage(llm)
+
+    output = stage.execute(_make_input())
+
+    assert stage.name == "qc"
+    assert output.passed is True
+    assert output.usage[0].model == "cheap-model"
+    call = llm.calls[0]
+    assert call["model"] == "cheap-model"
+    prompt = str(call["user_prompt"])
+    assert "Add rate_limit to the API" in prompt
+    assert "Edit src/limits.py" in prompt
+    assert "+def rate_limit(): ..." in prompt
+    assert "unchanged context" not in prompt
+    assert "Ignored by QC" not in prompt
+    assert "## File Tree" not in prompt
+    assert "ROUTE" not in str(call["system_prompt"])
+
+
+def test_missing_verdict_passes() -> None:
+    output = _stage(_FakeLLM("Hmm.")).execute(_make_input(diff=None))
+    assert output.passed is True
+
+
+@pytest.mark.parametrize(
+    ("mode", "last_attempt", "escalate_to"),
+    [
+        ("never", True, "coder"),
+        ("auto", False, "architect"),
+        ("last_attempt", False, "coder"),
+        ("last_attempt", True, "architect"),
+    ],
+)
+def test_escalation_mode_decides_who_gets_the_failure(
+    mode: str, *, last_attempt: bool, escalate_to: str
+) -> None:
+    llm = _FakeLLM("Plan ignores auth.\nVERDICT: FAIL\nROUTE: ARCHITECT")
+
+    stage_input = replace(_make_input(), last_attempt=last_attempt)
+    output = _stage(llm, mode).execute(stage_input)
+
+    assert output.passed is False
+    assert output.escalate_to == escalate_to
+    assert output.output == "Plan ignores auth."
+    offered = "ROUTE: ARCHITECT" in str(llm.calls[0]["system_prompt"])
+    assert offered is (escalate_to == "architect")
+
+
+def test_failure_without_route_goes_to_coder() -> None:
+    llm = _FakeLLM("Missing test.\nVERDICT: FAIL")
+    output = _stage(llm, "auto").execute(_make_input())
+    assert output.escalate_to == "coder"
+
+
+def test_compact_diff_ranks_mentioned_files_first_and_drops_context() -> None:
+    diff = _file("docs/notes.md", "+misc") + _file(
+        "src/limits.py", "--- removed comment", "+x = 1"
+    )
+
+    compacted = compact_diff(diff, relevant_to="see limits.py", max_tokens=1000)
+
+    assert compacted.splitlines() == [
+        "--- src/limits.py",
+        "@@ -1,3 +1,3 @@",
+        "--- removed comment",
+        "+x = 1",
+        "--- docs/notes.md",
+        "@@ -1,3 +1,3 @@",
+        "+misc",
+    ]
+
+
+def test_compact_diff_ranks_by_shared_identifiers() -> None:
+    diff = _file("a.py", "+unrelated = 1") + _file("b.py", "+def throttle(): ...")
+    compacted = compact_diff(diff, relevant_to="Add throttle", max_tokens=1000)
+    assert compacted.index("b.py") < compacted.index("a.py")
+
+
+def test_compact_diff_omits_files_over_budget() -> None:
+    diff = _file("src/limits.py", "+limit = 1") + _file(
+        "big.py", *(f"+line_{n} = {n}" for n in range(100))
+    )
+
+    compacted = compact_diff(diff, relevant_to="src/limits.py", max_tokens=20)
+
+    assert "+limit = 1" in compacted
+    assert compacted.endswith("... 1 more file(s) omitted: big.py (+100/-0)")
+
+
+def test_compact_diff_truncates_an_oversized_top_file() -> None:
+    diff = _file("big.py", *(f"+line_{n} = {n}" for n in range(100)))
+    compacted = compact_diff(diff, relevant_to="", max_tokens=10)
+    assert len(compacted) == 40 + len("\n... (truncated)")
+    assert compacted.endswith("... (truncated)")
+
+
+def test_compact_diff_keeps_binary_markers() -> None:
+    diff = (
+        "diff --git a/logo.png b/logo.png\n"
+        "new file mode 100644\n"
+        "Binary files /dev/null and b/logo.png differ\n"
+    )
+    compacted = compact_diff(diff, relevant_to="", max_tokens=100)
+    assert compacted == ("--- logo.png\nBinary files /dev/null and b/logo.png differ")
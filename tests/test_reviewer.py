@@ -0,0 +1,141 @@
+"""Tests for the Reviewer stage."""
+
+from __future__ import annotations
+
+import pytest
+
+from smelt.config import ReviewerConfig
+from smelt.db.models import AgentResult
+from smelt.exceptions import AgentError
+from smelt.pipeline.reviewer import ReviewerStage
+from smelt.pipeline.stages import StageInput
+
+
+class _FakeAgent:
+    """Fake CodingAgent that records its calls and returns a canned result."""
+
+    def __init__(self, output: str, *, success: bool = True) -> None:
+        self.output = output
+        self.success = success
+        self.calls: list[dict[str, object]] = []
+
+    def run_session(
+        self,
+        *,
+        prompt: str,
+        working_dir: str,
+        timeout_seconds: int,
+        read_only: bool = False,
+    ) -> AgentResult:
+        self.calls.append(
+            {
+                "prompt": prompt,
+                "working_dir": working_dir,
+                "timeout_seconds": timeout_seconds,
+                "read_only": read_only,
+            }
+        )
+        return AgentResult(
+            success=self.success,
+            session_id="rev-1",
+            output=self.output,
+            duration_seconds=1.0,
+        )
+
+
+class _FailingAgent:
+    """Fake CodingAgent that raises on run_session."""
+
+    def run_session(
+        self,
+        *,
+        prompt: str,
+        working_dir: str,
+        timeout_seconds: int,
+        read_only: bool = False,
+    ) -> AgentResult:
+        raise AgentError("goose crashed")
+
+
+def _make_input(diff: str | None = "+x = 1") -> StageInput:
+    return StageInput(
+        task_description="Add rate limiting",
+        task_context=None,
+        repo_context="## File Tree\nsrc/",
+        plan="## Plan\nWrap the handler.",
+        last_failure=None,
+        diff=diff,
+    )
+
+
+def _stage(agent: object) -> ReviewerStage:
+    return ReviewerStage(
+        agent=agent,  # type: ignore[arg-type]
+        config=ReviewerConfig(timeout_seconds=120),
+        working_dir="/repo",
+    )
+
+
+def test_pass_verdict_runs_read_only_session_on_the_diff() -> None:
+    agent = _FakeAgent("Looks fine.\nVERDICT: PASS")
+
+    output = _stage(agent).execute(_make_input())
+
+    assert output.passed is True
+    assert output.escalate_to is None
+    assert output.session_id == "rev-1"
+    call = agent.calls[0]
+    assert call["read_only"] is True
+    assert call["working_dir"] == "/repo"
+    assert call["timeout_seconds"] == 120
+    prompt = str(call["prompt"])
+    assert "Add rate limiting" in prompt
+    assert "Wrap the handler." in prompt
+    assert "+x = 1" in prompt
+
+
+def test_fail_verdict_returns_findings_for_the_coder() -> None:
+    agent = _FakeAgent(
+        "Example format: VERDICT: PASS\n"
+        "src/api.py: token compared with ==\n"
+        "**VERDICT: FAIL**\n"
+    )
+
+    output = _stage(agent).execute(_make_input())
+
+    assert _stage(agent).name == "reviewer"
+    assert output.passed is False
+    assert output.escalate_to == "coder"
+    assert output.output == (
+        "Example format: VERDICT: PASS\nsrc/api.py: token compared with =="
+    )
+
+
+def test_missing_verdict_passes() -> None:
+    output = _stage(_FakeAgent("I ran out of time")).execute(_make_input())
+    assert output.passed is True
+    assert output.output == "I ran out of time"
+
+
+def test_unsuccessful_session_passes_even_with_a_verdict() -> None:
+    agent = _FakeAgent("VERDICT: FAIL", success=False)
+    assert _stage(agent).execute(_make_input()).passed is True
+
+
+def test_agent_error_passes(caplog: pytest.LogCaptureFixture) -> None:
+    output = _stage(_FailingAgent()).execute(_make_input())
+    assert output.passed is True
+    assert "goose crashed" in output.output
+    assert "Review skipped" in caplog.text
+
+
+def test_large_diff_is_truncated_and_empty_diff_is_named() -> None:
+    agent = _FakeAgent("VERDICT: PASS")
+    stage = _stage(agent)
+
+    stage.execute(_make_input(diff="+" * 50_000))
+    stage.execute(_make_input(diff=None))
+
+    assert "diff truncated" in str(agent.calls[0]["prompt"])
+    assert "+" * 50_000 not in str(agent.calls[0]["prompt"])
+    assert "(no changes)" in str(agent.calls[1]["prompt"])
@@ -2,20 +2,52 @@
 
 from __future__ import annotations
 
+import json
+import os
 import sqlite3
+from dataclasses import replace
 from pathlib import Path
 from unittest.mock import MagicMock
 
 import pytest
 
 from smelt.agents.protocols import CodingAgent, LLMClient
-from smelt.config import CodingConfig, SmeltConfig
-from smelt.db.models import AgentResult, ToolResult
+from smelt.config import (
+    CodingConfig,
+    InfraConfig,
+    QCConfig,
+    ReviewerConfig,
+    SmeltConfig,
+)
+from smelt.db.models import (
+    AgentResult,
+    Checkpoint,
+    LLMResponse,
+    LLMUsage,
+    RunResult,
+    ToolResult,
+)
 from smelt.db.schema import init_db
 from smelt.db.store import TaskStore
-from smelt.exceptions import AgentError, InfraError, LLMError
-from smelt.pipeline.runner import PipelineRunner
+from smelt.events import EventLog
+from smelt.exceptions import (
+    AgentError,
+    GitError,
+    InfraError,
+    LLMError,
+    SanityCheckError,
+)
+from smelt.git import Worktree
+from smelt.metrics import PipelineMetrics
+from smelt.pipeline.runner import (
+    PipelineRunner,
+    TaskClaims,
+    _commit_message,
+    _pid_alive,
+    _process_token,
+)
 from smelt.pipeline.sanity import SanityChecker
+from smelt.usage import summarize
 
 # ---------------------------------------------------------------------------
 # Fakes satisfying the protocols
@@ -33,8 +65,38 @@ class _FakeLLM:
         user_prompt: str,
         max_tokens: int = 4096,
         temperature: float = 0.0,
-    ) -> str:
-        return "## Plan\nModify the file."
+    ) -> LLMResponse:
+        return LLMResponse(
+            content="## Plan\nModify the file.",
+            usage=LLMUsage(model=model, prompt_tokens=100, completion_tokens=20),
+        )
+
+
+class _QCScriptLLM:
+    """Fake LLMClient: plans for the Architect, scripted answers for QC."""
+
+    def __init__(self, *qc_answers: str) -> None:
+        self.qc_answers = list(qc_answers)
+        self.architect_prompts: list[str] = []
+
+    def complete(
+        self,
+        *,
+        model: str,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int = 4096,
+        temperature: float = 0.0,
+    ) -> LLMResponse:
+        if model == SmeltConfig().models.qc:
+            content = self.qc_answers.pop(0)
+        else:
+            self.architect_prompts.append(user_prompt)
+            content = f"## Plan {len(self.architect_prompts)}"
+        return LLMResponse(
+            content=content,
+            usage=LLMUsage(model=model, prompt_tokens=100, completion_tokens=20),
+        )
 
 
 class _FailingLLM:
@@ -51,7 +113,7 @@ class _FailingLLM:
         user_prompt: str,
         max_tokens: int = 4096,
         temperature: float = 0.0,
-    ) -> str:
+    ) -> LLMResponse:
         raise self._exc
 
 
@@ -77,6 +139,44 @@ class _FakeAgent:
         )
 
 
+class _ReviewingAgent:
+    """Fake CodingAgent that records prompts and answers reviews from a script."""
+
+    def __init__(self, *verdicts: str) -> None:
+        self.verdicts = list(verdicts)
+        self.coder_prompts: list[str] = []
+        self.review_prompts: list[str] = []
+
+    def run_session(
+        self,
+        *,
+        prompt: str,
+        working_dir: str,
+        timeout_seconds: int,
+        read_only: bool = False,
+    ) -> AgentResult:
+        output = "done"
+        if read_only:
+            self.review_prompts.append(prompt)
+            output = f"src/app.py: unchecked input\nVERDICT: {self.verdicts.pop(0)}"
+        else:
+            self.coder_prompts.append(prompt)
+        return AgentResult(
+            success=True, session_id="fake", output=output, duration_seconds=0.1
+        )
+
+
+class _RunScopedAgent(_FakeAgent):
+    """Fake CodingAgent that hands out a separate agent for every run."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.runs: dict[str, _FakeAgent] = {}
+
+    def for_run(self, run_id: str) -> _FakeAgent:
+        return self.runs.setdefault(run_id, _FakeAgent())
+
+
 class _FailingAgent:
     """Fake CodingAgent that raises on run_session."""
 
@@ -112,10 +212,22 @@ def repo_path(tmp_path: Path) -> Path:
     return tmp_path
 
 
+BASE_SHA = "c0ffee" * 6 + "c0ff"
+SNAPSHOT_SHA = "5eed" * 10
+
+
 @pytest.fixture
 def mock_git(mocker: MagicMock) -> MagicMock:
     git = MagicMock()
     git.create_branch.return_value = "smelt/task-abc"
+    git.rev_parse.return_value = BASE_SHA
+    git.branch_name.return_value = "smelt/task-abc"
+    git.has_staged_changes.return_value = True
+    git.diff_head.return_value = ""
+    git.snapshot.return_value = SNAPSHOT_SHA
+    git.at.return_value.diff_head.return_value = ""
+    git.at.return_value.snapshot.return_value = SNAPSHOT_SHA
+    git.push_branches.return_value = {}
     return git
 
 
@@ -126,6 +238,9 @@ def _make_runner(
     llm: LLMClient | None = None,
     agent: CodingAgent | None = None,
     config: SmeltConfig | None = None,
+    event_log: EventLog | None = None,
+    metrics: PipelineMetrics | None = None,
+    worktrees: MagicMock | None = None,
 ) -> PipelineRunner:
     return PipelineRunner(
         config=config or SmeltConfig.default(),
@@ -134,6 +249,9 @@ def _make_runner(
         llm=llm or _FakeLLM(),
         agent=agent or _FakeAgent(),
         repo_path=repo_path,
+        event_log=event_log,
+        metrics=metrics,
+        worktrees=worktrees,
     )
 
 
@@ -197,7 +315,90 @@ def test_happy_path_returns_success(
 
     assert result.success is True
     assert result.task_id == task.id
-    assert result.stage_reached == "qa"
+    assert result.stage_reached == "publish"
+    assert "smelt/task-abc" in result.message
+
+
+def test_happy_path_publishes_branch_for_review(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    _patch_sanity_pass(mocker)
+    _patch_qa(mocker, returncode=0)
+    task = store.add_task(description="Build feature X\n\nDetails follow.")
+    runner = _make_runner(store, repo_path, mock_git)
+
+    runner.run()
+
+    mock_git.add_all.assert_called_once()
+    mock_git.commit.assert_called_once_with(
+        f"smelt: Build feature X\n\nTask: {task.id}"
+    )
+    mock_git.push_branches.assert_called_once_with(["smelt/task-abc"])
+    refreshed = store.get_task(task.id)
+    assert refreshed is not None
+    assert refreshed.status == "in-review"
+
+
+def test_run_scoped_agent_is_used_for_the_run(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    _patch_sanity_pass(mocker)
+    _patch_qa(mocker, returncode=0)
+    store.add_task(description="Build feature X")
+    agent = _RunScopedAgent()
+    spy = mocker.spy(_FakeAgent, "run_session")
+    runner = _make_runner(store, repo_path, mock_git, agent=agent)
+
+    result = runner.run()
+
+    assert list(agent.runs) == [result.run_id]
+    assert {call.args[0] for call in spy.call_args_list} == {agent.runs[result.run_id]}
+
+
+def test_qa_pass_without_changes_marks_task_failed(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    _patch_sanity_pass(mocker)
+    _patch_qa(mocker, returncode=0)
+    mock_git.has_staged_changes.return_value = False
+    task = store.add_task(description="task")
+    runner = _make_runner(store, repo_path, mock_git)
+
+    result = runner.run()
+
+    assert result.success is False
+    assert result.stage_reached == "publish"
+    assert "no changes" in result.message
+    mock_git.commit.assert_not_called()
+    mock_git.push_branches.assert_not_called()
+    refreshed = store.get_task(task.id)
+    assert refreshed is not None
+    assert refreshed.status == "failed"
+
+
+def test_rejected_push_marks_infra_error(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    _patch_sanity_pass(mocker)
+    _patch_qa(mocker, returncode=0)
+    mock_git.push_branches.return_value = {"smelt/task-abc": "remote hung up"}
+    task = store.add_task(description="task")
+    runner = _make_runner(store, repo_path, mock_git)
+
+    result = runner.run()
+
+    assert result.success is False
+    assert "remote hung up" in result.message
+    refreshed = store.get_task(task.id)
+    assert refreshed is not None
+    assert refreshed.status == "infra-error"
+
+
+def test_commit_message_summarizes_description(store: TaskStore) -> None:
+    long = store.add_task(description="  " + "x" * 100 + "\nmore")
+    assert _commit_message(long).startswith("smelt: " + "x" * 71 + "…\n\n")
+    blank = store.add_task(description="   ")
+    assert _commit_message(blank) == f"smelt: {blank.id}\n\nTask: {blank.id}"
 
 
 def test_happy_path_creates_branch(
@@ -209,7 +410,9 @@ def test_happy_path_creates_branch(
     runner = _make_runner(store, repo_path, mock_git)
     runner.run()
 
-    mock_git.create_branch.assert_called_once_with(task.id)
+    mock_git.create_branch.assert_called_once_with(
+        task.id, start_point=BASE_SHA, reset=True
+    )
 
 
 def test_happy_path_runs_sanity_check(
@@ -221,8 +424,10 @@ def test_happy_path_runs_sanity_check(
     runner = _make_runner(store, repo_path, mock_git)
     runner.run()
 
-    mock_git.checkout_branch.assert_called_once()
-    mock_git.pull.assert_called_once()
+    mock_git.fetch.assert_called_once_with("develop")
+    mock_git.rev_parse.assert_called_once_with("refs/remotes/origin/develop")
+    mock_git.checkout_branch.assert_called_once_with(BASE_SHA)
+    mock_git.pull.assert_not_called()
 
 
 # ---------------------------------------------------------------------------
@@ -269,6 +474,189 @@ def test_qa_fails_all_retries_marks_task_failed(
     refreshed = store.get_task(task.id)
     assert refreshed is not None
     assert refreshed.status == "failed"
+    # The plan may be at fault, so a retry plans again
+    assert store.get_plan(task.id) is None
+
+
+# ---------------------------------------------------------------------------
+# Tests: Review
+# ---------------------------------------------------------------------------
+
+
+def test_review_and_qa_failures_feed_the_coder_retry(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    _patch_sanity_pass(mocker)
+    results = iter([_proc(1, "FAILED test_foo"), _proc(0), _proc(0)] + [_proc(0)] * 3)
+    mocker.patch("subprocess.run", side_effect=lambda *a, **k: next(results))
+    mock_git.diff_head.return_value = "+def handler(payload): ..."
+    agent = _ReviewingAgent("FAIL", "PASS")
+    store.add_task(description="task")
+    log_dir = repo_path / "runs"
+    event_log = EventLog(log_dir=log_dir, max_runs_retained=5)
+    runner = _make_runner(store, repo_path, mock_git, agent=agent, event_log=event_log)
+
+    result = runner.run()
+    event_log.close()
+
+    assert result.success is True
+    assert len(agent.review_prompts) == 2
+    assert "+def handler(payload): ..." in agent.review_prompts[0]
+    retry_prompt = agent.coder_prompts[1]
+    assert "FAILED test_foo" in retry_prompt
+    assert "Code review requested changes:\nsrc/app.py: unchecked input" in (
+        retry_prompt
+    )
+    finished = {
+        (e["stage"], e["attempt"]): e["passed"]
+        for e in _read_events(log_dir)
+        if e["event"] == "stage_finished" and e["stage"] in ("qa", "reviewer")
+    }
+    assert finished == {
+        ("qa", 1): False,
+        ("reviewer", 1): False,
+        ("qa", 2): True,
+        ("reviewer", 2): True,
+    }
+
+
+def test_review_rejection_alone_triggers_a_retry(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    _patch_sanity_pass(mocker)
+    _patch_qa(mocker, returncode=0)
+    agent = _ReviewingAgent("FAIL", "PASS")
+    store.add_task(description="task")
+    runner = _make_runner(store, repo_path, mock_git, agent=agent)
+
+    assert runner.run().success is True
+
+    assert len(agent.coder_prompts) == 2
+    assert "FAILED" not in agent.coder_prompts[1]
+    assert "Code review requested changes" in agent.coder_prompts[1]
+
+
+def test_exhausted_review_retries_leave_qa_to_decide(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    _patch_sanity_pass(mocker)
+    _patch_qa(mocker, returncode=0)
+    agent = _ReviewingAgent("FAIL")
+    task = store.add_task(description="task")
+    config = SmeltConfig(
+        coding=CodingConfig(max_retries=2), reviewer=ReviewerConfig(max_retries=1)
+    )
+    runner = _make_runner(store, repo_path, mock_git, agent=agent, config=config)
+
+    result = runner.run()
+
+    assert result.success is True
+    assert len(agent.coder_prompts) == 2
+    assert len(agent.review_prompts) == 1
+    assert mock_git.diff_head.call_count == 2
+    refreshed = store.get_task(task.id)
+    assert refreshed is not None
+    assert refreshed.status == "in-review"
+
+
+def test_review_rejection_on_the_last_attempt_fails_the_task(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    _patch_sanity_pass(mocker)
+    _patch_qa(mocker, returncode=0)
+    store.add_task(description="task")
+    config = SmeltConfig(coding=CodingConfig(max_retries=0))
+    agent = _ReviewingAgent("FAIL")
+    runner = _make_runner(store, repo_path, mock_git, agent=agent, config=config)
+
+    result = runner.run()
+
+    assert result.success is False
+    assert result.stage_reached == "reviewer"
+    assert result.message == "Review failed after 1 attempt(s). Task marked failed."
+
+
+# ---------------------------------------------------------------------------
+# Tests: QC
+# ---------------------------------------------------------------------------
+
+
+def test_qc_failure_goes_back_to_the_coder_before_the_last_attempt(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    _patch_sanity_pass(mocker)
+    _patch_qa(mocker, returncode=0)
+    mock_git.diff_head.return_value = "diff --git a/a.py b/a.py\n@@ -0,0 +1 @@\n+x = 1"
+    llm = _QCScriptLLM(
+        "Rate limit missing.\nVERDICT: FAIL\nROUTE: ARCHITECT", "VERDICT: PASS"
+    )
+    agent = _ReviewingAgent("PASS", "PASS")
+    store.add_task(description="task")
+    config = SmeltConfig(coding=CodingConfig(max_retries=1))
+    runner = _make_runner(
+        store, repo_path, mock_git, llm=llm, agent=agent, config=config
+    )
+
+    result = runner.run()
+
+    assert result.success is True
+    assert len(llm.architect_prompts) == 1
+    assert (
+        "QC found the change does not do what the task asked:\n"
+        in (agent.coder_prompts[1])
+    )
+    assert "Rate limit missing." in agent.coder_prompts[1]
+
+
+def test_qc_escalation_replans_once_and_restarts_the_coder(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    _patch_sanity_pass(mocker)
+    _patch_qa(mocker, returncode=0)
+    llm = _QCScriptLLM(
+        "Wrong endpoint.\nVERDICT: FAIL\nROUTE: ARCHITECT", "VERDICT: PASS"
+    )
+    agent = _ReviewingAgent("PASS", "PASS")
+    store.add_task(description="task")
+    config = SmeltConfig(
+        coding=CodingConfig(max_retries=0), qc=QCConfig(escalation_mode="auto")
+    )
+    runner = _make_runner(
+        store, repo_path, mock_git, llm=llm, agent=agent, config=config
+    )
+
+    result = runner.run()
+
+    assert result.success is True
+    assert len(llm.architect_prompts) == 2
+    assert "Intent mismatch (QC):\nWrong endpoint." in llm.architect_prompts[1]
+    assert len(agent.coder_prompts) == 2
+    assert "## Plan 2" in agent.coder_prompts[1]
+    assert "QC found" not in agent.coder_prompts[1]
+
+
+def test_second_qc_escalation_fails_the_task(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    _patch_sanity_pass(mocker)
+    _patch_qa(mocker, returncode=0)
+    escalate = "VERDICT: FAIL\nROUTE: ARCHITECT"
+    llm = _QCScriptLLM(escalate, escalate)
+    task = store.add_task(description="task")
+    config = SmeltConfig(
+        coding=CodingConfig(max_retries=2), qc=QCConfig(escalation_mode="auto")
+    )
+    runner = _make_runner(store, repo_path, mock_git, llm=llm, config=config)
+
+    result = runner.run()
+
+    assert result.success is False
+    assert result.stage_reached == "qc"
+    assert result.message == "QC failed after 1 attempt(s). Task marked failed."
+    assert len(llm.architect_prompts) == 2
+    refreshed = store.get_task(task.id)
+    assert refreshed is not None
+    assert refreshed.status == "failed"
 
 
 # ---------------------------------------------------------------------------
@@ -311,6 +699,8 @@ def test_infra_error_from_llm_marks_infra_error(
     refreshed = store.get_task(task.id)
     assert refreshed is not None
     assert refreshed.status == "infra-error"
+    # The automatic retry resumes from the checkpoint
+    assert store.get_checkpoint(task.id) is not None
 
 
 def test_llm_error_marks_task_failed(
@@ -343,6 +733,8 @@ def test_agent_error_marks_task_failed(
     refreshed = store.get_task(task.id)
     assert refreshed is not None
     assert refreshed.status == "failed"
+    assert store.get_checkpoint(task.id) is None
+    mock_git.drop_snapshot.assert_called_once_with(task.id)
 
 
 # ---------------------------------------------------------------------------
@@ -361,3 +753,872 @@ def test_run_with_explicit_task(
 
     assert result.success is True
     assert result.task_id == task.id
+
+
+# ---------------------------------------------------------------------------
+# Tests: Event log
+# ---------------------------------------------------------------------------
+
+
+def _read_events(log_dir: Path) -> list[dict[str, object]]:
+    (run_dir,) = log_dir.iterdir()
+    lines = (run_dir / "events.jsonl").read_text().splitlines()
+    return [json.loads(line) for line in lines]
+
+
+def test_run_records_every_stage_boundary(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    _patch_sanity_pass(mocker)
+    results = iter([_proc(1, "FAILED test_foo"), _proc(0), _proc(0)] + [_proc(0)] * 3)
+    mocker.patch("subprocess.run", side_effect=lambda *a, **k: next(results))
+    task = store.add_task(description="task")
+    log_dir = repo_path / "runs"
+    event_log = EventLog(log_dir=log_dir, max_runs_retained=5)
+    # The reviewer runs concurrently with QA; leave it out for a fixed order.
+    config = SmeltConfig(reviewer=ReviewerConfig(enabled=False))
+    runner = _make_runner(
+        store, repo_path, mock_git, config=config, event_log=event_log
+    )
+
+    result = runner.run()
+    event_log.close()
+
+    assert result.success is True
+    events = _read_events(log_dir)
+    assert [(e["event"], e.get("stage"), e.get("attempt")) for e in events] == [
+        ("run_started", None, None),
+        ("stage_started", "sanity", None),
+        ("stage_finished", "sanity", None),
+        ("stage_started", "branch", None),
+        ("stage_finished", "branch", None),
+        ("stage_started", "context", None),
+        ("stage_finished", "context", None),
+        ("stage_started", "architect", None),
+        ("llm_call", "architect", None),
+        ("stage_finished", "architect", None),
+        ("stage_started", "coder", 1),
+        ("stage_finished", "coder", 1),
+        ("stage_started", "qa", 1),
+        ("stage_finished", "qa", 1),
+        ("stage_started", "coder", 2),
+        ("stage_finished", "coder", 2),
+        ("stage_started", "qa", 2),
+        ("stage_finished", "qa", 2),
+        ("stage_started", "qc", 2),
+        ("llm_call", "qc", 2),
+        ("stage_finished", "qc", 2),
+        ("stage_started", "publish", None),
+        ("stage_finished", "publish", None),
+        ("run_finished", "publish", None),
+    ]
+    assert {e["task_id"] for e in events} == {task.id}
+    by_stage = {
+        (e.get("stage"), e.get("attempt")): e
+        for e in events
+        if e["event"] == "stage_finished"
+    }
+    assert by_stage[("sanity", None)]["exit_codes"] == {"pytest": 0}
+    assert by_stage[("sanity", None)]["base_sha"] == BASE_SHA
+    assert "base_sha" not in by_stage[("branch", None)]
+    assert by_stage[("architect", None)]["model"] == "claude-opus-4-20250514"
+    assert by_stage[("coder", 1)]["session_id"] == "fake"
+    assert by_stage[("qa", 1)]["exit_codes"] == {"pytest": 1, "ruff": 0, "mypy": 0}
+    assert by_stage[("qa", 1)]["passed"] is False
+    assert events[-1]["passed"] is True
+    elapsed = [float(str(e["elapsed_seconds"])) for e in events]
+    assert elapsed == sorted(elapsed)
+
+
+def test_failed_stage_recorded_with_error(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    _patch_sanity_pass(mocker)
+    store.add_task(description="task")
+    log_dir = repo_path / "runs"
+    event_log = EventLog(log_dir=log_dir, max_runs_retained=5)
+    runner = _make_runner(
+        store,
+        repo_path,
+        mock_git,
+        llm=_FailingLLM(LLMError("bad api")),
+        event_log=event_log,
+    )
+
+    runner.run()
+    event_log.close()
+
+    events = _read_events(log_dir)
+    architect = next(
+        e
+        for e in events
+        if e["event"] == "stage_finished" and e["stage"] == "architect"
+    )
+    assert architect["passed"] is False
+    assert architect["message"] == "bad api"
+    assert events[-1]["event"] == "run_finished"
+    assert events[-1]["passed"] is False
+
+
+def test_unexpected_error_finishes_run_and_propagates(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    _patch_sanity_pass(mocker)
+    mock_git.create_branch.side_effect = RuntimeError("disk full")
+    task = store.add_task(description="task")
+    log_dir = repo_path / "runs"
+    event_log = EventLog(log_dir=log_dir, max_runs_retained=5)
+    runner = _make_runner(store, repo_path, mock_git, event_log=event_log)
+
+    with pytest.raises(RuntimeError, match="disk full"):
+        runner.run()
+    event_log.close()
+
+    last = _read_events(log_dir)[-1]
+    assert last["event"] == "run_finished"
+    assert last["passed"] is False
+    assert last["message"] == "disk full"
+    # Not left in-progress: the infra retry picks it up again
+    refreshed = store.get_task(task.id)
+    assert refreshed is not None
+    assert refreshed.status == "infra-error"
+    assert store.get_checkpoint(task.id) is not None
+
+
+def test_run_persists_llm_usage(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    _patch_sanity_pass(mocker)
+    _patch_qa(mocker, returncode=0)
+    task = store.add_task(description="task")
+    log_dir = repo_path / "runs"
+    event_log = EventLog(log_dir=log_dir, max_runs_retained=5)
+    runner = _make_runner(store, repo_path, mock_git, event_log=event_log)
+
+    outcome = runner.run()
+    event_log.close()
+
+    totals = store.usage_totals(group_by="stage", task_id=task.id)
+    assert {t.key: t.prompt_tokens for t in totals} == {"architect": 100, "qc": 100}
+    (run_dir,) = log_dir.iterdir()
+    result = json.loads((run_dir / "result.json").read_text())
+    assert result["usage_by_stage"]["architect"]["completion_tokens"] == 20
+    assert result["usage_by_stage"]["qc"]["prompt_tokens"] == 100
+    (by_run,) = store.usage_totals(group_by="run_id")
+    assert by_run.key == run_dir.name
+    assert outcome.run_id == run_dir.name
+    (run,) = store.list_runs(task_id=task.id)
+    assert run.run_id == run_dir.name
+    assert run.passed is True
+    assert run.attempts == 1
+    assert run.prompt_tokens == 200
+    assert run.base_sha == BASE_SHA
+    assert result["base_sha"] == BASE_SHA
+
+
+def test_run_without_llm_calls_records_no_usage(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    from smelt.exceptions import SanityCheckError
+
+    mocker.patch.object(SanityChecker, "check", side_effect=SanityCheckError("red"))
+    store.add_task(description="task")
+    runner = _make_runner(store, repo_path, mock_git)
+
+    runner.run()
+
+    assert store.usage_totals() == []
+
+
+def test_runs_share_one_base_branch_fetch(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    _patch_sanity_pass(mocker)
+    _patch_qa(mocker, returncode=0)
+    first = store.add_task(description="first")
+    second = store.add_task(description="second")
+    runner = _make_runner(store, repo_path, mock_git)
+
+    runner.run(first)
+    runner.run(second)
+
+    mock_git.fetch.assert_called_once_with("develop")
+    assert mock_git.create_branch.call_args_list == [
+        mocker.call(first.id, start_point=BASE_SHA, reset=True),
+        mocker.call(second.id, start_point=BASE_SHA, reset=True),
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Tests: Metrics
+# ---------------------------------------------------------------------------
+
+
+def test_run_feeds_metrics(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    _patch_sanity_pass(mocker)
+    results = iter([_proc(1, "FAILED test_foo"), _proc(0), _proc(0)] + [_proc(0)] * 3)
+    mocker.patch("subprocess.run", side_effect=lambda *a, **k: next(results))
+    store.add_task(description="task")
+    metrics = PipelineMetrics()
+    runner = _make_runner(store, repo_path, mock_git, metrics=metrics)
+
+    runner.run()
+
+    assert metrics.claims.value(result="claimed") == 1
+    assert metrics.claim_seconds.count() == 1
+    assert metrics.runs.value(outcome="passed") == 1
+    assert metrics.stage_runs.value(stage="qa", outcome="failed") == 1
+    assert metrics.stage_runs.value(stage="qa", outcome="passed") == 1
+    assert metrics.qa_checks.value(tool="pytest", outcome="failed") == 1
+    assert metrics.qa_checks.value(tool="ruff", outcome="passed") == 2
+    assert metrics.llm_seconds.count(model="claude-opus-4-20250514") == 1
+    assert metrics.workers_busy.value() == 0
+
+
+def test_run_feeds_metrics_and_event_log(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    _patch_sanity_pass(mocker)
+    _patch_qa(mocker, returncode=0)
+    task = store.add_task(description="task")
+    metrics = PipelineMetrics()
+    event_log = EventLog(log_dir=repo_path / "runs", max_runs_retained=5)
+    runner = _make_runner(
+        store, repo_path, mock_git, event_log=event_log, metrics=metrics
+    )
+
+    runner.run(task)
+    event_log.close()
+
+    assert metrics.runs.value(outcome="passed") == 1
+    assert metrics.claim_seconds.count() == 0
+    assert _read_events(repo_path / "runs")[-1]["event"] == "run_finished"
+
+
+def test_empty_claim_recorded_in_metrics(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock
+) -> None:
+    metrics = PipelineMetrics()
+    runner = _make_runner(store, repo_path, mock_git, metrics=metrics)
+
+    runner.run()
+
+    assert metrics.claims.value(result="empty") == 1
+    assert metrics.runs.value(outcome="passed") == 0
+
+
+def test_worker_counted_busy_while_running(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    metrics = PipelineMetrics()
+    busy_during_sanity: list[float] = []
+
+    def check() -> ToolResult:
+        busy_during_sanity.append(metrics.workers_busy.value())
+        raise RuntimeError("boom")
+
+    mocker.patch.object(SanityChecker, "check", side_effect=check)
+    store.add_task(description="task")
+    runner = _make_runner(store, repo_path, mock_git, metrics=metrics)
+
+    with pytest.raises(RuntimeError):
+        runner.run()
+
+    assert busy_during_sanity == [1]
+    assert metrics.workers_busy.value() == 0
+    assert metrics.runs.value(outcome="failed") == 1
+
+
+# ---------------------------------------------------------------------------
+# Tests: Worktree pool
+# ---------------------------------------------------------------------------
+
+
+@pytest.fixture
+def pool(repo_path: Path) -> MagicMock:
+    pool = MagicMock()
+    worktree_path = repo_path / "wt"
+    worktree_path.mkdir()
+    pool.acquire.return_value = Worktree(path=worktree_path, branch="smelt/x")
+    return pool
+
+
+def test_worktree_pool_keeps_main_tree_untouched(
+    store: TaskStore,
+    repo_path: Path,
+    mock_git: MagicMock,
+    pool: MagicMock,
+    mocker: MagicMock,
+) -> None:
+    _patch_sanity_pass(mocker)
+    sanity_init = mocker.spy(SanityChecker, "__init__")
+    qa_run = _patch_qa(mocker, returncode=0)
+    mock_git.branch_name.return_value = "smelt/x"
+    task = store.add_task(description="task")
+    runner = _make_runner(store, repo_path, mock_git, worktrees=pool)
+
+    result = runner.run()
+
+    assert result.success is True
+    worktree = pool.acquire.return_value
+    mock_git.fetch.assert_called_once_with("develop")
+    mock_git.branch_name.assert_called_with(task.id)
+    mock_git.at.assert_called_once_with(worktree.path)
+    mock_git.at.return_value.commit.assert_called_once()
+    mock_git.push_branches.assert_called_once_with(["smelt/x"])
+    mock_git.add_all.assert_not_called()
+    pool.acquire.assert_called_once_with("smelt/x", BASE_SHA)
+    pool.release.assert_called_once_with(worktree)
+    mock_git.checkout_branch.assert_not_called()
+    mock_git.pull.assert_not_called()
+    mock_git.create_branch.assert_not_called()
+    assert sanity_init.call_args.kwargs["repo_path"] == worktree.path
+    assert {c.kwargs["cwd"] for c in qa_run.call_args_list} == {worktree.path}
+
+
+def test_worktree_released_when_sanity_fails(
+    store: TaskStore,
+    repo_path: Path,
+    mock_git: MagicMock,
+    pool: MagicMock,
+    mocker: MagicMock,
+) -> None:
+    mocker.patch.object(
+        SanityChecker, "check", side_effect=SanityCheckError("tests failing")
+    )
+    store.add_task(description="task")
+    runner = _make_runner(store, repo_path, mock_git, worktrees=pool)
+
+    result = runner.run()
+
+    assert result.stage_reached == "sanity"
+    pool.release.assert_called_once_with(pool.acquire.return_value)
+
+
+# ---------------------------------------------------------------------------
+# Tests: Speculative execution
+# ---------------------------------------------------------------------------
+
+
+def _speculative_config() -> SmeltConfig:
+    config = SmeltConfig.default()
+    return replace(config, git=replace(config.git, speculative=True))
+
+
+def test_speculative_task_builds_on_parent_in_review(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    _patch_sanity_pass(mocker)
+    _patch_qa(mocker, returncode=0)
+    parent = store.add_task(description="parent")
+    child = store.add_task(description="child", depends_on=[parent.id])
+    store.update_status(parent.id, "in-review")
+    runner = _make_runner(store, repo_path, mock_git, config=_speculative_config())
+
+    result = runner.run()
+
+    assert result.task_id == child.id
+    assert result.success is True
+    assert f"provisional until {parent.id} is merged" in result.message
+    mock_git.fetch.assert_called_once_with("smelt/task-abc")
+    mock_git.rev_parse.assert_called_with("refs/remotes/origin/smelt/task-abc")
+    mock_git.create_branch.assert_called_once_with(
+        child.id, start_point=BASE_SHA, reset=True
+    )
+    (speculation,) = store.speculations()
+    assert (speculation.task_id, speculation.parent_id) == (child.id, parent.id)
+    assert speculation.parent_sha == BASE_SHA
+
+
+@pytest.mark.parametrize("broken", ["fetch", "missing"])
+def test_unreachable_parent_branch_is_infra_error(
+    store: TaskStore,
+    repo_path: Path,
+    mock_git: MagicMock,
+    mocker: MagicMock,
+    broken: str,
+) -> None:
+    if broken == "fetch":
+        mock_git.fetch.side_effect = GitError("network down")
+    else:
+        mock_git.rev_parse.return_value = None
+    parent = store.add_task(description="parent")
+    child = store.add_task(description="child", depends_on=[parent.id])
+    store.update_status(parent.id, "in-review")
+    runner = _make_runner(store, repo_path, mock_git, config=_speculative_config())
+
+    result = runner.run()
+
+    assert result.task_id == child.id
+    assert result.success is False
+    refreshed = store.get_task(child.id)
+    assert refreshed is not None
+    assert refreshed.status == "infra-error"
+    assert store.speculations() == []
+
+
+# ---------------------------------------------------------------------------
+# Tests: Checkpoints
+# ---------------------------------------------------------------------------
+
+
+def test_every_step_is_checkpointed_until_the_run_ends(
+    store: TaskStore,
+    repo_path: Path,
+    mock_git: MagicMock,
+    mocker: MagicMock,
+    tmp_path: Path,
+) -> None:
+    _patch_sanity_pass(mocker)
+    results = iter([_proc(1, "FAILED test_foo")] + [_proc(0)] * 6)
+    mocker.patch("subprocess.run", side_effect=lambda *a, **k: next(results))
+    save = mocker.spy(store, "save_checkpoint")
+    task = store.add_task(description="task")
+    log = EventLog(log_dir=tmp_path / "runs", max_runs_retained=10)
+    config = SmeltConfig.default()
+    config = replace(config, reviewer=ReviewerConfig(enabled=False))
+    runner = _make_runner(store, repo_path, mock_git, config=config, event_log=log)
+
+    result = runner.run()
+    log.close()
+
+    assert result.success is True
+    saved = [c.args[0] for c in save.call_args_list]
+    assert [(c.step, c.attempt) for c in saved] == [
+        (0, None),
+        (1, 1),
+        (2, 1),
+        (1, 2),
+        (2, 2),
+        (3, 2),
+        (4, 2),
+    ]
+    assert {c.base_sha for c in saved[1:]} == {BASE_SHA}
+    assert {c.snapshot for c in saved[1:]} == {SNAPSHOT_SHA}
+    assert "FAILED test_foo" in saved[3].feedback["coder"]
+    assert saved[-1].plan == "## Plan\nModify the file."
+    assert store.get_checkpoint(task.id) is None
+    mock_git.drop_snapshot.assert_called_once_with(task.id)
+    (run_dir,) = (tmp_path / "runs").iterdir()
+    written = json.loads((run_dir / "checkpoint.json").read_text())
+    assert (written["step"], written["snapshot"]) == (4, SNAPSHOT_SHA)
+
+
+def _checkpoint(task_id: str, **changes: object) -> Checkpoint:
+    """A checkpoint taken after the Coder's first attempt failed QA."""
+    checkpoint = Checkpoint(
+        task_id=task_id,
+        run_id="old-run",
+        owner="1",
+        base_sha=BASE_SHA,
+        step=1,
+        plan="## Saved plan",
+        attempt=2,
+        feedback={"coder": "## pytest FAILED (exit 1)\nFAILED test_foo"},
+        runs={"architect": 1, "coder": 1},
+        routes=(1, 0, 0, 0),
+        snapshot=SNAPSHOT_SHA,
+    )
+    return replace(checkpoint, **changes)
+
+
+def test_resume_skips_completed_stages(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    sanity = mocker.patch.object(SanityChecker, "check")
+    _patch_qa(mocker, returncode=0)
+    llm = _QCScriptLLM("VERDICT: PASS")
+    agent = _ReviewingAgent("PASS")
+    task = store.add_task(description="task")
+    store.save_checkpoint(_checkpoint(task.id))
+    runner = _make_runner(store, repo_path, mock_git, llm=llm, agent=agent)
+
+    result = runner.run(task)
+
+    assert result.success is True
+    assert llm.architect_prompts == []
+    sanity.assert_not_called()
+    mock_git.fetch.assert_not_called()
+    mock_git.create_branch.assert_called_once_with(
+        task.id, start_point=BASE_SHA, reset=True
+    )
+    mock_git.restore_snapshot.assert_called_once_with(SNAPSHOT_SHA)
+    (prompt,) = agent.coder_prompts
+    assert "## Saved plan" in prompt
+    assert "FAILED test_foo" in prompt
+    runs = store.list_runs()
+    assert (runs[0].attempts, runs[0].base_sha) == (2, BASE_SHA)
+
+
+def test_resume_in_a_worktree(
+    store: TaskStore,
+    repo_path: Path,
+    mock_git: MagicMock,
+    pool: MagicMock,
+    mocker: MagicMock,
+) -> None:
+    sanity = mocker.patch.object(SanityChecker, "check")
+    _patch_qa(mocker, returncode=0)
+    mock_git.branch_name.return_value = "smelt/x"
+    task = store.add_task(description="task")
+    store.save_checkpoint(_checkpoint(task.id, step=4))
+    runner = _make_runner(store, repo_path, mock_git, worktrees=pool)
+
+    result = runner.run(task)
+
+    assert result.success is True
+    sanity.assert_not_called()
+    pool.acquire.assert_called_once_with("smelt/x", BASE_SHA)
+    mock_git.at.return_value.restore_snapshot.assert_called_once_with(SNAPSHOT_SHA)
+    mock_git.at.return_value.commit.assert_called_once()
+    pool.release.assert_called_once_with(pool.acquire.return_value)
+
+
+def test_unrestorable_checkpoint_is_dropped(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock
+) -> None:
+    mock_git.restore_snapshot.side_effect = GitError("bad object")
+    task = store.add_task(description="task")
+    store.save_checkpoint(_checkpoint(task.id, snapshot=None, step=2))
+    store.save_checkpoint(_checkpoint(task.id))
+    runner = _make_runner(store, repo_path, mock_git)
+
+    result = runner.run(task)
+
+    assert result.success is False
+    assert "Could not restore checkpoint" in result.message
+    # The infra retry starts over
+    saved = store.get_checkpoint(task.id)
+    assert saved is not None
+    assert (saved.step, saved.snapshot) == (0, None)
+    mock_git.drop_snapshot.assert_called_once_with(task.id)
+    refreshed = store.get_task(task.id)
+    assert refreshed is not None
+    assert refreshed.status == "infra-error"
+
+
+def test_resume_without_snapshot_keeps_the_fresh_branch(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    _patch_qa(mocker, returncode=0)
+    task = store.add_task(description="task")
+    store.save_checkpoint(_checkpoint(task.id, snapshot=None))
+    runner = _make_runner(store, repo_path, mock_git)
+
+    assert runner.run(task).success is True
+    mock_git.restore_snapshot.assert_not_called()
+
+
+def test_interrupted_task_is_requeued_and_resumed(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    _patch_qa(mocker, returncode=0)
+    mocker.patch("smelt.pipeline.runner._pid_alive", return_value=False)
+    llm = _QCScriptLLM("VERDICT: PASS")
+    task = store.add_task(description="task")
+    store.update_status(task.id, "in-progress")
+    store.save_checkpoint(_checkpoint(task.id))
+    runner = _make_runner(store, repo_path, mock_git, llm=llm)
+
+    result = runner.run()
+
+    assert (result.task_id, result.success) == (task.id, True)
+    assert llm.architect_prompts == []
+
+
+def test_checkpoint_without_progress_starts_over(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    _patch_sanity_pass(mocker)
+    _patch_qa(mocker, returncode=0)
+    llm = _QCScriptLLM("VERDICT: PASS")
+    task = store.add_task(description="task")
+    store.save_checkpoint(Checkpoint(task_id=task.id, run_id="old-run", owner="1"))
+    runner = _make_runner(store, repo_path, mock_git, llm=llm)
+
+    assert runner.run(task).success is True
+    assert len(llm.architect_prompts) == 1
+    mock_git.restore_snapshot.assert_not_called()
+
+
+def test_failed_snapshot_skips_the_checkpoint(
+    store: TaskStore,
+    repo_path: Path,
+    mock_git: MagicMock,
+    mocker: MagicMock,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    _patch_sanity_pass(mocker)
+    _patch_qa(mocker, returncode=0)
+    mock_git.snapshot.side_effect = GitError("disk full")
+    mock_git.drop_snapshot.side_effect = GitError("no such ref")
+    save = mocker.spy(store, "save_checkpoint")
+    store.add_task(description="task")
+    runner = _make_runner(store, repo_path, mock_git)
+
+    assert runner.run().success is True
+
+    assert save.call_count == 1
+    assert "Could not checkpoint task" in caplog.text
+    assert "Could not delete the snapshot" in caplog.text
+
+
+def test_task_of_an_ended_run_in_this_process_is_requeued(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    _patch_sanity_pass(mocker)
+    _patch_qa(mocker, returncode=0)
+    task = store.add_task(description="task")
+    runner = _make_runner(store, repo_path, mock_git, llm=_QCScriptLLM())
+    # The run dies after the claim without marking the task
+    mocker.patch.object(runner, "_start_recorder", side_effect=MemoryError)
+    with pytest.raises(MemoryError):
+        runner.run()
+    refreshed = store.get_task(task.id)
+    assert refreshed is not None
+    assert refreshed.status == "in-progress"
+
+    llm = _QCScriptLLM("VERDICT: PASS")
+    result = _make_runner(store, repo_path, mock_git, llm=llm).run()
+
+    assert (result.task_id, result.success) == (task.id, True)
+
+
+def test_infra_error_is_retried_from_its_checkpoint(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    _patch_qa(mocker, returncode=0)
+    llm = _QCScriptLLM("VERDICT: PASS")
+    task = store.add_task(description="task")
+    store.save_checkpoint(_checkpoint(task.id))
+    store.update_status(task.id, "infra-error")
+    config = SmeltConfig(infra=InfraConfig(retry_delay_seconds=0))
+
+    result = _make_runner(store, repo_path, mock_git, llm=llm, config=config).run()
+
+    assert (result.task_id, result.success) == (task.id, True)
+    assert llm.architect_prompts == []
+
+
+def test_task_out_of_infra_retries_loses_its_checkpoint(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock
+) -> None:
+    task = store.add_task(description="task")
+    store.save_checkpoint(_checkpoint(task.id))
+    store.update_status(task.id, "infra-error")
+    config = SmeltConfig(infra=InfraConfig(max_infra_retries=0))
+
+    assert _make_runner(store, repo_path, mock_git, config=config).run().task_id == ""
+
+    assert store.get_checkpoint(task.id) is None
+    mock_git.drop_snapshot.assert_called_once_with(task.id)
+    refreshed = store.get_task(task.id)
+    assert refreshed is not None
+    assert refreshed.status == "infra-error"
+
+
+def test_owner_alive() -> None:
+    claims = TaskClaims()
+    own = claims.owner
+    assert own.startswith(f"{os.getpid()}:")
+    assert claims.owner_alive("task-1", own) is False
+    claims.hold("task-1")
+    assert claims.owner_alive("task-1", own) is True
+    # Runners must share one instance: another does not see these runs
+    assert TaskClaims().owner_alive("task-1", own) is False
+    claims.release("task-1")
+    assert claims.owner_alive("task-1", own) is False
+
+    parent = os.getppid()
+    assert claims.owner_alive("task-1", _process_token(parent)) is True
+    # Same pid, different process (e.g. a restarted container)
+    assert claims.owner_alive("task-1", f"{parent}:other-boot:1") is False
+
+
+def test_process_token_without_proc(mocker: MagicMock) -> None:
+    mocker.patch.object(Path, "read_text", side_effect=FileNotFoundError)
+    assert _process_token(4242) == "4242"
+
+
+def test_pid_alive(mocker: MagicMock) -> None:
+    assert _pid_alive(os.getpid()) is True
+    mocker.patch("os.kill", side_effect=ProcessLookupError)
+    assert _pid_alive(1) is False
+    mocker.patch("os.kill", side_effect=PermissionError)
+    assert _pid_alive(1) is True
+
+
+# ---------------------------------------------------------------------------
+# Tests: Plan reuse
+# ---------------------------------------------------------------------------
+
+
+def _rerun(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, llm: _QCScriptLLM
+) -> None:
+    """Run the only task once, then put it back to 'ready' for a retry."""
+    llm.qc_answers.append("VERDICT: PASS")
+    result = _make_runner(store, repo_path, mock_git, llm=llm).run()
+    assert result.success is True
+    store.update_status(result.task_id, "ready")
+
+
+def test_rerun_reuses_the_plan(
+    store: TaskStore,
+    repo_path: Path,
+    mock_git: MagicMock,
+    mocker: MagicMock,
+    tmp_path: Path,
+) -> None:
+    _patch_sanity_pass(mocker)
+    _patch_qa(mocker, returncode=0)
+    llm = _QCScriptLLM()
+    task = store.add_task(description="task")
+    _rerun(store, repo_path, mock_git, llm)
+    saved = store.get_plan(task.id)
+    assert saved is not None
+    assert (saved.plan, saved.base_sha) == ("## Plan 1", BASE_SHA)
+
+    llm.qc_answers.append("VERDICT: PASS")
+    agent = _ReviewingAgent("PASS")
+    log = EventLog(log_dir=tmp_path / "runs", max_runs_retained=10)
+    runner = _make_runner(
+        store, repo_path, mock_git, llm=llm, agent=agent, event_log=log
+    )
+    assert runner.run().success is True
+    log.close()
+
+    assert len(llm.architect_prompts) == 1
+    assert "## Plan 1" in agent.coder_prompts[0]
+    events = _read_events(tmp_path / "runs")
+    assert [e["stage"] for e in events if e["event"] == "plan_reused"] == ["architect"]
+    assert "architect" not in {
+        e.get("stage") for e in events if e["event"] == "stage_started"
+    }
+
+
+def test_moved_base_with_the_same_context_reuses_the_plan(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    _patch_sanity_pass(mocker)
+    _patch_qa(mocker, returncode=0)
+    llm = _QCScriptLLM()
+    store.add_task(description="task")
+    _rerun(store, repo_path, mock_git, llm)
+    mock_git.rev_parse.return_value = "b" * 40
+
+    _rerun(store, repo_path, mock_git, llm)
+
+    assert len(llm.architect_prompts) == 1
+
+
+def test_changed_repository_or_task_gets_a_new_plan(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    _patch_sanity_pass(mocker)
+    _patch_qa(mocker, returncode=0)
+    llm = _QCScriptLLM()
+    task = store.add_task(description="task")
+    _rerun(store, repo_path, mock_git, llm)
+    mock_git.rev_parse.return_value = "b" * 40
+    (repo_path / "new_module.py").write_text("def added() -> None: ...\n")
+
+    _rerun(store, repo_path, mock_git, llm)
+    assert len(llm.architect_prompts) == 2
+
+    store._conn.execute(
+        "UPDATE tasks SET description = 'changed' WHERE id = ?", (task.id,)
+    )
+    _rerun(store, repo_path, mock_git, llm)
+    assert len(llm.architect_prompts) == 3
+    saved = store.get_plan(task.id)
+    assert saved is not None
+    assert (saved.plan, saved.base_sha) == ("## Plan 3", "b" * 40)
+
+
+# ---------------------------------------------------------------------------
+# Tests: Coding budgets
+# ---------------------------------------------------------------------------
+
+
+class _TimedAgent(_FakeAgent):
+    """Fake CodingAgent that records the timeout of every coder session."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.timeouts: list[int] = []
+
+    def run_session(
+        self,
+        *,
+        prompt: str,
+        working_dir: str,
+        timeout_seconds: int,
+        read_only: bool = False,
+    ) -> AgentResult:
+        if not read_only:
+            self.timeouts.append(timeout_seconds)
+        return super().run_session(
+            prompt=prompt,
+            working_dir=working_dir,
+            timeout_seconds=timeout_seconds,
+            read_only=read_only,
+        )
+
+
+def test_simple_task_gets_a_smaller_coding_budget(
+    store: TaskStore,
+    repo_path: Path,
+    mock_git: MagicMock,
+    mocker: MagicMock,
+    tmp_path: Path,
+) -> None:
+    _patch_sanity_pass(mocker)
+    _patch_qa(mocker, returncode=1, stdout="FAILED test_foo")
+    store.add_task(description="rename a constant", complexity=2)
+    agent = _TimedAgent()
+    log = EventLog(log_dir=tmp_path / "runs", max_runs_retained=10)
+
+    result = _make_runner(store, repo_path, mock_git, agent=agent, event_log=log).run()
+    log.close()
+
+    assert result.success is False
+    # Complexity 2 of the default budget (600s, 3 retries at complexity 5)
+    assert agent.timeouts == [240, 240, 240]
+    events = _read_events(tmp_path / "runs")
+    assert [e["message"] for e in events if e["event"] == "coding_budget"] == [
+        "240s per session, 2 retries (from complexity)"
+    ]
+
+
+def test_slow_similar_runs_raise_the_coding_budget(
+    store: TaskStore, repo_path: Path, mock_git: MagicMock, mocker: MagicMock
+) -> None:
+    _patch_sanity_pass(mocker)
+    _patch_qa(mocker, returncode=0)
+    for i in range(5):
+        done = store.add_task(description=f"done {i}", complexity=7)
+        store.update_status(done.id, "merged")
+        store.record_run(
+            RunResult(
+                run_id=f"r{i}",
+                task_id=done.id,
+                passed=True,
+                stage_reached="publish",
+                message="ok",
+                duration_seconds=1000.0,
+                usage_total=summarize("total", []),
+                usage_by_stage={},
+                usage_by_model={},
+                attempts=1,
+            )
+        )
+    store.add_task(description="task", complexity=7)
+    agent = _TimedAgent()
+
+    assert _make_runner(store, repo_path, mock_git, agent=agent).run().success
+
+    # Raised from 840s (complexity 7) to 1.5x the 1000s the similar runs took
+    assert agent.timeouts == [1500]
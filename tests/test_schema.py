@@ -14,6 +14,39 @@ def test_init_db_creates_tables() -> None:
     tables = {row[0] for row in cursor.fetchall()}
     assert "tasks" in tables
     assert "task_dependencies" in tables
+    assert "llm_usage" in tables
+    assert "runs" in tables
+    assert "checkpoints" in tables
+    assert "plans" in tables
+
+
+def test_runs_table_indexed_by_time_and_task() -> None:
+    conn = sqlite3.connect(":memory:")
+    init_db(conn)
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM runs WHERE task_id = ? "
+        "ORDER BY finished_at DESC",
+        ("t1",),
+    ).fetchall()
+    assert "idx_runs_task" in str(plan)
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM runs WHERE finished_at >= ? "
+        "ORDER BY finished_at DESC",
+        ("2026-01-01",),
+    ).fetchall()
+    assert "idx_runs_finished" in str(plan)
+
+
+def test_runs_table_indexed_by_duration() -> None:
+    conn = sqlite3.connect(":memory:")
+    init_db(conn)
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT duration_seconds FROM runs "
+        "ORDER BY duration_seconds LIMIT 1 OFFSET ?",
+        (10,),
+    ).fetchall()
+    assert "idx_runs_duration" in str(plan)
+    assert "TEMP B-TREE" not in str(plan)
 
 
 def test_init_db_is_idempotent() -> None:
@@ -0,0 +1,333 @@
+"""Tests for promoting and invalidating speculative task results."""
+
+from __future__ import annotations
+
+import sqlite3
+import subprocess
+from collections.abc import Iterator
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+from smelt.config import GitConfig
+from smelt.db.models import CachedPlan, Task
+from smelt.db.schema import init_db
+from smelt.db.store import TaskStore
+from smelt.git import BaseBranchSync, GitOps, WorktreePool
+from smelt.speculation import SpeculationReconciler
+
+
+@pytest.fixture
+def git(tmp_path: Path) -> Iterator[GitOps]:
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    origin = tmp_path / "origin.git"
+
+    def run(*args: str) -> None:
+        subprocess.run(["git", *args], cwd=repo, check=True, capture_output=True)
+
+    run("init", "-q", "-b", "main")
+    run("config", "user.name", "t")
+    run("config", "user.email", "t@t")
+    (repo / "README.md").write_text("hello\n")
+    run("add", ".")
+    run("commit", "-qm", "init")
+    subprocess.run(
+        ["git", "clone", "-q", "--bare", str(repo), str(origin)],
+        check=True,
+        capture_output=True,
+    )
+    run("remote", "add", "origin", str(origin))
+    ops = GitOps(repo, GitConfig(base_branch="main"))
+    yield ops
+    ops.close()
+
+
+@pytest.fixture
+def store() -> TaskStore:
+    conn = sqlite3.connect(":memory:")
+    init_db(conn)
+    return TaskStore(conn)
+
+
+def _commit(git: GitOps, branch: str, start: str, name: str, text: str) -> str:
+    """Commit a file on a branch (in the main tree) and push the branch."""
+    git._run("checkout", "-q", "-B", branch, start)
+    (git.repo_path / name).write_text(text)
+    git.add_all()
+    git.commit(f"{branch}: {name}")
+    git._run("push", "-q", "-f", "origin", branch)
+    git._run("checkout", "-q", "--detach")
+    return git._run("rev-parse", branch)
+
+
+def _speculate(git: GitOps, store: TaskStore) -> tuple[Task, Task, str]:
+    """Set up a parent in review and a child built speculatively on it."""
+    parent = store.add_task("parent")
+    child = store.add_task("child", depends_on=[parent.id])
+    store.update_status(parent.id, "in-review")
+    store.update_status(child.id, "speculative")
+    parent_sha = _commit(git, f"smelt/{parent.id}", "main", "parent.txt", "p\n")
+    _commit(git, f"smelt/{child.id}", parent_sha, "child.txt", "c\n")
+    store.record_speculation(child.id, parent.id, parent_sha)
+    return parent, child, parent_sha
+
+
+def _merge(git: GitOps, branch: str) -> str:
+    """Squash-merge a branch into main on origin."""
+    git._run("checkout", "-q", "main")
+    git._run("merge", "-q", "--squash", branch)
+    git.commit(f"Merge {branch}")
+    git._run("push", "-q", "origin", "main")
+    git._run("checkout", "-q", "--detach")
+    return git._run("rev-parse", "main")
+
+
+def _reconciler(
+    git: GitOps, store: TaskStore, pool: WorktreePool | None = None
+) -> SpeculationReconciler:
+    return SpeculationReconciler(
+        store=store,
+        git=git,
+        base_sync=BaseBranchSync(git, branch="main", interval_seconds=0),
+        worktrees=pool,
+        interval_seconds=0,
+        verify_step=2,
+    )
+
+
+def _status(store: TaskStore, task: Task) -> str:
+    refreshed = store.get_task(task.id)
+    assert refreshed is not None
+    return refreshed.status
+
+
+def _remote_heads(git: GitOps) -> str:
+    return git._run("ls-remote", "--heads", "origin")
+
+
+@pytest.mark.parametrize("pooled", [False, True])
+def test_merged_parent_requeues_rebased_result_for_qa(
+    git: GitOps, store: TaskStore, *, pooled: bool
+) -> None:
+    parent, child, _ = _speculate(git, store)
+    store.save_plan(
+        CachedPlan(
+            task_id=child.id,
+            input_hash="i",
+            base_sha="b",
+            context_hash="c",
+            plan="## Plan",
+        )
+    )
+    main_sha = _merge(git, f"smelt/{parent.id}")
+    store.update_status(parent.id, "merged")
+    pool = (
+        WorktreePool(git, root=git.repo_path / "wt", max_idle=1, idle_seconds=60)
+        if pooled
+        else None
+    )
+
+    assert _reconciler(git, store, pool).reconcile() == 1
+
+    assert _status(store, child) == "ready"
+    checkpoint = store.get_checkpoint(child.id)
+    assert checkpoint is not None
+    assert (checkpoint.step, checkpoint.base_sha) == (2, main_sha)
+    assert (checkpoint.plan, checkpoint.runs) == ("## Plan", {"coder": 1})
+    assert checkpoint.snapshot is not None
+    assert git._run("rev-parse", f"{checkpoint.snapshot}~2") == main_sha
+    assert git._run("show", f"{checkpoint.snapshot}:child.txt") == "c"
+    assert git._run("show", f"{checkpoint.snapshot}:parent.txt") == "p"
+    # Published again only once it passes QA
+    assert f"smelt/{child.id}" not in _remote_heads(git)
+    assert store.speculations() == []
+
+
+def test_parent_merged_after_the_last_fetch_waits(
+    git: GitOps, store: TaskStore
+) -> None:
+    parent, child, _ = _speculate(git, store)
+    base_sync = BaseBranchSync(git, branch="main", interval_seconds=3600)
+    reconciler = SpeculationReconciler(
+        store=store,
+        git=git,
+        base_sync=base_sync,
+        worktrees=None,
+        interval_seconds=0,
+        verify_step=2,
+    )
+    base_sync.pin()
+    store.update_status(parent.id, "merged")
+
+    # Marked merged, but origin/main does not have it yet
+    assert reconciler.reconcile() == 0
+    assert _status(store, child) == "speculative"
+
+    _merge(git, f"smelt/{parent.id}")
+    assert reconciler.reconcile() == 1
+    assert _status(store, child) == "ready"
+
+
+def test_unfetchable_base_keeps_result(
+    git: GitOps, store: TaskStore, caplog: pytest.LogCaptureFixture
+) -> None:
+    parent, child, _ = _speculate(git, store)
+    store.update_status(parent.id, "merged")
+    reconciler = SpeculationReconciler(
+        store=store,
+        git=git,
+        base_sync=BaseBranchSync(git, branch="missing", interval_seconds=0),
+        worktrees=None,
+        interval_seconds=0,
+        verify_step=2,
+    )
+
+    assert reconciler.reconcile() == 0
+
+    assert _status(store, child) == "speculative"
+    assert "Could not check the merge" in caplog.text
+
+
+def test_parent_leaving_review_invalidates(git: GitOps, store: TaskStore) -> None:
+    parent, child, _ = _speculate(git, store)
+    store.update_status(parent.id, "ready")
+
+    assert _reconciler(git, store).reconcile() == 1
+
+    assert _status(store, child) == "ready"
+    assert f"smelt/{child.id}" not in _remote_heads(git)
+
+
+def test_moved_parent_branch_invalidates(git: GitOps, store: TaskStore) -> None:
+    parent, child, parent_sha = _speculate(git, store)
+    reconciler = _reconciler(git, store)
+    assert reconciler.reconcile() == 0
+    assert _status(store, child) == "speculative"
+
+    _commit(git, f"smelt/{parent.id}", parent_sha, "fix.txt", "review fix\n")
+
+    assert reconciler.reconcile() == 1
+    assert _status(store, child) == "ready"
+
+
+def test_unfetchable_parent_keeps_result(
+    git: GitOps, store: TaskStore, caplog: pytest.LogCaptureFixture
+) -> None:
+    parent, child, _ = _speculate(git, store)
+    git.delete_remote_branch(f"smelt/{parent.id}")
+
+    assert _reconciler(git, store).reconcile() == 0
+
+    assert _status(store, child) == "speculative"
+    assert "Could not fetch" in caplog.text
+
+
+def test_rebase_conflict_invalidates(git: GitOps, store: TaskStore) -> None:
+    parent, child, _ = _speculate(git, store)
+    _merge(git, f"smelt/{parent.id}")
+    _commit(git, "main", "main", "child.txt", "conflicting\n")
+    store.update_status(parent.id, "merged")
+
+    assert _reconciler(git, store).reconcile() == 1
+
+    assert _status(store, child) == "ready"
+    assert f"smelt/{child.id}" not in _remote_heads(git)
+    assert not (git.repo_path / ".git" / "rebase-merge").exists()
+
+
+def test_missing_local_branch_invalidates(
+    git: GitOps, store: TaskStore, caplog: pytest.LogCaptureFixture
+) -> None:
+    parent, child, _ = _speculate(git, store)
+    git.delete_branch(f"smelt/{child.id}")
+    git.delete_remote_branch(f"smelt/{child.id}")
+    _merge(git, f"smelt/{parent.id}")
+    store.update_status(parent.id, "merged")
+
+    assert _reconciler(git, store).reconcile() == 1
+
+    assert _status(store, child) == "ready"
+    assert "not found" in caplog.text
+    assert "Could not delete" in caplog.text
+
+
+def test_deleted_parent_invalidates(store: TaskStore) -> None:
+    git = MagicMock()
+    task = store.add_task("orphan")
+    store.update_status(task.id, "speculative")
+
+    reconciler = _reconciler(git, store)
+    assert reconciler.reconcile() == 1
+
+    assert _status(store, task) == "ready"
+    git.delete_remote_branch.assert_called_once_with(git.branch_name.return_value)
+
+
+def test_lost_races_change_nothing(store: TaskStore, mocker: MagicMock) -> None:
+    git = MagicMock()
+    parent = store.add_task("parent")
+    merged = store.add_task("merged parent")
+    for child_of in (parent, merged):
+        child = store.add_task("child", depends_on=[child_of.id])
+        store.update_status(child.id, "speculative")
+        store.record_speculation(child.id, child_of.id, "sha")
+    store.update_status(merged.id, "merged")
+    mocker.patch.object(store, "resolve_speculation", return_value=False)
+
+    assert _reconciler(git, store).reconcile() == 0
+    git.rebase.assert_not_called()
+    git.delete_remote_branch.assert_not_called()
+
+
+def test_racing_reconcilers_resolve_once(
+    git: GitOps, store: TaskStore, mocker: MagicMock
+) -> None:
+    parent, child, _ = _speculate(git, store)
+    _merge(git, f"smelt/{parent.id}")
+    store.update_status(parent.id, "merged")
+    listing = store.speculations()
+    first, second = _reconciler(git, store), _reconciler(git, store)
+    rebase = mocker.spy(GitOps, "rebase")
+
+    assert first.reconcile() == 1
+    mocker.patch.object(store, "speculations", return_value=listing)
+    assert second.reconcile() == 0
+
+    assert rebase.call_count == 1
+    assert _status(store, child) == "ready"
+
+
+def test_stale_listing_leaves_a_new_speculation_alone(store: TaskStore) -> None:
+    git = MagicMock()
+    parent = store.add_task("parent")
+    child = store.add_task("child", depends_on=[parent.id])
+    store.update_status(child.id, "speculative")
+    store.record_speculation(child.id, parent.id, "old")
+    listing = store.speculations()
+    store.record_speculation(child.id, parent.id, "new")
+    store.speculations = MagicMock(return_value=listing)  # type: ignore[method-assign]
+
+    assert _reconciler(git, store).reconcile() == 0
+
+    assert _status(store, child) == "speculative"
+    git.delete_remote_branch.assert_not_called()
+
+
+def test_reconcile_runs_at_most_once_per_interval(store: TaskStore) -> None:
+    store.update_status(store.add_task("orphan").id, "speculative")
+    reconciler = SpeculationReconciler(
+        store=store,
+        git=MagicMock(),
+        base_sync=MagicMock(),
+        worktrees=None,
+        interval_seconds=3600,
+        verify_step=2,
+    )
+    speculations = MagicMock(wraps=store.speculations)
+    store.speculations = speculations  # type: ignore[method-assign]
+
+    reconciler.reconcile()
+    assert reconciler.reconcile() == 0
+    assert speculations.call_count == 1
@@ -1,9 +1,19 @@
 """Unit tests for the TaskStore implementation."""
 
 import sqlite3
+from dataclasses import replace
 
 import pytest
 
+from smelt.db.models import (
+    CachedPlan,
+    Checkpoint,
+    LLMUsage,
+    RunResult,
+    Speculation,
+    SubTask,
+    UsageTotals,
+)
 from smelt.db.schema import init_db
 from smelt.db.store import TaskStore
 from smelt.exceptions import (
@@ -56,6 +66,19 @@ def test_list_tasks_filtered(store: TaskStore) -> None:
     assert tasks[0].id == t2.id
 
 
+def test_count_by_status(store: TaskStore) -> None:
+    store.add_task("t1")
+    store.add_task("t2")
+    t3 = store.add_task("t3")
+    store.update_status(t3.id, "failed")
+
+    counts = store.count_by_status()
+    assert counts["ready"] == 2
+    assert counts["failed"] == 1
+    assert counts["merged"] == 0
+    assert set(counts) == TaskStore.VALID_STATUSES
+
+
 def test_update_status(store: TaskStore) -> None:
     t1 = store.add_task("t1")
     store.update_status(t1.id, "in-progress")
@@ -100,6 +123,81 @@ def test_pick_next_task_with_deps(store: TaskStore) -> None:
     assert next_task2.id == t2.id
 
 
+def _schedule(store: TaskStore) -> dict[str, tuple[int, int]]:
+    rows = store._conn.execute("SELECT * FROM task_schedule").fetchall()
+    return {r["task_id"]: (r["critical_path"], r["downstream"]) for r in rows}
+
+
+def test_pick_next_task_prefers_critical_path(store: TaskStore) -> None:
+    store.add_task("big leaf", complexity=8)
+    head = store.add_task("chain head", complexity=1)
+    middle = store.add_task("chain middle", complexity=5, depends_on=[head.id])
+    store.add_task("chain tail", complexity=5, depends_on=[middle.id])
+
+    assert _schedule(store)[head.id] == (11, 2)
+    assert store.pick_next_task() == head
+
+
+def test_pick_next_task_breaks_ties_by_downstream(store: TaskStore) -> None:
+    narrow = store.add_task("narrow", complexity=2)
+    wide = store.add_task("wide", complexity=2)
+    store.add_task("n1", complexity=3, depends_on=[narrow.id])
+    store.add_task("w1", complexity=3, depends_on=[wide.id])
+    store.add_task("w2", complexity=3, depends_on=[wide.id])
+
+    schedule = _schedule(store)
+    assert (schedule[narrow.id], schedule[wide.id]) == ((5, 1), (5, 2))
+    claimed = store.claim_next_task()
+    assert claimed is not None
+    assert claimed.id == wide.id
+
+
+def test_schedule_follows_edge_and_status_changes(store: TaskStore) -> None:
+    root = store.add_task("root")
+    mid = store.add_task("mid", complexity=2, depends_on=[root.id])
+    leaf = store.add_task("leaf", complexity=3)
+    assert _schedule(store)[root.id] == (7, 1)
+
+    store.add_dependency(leaf.id, mid.id)
+    assert _schedule(store)[root.id] == (10, 2)
+
+    store.update_status(mid.id, "merged")
+    assert _schedule(store)[mid.id] == (0, 0)
+    assert _schedule(store)[root.id] == (5, 0)
+
+    store.update_status(mid.id, "ready")
+    assert _schedule(store)[root.id] == (10, 2)
+
+
+def test_incremental_schedule_matches_a_rebuild(store: TaskStore) -> None:
+    root = store.add_task("root", complexity=1)
+    left = store.add_task("left", complexity=2, depends_on=[root.id])
+    right = store.add_task("right", complexity=4, depends_on=[root.id])
+    join = store.add_task("join", complexity=3, depends_on=[left.id, right.id])
+    store.add_task("tail", complexity=1, depends_on=[join.id])
+    other = store.add_task("other", complexity=6)
+    store.update_status(left.id, "merged")
+    store.add_dependency(store.add_task("late", complexity=2).id, right.id)
+
+    incremental = _schedule(store)
+    # A diamond counts the shared tail once
+    assert incremental[root.id] == (1 + 4 + 3 + 1, 4)
+    assert incremental[other.id] == (6, 0)
+    with store._conn:
+        store._refresh_schedule(None)
+    assert _schedule(store) == incremental
+
+
+def test_schedule_backfilled_for_existing_databases() -> None:
+    conn = sqlite3.connect(":memory:")
+    init_db(conn)
+    conn.execute("INSERT INTO tasks (id, description, complexity) VALUES ('a', 'a', 4)")
+
+    store = TaskStore(conn)
+
+    assert _schedule(store) == {"a": (4, 0)}
+
+
 def test_pick_next_task_ignores_non_ready(store: TaskStore) -> None:
     t1 = store.add_task("t1")
     store.update_status(t1.id, "in-progress")
@@ -162,3 +260,511 @@ def test_diamond_dependency_visited_branch(store: TaskStore) -> None:
     # Adding tx -> t4 will check _path_exists(t4.id, tx.id)
     # BFS will enqueue t5 twice, and hit the 'current already in visited' branch
     store.add_dependency(tx.id, t4.id)
+
+
+def test_split_task_replaces_parent_with_subtasks(store: TaskStore) -> None:
+    upstream = store.add_task("upstream")
+    epic = store.add_task(
+        "epic",
+        priority=4,
+        context="spec",
+        context_files="a.py",
+        depends_on=[upstream.id],
+    )
+    downstream = store.add_task("downstream", depends_on=[epic.id])
+    store.record_usage(
+        run_id="r",
+        task_id=epic.id,
+        entries=[("decomposer", _usage("m", 3, None))],
+    )
+
+    schema, api, docs = store.split_task(
+        epic.id,
+        [
+            SubTask(key="schema", description="Add schema", complexity=2),
+            SubTask(
+                key="api", description="Add API", complexity=5, depends_on=("schema",)
+            ),
+            SubTask(
+                key="docs", description="Docs", complexity=1, depends_on=("schema",)
+            ),
+        ],
+    )
+
+    assert store.get_task(epic.id) is None
+    assert (api.priority, api.complexity, api.context, api.context_files) == (
+        4,
+        5,
+        "spec",
+        "a.py",
+    )
+    assert {t.id for t in store.get_dependencies(schema.id)} == {upstream.id}
+    assert {t.id for t in store.get_dependencies(api.id)} == {schema.id, upstream.id}
+    assert {t.id for t in store.get_dependencies(downstream.id)} == {
+        schema.id,
+        api.id,
+        docs.id,
+    }
+    assert [u.key for u in store.usage_totals("task_id")] == [schema.id]
+    store.update_status(upstream.id, "merged")
+    assert store.pick_next_task() == schema
+
+
+def test_split_task_rejects_bad_order_and_unknown_keys(store: TaskStore) -> None:
+    epic = store.add_task("epic")
+    later = SubTask(key="b", description="b", complexity=1, depends_on=("a",))
+    with pytest.raises(CircularDependencyError, match="listed before"):
+        store.split_task(
+            epic.id, [later, SubTask(key="a", description="a", complexity=1)]
+        )
+    with pytest.raises(TaskNotFoundError, match="unknown sub-task 'a'"):
+        store.split_task(epic.id, [later])
+    assert [t.id for t in store.list_tasks()] == [epic.id]
+
+
+def test_split_task_requires_unstarted_task(store: TaskStore) -> None:
+    sub = [SubTask(key="a", description="a", complexity=1)]
+    with pytest.raises(TaskNotFoundError):
+        store.split_task("missing", sub)
+    task = store.add_task("started")
+    store.update_status(task.id, "in-progress")
+    with pytest.raises(InvalidStatusTransitionError, match="in-progress"):
+        store.split_task(task.id, sub)
+
+
+def test_claim_next_task_marks_in_progress(store: TaskStore) -> None:
+    store.add_task("low", priority=1)
+    high = store.add_task("high", priority=10)
+
+    claimed = store.claim_next_task()
+    assert claimed is not None
+    assert claimed.id == high.id
+    assert claimed.status == "in-progress"
+
+    refreshed = store.get_task(high.id)
+    assert refreshed is not None
+    assert refreshed.status == "in-progress"
+
+
+def test_claim_next_task_never_returns_same_task_twice(store: TaskStore) -> None:
+    t1 = store.add_task("t1")
+    t2 = store.add_task("t2")
+
+    first = store.claim_next_task()
+    second = store.claim_next_task()
+    assert first is not None
+    assert second is not None
+    assert {first.id, second.id} == {t1.id, t2.id}
+    assert store.claim_next_task() is None
+
+
+def test_claim_next_task_respects_dependencies(store: TaskStore) -> None:
+    t1 = store.add_task("t1")
+    store.add_task("t2", priority=10, depends_on=[t1.id])
+
+    claimed = store.claim_next_task()
+    assert claimed is not None
+    assert claimed.id == t1.id
+    # t2 is blocked until t1 is merged
+    assert store.claim_next_task() is None
+
+
+def _usage(model: str, prompt: int, cost: float | None) -> LLMUsage:
+    return LLMUsage(
+        model=model,
+        prompt_tokens=prompt,
+        completion_tokens=prompt // 10,
+        cached_tokens=prompt // 2,
+        latency_seconds=1.0,
+        cost_usd=cost,
+    )
+
+
+def test_claim_next_task_speculative(store: TaskStore) -> None:
+    parent = store.add_task("parent", priority=1)
+    child = store.add_task("child", priority=1, depends_on=[parent.id])
+    other = store.add_task("other")
+    two_parents = store.add_task("two", priority=1, depends_on=[parent.id, other.id])
+    broken = store.add_task("broken")
+    store.add_task("needs failed", priority=1, depends_on=[parent.id, broken.id])
+    store.update_status(parent.id, "in-review")
+    store.update_status(broken.id, "failed")
+
+    claimed = store.claim_next_task(speculative=True)
+    assert claimed is not None
+    assert claimed.id == other.id
+    store.update_status(other.id, "in-review")
+
+    assert store.claim_next_task() is None
+    claimed = store.claim_next_task(speculative=True)
+    assert claimed is not None
+    assert claimed.id == child.id
+    assert store.claim_next_task(speculative=True) is None
+    assert _task_status(store, two_parents.id) == "ready"
+
+
+def _task_status(store: TaskStore, task_id: str) -> str:
+    task = store.get_task(task_id)
+    assert task is not None
+    return task.status
+
+
+def test_update_status_if(store: TaskStore) -> None:
+    task = store.add_task("t", complexity=2)
+    dependent = store.add_task("d", depends_on=[task.id])
+
+    assert store.update_status_if(task.id, "in-review", "merged") is False
+    assert store.update_status_if(task.id, "ready", "merged") is True
+    assert _task_status(store, task.id) == "merged"
+    assert _schedule(store)[task.id] == (0, 0)
+    assert store.update_status_if(dependent.id, "ready", "speculative") is True
+    with pytest.raises(InvalidStatusTransitionError):
+        store.update_status_if(task.id, "merged", "bogus")
+
+
+def test_speculations(store: TaskStore) -> None:
+    parent = store.add_task("parent")
+    child = store.add_task("child", depends_on=[parent.id])
+    store.update_status(parent.id, "in-review")
+    store.record_speculation(child.id, parent.id, "old")
+    store.record_speculation(child.id, parent.id, "abc")
+    assert store.speculations() == []
+
+    store.update_status(child.id, "speculative")
+    assert store.speculations() == [
+        Speculation(
+            task_id=child.id,
+            parent_id=parent.id,
+            parent_sha="abc",
+            parent_status="in-review",
+        )
+    ]
+
+
+def test_resolve_speculation(store: TaskStore) -> None:
+    parent = store.add_task("parent")
+    child = store.add_task("child", depends_on=[parent.id])
+    orphan = store.add_task("orphan")
+    store.update_status(child.id, "speculative")
+    store.update_status(orphan.id, "speculative")
+    store.record_speculation(child.id, parent.id, "new")
+
+    assert not store.resolve_speculation(child.id, "old", "ready")
+    assert store.resolve_speculation(child.id, "new", "ready")
+    assert not store.resolve_speculation(child.id, "new", "ready")
+    assert store.resolve_speculation(orphan.id, "", "ready")
+    statuses = {t.id: t.status for t in store.list_tasks()}
+    assert (statuses[child.id], statuses[orphan.id]) == ("ready", "ready")
+    with pytest.raises(InvalidStatusTransitionError):
+        store.resolve_speculation(child.id, "new", "bogus")
+
+
+def test_checkpoint_round_trip(store: TaskStore) -> None:
+    task = store.add_task("t")
+    assert store.get_checkpoint(task.id) is None
+    store.save_checkpoint(Checkpoint(task_id=task.id, run_id="r1", owner="1"))
+    checkpoint = Checkpoint(
+        task_id=task.id,
+        run_id="r2",
+        owner="42:boot:123",
+        base_sha="abc",
+        step=2,
+        plan="## Plan",
+        attempt=3,
+        feedback={"coder": "tests failed"},
+        runs={"coder": 3, "qa": 2},
+        routes=(2, 0, 1),
+        snapshot="def",
+    )
+
+    store.save_checkpoint(checkpoint)
+
+    saved = store.get_checkpoint(task.id)
+    assert saved is not None
+    assert saved.updated_at
+    assert replace(saved, updated_at="") == checkpoint
+
+    store.delete_checkpoint(task.id)
+    assert store.get_checkpoint(task.id) is None
+
+
+def test_claim_gives_the_checkpoint_an_owner(store: TaskStore) -> None:
+    fresh = store.add_task("fresh", priority=2)
+    resumed = store.add_task("resumed", priority=1)
+    store.save_checkpoint(
+        Checkpoint(task_id=resumed.id, run_id="r", owner="dead", step=3)
+    )
+
+    assert store.claim_next_task(owner="me") == store.get_task(fresh.id)
+    checkpoint = store.get_checkpoint(fresh.id)
+    assert checkpoint is not None
+    assert (checkpoint.owner, checkpoint.step) == ("me", 0)
+
+    store.claim_task(resumed.id, owner="me")
+    checkpoint = store.get_checkpoint(resumed.id)
+    assert checkpoint is not None
+    assert (checkpoint.owner, checkpoint.step) == ("me", 3)
+    assert store.task_statuses()[resumed.id] == "in-progress"
+
+
+def test_claim_task_refreshes_the_schedule_of_a_merged_task(
+    store: TaskStore,
+) -> None:
+    done = store.add_task("done", complexity=4)
+    store.add_task("child", complexity=1, depends_on=[done.id])
+    store.update_status(done.id, "merged")
+
+    store.claim_task(done.id, owner="me")
+
+    row = store._conn.execute(
+        "SELECT critical_path FROM task_schedule WHERE task_id = ?", (done.id,)
+    ).fetchone()
+    # Back on the critical path: its own weight plus the child's
+    assert row[0] == 5
+
+
+def test_claim_missing_task(store: TaskStore) -> None:
+    with pytest.raises(TaskNotFoundError):
+        store.claim_task("missing", owner="me")
+
+
+def _age(store: TaskStore, task_id: str, updated_at: str) -> None:
+    with store._conn:
+        store._conn.execute(
+            "UPDATE tasks SET updated_at = ? WHERE id = ?", (updated_at, task_id)
+        )
+
+
+def test_retry_infra_errors(store: TaskStore) -> None:
+    old = store.add_task("old error")
+    recent = store.add_task("recent error")
+    spent = store.add_task("out of retries")
+    bare = store.add_task("no checkpoint")
+    for task in (old, recent, spent, bare):
+        if task is not bare:
+            store.save_checkpoint(Checkpoint(task_id=task.id, run_id="r", owner="o"))
+        store.update_status(task.id, "infra-error")
+    for task in (old, spent, bare):
+        _age(store, task.id, "2026-01-01 00:00:00")
+    with store._conn:
+        store._conn.execute(
+            "UPDATE checkpoints SET infra_retries = 2 WHERE task_id = ?", (spent.id,)
+        )
+
+    requeued, exhausted = store.retry_infra_errors(delay_seconds=60, max_retries=2)
+
+    assert (requeued, exhausted) == ([old.id], [spent.id])
+    statuses = store.task_statuses()
+    assert [statuses[t.id] for t in (old, recent, spent, bare)] == [
+        "ready",
+        "infra-error",
+        "infra-error",
+        "infra-error",
+    ]
+    checkpoint = store.get_checkpoint(old.id)
+    assert checkpoint is not None
+    assert checkpoint.infra_retries == 1
+    # Saving progress keeps the retry count
+    store.save_checkpoint(replace(checkpoint, step=2, infra_retries=0))
+    saved = store.get_checkpoint(old.id)
+    assert saved is not None
+    assert (saved.step, saved.infra_retries) == (2, 1)
+
+
+def test_plan_round_trip(store: TaskStore) -> None:
+    task = store.add_task("t")
+    assert store.get_plan(task.id) is None
+    plan = CachedPlan(
+        task_id=task.id,
+        input_hash="in",
+        base_sha="abc",
+        context_hash="ctx",
+        plan="## Plan",
+    )
+    store.save_plan(replace(plan, plan="## Old plan"))
+    store.save_plan(plan)
+
+    saved = store.get_plan(task.id)
+    assert saved is not None
+    assert saved.created_at
+    assert replace(saved, created_at="") == plan
+
+    store.delete_plan(task.id)
+    assert store.get_plan(task.id) is None
+
+
+def test_requeue_interrupted_only_takes_tasks_of_dead_runners(
+    store: TaskStore,
+) -> None:
+    dead = store.add_task("dead runner")
+    alive = store.add_task("live runner")
+    finished = store.add_task("finished")
+    unclaimed = store.add_task("no checkpoint")
+    for task, owner in ((dead, "1"), (alive, "2"), (finished, "1")):
+        store.update_status(task.id, "in-progress")
+        store.save_checkpoint(Checkpoint(task_id=task.id, run_id="r", owner=owner))
+    store.update_status(finished.id, "failed")
+    store.update_status(unclaimed.id, "in-progress")
+
+    alive_owners = {(alive.id, "2")}
+    assert store.requeue_interrupted(
+        lambda task_id, owner: (task_id, owner) in alive_owners
+    ) == [dead.id]
+
+    statuses = store.task_statuses()
+    assert statuses[dead.id] == "ready"
+    assert statuses[alive.id] == "in-progress"
+    assert statuses[finished.id] == "failed"
+    assert statuses[unclaimed.id] == "in-progress"
+    assert store.get_checkpoint(dead.id) is not None
+
+
+def test_record_and_aggregate_usage(store: TaskStore) -> None:
+    t1 = store.add_task("t1")
+    t2 = store.add_task("t2")
+    store.record_usage(
+        run_id="r1",
+        task_id=t1.id,
+        entries=[
+            ("architect", _usage("opus", 1000, 0.10)),
+            ("qc", _usage("haiku", 200, None)),
+        ],
+    )
+    store.record_usage(
+        run_id="r2", task_id=t2.id, entries=[("architect", _usage("opus", 500, 0.05))]
+    )
+
+    by_model = store.usage_totals()
+    assert [t.key for t in by_model] == ["opus", "haiku"]
+    opus = by_model[0]
+    assert opus.calls == 2
+    assert opus.prompt_tokens == 1500
+    assert opus.cached_tokens == 750
+    assert opus.cost_usd == pytest.approx(0.15)
+    assert by_model[1].cost_usd == 0
+    assert by_model[1].unpriced_calls == 1
+
+    by_stage = store.usage_totals(group_by="stage", task_id=t1.id)
+    assert {t.key: t.calls for t in by_stage} == {"architect": 1, "qc": 1}
+
+    by_run = store.usage_totals(group_by="run_id")
+    assert [t.key for t in by_run] == ["r1", "r2"]
+
+
+def test_usage_totals_rejects_unknown_column(store: TaskStore) -> None:
+    with pytest.raises(ValueError, match="Cannot group usage by"):
+        store.usage_totals(group_by="1; DROP TABLE tasks")
+
+
+def test_usage_removed_with_task(store: TaskStore) -> None:
+    task = store.add_task("t1")
+    store.record_usage(
+        run_id="r1", task_id=task.id, entries=[("architect", _usage("m", 1, 0.0))]
+    )
+    store._conn.execute("DELETE FROM tasks WHERE id = ?", (task.id,))
+    assert store.usage_totals() == []
+
+
+def _run(
+    run_id: str,
+    task_id: str,
+    *,
+    passed: bool = True,
+    duration: float = 10.0,
+    cost: float = 0.5,
+) -> RunResult:
+    total = UsageTotals(
+        key="total",
+        calls=1,
+        prompt_tokens=100,
+        completion_tokens=20,
+        cached_tokens=0,
+        latency_seconds=1.0,
+        cost_usd=cost,
+        unpriced_calls=0,
+    )
+    return RunResult(
+        run_id=run_id,
+        task_id=task_id,
+        passed=passed,
+        stage_reached="qa",
+        message="ok" if passed else "QA failed",
+        duration_seconds=duration,
+        usage_total=total,
+        usage_by_stage={},
+        usage_by_model={},
+        attempts=2,
+        base_sha="abc123",
+    )
+
+
+def _set_finished(store: TaskStore, run_id: str, finished_at: str) -> None:
+    with store._conn:
+        store._conn.execute(
+            "UPDATE runs SET finished_at = ? WHERE run_id = ?", (finished_at, run_id)
+        )
+
+
+def test_task_statuses(store: TaskStore) -> None:
+    assert store.task_statuses() == {}
+    t1 = store.add_task("t1")
+    t2 = store.add_task("t2")
+    store.update_status(t2.id, "failed")
+    assert store.task_statuses() == {t1.id: "ready", t2.id: "failed"}
+
+
+def test_record_and_list_runs(store: TaskStore) -> None:
+    t1 = store.add_task("t1")
+    t2 = store.add_task("t2", complexity=3)
+    store.record_run(_run("r1", t1.id, passed=False))
+    store.record_run(_run("r2", t1.id))
+    store.record_run(_run("r3", t2.id))
+    _set_finished(store, "r1", "2026-03-01 10:00:00")
+    _set_finished(store, "r2", "2026-03-02 10:00:00")
+    _set_finished(store, "r3", "2026-03-03 10:00:00")
+
+    runs = store.list_runs()
+    assert [r.run_id for r in runs] == ["r3", "r2", "r1"]
+    assert runs[2].passed is False
+    assert runs[2].attempts == 2
+    assert runs[2].base_sha == "abc123"
+    assert runs[2].prompt_tokens == 100
+    assert runs[2].cost_usd == 0.5
+    assert runs[2].finished_at == "2026-03-01 10:00:00"
+
+    assert [r.run_id for r in store.list_runs(task_id=t1.id)] == ["r2", "r1"]
+    assert [r.run_id for r in store.list_runs(passed=False)] == ["r1"]
+    assert [r.run_id for r in store.list_runs(since="2026-03-02")] == ["r3", "r2"]
+    assert [r.run_id for r in store.list_runs(limit=1, offset=1)] == ["r2"]
+    assert [r.run_id for r in store.list_runs(complexity=3)] == ["r3"]
+    assert store.run_stats(complexity=3).runs == 1
+
+
+def test_run_stats(store: TaskStore) -> None:
+    t1 = store.add_task("t1")
+    t2 = store.add_task("t2")
+    for i, duration in enumerate([5.0, 1.0, 3.0, 100.0, 2.0], start=1):
+        task = t1 if i < 4 else t2
+        store.record_run(_run(f"r{i}", task.id, passed=i != 1, duration=duration))
+        _set_finished(store, f"r{i}", f"2026-03-0{1 + i // 3} 12:00:00")
+
+    stats = store.run_stats()
+    assert stats.runs == 5
+    assert stats.passed == 4
+    assert stats.p50_seconds == 3.0
+    assert stats.p95_seconds == 100.0
+    # Two distinct tasks completed over 2026-03-01 .. 2026-03-02
+    assert stats.tasks_per_day == 1.0
+    assert stats.cost_usd == pytest.approx(2.5)
+
+    failed = store.run_stats(passed=False)
+    assert (failed.runs, failed.p50_seconds, failed.tasks_per_day) == (1, 5.0, 0.0)
+
+
+def test_run_stats_without_runs(store: TaskStore) -> None:
+    stats = store.run_stats(task_id="missing")
+    assert stats.runs == 0
+    assert stats.p50_seconds == 0.0
+    assert stats.p95_seconds == 0.0
+    assert stats.tasks_per_day == 0.0
+    assert stats.cost_usd == 0.0
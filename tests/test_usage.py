@@ -0,0 +1,57 @@
+"""Tests for the per-run LLM usage ledger."""
+
+from __future__ import annotations
+
+import pytest
+
+from smelt.db.models import LLMUsage
+from smelt.usage import UsageLedger, summarize
+
+
+def _usage(model: str, cost: float | None = 0.01) -> LLMUsage:
+    return LLMUsage(
+        model=model,
+        prompt_tokens=100,
+        completion_tokens=10,
+        cached_tokens=40,
+        latency_seconds=0.5,
+        cost_usd=cost,
+    )
+
+
+def test_empty_ledger_totals_are_zero() -> None:
+    ledger = UsageLedger()
+    total = ledger.total()
+    assert total.key == "total"
+    assert total.calls == 0
+    assert total.cost_usd == 0
+    assert ledger.by_stage() == {}
+    assert ledger.by_model() == {}
+
+
+def test_ledger_groups_by_stage_and_model() -> None:
+    ledger = UsageLedger()
+    ledger.add("architect", [_usage("opus"), _usage("opus")])
+    ledger.add("qc", [_usage("haiku", cost=None)])
+
+    by_stage = ledger.by_stage()
+    assert by_stage["architect"].calls == 2
+    assert by_stage["architect"].prompt_tokens == 200
+    assert by_stage["architect"].cost_usd == pytest.approx(0.02)
+    assert by_stage["qc"].unpriced_calls == 1
+
+    by_model = ledger.by_model()
+    assert set(by_model) == {"opus", "haiku"}
+    assert by_model["haiku"].cost_usd == 0
+
+    total = ledger.total()
+    assert total.calls == 3
+    assert total.cached_tokens == 120
+    assert total.latency_seconds == pytest.approx(1.5)
+    assert [stage for stage, _ in ledger.entries] == ["architect", "architect", "qc"]
+
+
+def test_summarize_counts_unpriced_calls_separately() -> None:
+    totals = summarize("x", [_usage("a", cost=0.5), _usage("a", cost=None)])
+    assert totals.cost_usd == 0.5
+    assert totals.unpriced_calls == 1